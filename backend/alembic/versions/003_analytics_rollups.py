@@ -0,0 +1,67 @@
+"""Add hourly/daily analytics rollup tables
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Traffic counters per hour/day
+    op.create_table(
+        'analytics_rollups',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('granularity', sa.String(10), nullable=False),
+        sa.Column('bucket_start', sa.DateTime, nullable=False),
+        sa.Column('pageviews', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('events', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('visitors', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('sessions', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('bounces', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('session_duration_total', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('conversions', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('revenue', sa.Float, nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime),
+        sa.UniqueConstraint('granularity', 'bucket_start', name='uq_rollups_bucket'),
+    )
+
+    # Per-dimension counters per hour/day
+    op.create_table(
+        'analytics_dimension_rollups',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('granularity', sa.String(10), nullable=False),
+        sa.Column('bucket_start', sa.DateTime, nullable=False),
+        sa.Column('dimension', sa.String(20), nullable=False),
+        sa.Column('value', sa.String(1024), nullable=False),
+        sa.Column('label', sa.String(255)),
+        sa.Column('hits', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('visitors', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime),
+        sa.UniqueConstraint(
+            'granularity', 'bucket_start', 'dimension', 'value',
+            name='uq_dimension_rollups_bucket'
+        ),
+    )
+
+    op.create_index(
+        'idx_dimension_rollups_lookup',
+        'analytics_dimension_rollups',
+        ['granularity', 'dimension', 'bucket_start']
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_dimension_rollups')
+    op.drop_table('analytics_rollups')
@@ -0,0 +1,27 @@
+"""Add HyperLogLog visitor sketches to analytics rollups
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('analytics_rollups', sa.Column('visitor_sketch', sa.LargeBinary))
+    op.add_column('analytics_dimension_rollups', sa.Column('visitor_sketch', sa.LargeBinary))
+
+
+def downgrade() -> None:
+    op.drop_column('analytics_dimension_rollups', 'visitor_sketch')
+    op.drop_column('analytics_rollups', 'visitor_sketch')
@@ -0,0 +1,176 @@
+"""Range-partition analytics_events by day on timestamp
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Future daily partitions created by the migration; the maintenance job
+# keeps extending this window afterwards.
+PREMAKE_DAYS = 7
+
+SINGLE_COLUMN_INDEXES = [
+    'event_type', 'session_id', 'visitor_id', 'user_id', 'timestamp', 'path',
+    'referrer_domain', 'utm_source', 'utm_medium', 'utm_campaign', 'country_code', 'is_bot',
+]
+
+COMPOSITE_INDEXES = {
+    'idx_events_timestamp_path': ['timestamp', 'path'],
+    'idx_events_session_timestamp': ['session_id', 'timestamp'],
+    'idx_events_visitor_timestamp': ['visitor_id', 'timestamp'],
+    'idx_events_type_timestamp': ['event_type', 'timestamp'],
+}
+
+
+def _event_columns() -> list[sa.Column]:
+    return [
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('event_type', sa.String(100), nullable=False),
+        sa.Column('event_name', sa.String(255)),
+        sa.Column('session_id', sa.String(255), nullable=False),
+        sa.Column('visitor_id', sa.String(255), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True)),
+        sa.Column('timestamp', sa.DateTime, nullable=False),
+        sa.Column('client_timestamp', sa.BigInteger),
+        sa.Column('url', sa.String(2048), nullable=False),
+        sa.Column('path', sa.String(1024), nullable=False),
+        sa.Column('referrer', sa.String(2048)),
+        sa.Column('referrer_domain', sa.String(255)),
+        sa.Column('utm_source', sa.String(255)),
+        sa.Column('utm_medium', sa.String(255)),
+        sa.Column('utm_campaign', sa.String(255)),
+        sa.Column('utm_term', sa.String(255)),
+        sa.Column('utm_content', sa.String(255)),
+        sa.Column('device_type', sa.String(50)),
+        sa.Column('browser', sa.String(100)),
+        sa.Column('browser_version', sa.String(50)),
+        sa.Column('os', sa.String(100)),
+        sa.Column('os_version', sa.String(50)),
+        sa.Column('country_code', sa.String(2)),
+        sa.Column('country_name', sa.String(100)),
+        sa.Column('region', sa.String(100)),
+        sa.Column('city', sa.String(100)),
+        sa.Column('timezone', sa.String(100)),
+        sa.Column('ip_address_hash', sa.String(64)),
+        sa.Column('viewport_width', sa.Integer),
+        sa.Column('viewport_height', sa.Integer),
+        sa.Column('screen_width', sa.Integer),
+        sa.Column('screen_height', sa.Integer),
+        sa.Column('performance_data', postgresql.JSONB),
+        sa.Column('ecommerce_data', postgresql.JSONB),
+        sa.Column('properties', postgresql.JSONB),
+        sa.Column('is_bot', sa.Boolean),
+        sa.Column('consent_given', sa.Boolean),
+        sa.Column('anonymized', sa.Boolean),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+    ]
+
+
+def _drop_secondary_indexes(table: str) -> None:
+    """Drop every non-primary-key index so the names can be reused."""
+    op.execute(
+        f"""
+        DO $$
+        DECLARE idx record;
+        BEGIN
+            FOR idx IN
+                SELECT i.relname AS name
+                FROM pg_index x
+                JOIN pg_class i ON i.oid = x.indexrelid
+                JOIN pg_class t ON t.oid = x.indrelid
+                WHERE t.relname = '{table}' AND NOT x.indisprimary
+            LOOP
+                EXECUTE format('DROP INDEX %I', idx.name);
+            END LOOP;
+        END $$;
+        """
+    )
+
+
+def _create_indexes() -> None:
+    for column in SINGLE_COLUMN_INDEXES:
+        op.create_index(f'ix_analytics_events_{column}', 'analytics_events', [column])
+    for name, columns in COMPOSITE_INDEXES.items():
+        op.create_index(name, 'analytics_events', columns)
+    op.create_index(
+        'idx_events_ecommerce',
+        'analytics_events',
+        ['timestamp'],
+        postgresql_where=sa.text('ecommerce_data IS NOT NULL'),
+    )
+
+
+def upgrade() -> None:
+    # Move the heap table aside; its indexes would only slow the copy down
+    op.rename_table('analytics_events', 'analytics_events_unpartitioned')
+    _drop_secondary_indexes('analytics_events_unpartitioned')
+    op.execute(
+        'ALTER TABLE analytics_events_unpartitioned '
+        'RENAME CONSTRAINT analytics_events_pkey TO analytics_events_unpartitioned_pkey'
+    )
+
+    op.create_table(
+        'analytics_events',
+        *_event_columns(),
+        sa.PrimaryKeyConstraint('id', 'timestamp', name='analytics_events_pkey'),
+        postgresql_partition_by='RANGE (timestamp)',
+    )
+    _create_indexes()
+
+    op.execute('CREATE TABLE analytics_events_default PARTITION OF analytics_events DEFAULT')
+
+    # One partition per day from the oldest event through the premake window
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            day date;
+            last_day date := current_date + {PREMAKE_DAYS};
+        BEGIN
+            SELECT COALESCE(min(timestamp)::date, current_date) INTO day
+            FROM analytics_events_unpartitioned;
+            WHILE day <= last_day LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF analytics_events FOR VALUES FROM (%L) TO (%L)',
+                    'analytics_events_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+                );
+                day := day + 1;
+            END LOOP;
+        END $$;
+        """
+    )
+
+    op.execute('INSERT INTO analytics_events SELECT * FROM analytics_events_unpartitioned')
+    op.drop_table('analytics_events_unpartitioned')
+
+
+def downgrade() -> None:
+    op.rename_table('analytics_events', 'analytics_events_partitioned')
+    _drop_secondary_indexes('analytics_events_partitioned')
+    op.execute(
+        'ALTER TABLE analytics_events_partitioned '
+        'RENAME CONSTRAINT analytics_events_pkey TO analytics_events_partitioned_pkey'
+    )
+
+    op.create_table(
+        'analytics_events',
+        *_event_columns(),
+        sa.PrimaryKeyConstraint('id', name='analytics_events_pkey'),
+    )
+    op.execute('INSERT INTO analytics_events SELECT * FROM analytics_events_partitioned')
+    _create_indexes()
+
+    # Dropping the parent drops every partition with it
+    op.drop_table('analytics_events_partitioned')
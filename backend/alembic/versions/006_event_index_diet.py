@@ -0,0 +1,78 @@
+"""Replace analytics_events B-trees with BRIN, covering and partial indexes
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Indexes no read path filters or sorts on (or that BRIN now serves)
+UNUSED_SINGLE_COLUMN_INDEXES = [
+    'event_type', 'session_id', 'visitor_id', 'user_id', 'timestamp', 'path',
+    'referrer_domain', 'utm_source', 'utm_medium', 'utm_campaign', 'country_code', 'is_bot',
+]
+
+UNUSED_COMPOSITE_INDEXES = {
+    'idx_events_timestamp_path': ['timestamp', 'path'],
+    'idx_events_visitor_timestamp': ['visitor_id', 'timestamp'],
+    'idx_events_type_timestamp': ['event_type', 'timestamp'],
+}
+
+
+def upgrade() -> None:
+    for column in UNUSED_SINGLE_COLUMN_INDEXES:
+        op.drop_index(f'ix_analytics_events_{column}', table_name='analytics_events')
+    for name in UNUSED_COMPOSITE_INDEXES:
+        op.drop_index(name, table_name='analytics_events')
+    op.drop_index('idx_events_ecommerce', table_name='analytics_events')
+
+    # Rows arrive in timestamp order, so block ranges summarize them tightly
+    op.create_index(
+        'idx_events_timestamp_brin',
+        'analytics_events',
+        ['timestamp'],
+        postgresql_using='brin',
+        postgresql_with={'pages_per_range': 32},
+    )
+    op.create_index(
+        'idx_events_created_at_brin',
+        'analytics_events',
+        ['created_at'],
+        postgresql_using='brin',
+    )
+
+    # Top pages / page visitors for human traffic, answerable index-only
+    op.create_index(
+        'idx_events_human_pageviews',
+        'analytics_events',
+        ['timestamp'],
+        postgresql_include=['path', 'visitor_id'],
+        postgresql_where=sa.text("event_type = 'pageview' AND is_bot = false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_events_human_pageviews', table_name='analytics_events')
+    op.drop_index('idx_events_created_at_brin', table_name='analytics_events')
+    op.drop_index('idx_events_timestamp_brin', table_name='analytics_events')
+
+    op.create_index(
+        'idx_events_ecommerce',
+        'analytics_events',
+        ['timestamp'],
+        postgresql_where=sa.text('ecommerce_data IS NOT NULL'),
+    )
+    for name, columns in UNUSED_COMPOSITE_INDEXES.items():
+        op.create_index(name, 'analytics_events', columns)
+    for column in UNUSED_SINGLE_COLUMN_INDEXES:
+        op.create_index(f'ix_analytics_events_{column}', 'analytics_events', [column])
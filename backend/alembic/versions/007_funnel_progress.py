@@ -0,0 +1,57 @@
+"""Add materialized funnel progress
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'conversion_funnels',
+        sa.Column('progress_version', sa.Integer, nullable=False, server_default='1'),
+    )
+    op.add_column('conversion_funnels', sa.Column('progress_since', sa.DateTime))
+    op.add_column('conversion_funnels', sa.Column('progress_rebuilt_at', sa.DateTime))
+
+    op.create_table(
+        'funnel_progress',
+        sa.Column(
+            'funnel_id',
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey('conversion_funnels.id', ondelete='CASCADE'),
+            primary_key=True,
+        ),
+        sa.Column('session_id', sa.String(255), primary_key=True),
+        sa.Column('version', sa.Integer, nullable=False),
+        sa.Column('entered_at', sa.DateTime),
+        sa.Column('next_step', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('furthest_step', sa.Integer, nullable=False, server_default='-1'),
+        sa.Column('completed_at', sa.DateTime),
+        sa.Column('updated_at', sa.DateTime),
+    )
+    op.create_index(
+        'idx_funnel_progress_report',
+        'funnel_progress',
+        ['funnel_id', 'version', 'entered_at'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_funnel_progress_report', table_name='funnel_progress')
+    op.drop_table('funnel_progress')
+    op.drop_column('conversion_funnels', 'progress_rebuilt_at')
+    op.drop_column('conversion_funnels', 'progress_since')
+    op.drop_column('conversion_funnels', 'progress_version')
@@ -0,0 +1,31 @@
+"""Key heatmap_data by page, viewport bucket and day
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The unique index leads with the same columns, so it replaces this one
+    op.drop_index('idx_heatmap_page_viewport', table_name='heatmap_data')
+    op.create_unique_constraint(
+        'uq_heatmap_page_viewport_day',
+        'heatmap_data',
+        ['page_path', 'viewport_width', 'date_from'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_heatmap_page_viewport_day', 'heatmap_data', type_='unique')
+    op.create_index('idx_heatmap_page_viewport', 'heatmap_data', ['page_path', 'viewport_width'])
@@ -0,0 +1,42 @@
+"""Store heatmap days as compressed binary grids maintained at ingest
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Day rows are derived from raw events; reads rebuild whatever is missing
+    op.execute("DELETE FROM heatmap_data")
+    op.drop_column('heatmap_data', 'click_map')
+    op.drop_column('heatmap_data', 'scroll_map')
+    op.add_column('heatmap_data', sa.Column('click_grid', sa.LargeBinary))
+    op.add_column('heatmap_data', sa.Column('scroll_grid', sa.LargeBinary))
+    op.add_column('heatmap_data', sa.Column('accumulated_from', sa.DateTime))
+    op.add_column(
+        'heatmap_data',
+        sa.Column('verified', sa.Boolean, nullable=False, server_default=sa.false()),
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM heatmap_data")
+    op.drop_column('heatmap_data', 'verified')
+    op.drop_column('heatmap_data', 'accumulated_from')
+    op.drop_column('heatmap_data', 'scroll_grid')
+    op.drop_column('heatmap_data', 'click_grid')
+    op.add_column('heatmap_data', sa.Column('scroll_map', postgresql.JSONB))
+    op.add_column('heatmap_data', sa.Column('click_map', postgresql.JSONB))
@@ -0,0 +1,28 @@
+"""Track dead clicks on analytics sessions
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'analytics_sessions',
+        sa.Column('dead_click_count', sa.Integer, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('analytics_sessions', 'dead_click_count')
@@ -0,0 +1,31 @@
+"""Index human click and scroll events by page for heatmap reads
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Partial days, gap checks and rebuilds read one page's events only
+    op.create_index(
+        'idx_events_heatmap',
+        'analytics_events',
+        ['path', 'timestamp'],
+        postgresql_where=sa.text("event_type IN ('click', 'scroll') AND is_bot = false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_events_heatmap', table_name='analytics_events')
@@ -0,0 +1,165 @@
+"""
+In-process batching primitives.
+Provides a bounded queue drained by one flusher coroutine in size- and
+time-bounded batches, and retry with capped exponential backoff.
+"""
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any, Generic, Optional, TypeVar
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Queue sentinel that tells the flusher to finish after draining
+_STOP = object()
+
+
+class BatchingFlusher(Generic[T]):
+    """
+    Bounded queue whose items are handed to `flush` in batches.
+
+    A batch is flushed when `batch_size` items are waiting or when its first
+    item has been queued for `flush_interval_ms`, whichever is first. `stop`
+    flushes everything queued before returning.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        batch_size: int,
+        flush_interval_ms: int,
+        flush: Callable[[list[T]], Awaitable[None]],
+    ) -> None:
+        self.name = name
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush = flush
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+        self._closed = True
+
+    @property
+    def is_running(self) -> bool:
+        """True while the queue accepts items."""
+        return not self._closed
+
+    @property
+    def depth(self) -> int:
+        """Number of items waiting to be flushed."""
+        return self._queue.qsize()
+
+    @property
+    def free(self) -> int:
+        """Number of items that can still be queued."""
+        return self.max_size - self._queue.qsize()
+
+    def put_nowait(self, item: T) -> None:
+        """
+        Queue one item.
+
+        Raises:
+            asyncio.QueueFull: If the queue is at `max_size`
+        """
+        self._queue.put_nowait(item)
+
+    def start(self) -> None:
+        """Start the flusher coroutine."""
+        if self._task is not None:
+            return
+
+        self._closed = False
+        self._task = asyncio.create_task(self._run(), name=f"{self.name}-flusher")
+
+    async def stop(self) -> None:
+        """Stop accepting items and wait until everything queued is flushed."""
+        if self._task is None:
+            return
+
+        self._closed = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        """Collect items into batches and flush them until stopped."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except TimeoutError:
+                        break
+
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self.flush(batch)
+
+
+async def retry_with_backoff(
+    operation: Callable[[], Awaitable[R]],
+    message: str,
+    max_attempts: Optional[int] = None,
+    retry_seconds: Optional[float] = None,
+    max_delay: float = 5.0,
+    retryable: Callable[[Exception], bool] = lambda error: True,
+    **log_fields: Any,
+) -> R:
+    """
+    Await `operation`, retrying failures with exponential backoff.
+
+    Args:
+        operation: Zero-argument coroutine function to run
+        message: Log message for each failed attempt
+        max_attempts: Give up after this many attempts (None for no limit)
+        retry_seconds: Give up once the next attempt would start after this
+            many seconds (None for no limit)
+        max_delay: Longest wait between two attempts
+        retryable: Errors for which it returns False are raised at once
+        **log_fields: Extra fields logged with each failure
+
+    Raises:
+        Exception: The last error once retries run out, or a non-retryable one
+    """
+    loop = asyncio.get_running_loop()
+    deadline = None if retry_seconds is None else loop.time() + retry_seconds
+    attempt = 0
+
+    while True:
+        attempt += 1
+        try:
+            return await operation()
+        except Exception as e:
+            if not retryable(e):
+                raise
+            logger.error(message, attempt=attempt, error=str(e), **log_fields)
+
+            delay = min(0.1 * 2 ** attempt, max_delay)
+            if max_attempts is not None and attempt >= max_attempts:
+                raise
+            if deadline is not None and loop.time() + delay > deadline:
+                raise
+            await asyncio.sleep(delay)
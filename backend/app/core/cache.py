@@ -0,0 +1,90 @@
+"""
+In-process caching primitives.
+Provides a bounded, thread-safe LRU cache with hit/miss accounting.
+"""
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any, Generic, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Bounded least-recently-used cache safe to share between threads.
+
+    Lookups and inserts take a single lock, so the cache can be used from
+    the event loop and from worker threads alike.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """Return the cached value (marking it recently used) or `default`."""
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: K, value: V) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: K, compute: Callable[[K], V]) -> V:
+        """
+        Return the cached value for `key`, computing and storing it on a miss.
+
+        `compute` runs outside the lock; concurrent misses for the same key
+        may compute twice, which is harmless for pure functions.
+        """
+        value = self.get(key, _MISSING)  # type: ignore[arg-type]
+        if value is _MISSING:
+            value = compute(key)
+            self.set(key, value)
+        return value  # type: ignore[return-value]
+
+    def pop(self, key: K) -> Optional[V]:
+        """Remove and return an entry if present."""
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all entries and reset counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters for metrics endpoints."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
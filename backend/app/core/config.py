@@ -5,7 +5,7 @@ All environment variables are validated and typed.
 from functools import lru_cache
 from typing import List, Optional
 
-from pydantic import Field, PostgresDsn, RedisDsn, field_validator
+from pydantic import Field, PostgresDsn, RedisDsn, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -78,7 +78,7 @@ class Settings(BaseSettings):
     # Pattern Analysis Settings
     enable_pattern_analysis: bool = True
     pattern_analysis_max_days: int = 30
-    pattern_analysis_cache_ttl: int = 3600  # 1 hour in seconds
+    pattern_analysis_cache_ttl: int = 3600  # 1 hour in seconds; TTL of cached dashboard results
 
     # Notifications
     resend_api_key: Optional[str] = None
@@ -93,11 +93,114 @@ class Settings(BaseSettings):
     rate_limit_requests: int = 100
     rate_limit_period: int = 60
 
+    # Analytics Ingestion
+    # "sync" commits every request; "buffered" queues rows for group commit
+    analytics_ingest_mode: str = Field(default="sync", pattern="^(sync|buffered)$")
+    ingest_buffer_max_size: int = 10000  # rows held before returning 429
+    ingest_flush_batch_size: int = 500  # rows per group commit
+    ingest_flush_interval_ms: int = 50  # max time a row waits for its commit
+    ingest_flush_retry_seconds: int = 120  # transient flush failures retried this long
+    user_agent_cache_size: int = 4096  # distinct UA strings memoized per process
+    post_ingest_max_concurrency: int = 4  # concurrent session-update transactions
+    post_ingest_batch_window_ms: int = 50  # rows arriving within this window share a batch
+    post_ingest_max_batch_rows: int = 2000  # rows per session-update batch
+    post_ingest_max_pending_rows: int = 50000  # backlog before ingest answers 429
+
+    # Analytics Rollups
+    analytics_rollups_enabled: bool = True  # serve summaries from rollup tables
+    analytics_rollup_recompute_hours: int = 2  # closed hours re-rolled each run for late data
+    analytics_hll_precision: int = Field(default=14, ge=4, le=16)  # error ~1.04/sqrt(2^p)
+    # Pooled connections all summaries of a process may query on at once, on top of
+    # their request sessions; must stay below database_pool_size. 1 disables the fan-out
+    analytics_summary_max_connections: int = Field(default=4, ge=1)
+
+    # Analytics Event Partitions (one analytics_events partition per UTC day)
+    analytics_partition_premake_days: int = 7  # future daily partitions kept ready
+    analytics_event_retention_days: int = 0  # raw events kept; 0 keeps everything
+    # "drop" deletes expired partitions; "detach" keeps them as standalone tables
+    analytics_partition_retention_action: str = Field(default="drop", pattern="^(drop|detach)$")
+
+    # Cold Storage (Parquet archive of events past the hot window; needs pyarrow)
+    cold_storage_enabled: bool = False
+    cold_storage_dir: str = "data/cold_events"
+    analytics_hot_days: int = 30  # days of raw events kept in Postgres
+    cold_storage_batch_rows: int = 50000  # rows per Parquet row group during export
+    # Engine scanning the archive: "pyarrow" or embedded "duckdb" (needs duckdb)
+    cold_query_engine: str = Field(default="pyarrow", pattern="^(pyarrow|duckdb)$")
+    duckdb_threads: int = 4
+    duckdb_memory_limit: str = "1GB"
+
+    # Funnels
+    funnel_stream_batch_rows: int = 10000  # session-ordered events fetched per round trip
+    funnel_progress_backfill_days: int = 30  # raw history replayed when a saved funnel is rebuilt
+
+    # Heatmaps (stored day grids cover the viewport; reads may downsample them)
+    heatmap_grid_rows: int = Field(default=128, ge=1, le=4096)
+    heatmap_grid_columns: int = Field(default=128, ge=1, le=4096)
+    heatmap_stream_batch_rows: int = 50000  # events binned per round trip
+    heatmap_scroll_hll_precision: int = Field(default=10, ge=4, le=16)  # 21 sketches per day
+
+    # Session Replay (rrweb chunks in an object store; only metadata rows in Postgres)
+    replay_storage_backend: str = "local"
+    replay_storage_dir: str = "data/replays"
+    # "zstd" needs the zstandard package; existing replays keep their codec
+    replay_compression: str = Field(default="gzip", pattern="^(gzip|zstd)$")
+    replay_compression_level: int = Field(default=6, ge=1, le=19)
+    replay_max_chunk_events: int = 5000  # rrweb events accepted per chunk request
+    replay_retention_days: int = 30
+    replay_max_clock_skew_hours: int = 24  # rrweb timestamps further from server time are dropped
+    replay_read_block_bytes: int = 65536  # block size of streamed playback reads
+
+    # Frustration Signals (rage clicks, dead clicks and errors detected at ingest)
+    rage_click_count: int = Field(default=3, ge=2)  # clicks on one spot that make a rage click
+    rage_click_window_ms: int = 1000
+    rage_click_radius_px: float = 30.0
+    dead_click_window_ms: int = 2000  # a click with no reaction this long is dead
+    frustration_max_sessions: int = 100000  # sessions whose detector state is kept in memory
+
+    # Session Quality Scoring (periodic vectorized rescoring)
+    session_score_lookback_hours: int = 48  # sessions started this recently are rescored
+    session_score_batch_rows: int = 10000  # sessions scored and written per UPDATE
+
+    # Result Cache (analytics summary and dashboard endpoints; Redis tier when redis_url is set)
+    result_cache_enabled: bool = True
+    result_cache_max_entries: int = 1024  # results kept in process
+    analytics_summary_cache_ttl: int = 60  # seconds a cached analytics summary stays fresh
+    # Ingestion invalidates cached summaries at most this often (seconds)
+    result_cache_ingest_invalidate_interval: int = 10
+
+    # Realtime Analytics
+    realtime_window_seconds: int = 300  # per-second buckets kept in memory
+    realtime_active_seconds: int = 30  # "current visitors" lookback
+    realtime_sync_interval_ms: int = 1000  # Redis publish cadence when redis_url is set
+    realtime_stream_queue_size: int = 32  # deltas queued per subscriber before coalescing
+    realtime_stream_max_subscribers: int = 1000  # concurrent /stream clients per process
+    realtime_stream_snapshot_seconds: int = 5  # full snapshot cadence on /stream
+
+    # GeoIP (compiled with scripts/build_geoip_db.py)
+    geoip_database_path: Optional[str] = None  # unset disables geo enrichment
+    geoip_cache_size: int = 65536  # /24 blocks memoized per process
+
+    # Event Stream
+    event_stream_backend: str = Field(default="none", pattern="^(none|local_log)$")
+    event_stream_buffer_size: int = 10000  # rows queued before new ones are dropped
+    event_stream_batch_size: int = 500  # rows per append (one fsync each)
+    event_stream_flush_interval_ms: int = 100  # max time a row waits to be appended
+    event_log_dir: str = "data/event-log"  # local_log segment directory
+    event_log_segment_bytes: int = 64 * 1024 * 1024  # rotate segments at this size
+
     # Adaptive Scheduling Thresholds
     traffic_threshold: int = 1000  # requests/hour to trigger early run
     pending_threshold: int = 50  # pending submissions to trigger early run
     analysis_batch_size: int = 100  # max submissions per batch run
 
+    @model_validator(mode="after")
+    def summary_fan_out_below_pool(self) -> "Settings":
+        """Leave pooled connections for ingestion while summaries fan out."""
+        if self.analytics_summary_max_connections >= self.database_pool_size:
+            raise ValueError("analytics_summary_max_connections must be below database_pool_size")
+        return self
+
 
 @lru_cache
 def get_settings() -> Settings:
@@ -0,0 +1,171 @@
+"""
+HyperLogLog cardinality sketches.
+Provides fixed-size, mergeable distinct-count estimates backed by NumPy registers.
+"""
+import hashlib
+import math
+import zlib
+from collections.abc import Iterable
+from typing import Optional
+
+import numpy as np
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+_HASH_BITS = 64
+_FORMAT_VERSION = 1
+
+
+def hash_value(value: str) -> int:
+    """64-bit hash used to place a value in the sketch."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def register_positions(values: Iterable[str], precision: int) -> tuple[np.ndarray, np.ndarray]:
+    """Register index and rank of each value in a sketch of `precision`."""
+    index_shift = _HASH_BITS - precision
+    remainder_mask = (1 << index_shift) - 1
+
+    indexes = []
+    ranks = []
+    for value in values:
+        h = hash_value(value)
+        indexes.append(h >> index_shift)
+        ranks.append(index_shift - (h & remainder_mask).bit_length() + 1)
+    return np.asarray(indexes, dtype=np.intp), np.asarray(ranks, dtype=np.uint8)
+
+
+def _alpha(m: int) -> float:
+    """Bias correction constant for `m` registers."""
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch with 2^precision one-byte registers.
+
+    The relative standard error of `count()` is about 1.04 / sqrt(2^precision)
+    (0.81% at precision 14). Sketches of the same values built anywhere can be
+    merged, so distinct counts over a range are the union of per-bucket sketches.
+    """
+
+    def __init__(self, precision: int = 14, registers: Optional[np.ndarray] = None) -> None:
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(
+                f"HyperLogLog precision must be between {MIN_PRECISION} and {MAX_PRECISION}"
+            )
+        self.precision = precision
+        self.m = 1 << precision
+        if registers is None:
+            registers = np.zeros(self.m, dtype=np.uint8)
+        elif registers.shape != (self.m,):
+            raise ValueError("HyperLogLog register count does not match precision")
+        self.registers = registers
+
+    @property
+    def standard_error(self) -> float:
+        """Expected relative standard error of the estimate."""
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value: str) -> None:
+        """Add a single value."""
+        self.update((value,))
+
+    def update(self, values: Iterable[str]) -> None:
+        """Add many values in one register update."""
+        indexes, ranks = register_positions(values, self.precision)
+        if len(indexes):
+            np.maximum.at(self.registers, indexes, ranks)
+
+    def count(self) -> int:
+        """Estimated number of distinct values added."""
+        registers = self.registers
+        zeros = int(np.count_nonzero(registers == 0))
+        if zeros == self.m:
+            return 0
+
+        estimate = _alpha(self.m) * self.m * self.m / float(
+            np.sum(np.ldexp(1.0, -registers.astype(np.int32)))
+        )
+        # Small-range correction (linear counting); 64-bit hashes need no large-range one
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def fold(self, precision: int) -> "HyperLogLog":
+        """
+        Return an equivalent sketch at a lower precision.
+
+        Used to merge sketches written before the configured precision changed.
+        """
+        if precision == self.precision:
+            return self.copy()
+        if precision > self.precision:
+            raise ValueError("HyperLogLog sketches can only be folded to a lower precision")
+
+        dropped_bits = self.precision - precision
+        indexes = np.arange(self.m, dtype=np.int64)
+        low = indexes & ((1 << dropped_bits) - 1)
+        # Dropped index bits now lead the remainder; their bit length sets the rank
+        _, low_bit_length = np.frexp(low.astype(np.float64))
+        ranks = np.where(
+            low > 0,
+            dropped_bits - low_bit_length + 1,
+            dropped_bits + self.registers.astype(np.int64),
+        )
+        ranks = np.where(self.registers == 0, 0, ranks).astype(np.uint8)
+
+        folded = HyperLogLog(precision)
+        np.maximum.at(folded.registers, (indexes >> dropped_bits).astype(np.intp), ranks)
+        return folded
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Union another sketch into this one (in place) and return self."""
+        if other.precision != self.precision:
+            if other.precision > self.precision:
+                other = other.fold(self.precision)
+            else:
+                folded = self.fold(other.precision)
+                self.precision, self.m, self.registers = (
+                    folded.precision,
+                    folded.m,
+                    folded.registers,
+                )
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def copy(self) -> "HyperLogLog":
+        """Independent copy of the sketch."""
+        return HyperLogLog(self.precision, self.registers.copy())
+
+    def to_bytes(self) -> bytes:
+        """Serialize as version byte, precision byte and zlib-compressed registers."""
+        return bytes((_FORMAT_VERSION, self.precision)) + zlib.compress(
+            self.registers.tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        """Deserialize a sketch produced by `to_bytes`."""
+        if len(data) < 2 or data[0] != _FORMAT_VERSION:
+            raise ValueError("Unsupported HyperLogLog sketch format")
+        registers = np.frombuffer(zlib.decompress(data[2:]), dtype=np.uint8).copy()
+        return cls(data[1], registers)
+
+    @classmethod
+    def union(cls, sketches: Iterable["HyperLogLog"]) -> Optional["HyperLogLog"]:
+        """Merge sketches into a new one, or None if there are none."""
+        merged: Optional[HyperLogLog] = None
+        for sketch in sketches:
+            if merged is None:
+                merged = sketch.copy()
+            else:
+                merged.merge(sketch)
+        return merged
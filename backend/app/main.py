@@ -10,7 +10,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.core.database import close_db, init_db
+from app.core.database import close_db, get_db_context, init_db
 from app.core.logging import configure_logging, get_logger
 from app.middleware import ErrorHandlerMiddleware, RequestIdMiddleware
 from app.routers import (
@@ -21,6 +21,14 @@ from app.routers import (
     shops_router,
 )
 from app.routers.analytics import router as analytics_router
+from app.services.duckdb_engine import duckdb_engine
+from app.services.event_partitions import maintain_event_partitions
+from app.services.event_stream import event_stream_publisher
+from app.services.geoip import geoip_database
+from app.services.ingest_buffer import ingest_buffer
+from app.services.post_ingest import post_ingest_executor
+from app.services.realtime_window import realtime_window
+from app.services.result_cache import result_cache
 
 # Configure logging before anything else
 configure_logging()
@@ -44,6 +52,14 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Initialize database
     await init_db()
 
+    # Make sure today's analytics_events partitions exist before ingesting;
+    # retention is left to the worker job
+    try:
+        async with get_db_context() as session:
+            await maintain_event_partitions(session, apply_retention=False)
+    except Exception as e:
+        logger.error("Event partition maintenance failed", error=str(e))
+
     # Initialize Sentry if configured
     if settings.sentry_dsn:
         import sentry_sdk
@@ -55,10 +71,37 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         )
         logger.info("Sentry initialized")
 
+    # Map the GeoIP database (shared page cache across workers)
+    if settings.geoip_database_path:
+        try:
+            geoip_database.open(settings.geoip_database_path)
+        except (OSError, ValueError) as e:
+            logger.error("GeoIP database unavailable", error=str(e))
+
+    # Start durable event stream before ingestion so no committed row skips it
+    if settings.event_stream_backend != "none":
+        await event_stream_publisher.start()
+
+    # Start group-commit flusher for analytics ingestion
+    if settings.analytics_ingest_mode == "buffered":
+        await ingest_buffer.start()
+
+    # Share realtime windows between workers through Redis (no-op without it)
+    await realtime_window.start()
+    # Result cache Redis tier (in-process only without it)
+    await result_cache.start()
+
     yield
 
     # Shutdown
     logger.info("Shutting down application")
+    await ingest_buffer.stop()  # Drain queued events before closing the pool
+    await post_ingest_executor.stop()  # Finish session updates for committed events
+    await event_stream_publisher.stop()  # Append everything the drain published
+    await realtime_window.stop()
+    await result_cache.stop()
+    geoip_database.close()
+    duckdb_engine.close()
     await close_db()
 
 
@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import Optional
 from sqlalchemy import (
     Column,
+    ForeignKey,
     String,
     Integer,
     Float,
@@ -13,6 +14,9 @@ from sqlalchemy import (
     JSON,
     Index,
     BigInteger,
+    UniqueConstraint,
+    LargeBinary,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 import uuid
@@ -24,6 +28,9 @@ class AnalyticsEvent(Base):
     """
     Core analytics event model - stores all tracking events.
     Optimized for high-throughput writes and time-series queries.
+
+    Range-partitioned by day on `timestamp` (see services/event_partitions.py),
+    so the primary key includes the partition key.
     """
 
     __tablename__ = "analytics_events"
@@ -31,28 +38,28 @@ class AnalyticsEvent(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
     # Event identification
-    event_type = Column(String(100), nullable=False, index=True)  # pageview, click, conversion, etc.
+    event_type = Column(String(100), nullable=False)  # pageview, click, conversion, etc.
     event_name = Column(String(255))  # Custom event name
 
     # Session & User tracking (privacy-first)
-    session_id = Column(String(255), nullable=False, index=True)
-    visitor_id = Column(String(255), nullable=False, index=True)  # Fingerprint hash
-    user_id = Column(UUID(as_uuid=True), nullable=True, index=True)  # Authenticated user (optional)
+    session_id = Column(String(255), nullable=False)
+    visitor_id = Column(String(255), nullable=False)  # Fingerprint hash
+    user_id = Column(UUID(as_uuid=True), nullable=True)  # Authenticated user (optional)
 
     # Temporal data
-    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
     client_timestamp = Column(BigInteger)  # Unix timestamp from client
 
     # Page context
     url = Column(String(2048), nullable=False)
-    path = Column(String(1024), nullable=False, index=True)
+    path = Column(String(1024), nullable=False)
     referrer = Column(String(2048))
-    referrer_domain = Column(String(255), index=True)
+    referrer_domain = Column(String(255))
 
     # Traffic source (UTM parameters)
-    utm_source = Column(String(255), index=True)
-    utm_medium = Column(String(255), index=True)
-    utm_campaign = Column(String(255), index=True)
+    utm_source = Column(String(255))
+    utm_medium = Column(String(255))
+    utm_campaign = Column(String(255))
     utm_term = Column(String(255))
     utm_content = Column(String(255))
 
@@ -64,7 +71,7 @@ class AnalyticsEvent(Base):
     os_version = Column(String(50))
 
     # Geographic data (from IP, anonymized)
-    country_code = Column(String(2), index=True)
+    country_code = Column(String(2))
     country_name = Column(String(100))
     region = Column(String(100))
     city = Column(String(100))
@@ -89,20 +96,37 @@ class AnalyticsEvent(Base):
     properties = Column(JSONB)  # Flexible schema for custom tracking
 
     # Privacy & Compliance
-    is_bot = Column(Boolean, default=False, index=True)
+    is_bot = Column(Boolean, default=False)
     consent_given = Column(Boolean, default=True)
     anonymized = Column(Boolean, default=False)
 
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
-    # Indexes for common query patterns
+    # Indexes sized for an append-only table: every index is paid on each
+    # insert, so only query shapes the read paths actually use are indexed.
+    # Range scans (rollups, summaries) use BRIN, which stays tiny because
+    # rows arrive in timestamp order.
     __table_args__ = (
-        Index("idx_events_timestamp_path", "timestamp", "path"),
+        Index(
+            "idx_events_timestamp_brin", "timestamp",
+            postgresql_using="brin", postgresql_with={"pages_per_range": 32},
+        ),
+        Index("idx_events_created_at_brin", "created_at", postgresql_using="brin"),
+        # Session timelines (intent classification, funnels, replays)
         Index("idx_events_session_timestamp", "session_id", "timestamp"),
-        Index("idx_events_visitor_timestamp", "visitor_id", "timestamp"),
-        Index("idx_events_type_timestamp", "event_type", "timestamp"),
-        Index("idx_events_ecommerce", "timestamp", postgresql_where=Column("ecommerce_data").isnot(None)),
+        # Human pageviews by time, covering path/visitor for index-only scans
+        Index(
+            "idx_events_human_pageviews", "timestamp",
+            postgresql_include=["path", "visitor_id"],
+            postgresql_where=text("event_type = 'pageview' AND is_bot = false"),
+        ),
+        # Heatmap reads of one page (partial days, gap checks, rebuilds)
+        Index(
+            "idx_events_heatmap", "path", "timestamp",
+            postgresql_where=text("event_type IN ('click', 'scroll') AND is_bot = false"),
+        ),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
     )
 
 
@@ -154,6 +178,7 @@ class AnalyticsSession(Base):
     is_bounce = Column(Boolean, default=False, index=True)  # Single page, < 10s
     has_rage_click = Column(Boolean, default=False)  # Frustration indicator
     has_error = Column(Boolean, default=False)
+    dead_click_count = Column(Integer, default=0)  # Clicks the page never reacted to
 
     # Session quality score (ML-generated)
     quality_score = Column(Float)  # 0-100, likelihood of conversion
@@ -187,11 +212,46 @@ class ConversionFunnel(Base):
     is_active = Column(Boolean, default=True)
     time_window_hours = Column(Integer, default=24)  # Max time to complete funnel
 
+    # Materialized progress (funnel_progress); bumped when steps or window change
+    progress_version = Column(Integer, nullable=False, default=1)
+    progress_since = Column(DateTime)  # Events from here on are materialized
+    progress_rebuilt_at = Column(DateTime)  # None while a rebuild is pending
+
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class FunnelProgress(Base):
+    """
+    Furthest step each session reached in a saved funnel.
+    Updated as events are ingested, so funnel reports group this table
+    instead of walking raw events.
+    """
+
+    __tablename__ = "funnel_progress"
+
+    funnel_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("conversion_funnels.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    session_id = Column(String(255), primary_key=True)
+    version = Column(Integer, nullable=False)  # Funnel progress_version the row was built for
+
+    # Walk state (see funnel_engine.FunnelState)
+    entered_at = Column(DateTime)  # Start of the current attempt
+    next_step = Column(Integer, nullable=False, default=0)
+    furthest_step = Column(Integer, nullable=False, default=-1)
+    completed_at = Column(DateTime)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_funnel_progress_report", "funnel_id", "version", "entered_at"),
+    )
+
+
 class ConversionEvent(Base):
     """
     Tracks individual conversion events with attribution.
@@ -286,21 +346,91 @@ class HeatmapData(Base):
     page_path = Column(String(1024), nullable=False, index=True)
     viewport_width = Column(Integer, nullable=False)  # Responsive buckets: 375, 768, 1024, 1920
 
-    # Heatmap types
-    click_map = Column(JSONB)  # {x: int, y: int, count: int}[]
-    scroll_map = Column(JSONB)  # {depth_percent: int, reach_count: int}[]
+    # Heatmap types (zlib-compressed arrays, see heatmap_engine)
+    click_grid = Column(LargeBinary)  # rows x columns clicks over the viewport
+    scroll_grid = Column(LargeBinary)  # HyperLogLog of sessions per reported scroll depth
     move_map = Column(JSONB)  # Mouse movement density
     attention_map = Column(JSONB)  # Time spent looking at areas
 
     # Aggregation metadata
-    sample_size = Column(Integer)  # Number of sessions aggregated
-    date_from = Column(DateTime, nullable=False)
+    sample_size = Column(Integer)  # Clicks plus (estimated) scrolling sessions
+    date_from = Column(DateTime, nullable=False)  # One row per UTC day
     date_to = Column(DateTime, nullable=False)
+    accumulated_from = Column(DateTime)  # Earliest event counted when the row was created
+    verified = Column(Boolean, nullable=False, default=False)  # No events before that
 
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     __table_args__ = (
-        Index("idx_heatmap_page_viewport", "page_path", "viewport_width"),
+        UniqueConstraint(
+            "page_path", "viewport_width", "date_from", name="uq_heatmap_page_viewport_day"
+        ),
+    )
+
+
+class AnalyticsRollup(Base):
+    """
+    Pre-aggregated traffic counters per hour or day.
+    Maintained incrementally by the rollup job; summary queries read these
+    instead of scanning raw events.
+    """
+
+    __tablename__ = "analytics_rollups"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    granularity = Column(String(10), nullable=False)  # hour, day
+    bucket_start = Column(DateTime, nullable=False)
+
+    # Event counters (bots excluded)
+    pageviews = Column(BigInteger, nullable=False, default=0)
+    events = Column(BigInteger, nullable=False, default=0)
+    visitors = Column(Integer, nullable=False, default=0)  # Distinct within this bucket only
+    visitor_sketch = Column(LargeBinary)  # HyperLogLog of visitor_id, mergeable across buckets
+
+    # Session counters (by session start time)
+    sessions = Column(Integer, nullable=False, default=0)
+    bounces = Column(Integer, nullable=False, default=0)
+    session_duration_total = Column(BigInteger, nullable=False, default=0)  # Sum of duration_seconds
+
+    # Conversion counters
+    conversions = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+    # Metadata
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", name="uq_rollups_bucket"),
+    )
+
+
+class AnalyticsDimensionRollup(Base):
+    """
+    Pre-aggregated per-dimension counters per hour or day.
+    Dimensions: path (pageviews), referrer, country, device.
+    """
+
+    __tablename__ = "analytics_dimension_rollups"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    granularity = Column(String(10), nullable=False)  # hour, day
+    bucket_start = Column(DateTime, nullable=False)
+    dimension = Column(String(20), nullable=False)  # path, referrer, country, device
+    value = Column(String(1024), nullable=False)
+    label = Column(String(255))  # Display name (e.g. country_name)
+
+    hits = Column(BigInteger, nullable=False, default=0)  # Events (pageviews for path)
+    visitors = Column(Integer, nullable=False, default=0)  # Distinct within this bucket only
+    visitor_sketch = Column(LargeBinary)  # HyperLogLog of visitor_id, mergeable across buckets
+
+    # Metadata
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "granularity", "bucket_start", "dimension", "value", name="uq_dimension_rollups_bucket"
+        ),
+        Index("idx_dimension_rollups_lookup", "granularity", "dimension", "bucket_start"),
     )
@@ -3,20 +3,21 @@ Analytics tracking API endpoints.
 High-performance event ingestion with privacy-first design.
 """
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Annotated, Optional
 import hashlib
-from urllib.parse import urlparse
-from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks
-from fastapi.responses import Response
+import uuid
+from pydantic import ValidationError
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, BackgroundTasks
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, desc
+from sqlalchemy import select, and_, insert
 import structlog
 
+from app.core.config import settings
 from app.core.database import get_db_session
 from app.models.analytics import (
     AnalyticsEvent,
-    AnalyticsSession,
-    ConversionEvent,
+    ConversionFunnel,
     HeatmapData,
     SessionReplay,
 )
@@ -25,32 +26,77 @@ from app.schemas.analytics import (
     BatchTrackRequest,
     TrackEventResponse,
     BatchTrackResponse,
+    BatchEventError,
     AnalyticsSummaryRequest,
     AnalyticsSummaryResponse,
     FunnelAnalysisRequest,
     FunnelAnalysisResponse,
+    FunnelCreate,
+    FunnelResponse,
+    FunnelUpdate,
     HeatmapRequest,
     HeatmapResponse,
+    ReplayChunkInfo,
+    ReplayChunkListResponse,
+    ReplayChunkRequest,
+    ReplayChunkResponse,
     SessionReplayListRequest,
     SessionReplayListResponse,
+    SessionReplayMetadata,
     RealTimeStatsResponse,
     SessionSummaryResponse,
 )
 from app.services.analytics_service import (
-    parse_user_agent,
-    extract_referrer_domain,
-    detect_bot,
-    fingerprint_hash,
-    enrich_geo_data,
-    update_session_metrics,
+    build_event_record,
     publish_to_event_stream,
 )
+from app.services.analytics_summary import build_analytics_summary
+from app.services.analytics_timeseries import build_time_series
+from app.services.funnel_engine import FunnelMatcher
+from app.services.funnel_engine import analyze_funnel as run_funnel_analysis
+from app.services.funnel_progress import (
+    can_report_from_progress,
+    funnel_progress_report,
+    rebuild_funnel_progress,
+)
+from app.services.geoip import geoip_database
+from app.services.heatmap_engine import build_heatmap
+from app.services.ingest_buffer import IngestBufferFullError, ingest_buffer
+from app.services.post_ingest import PostIngestBacklogFullError, post_ingest_executor
+from app.services.realtime_stream import (
+    StreamSubscriber,
+    StreamSubscribersExhaustedError,
+    realtime_broker,
+)
+from app.services.realtime_window import realtime_window
+from app.services.result_cache import ANALYTICS_NAMESPACE, result_cache
+from app.services.session_replay import (
+    ReplayCodec,
+    ReplayStorageUnavailableError,
+    list_replays,
+    parse_byte_range,
+    record_replay_chunk,
+    replay_store,
+)
 from app.services.ml_intent_classifier import classify_realtime_visitor, IntentScore
 
 logger = structlog.get_logger()
 router = APIRouter(prefix="/api/v1/analytics", tags=["analytics"])
 
 
+def get_client_ip(http_request: Request) -> Optional[str]:
+    """Client IP, honouring X-Forwarded-For. Never stored; only hashed and geolocated."""
+    client_ip = http_request.client.host if http_request.client else None
+    if "x-forwarded-for" in http_request.headers:
+        client_ip = http_request.headers["x-forwarded-for"].split(",")[0].strip()
+    return client_ip
+
+
+def hash_client_ip(client_ip: Optional[str]) -> Optional[str]:
+    """Hash the client IP for privacy."""
+    return hashlib.sha256(client_ip.encode()).hexdigest() if client_ip else None
+
+
 @router.post("/track/event", response_model=TrackEventResponse, status_code=202)
 async def track_event(
     request: TrackEventRequest,
@@ -65,91 +111,65 @@ async def track_event(
     - Validates and stores events asynchronously
     - Returns 202 Accepted immediately
     - Processes enrichment in background
+    - In buffered ingest mode, queues the row for group commit (429 when full)
+    - Answers 429 while the post-ingest backlog is full
 
     Privacy features:
-    - IP addresses are hashed (SHA-256)
+    - IP addresses are geolocated in memory, then hashed (SHA-256)
     - PII detection and redaction
     - GDPR-compliant by default
     """
     try:
-        # Get client IP (consider X-Forwarded-For for proxies)
-        client_ip = http_request.client.host if http_request.client else None
-        if "x-forwarded-for" in http_request.headers:
-            client_ip = http_request.headers["x-forwarded-for"].split(",")[0].strip()
-
-        # Hash IP for privacy
-        ip_hash = hashlib.sha256(client_ip.encode()).hexdigest() if client_ip else None
-
-        # Parse User-Agent
-        ua_data = parse_user_agent(request.user_agent)
-
-        # Detect bots
-        is_bot = detect_bot(request.user_agent, ua_data)
-
-        # Extract referrer domain
-        referrer_domain = extract_referrer_domain(request.referrer) if request.referrer else None
-
-        # Parse URL for path extraction
-        parsed_url = urlparse(request.url)
-        path = request.path or parsed_url.path
-
-        # Create event record
-        event = AnalyticsEvent(
-            event_type=request.event_type.value,
-            event_name=request.event_name,
-            session_id=request.session_id,
-            visitor_id=request.visitor_id,
-            user_id=request.user_id,
-            timestamp=datetime.utcnow(),
-            client_timestamp=request.timestamp,
-            url=request.url,
-            path=path,
-            referrer=request.referrer,
-            referrer_domain=referrer_domain,
-            utm_source=request.utm_source,
-            utm_medium=request.utm_medium,
-            utm_campaign=request.utm_campaign,
-            utm_term=request.utm_term,
-            utm_content=request.utm_content,
-            device_type=request.device_type or ua_data.get("device_type"),
-            browser=request.browser or ua_data.get("browser"),
-            browser_version=request.browser_version or ua_data.get("browser_version"),
-            os=request.os or ua_data.get("os"),
-            os_version=request.os_version or ua_data.get("os_version"),
-            ip_address_hash=ip_hash,
-            viewport_width=request.viewport_width,
-            viewport_height=request.viewport_height,
-            screen_width=request.screen_width,
-            screen_height=request.screen_height,
-            performance_data=request.performance.model_dump() if request.performance else None,
-            ecommerce_data=request.ecommerce.model_dump() if request.ecommerce else None,
-            properties=request.properties,
-            is_bot=is_bot,
-            consent_given=request.consent_given,
-        )
-
-        # Store in database (async)
-        db.add(event)
-        await db.commit()
-        await db.refresh(event)
-
-        # Background tasks
-        background_tasks.add_task(enrich_geo_data, str(event.id), ip_hash, db)
-        background_tasks.add_task(update_session_metrics, request.session_id, db)
-        background_tasks.add_task(publish_to_event_stream, event)
+        # Geolocate the raw IP, then keep only its hash
+        client_ip = get_client_ip(http_request)
+        geo = geoip_database.lookup(client_ip)
+        ip_hash = hash_client_ip(client_ip)
+
+        # Parse UA, detect bots and build the event row
+        record = build_event_record(request, ip_hash, geo)
+        event_id = str(record["id"])
+
+        post_ingest_executor.check_capacity(1)
+        if ingest_buffer.is_running:
+            # Group commit: the flusher stores the row and runs post-ingest work
+            ingest_buffer.submit([record])
+        else:
+            # Store in database
+            await db.execute(insert(AnalyticsEvent), [record])
+            await db.commit()
+            realtime_window.observe([record])
+
+            # Session updates run on the executor's own sessions, batched across requests
+            post_ingest_executor.submit([record])
+            background_tasks.add_task(publish_to_event_stream, [record])
 
         logger.info(
             "event_tracked",
-            event_id=str(event.id),
+            event_id=event_id,
             event_type=request.event_type.value,
             session_id=request.session_id,
         )
 
-        return TrackEventResponse(success=True, event_id=str(event.id))
-
+        return TrackEventResponse(success=True, event_id=event_id)
+
+    except IngestBufferFullError:
+        raise HTTPException(
+            status_code=429,
+            detail="Ingest buffer full, retry later",
+            headers={"Retry-After": "1"},
+        ) from None
+    except PostIngestBacklogFullError:
+        raise HTTPException(
+            status_code=429,
+            detail="Post-ingest backlog full, retry later",
+            headers={"Retry-After": "1"},
+        ) from None
+    except ValueError as e:
+        # The event does not fit the analytics_events columns
+        raise HTTPException(status_code=422, detail=str(e)) from e
     except Exception as e:
         logger.error("event_tracking_failed", error=str(e), exc_info=True)
-        raise HTTPException(status_code=500, detail="Failed to track event")
+        raise HTTPException(status_code=500, detail="Failed to track event") from e
 
 
 @router.post("/track/batch", response_model=BatchTrackResponse, status_code=202)
@@ -167,37 +187,123 @@ async def track_batch(
     - Better for mobile/offline scenarios
     - Maintains event ordering
 
+    All events are enriched in memory and written with one multi-row INSERT
+    in a single transaction (or queued as a unit for group commit in
+    buffered ingest mode). Session updates are handed to the post-ingest
+    executor, which batches them across requests on its own connections.
+    Events that fail enrichment or would not fit their columns (see
+    `validate_event_record`) are reported by their index in the batch.
+
     Limits:
     - Max 100 events per batch
     - Total payload < 1MB
     """
-    processed = 0
-    failed = 0
-    errors = []
+    client_ip = get_client_ip(http_request)
+    geo = geoip_database.lookup(client_ip)
+    ip_hash = hash_client_ip(client_ip)
 
-    for event_request in batch_request.events:
+    records = []
+    failures = []
+    for index, event_request in enumerate(batch_request.events):
         try:
-            # Reuse track_event logic
-            response = await track_event(event_request, http_request, background_tasks, db)
-            if response.success:
-                processed += 1
-            else:
-                failed += 1
-                errors.append(response.message or "Unknown error")
+            records.append(build_event_record(event_request, ip_hash, geo))
         except Exception as e:
-            failed += 1
-            errors.append(str(e))
-            logger.error("batch_event_failed", error=str(e))
+            failures.append(BatchEventError(index=index, error=str(e)))
+            logger.error("batch_event_failed", index=index, error=str(e))
+
+    try:
+        post_ingest_executor.check_capacity(len(records))
+    except PostIngestBacklogFullError:
+        raise HTTPException(
+            status_code=429,
+            detail="Post-ingest backlog full, retry later",
+            headers={"Retry-After": "1"},
+        ) from None
+
+    if records and ingest_buffer.is_running:
+        try:
+            ingest_buffer.submit(records)
+        except IngestBufferFullError:
+            raise HTTPException(
+                status_code=429,
+                detail="Ingest buffer full, retry later",
+                headers={"Retry-After": "1"},
+            ) from None
+    elif records:
+        try:
+            await db.execute(insert(AnalyticsEvent), records)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error("batch_insert_failed", count=len(records), error=str(e), exc_info=True)
+            raise HTTPException(status_code=500, detail="Failed to track events") from e
+
+        realtime_window.observe(records)
+
+        post_ingest_executor.submit(records)
+        background_tasks.add_task(publish_to_event_stream, records)
+
+    logger.info(
+        "batch_tracked",
+        processed=len(records),
+        failed=len(failures),
+        sessions=len({record["session_id"] for record in records}),
+    )
 
     return BatchTrackResponse(
-        success=failed == 0, processed=processed, failed=failed, errors=errors if errors else None
+        success=not failures,
+        processed=len(records),
+        failed=len(failures),
+        errors=[f"[{f.index}] {f.error}" for f in failures] if failures else None,
+        failures=failures if failures else None,
     )
 
 
+async def _summary_with_series(
+    db: AsyncSession,
+    request: AnalyticsSummaryRequest,
+    exact: bool,
+) -> AnalyticsSummaryResponse:
+    """
+    Summary totals plus, when grouped, the full time series in the same response.
+
+    Results are cached for `analytics_summary_cache_ttl` seconds and
+    invalidated as new events are ingested.
+    """
+
+    async def compute() -> AnalyticsSummaryResponse:
+        summary = await build_analytics_summary(
+            db, request.date_from, request.date_to, exact=exact
+        )
+        if request.group_by:
+            try:
+                summary.time_series = await build_time_series(
+                    db, request.date_from, request.date_to, request.group_by, request.filters
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e)) from e
+        return summary
+
+    cached = await result_cache.get_or_compute(
+        ANALYTICS_NAMESPACE,
+        {"summary": request.model_dump(exclude={"metrics"}), "exact": exact},
+        compute,
+        ttl=settings.analytics_summary_cache_ttl,
+    )
+    return AnalyticsSummaryResponse.model_validate(cached)
+
+
 @router.get("/summary", response_model=AnalyticsSummaryResponse)
 async def get_analytics_summary(
     date_from: datetime,
     date_to: datetime,
+    exact: bool = False,
+    group_by: Optional[str] = None,
+    country: Optional[str] = None,
+    device: Optional[str] = None,
+    utm_source: Optional[str] = None,
+    utm_medium: Optional[str] = None,
+    utm_campaign: Optional[str] = None,
     db: AsyncSession = Depends(get_db_session),
 ) -> AnalyticsSummaryResponse:
     """
@@ -208,307 +314,447 @@ async def get_analytics_summary(
     - Bounce rate and conversion rate
     - Top pages, referrers, countries
     - Device breakdown
+    - Time series per hour, day, week or month when `group_by` is set
+
+    Served from hourly/daily rollups where available; only the unrolled
+    edges of the range are aggregated from raw events. Unique visitor
+    counts are HyperLogLog estimates unless `exact=true` is passed.
+
+    `country`, `device` and `utm_*` narrow the time series only; a filtered
+    series is aggregated from raw events in one grouped query.
     """
-    # Total pageviews
-    pageviews_query = select(func.count(AnalyticsEvent.id)).where(
-        and_(
-            AnalyticsEvent.event_type == "pageview",
-            AnalyticsEvent.timestamp >= date_from,
-            AnalyticsEvent.timestamp <= date_to,
-            AnalyticsEvent.is_bot == False,
+    filters = {
+        name: value
+        for name, value in (
+            ("country", country),
+            ("device", device),
+            ("utm_source", utm_source),
+            ("utm_medium", utm_medium),
+            ("utm_campaign", utm_campaign),
         )
-    )
-    total_pageviews = (await db.execute(pageviews_query)).scalar() or 0
-
-    # Unique visitors
-    visitors_query = select(func.count(func.distinct(AnalyticsEvent.visitor_id))).where(
-        and_(
-            AnalyticsEvent.timestamp >= date_from,
-            AnalyticsEvent.timestamp <= date_to,
-            AnalyticsEvent.is_bot == False,
+        if value is not None
+    }
+    try:
+        request = AnalyticsSummaryRequest(
+            date_from=date_from, date_to=date_to, group_by=group_by, filters=filters or None
         )
-    )
-    total_visitors = (await db.execute(visitors_query)).scalar() or 0
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False)) from e
+    return await _summary_with_series(db, request, exact)
 
-    # Total sessions
-    sessions_query = select(func.count(AnalyticsSession.id)).where(
-        and_(AnalyticsSession.start_time >= date_from, AnalyticsSession.start_time <= date_to)
-    )
-    total_sessions = (await db.execute(sessions_query)).scalar() or 0
 
-    # Average session duration
-    avg_duration_query = select(func.avg(AnalyticsSession.duration_seconds)).where(
-        and_(AnalyticsSession.start_time >= date_from, AnalyticsSession.start_time <= date_to)
-    )
-    avg_session_duration = (await db.execute(avg_duration_query)).scalar() or 0.0
-
-    # Bounce rate
-    bounces_query = select(func.count(AnalyticsSession.id)).where(
-        and_(
-            AnalyticsSession.start_time >= date_from,
-            AnalyticsSession.start_time <= date_to,
-            AnalyticsSession.is_bounce == True,
-        )
-    )
-    total_bounces = (await db.execute(bounces_query)).scalar() or 0
-    bounce_rate = (total_bounces / total_sessions * 100) if total_sessions > 0 else 0.0
-
-    # Conversion rate
-    conversions_query = select(func.count(ConversionEvent.id)).where(
-        and_(ConversionEvent.timestamp >= date_from, ConversionEvent.timestamp <= date_to)
-    )
-    total_conversions = (await db.execute(conversions_query)).scalar() or 0
-    conversion_rate = (total_conversions / total_sessions * 100) if total_sessions > 0 else 0.0
+@router.post("/summary", response_model=AnalyticsSummaryResponse)
+async def query_analytics_summary(
+    request: AnalyticsSummaryRequest,
+    exact: bool = False,
+    db: AsyncSession = Depends(get_db_session),
+) -> AnalyticsSummaryResponse:
+    """
+    Analytics summary with grouping and filters in the request body.
 
-    # Total revenue
-    revenue_query = select(func.sum(ConversionEvent.conversion_value)).where(
-        and_(ConversionEvent.timestamp >= date_from, ConversionEvent.timestamp <= date_to)
-    )
-    total_revenue = (await db.execute(revenue_query)).scalar() or 0.0
-
-    # Top pages
-    top_pages_query = (
-        select(
-            AnalyticsEvent.path,
-            func.count(AnalyticsEvent.id).label("pageviews"),
-            func.count(func.distinct(AnalyticsEvent.visitor_id)).label("unique_visitors"),
-        )
-        .where(
-            and_(
-                AnalyticsEvent.event_type == "pageview",
-                AnalyticsEvent.timestamp >= date_from,
-                AnalyticsEvent.timestamp <= date_to,
-                AnalyticsEvent.is_bot == False,
-            )
-        )
-        .group_by(AnalyticsEvent.path)
-        .order_by(desc("pageviews"))
-        .limit(10)
-    )
-    top_pages_result = await db.execute(top_pages_query)
-    top_pages = [
-        {"path": row[0], "pageviews": row[1], "unique_visitors": row[2]}
-        for row in top_pages_result.fetchall()
-    ]
-
-    # Top referrers
-    top_referrers_query = (
-        select(
-            AnalyticsEvent.referrer_domain,
-            func.count(AnalyticsEvent.id).label("visits"),
-        )
-        .where(
-            and_(
-                AnalyticsEvent.timestamp >= date_from,
-                AnalyticsEvent.timestamp <= date_to,
-                AnalyticsEvent.referrer_domain.isnot(None),
-                AnalyticsEvent.is_bot == False,
-            )
-        )
-        .group_by(AnalyticsEvent.referrer_domain)
-        .order_by(desc("visits"))
-        .limit(10)
-    )
-    top_referrers_result = await db.execute(top_referrers_query)
-    top_referrers = [
-        {"referrer": row[0], "visits": row[1]} for row in top_referrers_result.fetchall()
-    ]
-
-    # Top countries
-    top_countries_query = (
-        select(
-            AnalyticsEvent.country_code,
-            AnalyticsEvent.country_name,
-            func.count(func.distinct(AnalyticsEvent.visitor_id)).label("visitors"),
-        )
-        .where(
-            and_(
-                AnalyticsEvent.timestamp >= date_from,
-                AnalyticsEvent.timestamp <= date_to,
-                AnalyticsEvent.country_code.isnot(None),
-                AnalyticsEvent.is_bot == False,
-            )
-        )
-        .group_by(AnalyticsEvent.country_code, AnalyticsEvent.country_name)
-        .order_by(desc("visitors"))
-        .limit(10)
-    )
-    top_countries_result = await db.execute(top_countries_query)
-    top_countries = [
-        {"country_code": row[0], "country_name": row[1], "visitors": row[2]}
-        for row in top_countries_result.fetchall()
-    ]
-
-    # Device breakdown
-    device_query = (
-        select(
-            AnalyticsEvent.device_type,
-            func.count(func.distinct(AnalyticsEvent.visitor_id)).label("visitors"),
-        )
-        .where(
-            and_(
-                AnalyticsEvent.timestamp >= date_from,
-                AnalyticsEvent.timestamp <= date_to,
-                AnalyticsEvent.is_bot == False,
-            )
-        )
-        .group_by(AnalyticsEvent.device_type)
-    )
-    device_result = await db.execute(device_query)
-    device_breakdown = {row[0] or "unknown": row[1] for row in device_result.fetchall()}
-
-    return AnalyticsSummaryResponse(
-        date_from=date_from,
-        date_to=date_to,
-        total_pageviews=total_pageviews,
-        total_visitors=total_visitors,
-        total_sessions=total_sessions,
-        avg_session_duration=avg_session_duration,
-        bounce_rate=bounce_rate,
-        conversion_rate=conversion_rate,
-        total_revenue=total_revenue,
-        top_pages=top_pages,
-        top_referrers=top_referrers,
-        top_countries=top_countries,
-        device_breakdown=device_breakdown,
-    )
+    Same response as `GET /summary`; `filters` values may be a single value
+    or a list of values.
+    """
+    return await _summary_with_series(db, request, exact)
 
 
 @router.get("/realtime", response_model=RealTimeStatsResponse)
-async def get_realtime_stats(db: AsyncSession = Depends(get_db_session)) -> RealTimeStatsResponse:
+async def get_realtime_stats() -> RealTimeStatsResponse:
     """
     Get real-time analytics statistics.
 
     Shows current active visitors and recent activity (last 5 minutes).
     Perfect for live dashboards.
+
+    Answered from the in-memory sliding window fed by ingestion (merged
+    across workers through Redis when configured); no database queries.
     """
-    now = datetime.utcnow()
-    five_min_ago = now - timedelta(minutes=5)
-    thirty_sec_ago = now - timedelta(seconds=30)
-
-    # Current visitors (active in last 30 seconds)
-    current_visitors_query = select(func.count(func.distinct(AnalyticsEvent.visitor_id))).where(
-        and_(
-            AnalyticsEvent.timestamp >= thirty_sec_ago,
-            AnalyticsEvent.is_bot == False,
-        )
-    )
-    current_visitors = (await db.execute(current_visitors_query)).scalar() or 0
+    return RealTimeStatsResponse(**await realtime_window.merged_stats())
 
-    # Visitors last 5 minutes
-    visitors_5min_query = select(func.count(func.distinct(AnalyticsEvent.visitor_id))).where(
-        and_(
-            AnalyticsEvent.timestamp >= five_min_ago,
-            AnalyticsEvent.is_bot == False,
-        )
-    )
-    visitors_last_5min = (await db.execute(visitors_5min_query)).scalar() or 0
-
-    # Pageviews last 5 minutes
-    pageviews_5min_query = select(func.count(AnalyticsEvent.id)).where(
-        and_(
-            AnalyticsEvent.event_type == "pageview",
-            AnalyticsEvent.timestamp >= five_min_ago,
-            AnalyticsEvent.is_bot == False,
-        )
-    )
-    pageviews_last_5min = (await db.execute(pageviews_5min_query)).scalar() or 0
 
-    # Top pages now
-    top_pages_query = (
-        select(
-            AnalyticsEvent.path, func.count(func.distinct(AnalyticsEvent.visitor_id)).label("visitors")
-        )
-        .where(
-            and_(
-                AnalyticsEvent.event_type == "pageview",
-                AnalyticsEvent.timestamp >= five_min_ago,
-                AnalyticsEvent.is_bot == False,
-            )
-        )
-        .group_by(AnalyticsEvent.path)
-        .order_by(desc("visitors"))
-        .limit(5)
-    )
-    top_pages_result = await db.execute(top_pages_query)
-    top_pages_now = [{"path": row[0], "visitors": row[1]} for row in top_pages_result.fetchall()]
-
-    # Top countries now
-    top_countries_query = (
-        select(
-            AnalyticsEvent.country_code,
-            func.count(func.distinct(AnalyticsEvent.visitor_id)).label("visitors"),
-        )
-        .where(
-            and_(
-                AnalyticsEvent.timestamp >= five_min_ago,
-                AnalyticsEvent.country_code.isnot(None),
-                AnalyticsEvent.is_bot == False,
-            )
-        )
-        .group_by(AnalyticsEvent.country_code)
-        .order_by(desc("visitors"))
-        .limit(5)
+class _SubscriberStreamingResponse(StreamingResponse):
+    """
+    SSE response that releases its broker subscriber however it ends.
+
+    The generator's own cleanup never runs if the response is cancelled
+    (e.g. the client disconnects) before its first event is pulled.
+    """
+
+    def __init__(self, subscriber: StreamSubscriber, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.subscriber = subscriber
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            realtime_broker.unsubscribe(self.subscriber)
+
+
+@router.get("/stream")
+async def stream_realtime_stats(http_request: Request) -> StreamingResponse:
+    """
+    Push real-time analytics to a dashboard over Server-Sent Events.
+
+    Events:
+    - `snapshot`: full real-time stats (same shape as `/realtime`), sent on
+      connect and every few seconds
+    - `delta`: counts for each batch of newly ingested events
+
+    Slow clients get coalesced deltas; they never hold up ingestion.
+    """
+    try:
+        subscriber = realtime_broker.subscribe()
+    except StreamSubscribersExhaustedError:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many realtime streams, fall back to polling",
+            headers={"Retry-After": "30"},
+        ) from None
+
+    return _SubscriberStreamingResponse(
+        subscriber,
+        realtime_broker.sse_events(
+            subscriber,
+            http_request.is_disconnected,
+            snapshot_interval=settings.realtime_stream_snapshot_seconds,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    top_countries_result = await db.execute(top_countries_query)
-    top_countries_now = [
-        {"country_code": row[0], "visitors": row[1]} for row in top_countries_result.fetchall()
-    ]
-
-    # Recent conversions
-    recent_conversions_query = (
-        select(
-            ConversionEvent.conversion_type,
-            ConversionEvent.conversion_value,
-            ConversionEvent.timestamp,
-        )
-        .where(ConversionEvent.timestamp >= five_min_ago)
-        .order_by(desc(ConversionEvent.timestamp))
-        .limit(10)
+
+
+async def schedule_funnel_rebuild(funnel_id: uuid.UUID, background_tasks: BackgroundTasks) -> None:
+    """Queue a rebuild of a funnel's materialized progress (background task fallback)."""
+    try:
+        from app.services.job_queue import create_queue_pool
+
+        redis = await create_queue_pool()
+        await redis.enqueue_job("rebuild_funnel_progress_job", str(funnel_id))
+        await redis.close()
+    except Exception as e:
+        logger.warning("funnel_rebuild_queue_unavailable", error=str(e))
+
+        async def rebuild_fallback():
+            from app.core.database import get_db_context
+
+            async with get_db_context() as db:
+                await rebuild_funnel_progress(db, funnel_id)
+
+        background_tasks.add_task(rebuild_fallback)
+
+
+def validate_funnel_steps(steps: list) -> None:
+    """Reject steps the funnel engine cannot compile."""
+    try:
+        FunnelMatcher(steps)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+async def get_funnel_or_404(db: AsyncSession, funnel_id: str) -> ConversionFunnel:
+    """Load a saved funnel by id."""
+    try:
+        funnel_uuid = uuid.UUID(funnel_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid funnel_id") from None
+    funnel = await db.get(ConversionFunnel, funnel_uuid)
+    if funnel is None:
+        raise HTTPException(status_code=404, detail="Funnel not found")
+    return funnel
+
+
+@router.post("/funnels", response_model=FunnelResponse, status_code=201)
+async def create_funnel(
+    request: FunnelCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db_session),
+) -> FunnelResponse:
+    """Save a conversion funnel and build its progress from recent events."""
+    validate_funnel_steps(request.steps)
+
+    funnel = ConversionFunnel(**request.model_dump())
+    db.add(funnel)
+    await db.commit()
+    await db.refresh(funnel)
+
+    await schedule_funnel_rebuild(funnel.id, background_tasks)
+    logger.info("funnel_created", funnel_id=str(funnel.id), steps=len(funnel.steps))
+    return FunnelResponse.model_validate(funnel)
+
+
+@router.patch("/funnels/{funnel_id}", response_model=FunnelResponse)
+async def update_funnel(
+    funnel_id: str,
+    request: FunnelUpdate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db_session),
+) -> FunnelResponse:
+    """
+    Edit a saved funnel.
+
+    Changing the steps or time window starts a new progress version; the
+    funnel is analyzed from raw events until its rebuild finishes. So does
+    reactivating it, as ingestion skipped it while it was inactive.
+    """
+    funnel = await get_funnel_or_404(db, funnel_id)
+    changes = request.model_dump(exclude_unset=True)
+    if changes.get("steps") is not None:
+        validate_funnel_steps(changes["steps"])
+
+    redefined = any(
+        name in changes and changes[name] != getattr(funnel, name)
+        for name in ("steps", "time_window_hours")
     )
-    recent_conversions_result = await db.execute(recent_conversions_query)
-    recent_conversions = [
-        {"type": row[0], "value": row[1], "timestamp": row[2].isoformat()}
-        for row in recent_conversions_result.fetchall()
-    ]
-
-    return RealTimeStatsResponse(
-        current_visitors=current_visitors,
-        visitors_last_5min=visitors_last_5min,
-        pageviews_last_5min=pageviews_last_5min,
-        top_pages_now=top_pages_now,
-        top_countries_now=top_countries_now,
-        recent_conversions=recent_conversions,
+    reactivated = changes.get("is_active") is True and not funnel.is_active
+    for name, value in changes.items():
+        if value is not None:
+            setattr(funnel, name, value)
+    rebuild = redefined or reactivated
+    if rebuild:
+        funnel.progress_version += 1
+        funnel.progress_rebuilt_at = None
+    await db.commit()
+    await db.refresh(funnel)
+
+    if rebuild:
+        await schedule_funnel_rebuild(funnel.id, background_tasks)
+    logger.info(
+        "funnel_updated", funnel_id=funnel_id, redefined=redefined, reactivated=reactivated
     )
+    return FunnelResponse.model_validate(funnel)
 
 
-# Placeholder endpoints for additional features
 @router.post("/funnel/analyze", response_model=FunnelAnalysisResponse)
 async def analyze_funnel(
     request: FunnelAnalysisRequest, db: AsyncSession = Depends(get_db_session)
 ) -> FunnelAnalysisResponse:
-    """Analyze conversion funnel (to be implemented)."""
-    # TODO: Implement funnel analysis logic
-    raise HTTPException(status_code=501, detail="Funnel analysis not yet implemented")
+    """
+    Analyze a conversion funnel over a date range.
+
+    Steps come from the request or, with `funnel_id`, from the saved
+    funnel (including its time window). Unfiltered reports of a saved
+    funnel group its materialized progress by sessions entering in the
+    range; otherwise matching pageviews are streamed in session order and
+    walked once, so memory does not grow with traffic. Days already moved
+    to cold storage are read from the Parquet archive.
+    """
+    steps = request.steps
+    time_window_hours = request.time_window_hours
+    source = "events"
+    report = None
+    if request.funnel_id is not None:
+        funnel = await get_funnel_or_404(db, request.funnel_id)
+        steps = funnel.steps
+        time_window_hours = funnel.time_window_hours or time_window_hours
+        if not request.filters and can_report_from_progress(funnel, request.date_from):
+            report = await funnel_progress_report(db, funnel, request.date_from, request.date_to)
+            source = "progress"
+
+    if report is None:
+        try:
+            report = await run_funnel_analysis(
+                db,
+                steps,
+                request.date_from,
+                request.date_to,
+                time_window_hours=time_window_hours,
+                filters=request.filters,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
+    logger.info(
+        "funnel_analyzed",
+        funnel_id=request.funnel_id,
+        steps=len(steps),
+        entries=report["total_entries"],
+        source=source,
+    )
+    return FunnelAnalysisResponse(**report)
 
 
 @router.post("/heatmap", response_model=HeatmapResponse)
 async def get_heatmap(request: HeatmapRequest, db: AsyncSession = Depends(get_db_session)) -> HeatmapResponse:
-    """Get heatmap data for a page (to be implemented)."""
-    # TODO: Implement heatmap data retrieval
-    raise HTTPException(status_code=501, detail="Heatmap feature not yet implemented")
+    """
+    Click or scroll heatmap of a page for one viewport bucket.
+
+    Whole days are summed from the per-day grids kept up to date at ingest
+    and downsampled to the requested resolution; partial days at the range
+    edges are binned from raw events with NumPy.
+    """
+    try:
+        heatmap = await build_heatmap(
+            db,
+            request.page_path,
+            request.viewport_width,
+            request.heatmap_type,
+            request.date_from,
+            request.date_to,
+            grid_rows=request.grid_rows,
+            grid_columns=request.grid_columns,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    logger.info(
+        "heatmap_built",
+        page_path=request.page_path,
+        viewport_width=heatmap["viewport_width"],
+        heatmap_type=request.heatmap_type,
+        sample_size=heatmap["sample_size"],
+    )
+    return HeatmapResponse(
+        page_path=request.page_path,
+        heatmap_type=request.heatmap_type,
+        date_from=request.date_from,
+        date_to=request.date_to,
+        **heatmap,
+    )
+
+
+@router.post("/replays/{session_id}/chunks", response_model=ReplayChunkResponse, status_code=202)
+async def ingest_replay_chunk(
+    session_id: str,
+    request: ReplayChunkRequest,
+    db: AsyncSession = Depends(get_db_session),
+) -> ReplayChunkResponse:
+    """
+    Append a chunk of rrweb events to a session's replay.
+
+    The chunk is compressed as one gzip member or zstd frame and appended
+    to the session's object in the replay store; Postgres only receives
+    the metadata row (counts, duration, size, object key).
+    """
+    if not session_id or len(session_id) > 255:
+        raise HTTPException(status_code=400, detail="Invalid session_id")
+    if len(request.events) > settings.replay_max_chunk_events:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Chunk exceeds {settings.replay_max_chunk_events} events",
+        )
+
+    try:
+        stored = await replay_store.append_chunk(session_id, request.events)
+    except ReplayStorageUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    await record_replay_chunk(
+        db,
+        session_id,
+        request.visitor_id,
+        request.events,
+        stored,
+        has_console_logs=request.has_console_logs,
+        has_network_data=request.has_network_data,
+        privacy_mode=request.privacy_mode,
+    )
+
+    logger.info(
+        "replay_chunk_stored",
+        session_id=session_id,
+        events=stored.chunk.event_count,
+        compressed_bytes=stored.chunk.length,
+    )
+    return ReplayChunkResponse(
+        session_id=session_id,
+        offset=stored.chunk.offset,
+        length=stored.chunk.length,
+        event_count=stored.chunk.event_count,
+    )
 
 
 @router.get("/replays", response_model=SessionReplayListResponse)
 async def list_session_replays(
-    date_from: datetime,
-    date_to: datetime,
-    limit: int = 50,
+    params: Annotated[SessionReplayListRequest, Query()],
     db: AsyncSession = Depends(get_db_session),
 ) -> SessionReplayListResponse:
-    """List session replays (to be implemented)."""
-    # TODO: Implement session replay listing
-    raise HTTPException(status_code=501, detail="Session replay feature not yet implemented")
+    """
+    List session replay metadata, newest first.
+
+    With `min_quality_score` above 70 the listing is ordered by score and
+    served from the idx_replays_quality partial index.
+    """
+    total, replays = await list_replays(
+        db,
+        params.date_from,
+        params.date_to,
+        min_quality_score=params.min_quality_score,
+        has_errors=params.has_errors,
+        has_rage_clicks=params.has_rage_clicks,
+        limit=params.limit,
+        offset=params.offset,
+    )
+    return SessionReplayListResponse(
+        total=total,
+        replays=[
+            SessionReplayMetadata(
+                id=str(replay.id),
+                session_id=replay.session_id,
+                visitor_id=replay.visitor_id,
+                duration_ms=replay.duration_ms or 0,
+                event_count=replay.event_count or 0,
+                has_errors=bool(replay.has_errors),
+                has_rage_clicks=bool(replay.has_rage_clicks),
+                quality_score=replay.quality_score,
+                recorded_at=replay.recorded_at,
+                storage_path=replay.storage_path or "",
+            )
+            for replay in replays
+        ],
+    )
+
+
+async def locate_replay_or_404(session_id: str) -> tuple[str, ReplayCodec, int]:
+    """Key, codec and size of a session's replay object."""
+    located = await replay_store.locate(session_id)
+    if located is None:
+        raise HTTPException(status_code=404, detail="Replay not found")
+    key, codec = located
+    size = await replay_store.store.size(key)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Replay not found")
+    return key, codec, size
+
+
+@router.get("/replays/{session_id}/chunks", response_model=ReplayChunkListResponse)
+async def get_replay_chunks(session_id: str) -> ReplayChunkListResponse:
+    """Chunk byte ranges of a replay, for seeking with Range requests on /data."""
+    key, codec, size = await locate_replay_or_404(session_id)
+    chunks = await replay_store.chunks(key)
+    return ReplayChunkListResponse(
+        session_id=session_id,
+        compression=codec.name,
+        size=size,
+        chunks=[ReplayChunkInfo(**vars(chunk)) for chunk in chunks if chunk.offset < size],
+    )
+
+
+@router.get("/replays/{session_id}/data")
+async def get_replay_data(session_id: str, http_request: Request) -> StreamingResponse:
+    """
+    Stream a replay's compressed rrweb events (JSON Lines).
+
+    Supports a single `Range: bytes=...` header; ranges starting at chunk
+    offsets decompress on their own, so players can fetch from any chunk.
+    """
+    key, codec, size = await locate_replay_or_404(session_id)
+    try:
+        byte_range = parse_byte_range(http_request.headers.get("range"), size)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{size}"}
+        ) from e
+
+    start, end = byte_range or (0, size)
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(end - start)}
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    return StreamingResponse(
+        replay_store.read(key, start, end),
+        status_code=206 if byte_range is not None else 200,
+        media_type=codec.media_type,
+        headers=headers,
+    )
 
 
 @router.post("/ml/classify-intent")
@@ -600,4 +846,4 @@ async def classify_visitor_intent(
         raise
     except Exception as e:
         logger.error("intent_classification_failed", error=str(e), exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Failed to classify intent: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to classify intent: {str(e)}") from e
@@ -1,5 +1,8 @@
 """
 Dashboard API routes for analytics data.
+
+Order-derived results are cached per shop (see `app.services.result_cache`)
+and invalidated when the shop's orders are synced.
 """
 from datetime import date, timedelta
 from typing import Annotated
@@ -21,6 +24,7 @@ from app.schemas.dashboard import (
     RevenueDataPoint,
     TopProduct,
 )
+from app.services.result_cache import dashboard_namespace, result_cache
 
 logger = get_logger(__name__)
 
@@ -35,6 +39,16 @@ async def get_dashboard_stats(
     """
     Get dashboard statistics comparing yesterday to weekly average.
     """
+    cached = await result_cache.get_or_compute(
+        dashboard_namespace(shop_id),
+        {"endpoint": "stats", "today": date.today()},
+        lambda: _compute_dashboard_stats(shop_id, session),
+    )
+    return DashboardStats.model_validate(cached)
+
+
+async def _compute_dashboard_stats(shop_id: UUID, session: AsyncSession) -> DashboardStats:
+    """Yesterday's orders against the trailing 7-day average."""
     # Verify shop exists
     shop = await session.get(Shop, shop_id)
     if not shop:
@@ -117,6 +131,20 @@ async def get_revenue_chart(
     period: str = Query("7d", description="Period: 7d, 30d, 90d"),
 ) -> RevenueChartData:
     """Get revenue chart data for the specified period."""
+    cached = await result_cache.get_or_compute(
+        dashboard_namespace(shop_id),
+        {"endpoint": "revenue-chart", "period": period, "today": date.today()},
+        lambda: _compute_revenue_chart(shop_id, session, period),
+    )
+    return RevenueChartData.model_validate(cached)
+
+
+async def _compute_revenue_chart(
+    shop_id: UUID,
+    session: AsyncSession,
+    period: str,
+) -> RevenueChartData:
+    """Daily revenue and orders for the period."""
     days = {"7d": 7, "30d": 30, "90d": 90}.get(period, 7)
     start_date = date.today() - timedelta(days=days)
 
@@ -167,6 +195,20 @@ async def get_top_products(
     period: str = Query("30d", description="Period: 7d, 30d, 90d"),
 ) -> dict:
     """Get top selling products for the period."""
+    return await result_cache.get_or_compute(
+        dashboard_namespace(shop_id),
+        {"endpoint": "top-products", "limit": limit, "period": period, "today": date.today()},
+        lambda: _compute_top_products(shop_id, session, limit, period),
+    )
+
+
+async def _compute_top_products(
+    shop_id: UUID,
+    session: AsyncSession,
+    limit: int,
+    period: str,
+) -> dict:
+    """Products ranked by line-item revenue over the period."""
     days = {"7d": 7, "30d": 30, "90d": 90}.get(period, 30)
     start_date = date.today() - timedelta(days=days)
 
@@ -229,7 +271,13 @@ async def get_dashboard_summary(
     shop_id: Annotated[UUID, Query(description="Shop ID")],
     session: Annotated[AsyncSession, Depends(get_db_session)],
 ) -> DashboardSummary:
-    """Get complete dashboard summary in a single call."""
+    """
+    Get complete dashboard summary in a single call.
+
+    Stats, chart and top products come from the result cache; the active
+    insights count is always read live, since dismissing an insight does
+    not invalidate cached dashboards.
+    """
     stats = await get_dashboard_stats(shop_id, session)
     revenue_chart = await get_revenue_chart(shop_id, session, "7d")
     top_products_response = await get_top_products(shop_id, session, 5, "30d")
@@ -9,6 +9,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.database import get_db_session
+from app.services.analytics_service import get_user_agent_cache_stats
+from app.services.duckdb_engine import duckdb_engine
+from app.services.event_stream import event_stream_publisher
+from app.services.geoip import geoip_database
+from app.services.ingest_buffer import ingest_buffer
+from app.services.post_ingest import post_ingest_executor
+from app.services.realtime_stream import realtime_broker
+from app.services.result_cache import result_cache
 
 router = APIRouter(tags=["health"])
 
@@ -81,4 +89,17 @@ async def metrics() -> dict:
         "app_name": settings.app_name,
         "app_version": settings.app_version,
         "environment": settings.environment,
+        "ingest_buffer": {
+            "running": ingest_buffer.is_running,
+            "depth": ingest_buffer.depth,
+            "flushed_rows": ingest_buffer.flushed_rows,
+            "failed_rows": ingest_buffer.failed_rows,
+        },
+        "post_ingest": post_ingest_executor.stats(),
+        "user_agent_cache": get_user_agent_cache_stats(),
+        "realtime_stream": realtime_broker.stats(),
+        "event_stream": event_stream_publisher.stats(),
+        "geoip": {"loaded": geoip_database.is_loaded, "cache": geoip_database.cache_stats()},
+        "duckdb": duckdb_engine.stats(),
+        "result_cache": result_cache.stats(),
     }
@@ -18,6 +18,7 @@ from app.schemas.shop import (
     ShopSyncResponse,
     ShopUpdate,
 )
+from app.services.result_cache import dashboard_namespace, result_cache
 
 logger = get_logger(__name__)
 
@@ -105,9 +106,21 @@ async def delete_shop(
     shop = await repo.get_by_domain(shop_domain)
     if shop:
         await repo.delete(shop)
+        await result_cache.invalidate(dashboard_namespace(shop.id))
         logger.info("Deleted shop and data", domain=shop_domain)
 
 
+async def sync_shop_orders(shop_id: UUID, full_sync: bool) -> None:
+    """Sync a shop's data, then drop its cached dashboards."""
+    from app.services.data_sync import sync_shop_data
+
+    try:
+        await sync_shop_data(shop_id=shop_id, full_sync=full_sync)
+    finally:
+        # Even a failed sync may have written some orders
+        await result_cache.invalidate(dashboard_namespace(shop_id))
+
+
 @router.post("/{shop_id}/sync", response_model=ShopSyncResponse)
 async def trigger_sync(
     shop_id: UUID,
@@ -127,10 +140,8 @@ async def trigger_sync(
     await repo.update_sync_status(shop, "syncing")
 
     # Queue background sync
-    from app.services.data_sync import sync_shop_data
-
     background_tasks.add_task(
-        sync_shop_data,
+        sync_shop_orders,
         shop_id=shop_id,
         full_sync=sync_request.full_sync,
     )
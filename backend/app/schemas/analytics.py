@@ -1,11 +1,14 @@
 """
 Pydantic schemas for analytics API requests and responses.
 """
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
-from pydantic import BaseModel, Field, field_validator, ConfigDict
+from uuid import UUID
+from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict
 from enum import Enum
 
+from app.core.config import settings
+
 
 class EventType(str, Enum):
     """Supported event types."""
@@ -162,6 +165,13 @@ class TrackEventResponse(BaseModel):
     message: Optional[str] = None
 
 
+class BatchEventError(BaseModel):
+    """Failure of a single event within a batch."""
+
+    index: int = Field(..., description="Position of the event in the submitted batch")
+    error: str
+
+
 class BatchTrackResponse(BaseModel):
     """Response schema for batch tracking."""
 
@@ -169,6 +179,7 @@ class BatchTrackResponse(BaseModel):
     processed: int
     failed: int
     errors: Optional[List[str]] = None
+    failures: Optional[List[BatchEventError]] = None
 
 
 class SessionSummaryResponse(BaseModel):
@@ -197,8 +208,12 @@ class AnalyticsSummaryRequest(BaseModel):
     metrics: Optional[List[str]] = Field(
         None, description="Specific metrics to return (default: all)"
     )
-    group_by: Optional[str] = Field(None, description="Group by: hour, day, week, month")
-    filters: Optional[Dict[str, Any]] = Field(None, description="Filters: country, device, etc.")
+    group_by: Optional[str] = Field(
+        None, pattern="^(hour|day|week|month)$", description="Group by: hour, day, week, month"
+    )
+    filters: Optional[Dict[str, Any]] = Field(
+        None, description="Filters: country, device, utm_source, utm_medium, utm_campaign"
+    )
 
 
 class AnalyticsSummaryResponse(BaseModel):
@@ -226,17 +241,66 @@ class AnalyticsSummaryResponse(BaseModel):
     time_series: Optional[List[Dict[str, Any]]] = None
 
 
+class FunnelCreate(BaseModel):
+    """Request schema for saving a conversion funnel."""
+
+    name: str = Field(..., min_length=1, max_length=255)
+    description: Optional[str] = Field(None, max_length=1000)
+    steps: List[Dict[str, str]] = Field(
+        ..., description="Funnel steps with url_pattern (and optional name)", min_length=2
+    )
+    time_window_hours: int = Field(24, ge=1, description="Max time to complete the funnel")
+    is_active: bool = True
+
+
+class FunnelUpdate(BaseModel):
+    """Request schema for editing a saved funnel; omitted fields are unchanged."""
+
+    name: Optional[str] = Field(None, min_length=1, max_length=255)
+    description: Optional[str] = Field(None, max_length=1000)
+    steps: Optional[List[Dict[str, str]]] = Field(None, min_length=2)
+    time_window_hours: Optional[int] = Field(None, ge=1)
+    is_active: Optional[bool] = None
+
+
+class FunnelResponse(BaseModel):
+    """Response schema for a saved funnel."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    name: str
+    description: Optional[str] = None
+    steps: List[Dict[str, str]]
+    time_window_hours: int
+    is_active: bool
+    progress_version: int
+    progress_rebuilt_at: Optional[datetime] = None  # None while a rebuild is pending
+    created_at: datetime
+    updated_at: datetime
+
+
 class FunnelAnalysisRequest(BaseModel):
     """Request schema for funnel analysis."""
 
-    funnel_id: Optional[str] = None
-    steps: List[Dict[str, str]] = Field(
-        ..., description="Funnel steps with url_pattern", min_length=2
+    funnel_id: Optional[str] = Field(
+        None, description="Saved funnel; its steps and time window are used"
+    )
+    steps: Optional[List[Dict[str, str]]] = Field(
+        None, description="Funnel steps with url_pattern (and optional name)", min_length=2
     )
     date_from: datetime
     date_to: datetime
+    time_window_hours: int = Field(24, ge=1, description="Max time to complete the funnel")
     filters: Optional[Dict[str, Any]] = None
 
+    @model_validator(mode="after")
+    def require_steps_or_funnel(self) -> "FunnelAnalysisRequest":
+        """Ad-hoc requests must define their steps."""
+        if self.funnel_id is None and not self.steps:
+            raise ValueError("Either funnel_id or steps is required")
+        return self
+
 
 class FunnelAnalysisResponse(BaseModel):
     """Response schema for funnel analysis."""
@@ -251,13 +315,19 @@ class HeatmapRequest(BaseModel):
     """Request schema for heatmap data."""
 
     page_path: str
-    viewport_width: int = Field(..., description="Viewport width bucket: 375, 768, 1024, 1920")
+    viewport_width: int = Field(
+        ..., ge=1, description="Viewport width; mapped to its bucket: 375, 768, 1024, 1920"
+    )
     heatmap_type: str = Field(
         ..., description="Type: click, scroll, move, attention", pattern="^(click|scroll|move|attention)$"
     )
     date_from: datetime
     date_to: datetime
 
+    # Click grid resolution; stored grids are downsampled (never upsampled)
+    grid_rows: Optional[int] = Field(None, ge=1)
+    grid_columns: Optional[int] = Field(None, ge=1)
+
 
 class HeatmapResponse(BaseModel):
     """Response schema for heatmap data."""
@@ -265,11 +335,15 @@ class HeatmapResponse(BaseModel):
     page_path: str
     viewport_width: int
     heatmap_type: str
-    data: List[Dict[str, Any]]  # Click coords, scroll depth, etc.
-    sample_size: int
+    data: List[Dict[str, Any]]  # Click cells {x, y, count} or scroll {depth_percent, reach_count}
+    sample_size: int  # Clicks binned, or (estimated) sessions that scrolled
     date_from: datetime
     date_to: datetime
 
+    # Click grid shape; cell (x, y) covers column x and row y of the viewport
+    rows: Optional[int] = None
+    columns: Optional[int] = None
+
 
 class SessionReplayListRequest(BaseModel):
     """Request schema for listing session replays."""
@@ -305,6 +379,60 @@ class SessionReplayListResponse(BaseModel):
     replays: List[SessionReplayMetadata]
 
 
+class ReplayChunkRequest(BaseModel):
+    """A chunk of rrweb events recorded for one session."""
+
+    visitor_id: str = Field(..., min_length=1, max_length=255)
+    events: List[Dict[str, Any]] = Field(..., min_length=1)
+    has_console_logs: bool = False
+    has_network_data: bool = False
+    privacy_mode: str = Field("strict", pattern="^(strict|balanced|off)$")
+
+    @field_validator("events")
+    @classmethod
+    def drop_events_with_bad_timestamps(cls, v: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep events whose timestamp is within `replay_max_clock_skew_hours` of server time."""
+        now_ms = datetime.now(timezone.utc).timestamp() * 1000
+        skew_ms = settings.replay_max_clock_skew_hours * 3600 * 1000
+        events = []
+        for event in v:
+            timestamp = event.get("timestamp")
+            if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)):
+                continue
+            if abs(timestamp - now_ms) <= skew_ms:
+                events.append(event)
+        if not events:
+            raise ValueError("No events with a timestamp near server time")
+        return events
+
+
+class ReplayChunkResponse(BaseModel):
+    """Response schema for an appended replay chunk."""
+
+    session_id: str
+    offset: int  # Byte offset of the chunk in the replay object
+    length: int  # Compressed bytes
+    event_count: int
+
+
+class ReplayChunkInfo(BaseModel):
+    """Byte range of one chunk of a replay object."""
+
+    offset: int
+    length: int
+    event_count: int
+    first_timestamp_ms: int
+
+
+class ReplayChunkListResponse(BaseModel):
+    """Chunk index of a session replay, for seeking with Range requests."""
+
+    session_id: str
+    compression: str
+    size: int
+    chunks: List[ReplayChunkInfo]
+
+
 class RealTimeStatsResponse(BaseModel):
     """Response schema for real-time statistics."""
 
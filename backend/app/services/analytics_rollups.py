@@ -0,0 +1,387 @@
+"""
+Analytics Rollups - Incremental hourly/daily pre-aggregation of traffic.
+
+Provides:
+- Hourly and daily counters (pageviews, sessions, bounces, conversions, revenue)
+- Per-path, per-referrer, per-country and per-device counters
+- HyperLogLog visitor sketches per bucket and dimension value, so distinct
+  visitors over any range are a merge of sketches instead of a raw scan
+- Watermarks telling readers how far each granularity is rolled up
+- Idempotent recompute of a bucket range, used by the periodic rollup job
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import and_, bindparam, delete, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.hyperloglog import HyperLogLog
+from app.core.logging import get_logger
+from app.models.analytics import AnalyticsDimensionRollup, AnalyticsEvent, AnalyticsRollup
+
+logger = get_logger(__name__)
+
+ROLLUP_STEPS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# Buckets recomputed per transaction while catching up
+ROLLUP_CHUNK_BUCKETS = {
+    "hour": 24,
+    "day": 7,
+}
+
+# Sketch dimension stored on analytics_rollups rather than per-dimension rows
+TOTAL_DIMENSION = "total"
+
+SketchKey = tuple[datetime, str, str]  # bucket_start, dimension, value
+
+
+_ROLLUP_TOTALS_SQL = text(
+    """
+    INSERT INTO analytics_rollups (
+        id, granularity, bucket_start, pageviews, events, visitors,
+        sessions, bounces, session_duration_total, conversions, revenue, updated_at
+    )
+    SELECT
+        gen_random_uuid(), :granularity, b.bucket_start,
+        COALESCE(ev.pageviews, 0), COALESCE(ev.events, 0), COALESCE(ev.visitors, 0),
+        COALESCE(se.sessions, 0), COALESCE(se.bounces, 0), COALESCE(se.duration_total, 0),
+        COALESCE(co.conversions, 0), COALESCE(co.revenue, 0), :now
+    FROM generate_series(
+        CAST(:start AS timestamp),
+        CAST(:end AS timestamp) - CAST(:step AS interval),
+        CAST(:step AS interval)
+    ) AS b(bucket_start)
+    LEFT JOIN (
+        SELECT
+            date_trunc(:granularity, timestamp) AS bucket_start,
+            COUNT(*) FILTER (WHERE event_type = 'pageview') AS pageviews,
+            COUNT(*) AS events,
+            COUNT(DISTINCT visitor_id) AS visitors
+        FROM analytics_events
+        WHERE timestamp >= :start AND timestamp < :end AND is_bot = false
+        GROUP BY 1
+    ) ev USING (bucket_start)
+    LEFT JOIN (
+        SELECT
+            date_trunc(:granularity, start_time) AS bucket_start,
+            COUNT(*) AS sessions,
+            COUNT(*) FILTER (WHERE is_bounce) AS bounces,
+            SUM(duration_seconds) AS duration_total
+        FROM analytics_sessions
+        WHERE start_time >= :start AND start_time < :end
+        GROUP BY 1
+    ) se USING (bucket_start)
+    LEFT JOIN (
+        SELECT
+            date_trunc(:granularity, timestamp) AS bucket_start,
+            COUNT(*) AS conversions,
+            SUM(conversion_value) AS revenue
+        FROM conversion_events
+        WHERE timestamp >= :start AND timestamp < :end
+        GROUP BY 1
+    ) co USING (bucket_start)
+    """
+)
+
+_ROLLUP_DIMENSIONS_SQL = text(
+    """
+    INSERT INTO analytics_dimension_rollups (
+        id, granularity, bucket_start, dimension, value, label, hits, visitors, updated_at
+    )
+    SELECT
+        gen_random_uuid(), CAST(:granularity AS text),
+        date_trunc(CAST(:granularity AS text), e.timestamp),
+        d.dimension, d.value, MAX(d.label), COUNT(*), COUNT(DISTINCT e.visitor_id), :now
+    FROM analytics_events e
+    CROSS JOIN LATERAL (VALUES
+        ('path', CASE WHEN e.event_type = 'pageview' THEN e.path END, NULL),
+        ('referrer', e.referrer_domain, NULL),
+        ('country', e.country_code, e.country_name),
+        ('device', COALESCE(e.device_type, 'unknown'), NULL)
+    ) AS d(dimension, value, label)
+    WHERE e.timestamp >= :start AND e.timestamp < :end
+      AND e.is_bot = false
+      AND d.value IS NOT NULL
+    GROUP BY 3, 4, 5
+    """
+)
+
+
+# Distinct visitors per hour and dimension value, feeding the hourly sketches.
+# Dimension values mirror _ROLLUP_DIMENSIONS_SQL.
+_HOUR_VISITORS_SQL = text(
+    """
+    SELECT DISTINCT date_trunc('hour', e.timestamp), d.dimension, d.value, e.visitor_id
+    FROM analytics_events e
+    CROSS JOIN LATERAL (VALUES
+        ('total', ''),
+        ('path', CASE WHEN e.event_type = 'pageview' THEN e.path END),
+        ('referrer', e.referrer_domain),
+        ('country', e.country_code),
+        ('device', COALESCE(e.device_type, 'unknown'))
+    ) AS d(dimension, value)
+    WHERE e.timestamp >= :start AND e.timestamp < :end
+      AND e.is_bot = false
+      AND d.value IS NOT NULL
+    """
+)
+
+_UPDATE_TOTAL_SKETCH = (
+    update(AnalyticsRollup.__table__)
+    .where(
+        and_(
+            AnalyticsRollup.__table__.c.granularity == bindparam("b_granularity"),
+            AnalyticsRollup.__table__.c.bucket_start == bindparam("b_bucket_start"),
+        )
+    )
+    .values(visitor_sketch=bindparam("b_sketch"))
+)
+
+_UPDATE_DIMENSION_SKETCH = (
+    update(AnalyticsDimensionRollup.__table__)
+    .where(
+        and_(
+            AnalyticsDimensionRollup.__table__.c.granularity == bindparam("b_granularity"),
+            AnalyticsDimensionRollup.__table__.c.bucket_start == bindparam("b_bucket_start"),
+            AnalyticsDimensionRollup.__table__.c.dimension == bindparam("b_dimension"),
+            AnalyticsDimensionRollup.__table__.c.value == bindparam("b_value"),
+        )
+    )
+    .values(visitor_sketch=bindparam("b_sketch"))
+)
+
+
+def floor_time(ts: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its hour or day."""
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        ts = ts.replace(hour=0)
+    return ts
+
+
+def ceil_time(ts: datetime, granularity: str) -> datetime:
+    """Round a timestamp up to the next hour or day boundary (unless already on one)."""
+    floored = floor_time(ts, granularity)
+    return floored if floored == ts else floored + ROLLUP_STEPS[granularity]
+
+
+async def get_rollup_watermark(db: AsyncSession, granularity: str) -> Optional[datetime]:
+    """
+    End of the rolled-up range for a granularity.
+
+    Every bucket before the watermark has a rollup row (zero rows included),
+    so readers can serve [start, watermark) entirely from rollups.
+    """
+    last_bucket = await db.scalar(
+        select(func.max(AnalyticsRollup.bucket_start)).where(
+            AnalyticsRollup.granularity == granularity
+        )
+    )
+    return last_bucket + ROLLUP_STEPS[granularity] if last_bucket else None
+
+
+async def _hour_visitor_sketches(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+) -> dict[SketchKey, HyperLogLog]:
+    """Build visitor sketches for hourly buckets in [start, end) from raw events."""
+    visitors: dict[SketchKey, list[str]] = defaultdict(list)
+    result = await db.stream(_HOUR_VISITORS_SQL, {"start": start, "end": end})
+    async for bucket_start, dimension, value, visitor_id in result:
+        visitors[(bucket_start, dimension, value)].append(visitor_id)
+
+    sketches = {}
+    for key, visitor_ids in visitors.items():
+        sketch = HyperLogLog(settings.analytics_hll_precision)
+        sketch.update(visitor_ids)
+        sketches[key] = sketch
+    return sketches
+
+
+async def _day_visitor_sketches(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+) -> dict[SketchKey, HyperLogLog]:
+    """Build visitor sketches for daily buckets in [start, end) by merging hourly ones."""
+    sketches: dict[SketchKey, HyperLogLog] = {}
+
+    def add(bucket_start: datetime, dimension: str, value: str, data: bytes) -> None:
+        key = (floor_time(bucket_start, "day"), dimension, value)
+        sketch = HyperLogLog.from_bytes(data)
+        if key in sketches:
+            sketches[key].merge(sketch)
+        else:
+            sketches[key] = sketch
+
+    totals = await db.execute(
+        select(AnalyticsRollup.bucket_start, AnalyticsRollup.visitor_sketch).where(
+            AnalyticsRollup.granularity == "hour",
+            AnalyticsRollup.bucket_start >= start,
+            AnalyticsRollup.bucket_start < end,
+            AnalyticsRollup.visitor_sketch.isnot(None),
+        )
+    )
+    for bucket_start, data in totals:
+        add(bucket_start, TOTAL_DIMENSION, "", data)
+
+    dimensions = await db.execute(
+        select(
+            AnalyticsDimensionRollup.bucket_start,
+            AnalyticsDimensionRollup.dimension,
+            AnalyticsDimensionRollup.value,
+            AnalyticsDimensionRollup.visitor_sketch,
+        ).where(
+            AnalyticsDimensionRollup.granularity == "hour",
+            AnalyticsDimensionRollup.bucket_start >= start,
+            AnalyticsDimensionRollup.bucket_start < end,
+            AnalyticsDimensionRollup.visitor_sketch.isnot(None),
+        )
+    )
+    for bucket_start, dimension, value, data in dimensions:
+        add(bucket_start, dimension, value, data)
+
+    return sketches
+
+
+async def _store_visitor_sketches(
+    db: AsyncSession,
+    granularity: str,
+    sketches: dict[SketchKey, HyperLogLog],
+) -> None:
+    """
+    Attach serialized sketches to the rollup rows they describe.
+
+    Total rows of buckets without visitors keep a NULL sketch, which readers
+    treat as empty; dimension rows only exist for buckets with traffic.
+    """
+    totals = []
+    dimensions = []
+    for (bucket_start, dimension, value), sketch in sketches.items():
+        params = {
+            "b_granularity": granularity,
+            "b_bucket_start": bucket_start,
+            "b_sketch": sketch.to_bytes(),
+        }
+        if dimension == TOTAL_DIMENSION:
+            totals.append(params)
+        else:
+            dimensions.append({**params, "b_dimension": dimension, "b_value": value})
+
+    if totals:
+        await db.execute(_UPDATE_TOTAL_SKETCH, totals)
+    if dimensions:
+        await db.execute(_UPDATE_DIMENSION_SKETCH, dimensions)
+
+
+async def rollup_range(
+    db: AsyncSession,
+    granularity: str,
+    start: datetime,
+    end: datetime,
+) -> None:
+    """
+    Recompute rollup rows for buckets in [start, end).
+
+    Existing rows for the range are replaced, so reprocessing a range after
+    late events or session updates is safe.
+    """
+    for model in (AnalyticsRollup, AnalyticsDimensionRollup):
+        await db.execute(
+            delete(model).where(
+                model.granularity == granularity,
+                model.bucket_start >= start,
+                model.bucket_start < end,
+            )
+        )
+
+    params: dict[str, Any] = {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "step": ROLLUP_STEPS[granularity],
+        "now": datetime.utcnow(),
+    }
+    await db.execute(_ROLLUP_TOTALS_SQL, params)
+    await db.execute(_ROLLUP_DIMENSIONS_SQL, params)
+
+    # Daily sketches are unions of the hourly ones, so days never rescan events
+    if granularity == "hour":
+        sketches = await _hour_visitor_sketches(db, start, end)
+    else:
+        sketches = await _day_visitor_sketches(db, start, end)
+    await _store_visitor_sketches(db, granularity, sketches)
+
+
+async def _roll_forward(
+    db: AsyncSession,
+    granularity: str,
+    start: datetime,
+    end: datetime,
+) -> int:
+    """Roll [start, end) in chunks, committing each; returns buckets processed."""
+    step = ROLLUP_STEPS[granularity]
+    chunk = step * ROLLUP_CHUNK_BUCKETS[granularity]
+    buckets = 0
+
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + chunk, end)
+        await rollup_range(db, granularity, chunk_start, chunk_end)
+        await db.commit()
+        buckets += int((chunk_end - chunk_start) / step)
+        chunk_start = chunk_end
+
+    return buckets
+
+
+async def refresh_analytics_rollups(
+    db: AsyncSession,
+    now: Optional[datetime] = None,
+) -> dict[str, int]:
+    """
+    Advance hourly and daily rollups up to the last closed bucket.
+
+    The most recent `analytics_rollup_recompute_hours` hours (and the last
+    closed day) are recomputed on every run to pick up late-arriving events
+    and sessions that kept growing after their start hour.
+
+    Returns:
+        Number of hourly and daily buckets processed
+    """
+    now = now or datetime.utcnow()
+    hour_end = floor_time(now, "hour")
+
+    hour_watermark = await get_rollup_watermark(db, "hour")
+    if hour_watermark is None:
+        first_event = await db.scalar(select(func.min(AnalyticsEvent.timestamp)))
+        if first_event is None:
+            return {"hours": 0, "days": 0}
+        hour_start = floor_time(first_event, "hour")
+    else:
+        hour_start = hour_watermark - timedelta(hours=settings.analytics_rollup_recompute_hours)
+
+    hours = await _roll_forward(db, "hour", hour_start, hour_end)
+
+    # Daily buckets only once the whole day is closed; today is served hourly
+    day_end = floor_time(hour_end, "day")
+    day_watermark = await get_rollup_watermark(db, "day")
+    if day_watermark is not None:
+        day_start = day_watermark - ROLLUP_STEPS["day"]
+    else:
+        first_hour = await db.scalar(
+            select(func.min(AnalyticsRollup.bucket_start)).where(
+                AnalyticsRollup.granularity == "hour"
+            )
+        )
+        day_start = floor_time(first_hour or hour_start, "day")
+    days = await _roll_forward(db, "day", day_start, day_end)
+
+    logger.info("Analytics rollups refreshed", hours=hours, days=days, rolled_until=hour_end)
+    return {"hours": hours, "days": days}
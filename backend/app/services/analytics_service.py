@@ -1,17 +1,38 @@
 """
 Analytics service - Helper functions for event processing and enrichment.
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
 import hashlib
 import re
+import uuid
+import numpy as np
 from user_agents import parse as parse_ua
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
+from sqlalchemy import Integer, String, and_, case, cast, func, or_
 import structlog
 
+from app.core.cache import LRUCache
+from app.core.config import settings
 from app.models.analytics import AnalyticsEvent, AnalyticsSession
+from app.schemas.analytics import TrackEventRequest
+from app.services.event_stream import event_stream_publisher
+from app.services.frustration_detector import update_frustration_signals
+from app.services.funnel_engine import FunnelAccumulator, FunnelMatcher
+from app.services.funnel_progress import update_funnel_progress
+from app.services.geoip import GeoLocation
+from app.services.heatmap_engine import (
+    DayHeatmap,
+    event_rows,
+    heatmap_events,
+    update_heatmap_grids,
+    viewport_bucket,
+)
+from app.services.realtime_stream import realtime_broker
+from app.services.result_cache import ANALYTICS_NAMESPACE, result_cache
+from app.services.session_scoring import score_sessions
 
 logger = structlog.get_logger()
 
@@ -22,17 +43,28 @@ BOT_PATTERNS = [
     r"facebookexternalhit", r"twitterbot", r"linkedinbot",
 ]
 
+# All bot signatures merged into one precompiled alternation
+BOT_PATTERN = re.compile("|".join(BOT_PATTERNS), re.IGNORECASE)
 
-def parse_user_agent(user_agent: str) -> Dict[str, Any]:
-    """
-    Parse User-Agent string to extract device, browser, and OS information.
+# Memoized results keyed by the raw User-Agent string; a few hundred UAs
+# make up almost all traffic, so parsing each one once is enough
+_user_agent_cache: LRUCache[str, Dict[str, Any]] = LRUCache(settings.user_agent_cache_size)
+_bot_signature_cache: LRUCache[str, bool] = LRUCache(settings.user_agent_cache_size)
 
-    Args:
-        user_agent: User-Agent header string
+# Length limits of the bounded text columns of analytics_events; a value
+# over its limit would fail the whole multi-row INSERT it is part of
+EVENT_COLUMN_LENGTHS = {
+    column.name: column.type.length
+    for column in AnalyticsEvent.__table__.columns
+    if isinstance(column.type, String) and column.type.length
+}
 
-    Returns:
-        Dictionary with device_type, browser, browser_version, os, os_version
-    """
+# Range of the BIGINT client_timestamp column
+_BIGINT_MAX = 2**63 - 1
+
+
+def _parse_user_agent_uncached(user_agent: str) -> Dict[str, Any]:
+    """Parse a User-Agent string with the `user_agents` library."""
     try:
         ua = parse_ua(user_agent)
 
@@ -70,13 +102,34 @@ def parse_user_agent(user_agent: str) -> Dict[str, Any]:
         }
 
 
+def _matches_bot_signature(user_agent: str) -> bool:
+    """Check a User-Agent against the known bot signatures."""
+    return BOT_PATTERN.search(user_agent) is not None
+
+
+def parse_user_agent(user_agent: str) -> Dict[str, Any]:
+    """
+    Parse User-Agent string to extract device, browser, and OS information.
+
+    Results are memoized in a bounded LRU cache keyed by the raw string.
+
+    Args:
+        user_agent: User-Agent header string
+
+    Returns:
+        Dictionary with device_type, browser, browser_version, os, os_version
+    """
+    # Copy so callers can't mutate the shared cached entry
+    return dict(_user_agent_cache.get_or_compute(user_agent, _parse_user_agent_uncached))
+
+
 def detect_bot(user_agent: str, ua_data: Dict[str, Any]) -> bool:
     """
     Detect if the request is from a bot.
 
     Uses multiple signals:
     - User-Agent parsing
-    - Pattern matching against known bot signatures
+    - Pattern matching against known bot signatures (memoized per UA)
     - Behavioral analysis (future: ML-based)
 
     Args:
@@ -90,17 +143,20 @@ def detect_bot(user_agent: str, ua_data: Dict[str, Any]) -> bool:
     if ua_data.get("is_bot"):
         return True
 
-    # Pattern matching
-    user_agent_lower = user_agent.lower()
-    for pattern in BOT_PATTERNS:
-        if re.search(pattern, user_agent_lower):
-            return True
-
     # Empty or very short UA (likely bot)
     if not user_agent or len(user_agent) < 10:
         return True
 
-    return False
+    # Pattern matching
+    return _bot_signature_cache.get_or_compute(user_agent, _matches_bot_signature)
+
+
+def get_user_agent_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss counters of the User-Agent parse and bot signature caches."""
+    return {
+        "parse": _user_agent_cache.stats(),
+        "bot_signature": _bot_signature_cache.stats(),
+    }
 
 
 def extract_referrer_domain(referrer: str) -> Optional[str]:
@@ -139,188 +195,305 @@ def fingerprint_hash(data: str) -> str:
     return hashlib.sha256(data.encode()).hexdigest()
 
 
-async def enrich_geo_data(event_id: str, ip_hash: Optional[str], db: AsyncSession) -> None:
+def validate_event_record(record: Dict[str, Any]) -> None:
+    """
+    Check an event row against the column types of `analytics_events`.
+
+    Rows are written many to a statement, so anything Postgres would reject
+    is caught here and reported for that event alone.
+
+    Raises:
+        ValueError: If a value does not fit its column
+    """
+    for name, limit in EVENT_COLUMN_LENGTHS.items():
+        value = record.get(name)
+        if isinstance(value, str) and len(value) > limit:
+            raise ValueError(f"{name} exceeds {limit} characters")
+
+    client_timestamp = record.get("client_timestamp")
+    if client_timestamp is not None and abs(client_timestamp) > _BIGINT_MAX:
+        raise ValueError("timestamp is out of range")
+
+
+def build_event_record(
+    request: TrackEventRequest,
+    ip_hash: Optional[str],
+    geo: Optional[GeoLocation] = None,
+) -> Dict[str, Any]:
     """
-    Enrich event with geographic data based on IP address.
+    Enrich a tracking request in memory and return its `analytics_events` row.
 
-    NOTE: This is a placeholder. In production, integrate with:
-    - MaxMind GeoIP2
-    - IP2Location
-    - ipapi.co
-    - Or self-hosted GeoIP database
+    The row carries a client-generated id and all timestamps so it can be
+    written with a single multi-row INSERT alongside other events.
 
     Args:
-        event_id: Event UUID
-        ip_hash: Hashed IP address
-        db: Database session
+        request: Validated tracking request
+        ip_hash: SHA-256 hash of the client IP (or None)
+        geo: Location resolved from the raw client IP before hashing (or None)
+
+    Returns:
+        Dictionary of AnalyticsEvent column values
+
+    Raises:
+        ValueError: If a value does not fit its column (see `validate_event_record`)
     """
-    # TODO: Implement actual GeoIP lookup
-    # For now, just log that enrichment would happen
-    logger.debug("geo_enrichment_placeholder", event_id=event_id)
-
-    # Example implementation with a GeoIP service:
-    # try:
-    #     geo_data = await geoip_lookup(ip_hash)
-    #     await db.execute(
-    #         update(AnalyticsEvent)
-    #         .where(AnalyticsEvent.id == event_id)
-    #         .values(
-    #             country_code=geo_data.get("country_code"),
-    #             country_name=geo_data.get("country_name"),
-    #             region=geo_data.get("region"),
-    #             city=geo_data.get("city"),
-    #             timezone=geo_data.get("timezone"),
-    #         )
-    #     )
-    #     await db.commit()
-    # except Exception as e:
-    #     logger.error("geo_enrichment_failed", error=str(e))
-
-    pass
-
-
-async def update_session_metrics(session_id: str, db: AsyncSession) -> None:
+    user_id = None
+    if request.user_id is not None:
+        try:
+            user_id = str(uuid.UUID(request.user_id))
+        except ValueError:
+            raise ValueError("user_id is not a valid UUID") from None
+
+    # Parse User-Agent and detect bots
+    ua_data = parse_user_agent(request.user_agent)
+    is_bot = detect_bot(request.user_agent, ua_data)
+
+    # Extract referrer domain
+    referrer_domain = extract_referrer_domain(request.referrer) if request.referrer else None
+
+    # Parse URL for path extraction
+    path = request.path or urlparse(request.url).path
+
+    now = datetime.utcnow()
+    record = {
+        "id": uuid.uuid4(),
+        "event_type": request.event_type.value,
+        "event_name": request.event_name,
+        "session_id": request.session_id,
+        "visitor_id": request.visitor_id,
+        "user_id": user_id,
+        "timestamp": now,
+        "client_timestamp": request.timestamp,
+        "url": request.url,
+        "path": path,
+        "referrer": request.referrer,
+        "referrer_domain": referrer_domain,
+        "utm_source": request.utm_source,
+        "utm_medium": request.utm_medium,
+        "utm_campaign": request.utm_campaign,
+        "utm_term": request.utm_term,
+        "utm_content": request.utm_content,
+        "device_type": (request.device_type.value if request.device_type else None)
+        or ua_data.get("device_type"),
+        "browser": request.browser or ua_data.get("browser"),
+        "browser_version": request.browser_version or ua_data.get("browser_version"),
+        "os": request.os or ua_data.get("os"),
+        "os_version": request.os_version or ua_data.get("os_version"),
+        **(geo or GeoLocation()).to_columns(),
+        "ip_address_hash": ip_hash,
+        "viewport_width": request.viewport_width,
+        "viewport_height": request.viewport_height,
+        "screen_width": request.screen_width,
+        "screen_height": request.screen_height,
+        "performance_data": request.performance.model_dump() if request.performance else None,
+        "ecommerce_data": request.ecommerce.model_dump() if request.ecommerce else None,
+        "properties": request.properties,
+        "is_bot": is_bot,
+        "consent_given": request.consent_given,
+        "anonymized": False,
+        "created_at": now,
+    }
+    validate_event_record(record)
+    return record
+
+
+async def process_ingested_events(events: List[Dict[str, Any]], db: AsyncSession) -> None:
     """
-    Update session-level aggregations when new events arrive.
+    Run post-ingest work for newly stored events.
 
-    This function:
-    1. Creates session if doesn't exist
-    2. Updates session end time
-    3. Increments event counters
-    4. Calculates derived metrics (bounce rate, duration)
+    Batched ingestion schedules this once per distinct session (or once per
+    group commit) instead of queueing separate aggregation tasks for every
+    event. Geo enrichment already happened at ingest (see `build_event_record`).
+    Saved funnels' progress and the per-day heatmap grids are advanced here
+    too (see `update_funnel_progress` and `update_heatmap_grids`), and the
+    events run through the frustration detector (`update_frustration_signals`).
+    A failed session update stops the batch here.
 
     Args:
-        session_id: Session identifier
+        events: Event rows just stored (as built by `build_event_record`)
         db: Database session
     """
-    try:
-        # Get all events for this session
-        events_query = (
-            select(AnalyticsEvent)
-            .where(AnalyticsEvent.session_id == session_id)
-            .order_by(AnalyticsEvent.timestamp)
-        )
-        result = await db.execute(events_query)
-        events = result.scalars().all()
+    await update_session_metrics(events, db)
+    await update_frustration_signals(events, db)
+    await update_funnel_progress(events, db)
+    await update_heatmap_grids(events, db)
 
-        if not events:
-            return
 
-        first_event = events[0]
-        last_event = events[-1]
-
-        # Calculate metrics
-        start_time = first_event.timestamp
-        end_time = last_event.timestamp
-        duration_seconds = int((end_time - start_time).total_seconds())
+def fold_session_events(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fold the events of one session into an `analytics_sessions` row delta.
 
-        pageview_count = sum(1 for e in events if e.event_type == "pageview")
-        event_count = len(events)
-        click_count = sum(1 for e in events if e.event_type == "click")
+    Args:
+        events: Event rows belonging to a single session, in any order
 
+    Returns:
+        Dictionary of AnalyticsSession column values covering just these events
+    """
+    ordered = sorted(events, key=lambda e: e["timestamp"])
+    first_event = ordered[0]
+    last_event = ordered[-1]
+
+    start_time = first_event["timestamp"]
+    end_time = last_event["timestamp"]
+    duration_seconds = int((end_time - start_time).total_seconds())
+
+    pageview_count = sum(1 for e in ordered if e["event_type"] == "pageview")
+    click_count = sum(1 for e in ordered if e["event_type"] == "click")
+
+    # Check for conversions
+    conversions = [e for e in ordered if e["ecommerce_data"] and e["event_type"] == "ecommerce"]
+    has_conversion = bool(conversions)
+    conversion_value = sum(e["ecommerce_data"].get("order_value") or 0 for e in conversions)
+
+    now = datetime.utcnow()
+    return {
+        "id": uuid.uuid4(),
+        "session_id": first_event["session_id"],
+        "visitor_id": first_event["visitor_id"],
+        "user_id": first_event["user_id"],
+        "start_time": start_time,
+        "end_time": end_time,
+        "duration_seconds": duration_seconds,
+        "entry_page": first_event["path"],
+        "exit_page": last_event["path"],
+        "pageview_count": pageview_count,
+        "event_count": len(ordered),
+        "click_count": click_count,
+        "initial_referrer": first_event["referrer"],
+        "initial_utm_source": first_event["utm_source"],
+        "initial_utm_medium": first_event["utm_medium"],
+        "initial_utm_campaign": first_event["utm_campaign"],
+        "device_type": first_event["device_type"],
+        "browser": first_event["browser"],
+        "os": first_event["os"],
+        "country_code": first_event.get("country_code"),
         # Bounce detection: single pageview and duration < 10 seconds
-        is_bounce = pageview_count == 1 and duration_seconds < 10
-
-        # Check for conversions
-        has_conversion = any(e.ecommerce_data and e.event_type == "ecommerce" for e in events)
-        conversion_value = sum(
-            e.ecommerce_data.get("order_value", 0)
-            for e in events
-            if e.ecommerce_data and e.event_type == "ecommerce"
-        )
+        "is_bounce": pageview_count == 1 and duration_seconds < 10,
+        "has_conversion": has_conversion,
+        "conversion_value": conversion_value if has_conversion else None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def update_session_metrics(events: List[Dict[str, Any]], db: AsyncSession) -> None:
+    """
+    Fold newly arrived events into their session-level aggregations.
+
+    Events are grouped per session and folded in memory, then written with a
+    single `INSERT ... ON CONFLICT (session_id) DO UPDATE`. The update adds
+    to the existing counters and widens the session window with
+    LEAST/GREATEST, so the result does not depend on arrival order:
+    1. Creates session if doesn't exist
+    2. Moves start/end time (and entry/exit page) outward
+    3. Increments pageview, click and event counters
+    4. Recalculates duration and bounce from the merged values
 
-        # Check existing session
-        session_query = select(AnalyticsSession).where(
-            AnalyticsSession.session_id == session_id
+    Args:
+        events: Event rows just stored (as built by `build_event_record`)
+        db: Database session
+
+    Raises:
+        Exception: Database errors, after rolling back, so the post-ingest
+            executor counts the batch as failed
+    """
+    if not events:
+        return
+
+    events_by_session: Dict[str, List[Dict[str, Any]]] = {}
+    for event in events:
+        events_by_session.setdefault(event["session_id"], []).append(event)
+
+    # Stable row order keeps concurrent upserts from deadlocking on each other
+    rows = [fold_session_events(events_by_session[sid]) for sid in sorted(events_by_session)]
+
+    try:
+        stmt = pg_insert(AnalyticsSession).values(rows)
+        new = stmt.excluded
+        current = AnalyticsSession
+
+        start_time = func.least(current.start_time, new.start_time)
+        end_time = func.greatest(current.end_time, new.end_time)
+        pageview_count = func.coalesce(current.pageview_count, 0) + new.pageview_count
+        starts_earlier = new.start_time < current.start_time
+
+        def first_touch(column: str) -> Any:
+            """Take the incoming value only if it comes from an earlier event."""
+            return case((starts_earlier, new[column]), else_=getattr(current, column))
+
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AnalyticsSession.session_id],
+            set_={
+                "start_time": start_time,
+                "end_time": end_time,
+                "duration_seconds": cast(func.extract("epoch", end_time - start_time), Integer),
+                "entry_page": first_touch("entry_page"),
+                "exit_page": case(
+                    (new.end_time >= current.end_time, new.exit_page),
+                    else_=current.exit_page,
+                ),
+                "pageview_count": pageview_count,
+                "event_count": func.coalesce(current.event_count, 0) + new.event_count,
+                "click_count": func.coalesce(current.click_count, 0) + new.click_count,
+                "initial_referrer": first_touch("initial_referrer"),
+                "initial_utm_source": first_touch("initial_utm_source"),
+                "initial_utm_medium": first_touch("initial_utm_medium"),
+                "initial_utm_campaign": first_touch("initial_utm_campaign"),
+                "is_bounce": and_(
+                    pageview_count == 1,
+                    end_time - start_time < timedelta(seconds=10),
+                ),
+                "has_conversion": or_(current.has_conversion.is_(True), new.has_conversion),
+                "conversion_value": case(
+                    (new.conversion_value.is_(None), current.conversion_value),
+                    else_=func.coalesce(current.conversion_value, 0) + new.conversion_value,
+                ),
+                "updated_at": new.updated_at,
+            },
         )
-        session_result = await db.execute(session_query)
-        existing_session = session_result.scalar_one_or_none()
-
-        if existing_session:
-            # Update existing session
-            existing_session.end_time = end_time
-            existing_session.duration_seconds = duration_seconds
-            existing_session.exit_page = last_event.path
-            existing_session.pageview_count = pageview_count
-            existing_session.event_count = event_count
-            existing_session.click_count = click_count
-            existing_session.is_bounce = is_bounce
-            existing_session.has_conversion = has_conversion
-            existing_session.conversion_value = conversion_value if has_conversion else None
-            existing_session.updated_at = datetime.utcnow()
-        else:
-            # Create new session
-            new_session = AnalyticsSession(
-                session_id=session_id,
-                visitor_id=first_event.visitor_id,
-                user_id=first_event.user_id,
-                start_time=start_time,
-                end_time=end_time,
-                duration_seconds=duration_seconds,
-                entry_page=first_event.path,
-                exit_page=last_event.path,
-                pageview_count=pageview_count,
-                event_count=event_count,
-                click_count=click_count,
-                initial_referrer=first_event.referrer,
-                initial_utm_source=first_event.utm_source,
-                initial_utm_medium=first_event.utm_medium,
-                initial_utm_campaign=first_event.utm_campaign,
-                device_type=first_event.device_type,
-                browser=first_event.browser,
-                os=first_event.os,
-                country_code=first_event.country_code,
-                is_bounce=is_bounce,
-                has_conversion=has_conversion,
-                conversion_value=conversion_value if has_conversion else None,
-            )
-            db.add(new_session)
 
+        await db.execute(stmt)
         await db.commit()
-        logger.debug("session_metrics_updated", session_id=session_id)
+        logger.debug("session_metrics_updated", sessions=len(rows), events=len(events))
 
     except Exception as e:
-        logger.error("session_update_failed", session_id=session_id, error=str(e))
+        logger.error("session_update_failed", sessions=len(rows), error=str(e))
         await db.rollback()
+        raise
 
 
-async def publish_to_event_stream(event: AnalyticsEvent) -> None:
+async def publish_to_event_stream(events: List[Dict[str, Any]]) -> None:
     """
-    Publish event to message broker (Kafka/Redpanda) for real-time processing.
+    Publish committed events for real-time and downstream processing.
 
     This enables:
-    - Real-time dashboard updates via WebSocket
-    - Stream processing for aggregations
-    - Event replay for recovery
+    - Real-time dashboard updates via `/api/v1/analytics/stream` (in-process
+      pub/sub, pushed to connected dashboards as deltas)
+    - Stream processing for aggregations, via the configured event stream
+      backend (local segmented log; Kafka/Redpanda can implement the same
+      `EventStreamBackend` interface)
+    - Event replay for recovery, by reading the log from an offset
     - Integration with other systems
+    - Invalidation of cached analytics summaries
 
-    Args:
-        event: Analytics event to publish
+    Publishing never blocks ingestion: rows are buffered and appended in
+    batches by the event stream publisher.
 
-    TODO: Implement actual Kafka/Redpanda integration
+    Args:
+        events: Analytics event rows to publish (as built by `build_event_record`)
     """
     try:
-        # Placeholder for event streaming
-        logger.debug(
-            "event_stream_publish_placeholder",
-            event_id=str(event.id),
-            event_type=event.event_type,
-        )
+        # Live dashboards connected to this process
+        realtime_broker.publish_events(events)
 
-        # Example with Kafka:
-        # await kafka_producer.send(
-        #     topic="analytics.events",
-        #     value={
-        #         "event_id": str(event.id),
-        #         "event_type": event.event_type,
-        #         "session_id": event.session_id,
-        #         "visitor_id": event.visitor_id,
-        #         "timestamp": event.timestamp.isoformat(),
-        #         "url": event.url,
-        #         "path": event.path,
-        #         "properties": event.properties,
-        #     }
-        # )
+        # Durable event log for downstream consumers
+        event_stream_publisher.publish(events)
+
+        # Cached summaries no longer reflect the data (throttled: hot path)
+        await result_cache.invalidate(
+            ANALYTICS_NAMESPACE,
+            min_interval=settings.result_cache_ingest_invalidate_interval,
+        )
 
     except Exception as e:
         logger.error("event_stream_publish_failed", error=str(e))
@@ -330,82 +503,74 @@ def calculate_funnel_conversion(steps: list, events: list) -> Dict[str, Any]:
     """
     Calculate conversion rates for a multi-step funnel.
 
+    In-memory counterpart of `funnel_engine.analyze_funnel` for events
+    already loaded; uses the default time window.
+
     Args:
         steps: List of funnel step definitions
-        events: List of analytics events
+        events: List of analytics events (mappings with session_id, path
+            and timestamp)
 
     Returns:
         Dictionary with step-by-step conversion metrics
     """
-    # TODO: Implement funnel analysis
-    # This will match URL patterns and calculate drop-off rates
-    pass
+    accumulator = FunnelAccumulator(FunnelMatcher(steps))
+    ordered = sorted(events, key=lambda event: (event["session_id"], event["timestamp"]))
+    accumulator.add_many(
+        (event["session_id"], event.get("path"), event["timestamp"]) for event in ordered
+    )
+    return accumulator.finish()
 
 
 def aggregate_heatmap_data(events: list, viewport_width: int) -> Dict[str, Any]:
     """
     Aggregate raw click/scroll events into heatmap data.
 
+    In-memory counterpart of the per-day grids kept by `update_heatmap_grids`;
+    only events in the viewport's bucket are binned.
+
     Args:
         events: List of analytics events with interaction data
         viewport_width: Viewport width bucket
 
     Returns:
-        Aggregated heatmap data structure
+        Aggregated heatmap data structure (`heatmap_data` column values)
     """
-    # TODO: Implement heatmap aggregation
-    # This will cluster click coordinates and generate density maps
-    pass
+    bucket = viewport_bucket(viewport_width)
+    in_bucket = [
+        event
+        for (_, event_bucket), page_events in heatmap_events(events).items()
+        if event_bucket == bucket
+        for event in page_events
+    ]
+    heatmap = DayHeatmap()
+    rows, sessions = event_rows(in_bucket)
+    heatmap.add_rows(rows[:, 1:], sessions)
+    return {"viewport_width": bucket, **heatmap.column_values()}
 
 
 def calculate_session_quality_score(session: AnalyticsSession) -> float:
     """
-    Calculate ML-based quality score for a session.
+    Calculate the quality score of a single session.
 
     Signals:
     - Duration
-    - Engagement (clicks, scrolls)
+    - Engagement (clicks)
     - Pages visited
     - Has conversion
     - Bounce vs engaged
 
+    Scores are normally refreshed in bulk by `session_scoring.rescore_sessions`;
+    this applies the same vectorized rules to one session.
+
     Returns:
         Score from 0-100 (higher = more likely to convert)
-
-    TODO: Implement ML model for quality scoring
     """
-    score = 50.0  # Base score
-
-    # Duration bonus (up to 20 points)
-    if session.duration_seconds > 300:  # 5+ minutes
-        score += 20
-    elif session.duration_seconds > 120:  # 2+ minutes
-        score += 10
-    elif session.duration_seconds > 30:  # 30+ seconds
-        score += 5
-
-    # Pageview bonus (up to 15 points)
-    if session.pageview_count >= 5:
-        score += 15
-    elif session.pageview_count >= 3:
-        score += 10
-    elif session.pageview_count >= 2:
-        score += 5
-
-    # Engagement bonus (up to 15 points)
-    if session.click_count >= 10:
-        score += 15
-    elif session.click_count >= 5:
-        score += 10
-    elif session.click_count >= 2:
-        score += 5
-
-    # Conversion (massive bonus)
-    if session.has_conversion:
-        score = 100.0
-
-    # Bounce penalty
-    if session.is_bounce:
-        score = max(0, score - 30)
-
-    return min(100.0, score)
+    scores = score_sessions(
+        np.array([session.duration_seconds or 0]),
+        np.array([session.pageview_count or 0]),
+        np.array([session.click_count or 0]),
+        np.array([bool(session.has_conversion)]),
+        np.array([bool(session.is_bounce)]),
+    )
+    return float(scores[0])
@@ -0,0 +1,752 @@
+"""
+Analytics Summary - Range planner and aggregation for the summary endpoint.
+
+Ranges are split into segments answered from daily rollups, hourly rollups
+or raw events. Only the edges of the range that are not aligned to a
+rolled-up bucket (and the unrolled tail after the rollup watermark) touch
+`analytics_events`; raw segments older than the cold-storage boundary are
+scanned from Parquet instead. Distinct visitors are estimated by merging the
+rollups' HyperLogLog sketches unless an exact count is requested.
+
+The archive is scanned with pyarrow or, with `cold_query_engine=duckdb`, the
+embedded DuckDB engine, which also counts distinct visitors for ranges that
+lie entirely in the archive.
+
+Raw events are aggregated with conditional aggregates and GROUPING SETS, so
+a raw segment costs one scan for its counters and one for its visitors, and
+independent segment queries run concurrently on separate pooled connections,
+bounded per process rather than per summary.
+"""
+import asyncio
+from collections import Counter, defaultdict
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from typing import Optional, TypeVar
+
+from sqlalchemy import and_, case, func, null, or_, select, true, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session_factory
+from app.core.hyperloglog import HyperLogLog
+from app.core.logging import get_logger
+from app.models.analytics import (
+    AnalyticsDimensionRollup,
+    AnalyticsEvent,
+    AnalyticsRollup,
+    AnalyticsSession,
+    ConversionEvent,
+)
+from app.schemas.analytics import AnalyticsSummaryResponse
+from app.services.analytics_rollups import (
+    TOTAL_DIMENSION,
+    ceil_time,
+    floor_time,
+    get_rollup_watermark,
+)
+from app.services.cold_storage import (
+    cold_boundary,
+    cold_visitor_table,
+    count_distinct_visitors,
+    read_cold_counters,
+    read_cold_visitor_ids,
+    visitor_table_from_ids,
+)
+from app.services.duckdb_engine import duckdb_engine
+
+logger = get_logger(__name__)
+
+TOP_N = 10
+
+T = TypeVar("T")
+
+
+@dataclass
+class RangeSegment:
+    """Part of a summary range and the source that answers it."""
+
+    source: str  # raw, cold, hour, day
+    start: datetime
+    end: datetime
+    end_inclusive: bool = False
+
+
+@dataclass
+class SummaryTotals:
+    """Additive summary counters that can be merged across segments."""
+
+    pageviews: int = 0
+    sessions: int = 0
+    bounces: int = 0
+    session_duration_total: float = 0.0
+    conversions: int = 0
+    revenue: float = 0.0
+    pages: Counter = field(default_factory=Counter)
+    referrers: Counter = field(default_factory=Counter)
+
+    def merge(self, other: "SummaryTotals") -> None:
+        """Add another segment's counters into this one."""
+        self.pageviews += other.pageviews
+        self.sessions += other.sessions
+        self.bounces += other.bounces
+        self.session_duration_total += other.session_duration_total
+        self.conversions += other.conversions
+        self.revenue += other.revenue
+        self.pages.update(other.pages)
+        self.referrers.update(other.referrers)
+
+
+def plan_summary_segments(
+    date_from: datetime,
+    date_to: datetime,
+    hour_watermark: Optional[datetime],
+    day_watermark: Optional[datetime],
+) -> list[RangeSegment]:
+    """
+    Split [date_from, date_to] into rollup-backed and raw segments.
+
+    Whole days inside the rolled-up range come from daily rollups, the
+    remaining whole hours from hourly rollups, and the unaligned head and
+    the tail after the hourly watermark from raw events.
+    """
+    raw_all = [RangeSegment("raw", date_from, date_to, end_inclusive=True)]
+    if hour_watermark is None:
+        return raw_all
+
+    rolled_start = ceil_time(date_from, "hour")
+    rolled_end = min(floor_time(date_to, "hour"), hour_watermark)
+    if rolled_start >= rolled_end:
+        return raw_all
+
+    segments = []
+    if date_from < rolled_start:
+        segments.append(RangeSegment("raw", date_from, rolled_start))
+
+    day_start = ceil_time(rolled_start, "day")
+    day_end = min(floor_time(rolled_end, "day"), day_watermark or day_start)
+    if day_start < day_end:
+        if rolled_start < day_start:
+            segments.append(RangeSegment("hour", rolled_start, day_start))
+        segments.append(RangeSegment("day", day_start, day_end))
+        if day_end < rolled_end:
+            segments.append(RangeSegment("hour", day_end, rolled_end))
+    else:
+        segments.append(RangeSegment("hour", rolled_start, rolled_end))
+
+    segments.append(RangeSegment("raw", rolled_end, date_to, end_inclusive=True))
+    return segments
+
+
+def split_cold_segments(
+    segments: list[RangeSegment],
+    boundary: Optional[datetime],
+) -> list[RangeSegment]:
+    """
+    Route the parts of raw segments before `boundary` to cold storage.
+
+    Rollup-backed segments are untouched: rollups outlive the raw events.
+    """
+    if boundary is None:
+        return segments
+
+    routed = []
+    for segment in segments:
+        if segment.source != "raw" or segment.start >= boundary:
+            routed.append(segment)
+        elif segment.end < boundary or (segment.end == boundary and not segment.end_inclusive):
+            routed.append(RangeSegment("cold", segment.start, segment.end, segment.end_inclusive))
+        else:
+            routed.append(RangeSegment("cold", segment.start, boundary))
+            routed.append(RangeSegment("raw", boundary, segment.end, segment.end_inclusive))
+    return routed
+
+
+def _use_duckdb() -> bool:
+    return settings.cold_query_engine == "duckdb"
+
+
+def _segment_filter(column, segment: RangeSegment):
+    """Time filter for a segment, honouring an inclusive end."""
+    upper = column <= segment.end if segment.end_inclusive else column < segment.end
+    return and_(column >= segment.start, upper)
+
+
+async def _rollup_totals(db: AsyncSession, segment: RangeSegment) -> SummaryTotals:
+    """Read additive counters for a segment from the rollup tables."""
+    bucket_filter = and_(
+        AnalyticsRollup.granularity == segment.source,
+        AnalyticsRollup.bucket_start >= segment.start,
+        AnalyticsRollup.bucket_start < segment.end,
+    )
+    row = (
+        await db.execute(
+            select(
+                func.coalesce(func.sum(AnalyticsRollup.pageviews), 0),
+                func.coalesce(func.sum(AnalyticsRollup.sessions), 0),
+                func.coalesce(func.sum(AnalyticsRollup.bounces), 0),
+                func.coalesce(func.sum(AnalyticsRollup.session_duration_total), 0),
+                func.coalesce(func.sum(AnalyticsRollup.conversions), 0),
+                func.coalesce(func.sum(AnalyticsRollup.revenue), 0.0),
+            ).where(bucket_filter)
+        )
+    ).one()
+
+    dimension_rows = await db.execute(
+        select(
+            AnalyticsDimensionRollup.dimension,
+            AnalyticsDimensionRollup.value,
+            func.sum(AnalyticsDimensionRollup.hits),
+        )
+        .where(
+            and_(
+                AnalyticsDimensionRollup.granularity == segment.source,
+                AnalyticsDimensionRollup.dimension.in_(("path", "referrer")),
+                AnalyticsDimensionRollup.bucket_start >= segment.start,
+                AnalyticsDimensionRollup.bucket_start < segment.end,
+            )
+        )
+        .group_by(AnalyticsDimensionRollup.dimension, AnalyticsDimensionRollup.value)
+    )
+
+    totals = SummaryTotals(
+        pageviews=int(row[0]),
+        sessions=int(row[1]),
+        bounces=int(row[2]),
+        session_duration_total=float(row[3]),
+        conversions=int(row[4]),
+        revenue=float(row[5]),
+    )
+    for dimension, value, hits in dimension_rows:
+        target = totals.pages if dimension == "path" else totals.referrers
+        target[value] += int(hits)
+    return totals
+
+
+# (limit, semaphore) shared by every summary of the process
+_connection_slots: Optional[tuple[int, asyncio.Semaphore]] = None
+
+
+def _summary_connection_slots() -> asyncio.Semaphore:
+    """Process-wide semaphore over the pooled connections summaries may hold."""
+    global _connection_slots
+    limit = settings.analytics_summary_max_connections
+    if _connection_slots is None or _connection_slots[0] != limit:
+        _connection_slots = (limit, asyncio.Semaphore(limit))
+    return _connection_slots[1]
+
+
+async def _gather_queries(
+    db: AsyncSession,
+    queries: Sequence[Callable[[AsyncSession], Awaitable[T]]],
+) -> list[T]:
+    """
+    Run independent read queries concurrently, each on its own pooled connection.
+
+    All summaries of the process share `analytics_summary_max_connections`
+    extra connections (kept below the pool size), so concurrent summaries
+    queue for them instead of draining the pool that ingestion also uses.
+    With a limit of 1 the queries run one after another on `db`.
+    """
+    limit = settings.analytics_summary_max_connections
+    if limit <= 1 or len(queries) <= 1:
+        return [await query(db) for query in queries]
+
+    semaphore = _summary_connection_slots()
+
+    async def run(query: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        async with semaphore, async_session_factory() as session:
+            return await query(session)
+
+    return list(await asyncio.gather(*(run(query) for query in queries)))
+
+
+async def _raw_event_totals(db: AsyncSession, segment: RangeSegment) -> SummaryTotals:
+    """
+    Pageviews per path and visits per referrer from raw events in one scan.
+
+    Both counters come from a single GROUPING SETS ((path), (referrer_domain))
+    aggregation; GROUPING(path) tells the two sets apart.
+    """
+    is_pageview = AnalyticsEvent.event_type == "pageview"
+    has_referrer = AnalyticsEvent.referrer_domain.isnot(None)
+    result = await db.execute(
+        select(
+            func.grouping(AnalyticsEvent.path),
+            AnalyticsEvent.path,
+            AnalyticsEvent.referrer_domain,
+            func.count().filter(is_pageview),
+            func.count().filter(has_referrer),
+        )
+        .where(
+            and_(
+                _segment_filter(AnalyticsEvent.timestamp, segment),
+                AnalyticsEvent.is_bot == False,
+                or_(is_pageview, has_referrer),
+            )
+        )
+        .group_by(func.grouping_sets(AnalyticsEvent.path, AnalyticsEvent.referrer_domain))
+    )
+
+    pages: Counter = Counter()
+    referrers: Counter = Counter()
+    for by_referrer, path, referrer, pageviews, visits in result:
+        if not by_referrer:
+            if pageviews:
+                pages[path] = pageviews
+        elif referrer is not None:
+            referrers[referrer] = visits
+    return SummaryTotals(pageviews=sum(pages.values()), pages=pages, referrers=referrers)
+
+
+async def _cold_event_totals(db: AsyncSession, segment: RangeSegment) -> SummaryTotals:
+    """Pageviews per path and visits per referrer from the Parquet archive."""
+    pages, referrers = await asyncio.to_thread(
+        duckdb_engine.counters if _use_duckdb() else read_cold_counters,
+        settings.cold_storage_dir,
+        segment.start,
+        segment.end,
+        segment.end_inclusive,
+    )
+    return SummaryTotals(pageviews=sum(pages.values()), pages=pages, referrers=referrers)
+
+
+async def _session_totals(db: AsyncSession, segment: RangeSegment) -> SummaryTotals:
+    """
+    Sessions, bounces, duration, conversions and revenue in one round trip.
+
+    Sessions and conversions are never archived, so this always reads
+    Postgres, even for cold segments.
+    """
+
+    def in_range(column):
+        return _segment_filter(column, segment)
+
+    sessions = select(
+        func.count(AnalyticsSession.id),
+        func.count(AnalyticsSession.id).filter(AnalyticsSession.is_bounce == True),
+        func.coalesce(func.sum(AnalyticsSession.duration_seconds), 0),
+    ).where(in_range(AnalyticsSession.start_time)).subquery()
+    conversions = select(
+        func.count(ConversionEvent.id),
+        func.coalesce(func.sum(ConversionEvent.conversion_value), 0.0),
+    ).where(in_range(ConversionEvent.timestamp)).subquery()
+
+    # Both sides are single-row aggregates; joining them explicitly keeps
+    # SQLAlchemy's cartesian-product linter quiet
+    both = sessions.join(conversions, true())
+    row = (await db.execute(select(sessions, conversions).select_from(both))).one()
+    return SummaryTotals(
+        sessions=int(row[0]),
+        bounces=int(row[1]),
+        session_duration_total=float(row[2]),
+        conversions=int(row[3]),
+        revenue=float(row[4]),
+    )
+
+
+def _segment_queries(segment: RangeSegment) -> list[Callable[[AsyncSession], Awaitable]]:
+    """Independent queries whose SummaryTotals add up to the segment's totals."""
+    if segment.source in ("hour", "day"):
+        return [partial(_rollup_totals, segment=segment)]
+    events = _cold_event_totals if segment.source == "cold" else _raw_event_totals
+    return [partial(events, segment=segment), partial(_session_totals, segment=segment)]
+
+
+# GROUPING(top_path, country_code, device_type) of each grouping set; a set bit
+# marks a column that is not grouped in that row
+_SET_TOTAL = 0b111
+_SET_PATH = 0b011
+_SET_COUNTRY = 0b101
+_SET_DEVICE = 0b110
+_PATH_BIT = 0b100
+
+
+def _visitor_grouping(human, top_paths: list[str]):
+    """
+    GROUPING() bitmask (see `_SET_TOTAL`) and path column of the visitor
+    breakdown rows.
+
+    GROUPING() only accepts columns of some grouping set, so without top
+    paths the path set is left out, its bit is added as "not grouped" and
+    the path column is a NULL constant.
+    """
+    if top_paths:
+        return (
+            func.grouping(human.c.top_path, human.c.country_code, human.c.device_type),
+            human.c.top_path,
+        )
+    return (
+        func.grouping(human.c.country_code, human.c.device_type) + _PATH_BIT,
+        null(),
+    )
+
+
+def _human_visitors(in_range, top_paths: list[str]):
+    """Human events reduced to the columns the visitor breakdowns group by."""
+    top_path = (
+        case(
+            (
+                and_(
+                    AnalyticsEvent.event_type == "pageview",
+                    AnalyticsEvent.path.in_(top_paths),
+                ),
+                AnalyticsEvent.path,
+            )
+        )
+        if top_paths
+        else null()
+    )
+    return (
+        select(
+            AnalyticsEvent.visitor_id,
+            top_path.label("top_path"),
+            AnalyticsEvent.country_code,
+            AnalyticsEvent.country_name,
+            func.coalesce(AnalyticsEvent.device_type, "unknown").label("device_type"),
+        )
+        .where(and_(in_range, AnalyticsEvent.is_bot == False))
+        .subquery()
+    )
+
+
+async def _visitor_breakdowns(
+    db: AsyncSession,
+    date_from: datetime,
+    date_to: datetime,
+    top_paths: list[str],
+) -> tuple[int, dict[str, int], list[dict], dict[str, int]]:
+    """
+    Exact distinct-visitor metrics for the whole range.
+
+    One scan of raw events with COUNT(DISTINCT visitor_id) over GROUPING SETS:
+    total visitors, unique visitors of the top pages, visitors per country
+    and per device.
+    """
+    human = _human_visitors(
+        and_(AnalyticsEvent.timestamp >= date_from, AnalyticsEvent.timestamp <= date_to),
+        top_paths,
+    )
+    grouping, top_path = _visitor_grouping(human, top_paths)
+    result = await db.execute(
+        select(
+            grouping,
+            top_path,
+            human.c.country_code,
+            human.c.country_name,
+            human.c.device_type,
+            func.count(func.distinct(human.c.visitor_id)),
+        ).group_by(
+            func.grouping_sets(
+                tuple_(),
+                *([tuple_(human.c.top_path)] if top_paths else []),
+                tuple_(human.c.country_code, human.c.country_name),
+                tuple_(human.c.device_type),
+            )
+        )
+    )
+
+    total_visitors = 0
+    page_visitors: dict[str, int] = {}
+    countries = []
+    device_breakdown: dict[str, int] = {}
+    for grouping, path, country_code, country_name, device_type, visitors in result:
+        if grouping == _SET_TOTAL:
+            total_visitors = visitors
+        elif grouping == _SET_PATH:
+            if path is not None:
+                page_visitors[path] = visitors
+        elif grouping == _SET_COUNTRY:
+            if country_code is not None:
+                countries.append({
+                    "country_code": country_code,
+                    "country_name": country_name,
+                    "visitors": visitors,
+                })
+        else:
+            device_breakdown[device_type] = visitors
+
+    countries.sort(key=lambda country: country["visitors"], reverse=True)
+    return total_visitors, page_visitors, countries[:TOP_N], device_breakdown
+
+
+async def _raw_visitor_ids(
+    db: AsyncSession,
+    segment: RangeSegment,
+    top_paths: list[str],
+    visitor_ids: dict[tuple[str, str], list[str]],
+    labels: dict[str, Optional[str]],
+) -> None:
+    """Collect distinct visitor ids per dimension value for a raw segment in one scan."""
+    human = _human_visitors(_segment_filter(AnalyticsEvent.timestamp, segment), top_paths)
+    grouping, top_path = _visitor_grouping(human, top_paths)
+    result = await db.execute(
+        select(
+            grouping,
+            top_path,
+            human.c.country_code,
+            human.c.country_name,
+            human.c.device_type,
+            human.c.visitor_id,
+        ).group_by(
+            func.grouping_sets(
+                tuple_(human.c.visitor_id),
+                *([tuple_(human.c.top_path, human.c.visitor_id)] if top_paths else []),
+                tuple_(human.c.country_code, human.c.country_name, human.c.visitor_id),
+                tuple_(human.c.device_type, human.c.visitor_id),
+            )
+        )
+    )
+
+    for grouping, path, country_code, country_name, device_type, visitor_id in result:
+        if grouping == _SET_TOTAL:
+            visitor_ids[(TOTAL_DIMENSION, "")].append(visitor_id)
+        elif grouping == _SET_PATH:
+            if path is not None:
+                visitor_ids[("path", path)].append(visitor_id)
+        elif grouping == _SET_COUNTRY:
+            if country_code is not None:
+                visitor_ids[("country", country_code)].append(visitor_id)
+                labels.setdefault(country_code, country_name)
+        else:
+            visitor_ids[("device", device_type)].append(visitor_id)
+
+
+async def _segment_visitor_ids(
+    db: AsyncSession,
+    segment: RangeSegment,
+    top_paths: list[str],
+    visitor_ids: dict[tuple[str, str], list[str]],
+    labels: dict[str, Optional[str]],
+) -> None:
+    """Collect visitor ids for a raw segment from Postgres or cold storage."""
+    if segment.source == "cold":
+        await asyncio.to_thread(
+            duckdb_engine.visitor_ids if _use_duckdb() else read_cold_visitor_ids,
+            settings.cold_storage_dir,
+            segment.start,
+            segment.end,
+            top_paths,
+            visitor_ids,
+            labels,
+            segment.end_inclusive,
+        )
+    else:
+        await _raw_visitor_ids(db, segment, top_paths, visitor_ids, labels)
+
+
+async def _exact_collected_breakdowns(
+    db: AsyncSession,
+    segments: list[RangeSegment],
+    top_paths: list[str],
+) -> tuple[int, dict[str, int], list[dict], dict[str, int]]:
+    """
+    Exact distinct-visitor metrics for a range partly held in cold storage.
+
+    COUNT(DISTINCT) cannot span Postgres and Parquet, so each segment yields
+    an Arrow table of its distinct visitors and Arrow counts the union. The
+    archive's visitor sets never become Python objects; only the hot window
+    read from Postgres does.
+    """
+    tables = []
+    for segment in segments:
+        if segment.source == "cold":
+            table = await asyncio.to_thread(
+                duckdb_engine.visitor_table if _use_duckdb() else cold_visitor_table,
+                settings.cold_storage_dir,
+                segment.start,
+                segment.end,
+                top_paths,
+                segment.end_inclusive,
+            )
+        else:
+            visitor_ids: dict[tuple[str, str], list[str]] = defaultdict(list)
+            segment_labels: dict[str, Optional[str]] = {}
+            await _raw_visitor_ids(db, segment, top_paths, visitor_ids, segment_labels)
+            table = visitor_table_from_ids(visitor_ids, segment_labels)
+        if table is not None:
+            tables.append(table)
+
+    counts, labels = await asyncio.to_thread(count_distinct_visitors, tables)
+
+    top_countries = [
+        {"country_code": code, "country_name": labels.get(code), "visitors": visitors}
+        for code, visitors in Counter(counts["country"]).most_common(TOP_N)
+    ]
+    return counts[TOTAL_DIMENSION].get("", 0), counts["path"], top_countries, counts["device"]
+
+
+async def _sketch_visitor_breakdowns(
+    db: AsyncSession,
+    segments: list[RangeSegment],
+    top_paths: list[str],
+) -> Optional[tuple[int, dict[str, int], list[dict], dict[str, int]]]:
+    """
+    Estimated distinct-visitor metrics from rollup sketches plus raw edges.
+
+    Returns None when a rolled-up bucket with visitors has no sketch (rolled
+    before sketches existed), so the caller can fall back to exact counts.
+    Buckets without visitors never get a sketch and contribute nothing.
+    """
+    sketches: dict[tuple[str, str], HyperLogLog] = {}
+    labels: dict[str, Optional[str]] = {}
+    raw_visitor_ids: dict[tuple[str, str], list[str]] = defaultdict(list)
+
+    def merge(key: tuple[str, str], sketch: HyperLogLog) -> None:
+        if key in sketches:
+            sketches[key].merge(sketch)
+        else:
+            sketches[key] = sketch
+
+    for segment in segments:
+        if segment.source in ("raw", "cold"):
+            await _segment_visitor_ids(db, segment, top_paths, raw_visitor_ids, labels)
+            continue
+
+        total_rows = await db.execute(
+            select(AnalyticsRollup.visitor_sketch, AnalyticsRollup.visitors).where(
+                AnalyticsRollup.granularity == segment.source,
+                AnalyticsRollup.bucket_start >= segment.start,
+                AnalyticsRollup.bucket_start < segment.end,
+            )
+        )
+        for data, visitors in total_rows:
+            if data is None:
+                if visitors:
+                    return None
+                continue
+            merge((TOTAL_DIMENSION, ""), HyperLogLog.from_bytes(data))
+
+        dimension_filter = AnalyticsDimensionRollup.dimension.in_(("country", "device"))
+        if top_paths:
+            dimension_filter = dimension_filter | and_(
+                AnalyticsDimensionRollup.dimension == "path",
+                AnalyticsDimensionRollup.value.in_(top_paths),
+            )
+        dimension_rows = await db.execute(
+            select(
+                AnalyticsDimensionRollup.dimension,
+                AnalyticsDimensionRollup.value,
+                AnalyticsDimensionRollup.label,
+                AnalyticsDimensionRollup.visitor_sketch,
+            ).where(
+                AnalyticsDimensionRollup.granularity == segment.source,
+                AnalyticsDimensionRollup.bucket_start >= segment.start,
+                AnalyticsDimensionRollup.bucket_start < segment.end,
+                dimension_filter,
+            )
+        )
+        for dimension, value, label, data in dimension_rows:
+            if data is None:
+                return None
+            merge((dimension, value), HyperLogLog.from_bytes(data))
+            if dimension == "country":
+                labels.setdefault(value, label)
+
+    for key, visitor_ids in raw_visitor_ids.items():
+        sketch = HyperLogLog(settings.analytics_hll_precision)
+        sketch.update(visitor_ids)
+        merge(key, sketch)
+
+    counts: dict[str, dict[str, int]] = defaultdict(dict)
+    for (dimension, value), sketch in sketches.items():
+        counts[dimension][value] = sketch.count()
+
+    total_visitors = counts[TOTAL_DIMENSION].get("", 0)
+    top_countries = [
+        {"country_code": code, "country_name": labels.get(code), "visitors": visitors}
+        for code, visitors in Counter(counts["country"]).most_common(TOP_N)
+    ]
+    return total_visitors, counts["path"], top_countries, counts["device"]
+
+
+async def build_analytics_summary(
+    db: AsyncSession,
+    date_from: datetime,
+    date_to: datetime,
+    exact: bool = False,
+) -> AnalyticsSummaryResponse:
+    """
+    Build the analytics summary for [date_from, date_to].
+
+    Additive metrics come from rollups wherever the range is rolled up and
+    from raw events for the remaining edges.
+
+    Args:
+        db: Database session
+        date_from: Range start (inclusive)
+        date_to: Range end (inclusive)
+        exact: Count distinct visitors exactly instead of merging sketches
+
+    Returns:
+        Summary response
+    """
+    hour_watermark = day_watermark = None
+    if settings.analytics_rollups_enabled:
+        hour_watermark = await get_rollup_watermark(db, "hour")
+        day_watermark = await get_rollup_watermark(db, "day")
+
+    boundary = cold_boundary(settings.cold_storage_dir) if settings.cold_storage_enabled else None
+    segments = split_cold_segments(
+        plan_summary_segments(date_from, date_to, hour_watermark, day_watermark),
+        boundary,
+    )
+
+    # Every segment's counters are independent: run them side by side
+    totals = SummaryTotals()
+    queries = [query for segment in segments for query in _segment_queries(segment)]
+    for segment_totals in await _gather_queries(db, queries):
+        totals.merge(segment_totals)
+
+    top_pages_counts = totals.pages.most_common(TOP_N)
+    top_paths = [path for path, _ in top_pages_counts]
+
+    breakdowns = None
+    if not exact and any(segment.source in ("hour", "day") for segment in segments):
+        breakdowns = await _sketch_visitor_breakdowns(db, segments, top_paths)
+    if breakdowns is None and boundary is not None and date_to < boundary and _use_duckdb():
+        breakdowns = await asyncio.to_thread(
+            duckdb_engine.visitor_breakdowns,
+            settings.cold_storage_dir,
+            date_from,
+            date_to,
+            top_paths,
+        )
+    if breakdowns is None and boundary is not None and date_from < boundary:
+        whole_range = [RangeSegment("raw", date_from, date_to, end_inclusive=True)]
+        breakdowns = await _exact_collected_breakdowns(
+            db, split_cold_segments(whole_range, boundary), top_paths
+        )
+    if breakdowns is None:
+        breakdowns = await _visitor_breakdowns(db, date_from, date_to, top_paths)
+    total_visitors, page_visitors, top_countries, device_breakdown = breakdowns
+
+    logger.debug(
+        "Analytics summary planned",
+        segments=[(s.source, s.start.isoformat(), s.end.isoformat()) for s in segments],
+        exact_visitors=exact,
+    )
+
+    sessions = totals.sessions
+    return AnalyticsSummaryResponse(
+        date_from=date_from,
+        date_to=date_to,
+        total_pageviews=totals.pageviews,
+        total_visitors=total_visitors,
+        total_sessions=sessions,
+        avg_session_duration=totals.session_duration_total / sessions if sessions else 0.0,
+        bounce_rate=(totals.bounces / sessions * 100) if sessions > 0 else 0.0,
+        conversion_rate=(totals.conversions / sessions * 100) if sessions > 0 else 0.0,
+        total_revenue=totals.revenue,
+        top_pages=[
+            {"path": path, "pageviews": pageviews, "unique_visitors": page_visitors.get(path, 0)}
+            for path, pageviews in top_pages_counts
+        ],
+        top_referrers=[
+            {"referrer": referrer, "visits": visits}
+            for referrer, visits in totals.referrers.most_common(TOP_N)
+        ],
+        top_countries=top_countries,
+        device_breakdown=device_breakdown,
+    )
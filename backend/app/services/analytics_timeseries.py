@@ -0,0 +1,502 @@
+"""
+Analytics Time Series - Bucketed traffic series for summary charts.
+
+A whole series (hour, day, week or month buckets) is returned in one call:
+- Unfiltered ranges reuse the summary's segment plan, so rolled-up parts are
+  read from hourly/daily rollups and only the unaligned edges from raw
+  events; visitors per bucket merge the rollups' HyperLogLog sketches
+- Ranges filtered by country, device or UTM parameters are aggregated from
+  raw events in a single `date_trunc` pass with exact distinct counts
+- Sessions are counted in the bucket they started in on every path, as the
+  rollups count them; under filters, only sessions with a matching event
+- Days before the cold-storage boundary are read from the Parquet archive
+  (see `cold_storage`), filtered or not
+"""
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import (
+    DateTime,
+    String,
+    and_,
+    any_,
+    bindparam,
+    exists,
+    func,
+    literal_column,
+    or_,
+    select,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.hyperloglog import HyperLogLog
+from app.models.analytics import AnalyticsEvent, AnalyticsRollup, AnalyticsSession
+from app.services.analytics_rollups import get_rollup_watermark
+from app.services.analytics_summary import (
+    RangeSegment,
+    _segment_filter,
+    plan_summary_segments,
+    split_cold_segments,
+)
+from app.services.cold_storage import (
+    cold_boundary,
+    count_cold_distinct,
+    read_cold_bucket_visitors,
+    read_cold_series,
+    read_cold_session_ids,
+)
+
+GROUP_BY_UNITS = ("hour", "day", "week", "month")
+
+# Filter name -> analytics_events column
+FILTER_COLUMNS = {
+    "country": AnalyticsEvent.country_code,
+    "device": AnalyticsEvent.device_type,
+    "utm_source": AnalyticsEvent.utm_source,
+    "utm_medium": AnalyticsEvent.utm_medium,
+    "utm_campaign": AnalyticsEvent.utm_campaign,
+}
+
+MAX_TIME_SERIES_BUCKETS = 2000
+
+
+@dataclass
+class TimeSeriesPoint:
+    """Counters for one output bucket."""
+
+    pageviews: int = 0
+    events: int = 0
+    sessions: int = 0
+    visitors: int = 0
+
+
+def bucket_floor(ts: datetime, group_by: str) -> datetime:
+    """Start of the bucket holding `ts`, matching Postgres `date_trunc`."""
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    if group_by == "hour":
+        return ts
+    ts = ts.replace(hour=0)
+    if group_by == "week":
+        return ts - timedelta(days=ts.weekday())  # ISO weeks start on Monday
+    if group_by == "month":
+        return ts.replace(day=1)
+    return ts
+
+
+def next_bucket(start: datetime, group_by: str) -> datetime:
+    """Start of the bucket after the one starting at `start`."""
+    if group_by == "month":
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    step = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
+    return start + step[group_by]
+
+
+def plan_time_buckets(date_from: datetime, date_to: datetime, group_by: str) -> list[datetime]:
+    """
+    Bucket starts covering [date_from, date_to], in order.
+
+    Raises:
+        ValueError: If the unit is unknown or the series would be too long
+    """
+    if group_by not in GROUP_BY_UNITS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_BY_UNITS)}")
+
+    buckets = []
+    bucket = bucket_floor(date_from, group_by)
+    while bucket <= date_to:
+        buckets.append(bucket)
+        if len(buckets) > MAX_TIME_SERIES_BUCKETS:
+            raise ValueError(
+                f"Time series limited to {MAX_TIME_SERIES_BUCKETS} buckets; use a coarser group_by"
+            )
+        bucket = next_bucket(bucket, group_by)
+    return buckets
+
+
+def filter_conditions(filters: Optional[dict[str, Any]]) -> list:
+    """
+    SQL conditions for dimension filters; values may be a string or a list.
+
+    Raises:
+        ValueError: For unsupported filter names
+    """
+    conditions = []
+    for name, value in (filters or {}).items():
+        column = FILTER_COLUMNS.get(name)
+        if column is None:
+            raise ValueError(
+                f"Unsupported filter '{name}'; use one of {', '.join(FILTER_COLUMNS)}"
+            )
+        if isinstance(value, (list, tuple)):
+            conditions.append(column.in_(value))
+        else:
+            conditions.append(column == value)
+    return conditions
+
+
+def filter_columns(filters: Optional[dict[str, Any]]) -> dict[str, Any]:
+    """Validated filters keyed by their analytics_events (and Parquet) column."""
+    filter_conditions(filters)
+    return {FILTER_COLUMNS[name].name: value for name, value in (filters or {}).items()}
+
+
+def _naive_utc(ts: datetime) -> datetime:
+    # Event timestamps are stored as naive UTC
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _trunc(unit: str, column):
+    # Inline the unit so SELECT and GROUP BY render the identical expression
+    return func.date_trunc(literal_column(f"'{unit}'"), column, type_=DateTime)
+
+
+async def _raw_series_exact(
+    db: AsyncSession,
+    date_from: datetime,
+    date_to: datetime,
+    group_by: str,
+    conditions: list,
+    series: dict[datetime, TimeSeriesPoint],
+) -> None:
+    """Single pass over raw events with exact distinct visitors."""
+    bucket = _trunc(group_by, AnalyticsEvent.timestamp).label("bucket")
+    result = await db.execute(
+        select(
+            bucket,
+            func.count().filter(AnalyticsEvent.event_type == "pageview"),
+            func.count(),
+            func.count(func.distinct(AnalyticsEvent.visitor_id)),
+        )
+        .where(
+            and_(
+                AnalyticsEvent.timestamp >= date_from,
+                AnalyticsEvent.timestamp <= date_to,
+                AnalyticsEvent.is_bot == False,
+                *conditions,
+            )
+        )
+        .group_by(bucket)
+    )
+    for start, pageviews, events, visitors in result:
+        point = series[start]
+        point.pageviews += pageviews
+        point.events += events
+        point.visitors += visitors
+
+
+async def _exact_session_starts(
+    db: AsyncSession,
+    date_from: datetime,
+    date_to: datetime,
+    group_by: str,
+    filters: Optional[dict[str, Any]],
+    series: dict[datetime, TimeSeriesPoint],
+    boundary: Optional[datetime],
+) -> None:
+    """
+    Sessions by start time, as the rollups count them.
+
+    Under filters only sessions with a matching event count; events before
+    `boundary` are matched by the session ids in their Parquet files.
+    """
+    conditions = filter_conditions(filters)
+    in_range = and_(
+        AnalyticsSession.start_time >= date_from,
+        AnalyticsSession.start_time <= date_to,
+    )
+    if conditions:
+        # A session's events never precede its start
+        hot_from = date_from if boundary is None else max(date_from, boundary)
+        matching = [
+            exists().where(
+                AnalyticsEvent.session_id == AnalyticsSession.session_id,
+                AnalyticsEvent.timestamp >= hot_from,
+                *conditions,
+            )
+        ]
+        if boundary is not None and date_from < boundary:
+            cold_ids = await asyncio.to_thread(
+                read_cold_session_ids,
+                settings.cold_storage_dir,
+                date_from,
+                boundary,
+                filter_columns(filters),
+            )
+            if cold_ids:
+                # One array parameter instead of an IN list per archived session
+                matching.append(
+                    AnalyticsSession.session_id
+                    == any_(bindparam("cold_session_ids", cold_ids, type_=ARRAY(String)))
+                )
+        in_range = and_(in_range, or_(*matching))
+
+    session_bucket = _trunc(group_by, AnalyticsSession.start_time).label("bucket")
+    sessions = await db.execute(
+        select(session_bucket, func.count()).where(in_range).group_by(session_bucket)
+    )
+    for start, count in sessions:
+        series[start].sessions += count
+
+
+async def _exact_series(
+    db: AsyncSession,
+    date_from: datetime,
+    date_to: datetime,
+    group_by: str,
+    filters: Optional[dict[str, Any]],
+    series: dict[datetime, TimeSeriesPoint],
+    boundary: Optional[datetime],
+) -> None:
+    """
+    Exact series from raw events, reading days before `boundary` from Parquet.
+
+    Archived days are whole, so only a week or month bucket can straddle the
+    boundary; its distinct visitors are recounted over the ids of both sides.
+    Sessions come from the session table (see `_exact_session_starts`).
+    """
+    conditions = filter_conditions(filters)
+    await _exact_session_starts(db, date_from, date_to, group_by, filters, series, boundary)
+    if boundary is None or date_from >= boundary:
+        await _raw_series_exact(db, date_from, date_to, group_by, conditions, series)
+        return
+
+    columns = filter_columns(filters)
+    cold = await asyncio.to_thread(
+        read_cold_series,
+        settings.cold_storage_dir,
+        date_from,
+        min(date_to, boundary),
+        group_by,
+        columns,
+        date_to < boundary,
+    )
+    for start, (pageviews, events, _, visitors) in cold.items():
+        point = series[start]
+        point.pageviews += pageviews
+        point.events += events
+        point.visitors += visitors
+    if date_to < boundary:
+        return
+
+    await _raw_series_exact(db, boundary, date_to, group_by, conditions, series)
+
+    straddling = bucket_floor(boundary, group_by)
+    if straddling == boundary or straddling not in cold:
+        return
+    hot_visitors = await db.execute(
+        select(AnalyticsEvent.visitor_id)
+        .where(
+            and_(
+                AnalyticsEvent.timestamp >= boundary,
+                AnalyticsEvent.timestamp < next_bucket(straddling, group_by),
+                AnalyticsEvent.timestamp <= date_to,
+                AnalyticsEvent.is_bot == False,
+                *conditions,
+            )
+        )
+        .distinct()
+    )
+    _, series[straddling].visitors = await asyncio.to_thread(
+        count_cold_distinct,
+        settings.cold_storage_dir,
+        max(straddling, date_from),
+        boundary,
+        columns,
+        [],
+        list(hot_visitors.scalars()),
+    )
+
+
+async def _raw_segment_series(
+    db: AsyncSession,
+    segment: RangeSegment,
+    group_by: str,
+    series: dict[datetime, TimeSeriesPoint],
+    sketches: dict[datetime, HyperLogLog],
+) -> None:
+    """Additive counters and visitor sketches for a raw edge of a rolled-up range."""
+    in_range = and_(
+        _segment_filter(AnalyticsEvent.timestamp, segment),
+        AnalyticsEvent.is_bot == False,
+    )
+    bucket = _trunc(group_by, AnalyticsEvent.timestamp).label("bucket")
+
+    counters = await db.execute(
+        select(
+            bucket,
+            func.count().filter(AnalyticsEvent.event_type == "pageview"),
+            func.count(),
+        )
+        .where(in_range)
+        .group_by(bucket)
+    )
+    for start, pageviews, events in counters:
+        series[start].pageviews += pageviews
+        series[start].events += events
+
+    await _segment_session_starts(db, segment, group_by, series)
+
+    visitors = await db.execute(
+        select(bucket, AnalyticsEvent.visitor_id).where(in_range).distinct()
+    )
+    for start, visitor_id in visitors:
+        sketches[start].add(visitor_id)
+
+
+async def _segment_session_starts(
+    db: AsyncSession,
+    segment: RangeSegment,
+    group_by: str,
+    series: dict[datetime, TimeSeriesPoint],
+) -> None:
+    """Sessions by start time, as the rollups count them (sessions are never archived)."""
+    session_bucket = _trunc(group_by, AnalyticsSession.start_time).label("bucket")
+    sessions = await db.execute(
+        select(session_bucket, func.count())
+        .where(_segment_filter(AnalyticsSession.start_time, segment))
+        .group_by(session_bucket)
+    )
+    for start, count in sessions:
+        series[start].sessions += count
+
+
+async def _cold_segment_series(
+    db: AsyncSession,
+    segment: RangeSegment,
+    group_by: str,
+    series: dict[datetime, TimeSeriesPoint],
+    sketches: dict[datetime, HyperLogLog],
+) -> None:
+    """`_raw_segment_series` for a raw edge whose events are already archived."""
+    args = (settings.cold_storage_dir, segment.start, segment.end, group_by)
+    counters = await asyncio.to_thread(
+        read_cold_series, *args, end_inclusive=segment.end_inclusive
+    )
+    for start, (pageviews, events, _, _) in counters.items():
+        series[start].pageviews += pageviews
+        series[start].events += events
+
+    await _segment_session_starts(db, segment, group_by, series)
+
+    visitors = await asyncio.to_thread(
+        read_cold_bucket_visitors, *args, end_inclusive=segment.end_inclusive
+    )
+    for start, visitor_id in visitors:
+        sketches[start].add(visitor_id)
+
+
+async def _rollup_segment_series(
+    db: AsyncSession,
+    segment: RangeSegment,
+    group_by: str,
+    series: dict[datetime, TimeSeriesPoint],
+    sketches: dict[datetime, HyperLogLog],
+) -> bool:
+    """
+    Fold rollup buckets of a segment into the output buckets.
+
+    Returns:
+        False if a rollup bucket with visitors has no visitor sketch
+    """
+    rows = await db.execute(
+        select(
+            AnalyticsRollup.bucket_start,
+            AnalyticsRollup.pageviews,
+            AnalyticsRollup.events,
+            AnalyticsRollup.sessions,
+            AnalyticsRollup.visitors,
+            AnalyticsRollup.visitor_sketch,
+        ).where(
+            AnalyticsRollup.granularity == segment.source,
+            AnalyticsRollup.bucket_start >= segment.start,
+            AnalyticsRollup.bucket_start < segment.end,
+        )
+    )
+    for bucket_start, pageviews, events, sessions, visitors, sketch in rows:
+        if sketch is None and visitors:
+            return False
+        start = bucket_floor(bucket_start, group_by)
+        point = series[start]
+        point.pageviews += pageviews
+        point.events += events
+        point.sessions += sessions
+        if sketch is not None:
+            sketches[start].merge(HyperLogLog.from_bytes(sketch))
+    return True
+
+
+async def build_time_series(
+    db: AsyncSession,
+    date_from: datetime,
+    date_to: datetime,
+    group_by: str,
+    filters: Optional[dict[str, Any]] = None,
+) -> list[dict[str, Any]]:
+    """
+    Traffic per bucket for [date_from, date_to], every bucket included.
+
+    Args:
+        db: Database session
+        date_from: Range start (inclusive)
+        date_to: Range end (inclusive)
+        group_by: hour, day, week or month
+        filters: Optional dimension filters (country, device, utm_*)
+
+    Returns:
+        Points with bucket start, pageviews, events, sessions and visitors
+
+    Raises:
+        ValueError: For an unknown unit, unsupported filter or too many buckets
+    """
+    date_from, date_to = _naive_utc(date_from), _naive_utc(date_to)
+    buckets = plan_time_buckets(date_from, date_to, group_by)
+    conditions = filter_conditions(filters)
+    series = {bucket: TimeSeriesPoint() for bucket in buckets}
+
+    hour_watermark = day_watermark = None
+    if settings.analytics_rollups_enabled and not conditions:
+        hour_watermark = await get_rollup_watermark(db, "hour")
+        # Daily rollups cannot be split into hours
+        if group_by != "hour":
+            day_watermark = await get_rollup_watermark(db, "day")
+
+    boundary = cold_boundary(settings.cold_storage_dir) if settings.cold_storage_enabled else None
+    segments = split_cold_segments(
+        plan_summary_segments(date_from, date_to, hour_watermark, day_watermark),
+        boundary,
+    )
+    if all(segment.source in ("raw", "cold") for segment in segments):
+        await _exact_series(db, date_from, date_to, group_by, filters, series, boundary)
+    else:
+        sketches: dict[datetime, HyperLogLog] = defaultdict(
+            lambda: HyperLogLog(settings.analytics_hll_precision)
+        )
+        for segment in segments:
+            if segment.source == "raw":
+                await _raw_segment_series(db, segment, group_by, series, sketches)
+            elif segment.source == "cold":
+                await _cold_segment_series(db, segment, group_by, series, sketches)
+            elif not await _rollup_segment_series(db, segment, group_by, series, sketches):
+                # Rolled before sketches existed: recount everything from raw events
+                series = {bucket: TimeSeriesPoint() for bucket in buckets}
+                await _exact_series(db, date_from, date_to, group_by, filters, series, boundary)
+                break
+        else:
+            for start, sketch in sketches.items():
+                series[start].visitors = sketch.count()
+
+    return [
+        {
+            "bucket": bucket,
+            "pageviews": point.pageviews,
+            "events": point.events,
+            "sessions": point.sessions,
+            "visitors": point.visitors,
+        }
+        for bucket, point in series.items()
+    ]
@@ -0,0 +1,708 @@
+"""
+Cold Storage - Columnar Parquet archive for analytics events past the hot window.
+
+Provides:
+- Compaction of whole days of `analytics_events` into one zstd-compressed
+  Parquet file per day, with dictionary-encoded low-cardinality columns
+  (event types, paths, referrers, browsers, countries)
+- Removal of exported days from Postgres by dropping their partition
+- Vectorized scans (pyarrow compute) answering the summary's raw-event
+  counters and visitor sets for ranges that now live in Parquet
+- Exact distinct-visitor counts across Postgres and Parquet, deduplicated
+  in Arrow rather than in Python sets
+- Bucketed traffic series (optionally filtered by dimension columns) for
+  the time-series charts over archived days
+- Session-ordered funnel pageviews for funnel walks over archived days
+- One page's click and scroll events, so heatmap days can be rebuilt after
+  their raw events left Postgres
+
+pyarrow is an optional dependency (`pip install .[cold-storage]`); it is
+only imported when cold storage is used.
+"""
+import asyncio
+import json
+import os
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy import and_, delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.analytics import AnalyticsEvent
+from app.services.analytics_rollups import TOTAL_DIMENSION
+from app.services.event_partitions import (
+    DEFAULT_PARTITION,
+    expire_event_partition,
+    list_event_partitions,
+)
+
+logger = get_logger(__name__)
+
+_FILE_PREFIX = "analytics_events_"
+_FILE_SUFFIX = ".parquet"
+
+# Columns with few distinct values; dictionary pages make them nearly free
+DICTIONARY_COLUMNS = [
+    "event_type", "event_name", "path", "referrer_domain",
+    "utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content",
+    "device_type", "browser", "browser_version", "os", "os_version",
+    "country_code", "country_name", "region", "city", "timezone",
+]
+
+_UUID_COLUMNS = {"id", "user_id"}
+_JSON_COLUMNS = {"performance_data", "ecommerce_data", "properties"}
+
+# Distinct (dimension, value, visitor) rows; label holds country names
+VISITOR_TABLE_COLUMNS = ["dimension", "value", "label", "visitor_id"]
+
+
+class ColdStorageUnavailableError(Exception):
+    """Raised when cold storage is used without pyarrow installed."""
+
+
+def _pyarrow():
+    """Import pyarrow lazily so it stays an optional dependency."""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ColdStorageUnavailableError(
+            "Cold storage requires pyarrow (pip install .[cold-storage])"
+        ) from e
+    return pyarrow
+
+
+def cold_file_path(directory: str | Path, day: date) -> Path:
+    """Parquet file holding the events of `day`."""
+    return Path(directory) / f"{_FILE_PREFIX}{day:%Y%m%d}{_FILE_SUFFIX}"
+
+
+def list_cold_days(directory: str | Path) -> list[date]:
+    """Days exported to `directory`, oldest first."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    days = []
+    for path in directory.glob(f"{_FILE_PREFIX}*{_FILE_SUFFIX}"):
+        stamp = path.name[len(_FILE_PREFIX):-len(_FILE_SUFFIX)]
+        try:
+            days.append(datetime.strptime(stamp, "%Y%m%d").date())
+        except ValueError:
+            continue
+    return sorted(days)
+
+
+def cold_boundary(directory: str | Path) -> Optional[datetime]:
+    """
+    Start of the first day still served by Postgres.
+
+    Days are exported oldest first, so every event before this instant is
+    read from Parquet. None when nothing has been exported.
+    """
+    days = list_cold_days(directory)
+    if not days:
+        return None
+    return datetime.combine(days[-1] + timedelta(days=1), datetime.min.time())
+
+
+def _event_schema():
+    pa = _pyarrow()
+    string_columns = [
+        "event_type", "event_name", "session_id", "visitor_id", "url", "path",
+        "referrer", "referrer_domain", "utm_source", "utm_medium", "utm_campaign",
+        "utm_term", "utm_content", "device_type", "browser", "browser_version", "os",
+        "os_version", "country_code", "country_name", "region", "city", "timezone",
+        "ip_address_hash",
+    ]
+    fields = [pa.field("id", pa.string()), pa.field("user_id", pa.string())]
+    fields += [pa.field(name, pa.string()) for name in string_columns]
+    fields += [
+        pa.field("timestamp", pa.timestamp("us")),
+        pa.field("client_timestamp", pa.int64()),
+        pa.field("viewport_width", pa.int32()),
+        pa.field("viewport_height", pa.int32()),
+        pa.field("screen_width", pa.int32()),
+        pa.field("screen_height", pa.int32()),
+        pa.field("performance_data", pa.string()),
+        pa.field("ecommerce_data", pa.string()),
+        pa.field("properties", pa.string()),
+        pa.field("is_bot", pa.bool_()),
+        pa.field("consent_given", pa.bool_()),
+        pa.field("anonymized", pa.bool_()),
+        pa.field("created_at", pa.timestamp("us")),
+    ]
+    return pa.schema(fields)
+
+
+def _rows_to_table(rows: list[dict[str, Any]], schema):
+    """Convert event rows to an Arrow table (UUIDs and JSONB as strings)."""
+    pa = _pyarrow()
+    columns: dict[str, list] = {name: [] for name in schema.names}
+    for row in rows:
+        for name, values in columns.items():
+            value = row.get(name)
+            if value is not None and name in _UUID_COLUMNS:
+                value = str(value)
+            elif value is not None and name in _JSON_COLUMNS:
+                value = json.dumps(value, default=str)
+            values.append(value)
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def _copy_archived_rows(path: Path, writer, exported_ids: list) -> int:
+    """
+    Copy the rows of an existing day file into `writer`.
+
+    Rows whose id is in `exported_ids` (Arrow arrays) were just written
+    again from Postgres and are skipped.
+
+    Returns:
+        Number of rows copied
+    """
+    pa = _pyarrow()
+    pc = pa.compute
+    value_set = pa.concat_arrays(exported_ids) if exported_ids else pa.array([], pa.string())
+    copied = 0
+    archived = pa.parquet.ParquetFile(path)
+    for batch in archived.iter_batches(batch_size=settings.cold_storage_batch_rows):
+        batch = batch.filter(pc.invert(pc.is_in(batch["id"], value_set=value_set)))
+        writer.write_batch(batch)
+        copied += batch.num_rows
+    return copied
+
+
+async def export_day(db: AsyncSession, day: date, directory: str | Path) -> int:
+    """
+    Write the events of `day` to Parquet and remove them from Postgres.
+
+    Rows of an existing file for the day (late events exported earlier, or
+    a previous run) are merged into the new file. The file is written under
+    a temporary name and renamed once complete, so readers never see a
+    partial day. Rows are deleted only after the rename; archived rows
+    whose id is exported again are dropped from the merge, so a crash in
+    between is harmless.
+
+    Returns:
+        Number of events exported
+    """
+    pq = _pyarrow().parquet
+    schema = _event_schema()
+    path = cold_file_path(directory, day)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+
+    start = datetime.combine(day, datetime.min.time())
+    in_day = and_(
+        AnalyticsEvent.timestamp >= start,
+        AnalyticsEvent.timestamp < start + timedelta(days=1),
+    )
+
+    exported = merged = 0
+    exported_ids: list = []
+    writer = pq.ParquetWriter(
+        tmp_path,
+        schema,
+        compression="zstd",
+        use_dictionary=DICTIONARY_COLUMNS,
+    )
+    try:
+        result = await db.stream(
+            select(AnalyticsEvent.__table__).where(in_day).order_by(AnalyticsEvent.timestamp)
+        )
+        async for chunk in result.mappings().partitions(settings.cold_storage_batch_rows):
+            table = _rows_to_table(chunk, schema)
+            await asyncio.to_thread(writer.write_table, table)
+            exported_ids.extend(table["id"].chunks)
+            exported += len(chunk)
+        if path.exists():
+            merged = await asyncio.to_thread(_copy_archived_rows, path, writer, exported_ids)
+    finally:
+        await asyncio.to_thread(writer.close)
+
+    os.replace(tmp_path, path)
+    # End the streaming read; its portal keeps the partition from being dropped
+    await db.commit()
+
+    if day in await list_event_partitions(db):
+        await expire_event_partition(db, day, "drop")
+    # Stray rows in the DEFAULT partition (or an unpartitioned table)
+    await db.execute(delete(AnalyticsEvent).where(in_day))
+    await db.commit()
+
+    logger.info(
+        "Events exported to cold storage", day=day.isoformat(), events=exported, merged=merged
+    )
+    return exported
+
+
+async def compact_cold_events(db: AsyncSession, now: Optional[datetime] = None) -> dict[str, int]:
+    """
+    Export every day older than `analytics_hot_days` that still lives in Postgres.
+
+    Returns:
+        Number of days and events exported
+    """
+    today = (now or datetime.utcnow()).date()
+    cutoff = today - timedelta(days=settings.analytics_hot_days)
+    directory = settings.cold_storage_dir
+
+    days = set(await list_event_partitions(db))
+    # Days that only have stray rows in the DEFAULT partition
+    stray_days = await db.execute(
+        text(
+            f"SELECT DISTINCT CAST(timestamp AS date) FROM {DEFAULT_PARTITION} "
+            "WHERE timestamp < :cutoff"
+        ),
+        {"cutoff": datetime.combine(cutoff, datetime.min.time())},
+    )
+    days.update(stray_days.scalars())
+
+    exported_days = 0
+    exported_events = 0
+    for day in sorted(d for d in days if d < cutoff):
+        exported_events += await export_day(db, day, directory)
+        exported_days += 1
+
+    return {"days": exported_days, "events": exported_events}
+
+
+def cold_files(directory: str | Path, start: datetime, end: datetime) -> list[str]:
+    """Existing day files overlapping [start, end]."""
+    paths = []
+    day = start.date()
+    while day <= end.date():
+        path = cold_file_path(directory, day)
+        if path.exists():
+            paths.append(str(path))
+        day += timedelta(days=1)
+    return paths
+
+
+def _cold_dataset(directory: str | Path, start: datetime, end: datetime):
+    """Dataset over the day files overlapping [start, end], or None."""
+    paths = cold_files(directory, start, end)
+    if not paths:
+        return None
+    return _pyarrow().dataset.dataset(paths, format="parquet")
+
+
+def _human_filter(start: datetime, end: datetime, end_inclusive: bool):
+    """Vectorized equivalent of the summary's time range and bot filter."""
+    ds = _pyarrow().dataset
+    timestamp = ds.field("timestamp")
+    upper = timestamp <= end if end_inclusive else timestamp < end
+    return (timestamp >= start) & upper & (ds.field("is_bot") == False)  # noqa: E712
+
+
+def _value_counts(array) -> Counter:
+    counts = _pyarrow().compute.value_counts(array)
+    return Counter({
+        item["values"].as_py(): item["counts"].as_py()
+        for item in counts
+        if item["values"].is_valid
+    })
+
+
+def read_cold_counters(
+    directory: str | Path,
+    start: datetime,
+    end: datetime,
+    end_inclusive: bool = False,
+) -> tuple[Counter, Counter]:
+    """
+    Pageviews per path and visits per referrer from Parquet files.
+
+    Returns:
+        (pages, referrers) counters, matching the raw-event summary queries
+    """
+    dataset = _cold_dataset(directory, start, end)
+    if dataset is None:
+        return Counter(), Counter()
+
+    ds = _pyarrow().dataset
+    human = _human_filter(start, end, end_inclusive)
+    pages = dataset.to_table(
+        columns=["path"], filter=human & (ds.field("event_type") == "pageview")
+    )
+    referrers = dataset.to_table(
+        columns=["referrer_domain"], filter=human & ds.field("referrer_domain").is_valid()
+    )
+    return _value_counts(pages["path"]), _value_counts(referrers["referrer_domain"])
+
+
+def _visitor_schema():
+    pa = _pyarrow()
+    return pa.schema([pa.field(name, pa.string()) for name in VISITOR_TABLE_COLUMNS])
+
+
+def _visitor_rows(dimension: str, values, visitor_ids, labels=None):
+    """Rows of a visitor table for one dimension."""
+    pa = _pyarrow()
+    count = len(visitor_ids)
+    return pa.table(
+        [
+            pa.repeat(dimension, count),
+            values,
+            labels if labels is not None else pa.nulls(count, pa.string()),
+            visitor_ids,
+        ],
+        schema=_visitor_schema(),
+    )
+
+
+def _day_visitor_table(table, top_paths: list[str]):
+    """Distinct (dimension, value, visitor) rows of one day's human events."""
+    pa = _pyarrow()
+    pc = pa.compute
+
+    visitors = pc.unique(table["visitor_id"])
+    parts = [_visitor_rows(TOTAL_DIMENSION, pa.repeat("", len(visitors)), visitors)]
+
+    if top_paths:
+        page_rows = table.filter(
+            pc.and_(
+                pc.equal(table["event_type"], "pageview"),
+                pc.is_in(table["path"], value_set=pa.array(top_paths)),
+            )
+        )
+        pages = page_rows.group_by(["path", "visitor_id"]).aggregate([])
+        parts.append(_visitor_rows("path", pages["path"], pages["visitor_id"]))
+
+    country_rows = table.filter(pc.is_valid(table["country_code"]))
+    countries = country_rows.group_by(
+        ["country_code", "country_name", "visitor_id"]
+    ).aggregate([])
+    parts.append(
+        _visitor_rows(
+            "country",
+            countries["country_code"],
+            countries["visitor_id"],
+            countries["country_name"],
+        )
+    )
+
+    devices = table.set_column(
+        table.schema.get_field_index("device_type"),
+        "device_type",
+        pc.fill_null(table["device_type"], "unknown"),
+    ).group_by(["device_type", "visitor_id"]).aggregate([])
+    parts.append(_visitor_rows("device", devices["device_type"], devices["visitor_id"]))
+
+    return pa.concat_tables(parts)
+
+
+def cold_visitor_table(
+    directory: str | Path,
+    start: datetime,
+    end: datetime,
+    top_paths: list[str],
+    end_inclusive: bool = False,
+):
+    """
+    Distinct visitors per total, top path, country and device from Parquet files.
+
+    Day files are read and deduplicated one at a time, so memory follows
+    the distinct visitors of the range rather than its events; visitors
+    seen on several days are repeated and merged by `count_distinct_visitors`.
+
+    Returns:
+        Arrow table of `VISITOR_TABLE_COLUMNS`, or None without day files
+    """
+    paths = cold_files(directory, start, end)
+    if not paths:
+        return None
+
+    pa = _pyarrow()
+    human = _human_filter(start, end, end_inclusive)
+    parts = [
+        _day_visitor_table(
+            pa.dataset.dataset(path, format="parquet").to_table(
+                columns=["visitor_id", "event_type", "path", "country_code", "country_name", "device_type"],
+                filter=human,
+            ),
+            top_paths,
+        )
+        for path in paths
+    ]
+    return pa.concat_tables(parts)
+
+
+def read_cold_visitor_ids(
+    directory: str | Path,
+    start: datetime,
+    end: datetime,
+    top_paths: list[str],
+    visitor_ids: dict[tuple[str, str], list[str]],
+    labels: dict[str, Optional[str]],
+    end_inclusive: bool = False,
+) -> None:
+    """
+    Collect distinct visitor ids per dimension value from Parquet files.
+
+    Used for the short raw edges of sketch-based summaries; exact counts
+    over long ranges stay in Arrow (see `count_distinct_visitors`).
+    """
+    table = cold_visitor_table(directory, start, end, top_paths, end_inclusive)
+    if table is None:
+        return
+    for row in table.to_pylist():
+        visitor_ids[(row["dimension"], row["value"])].append(row["visitor_id"])
+        if row["dimension"] == "country":
+            labels.setdefault(row["value"], row["label"])
+
+
+def visitor_table_from_ids(
+    visitor_ids: dict[tuple[str, str], list[str]],
+    labels: dict[str, Optional[str]],
+):
+    """Visitor table (see `cold_visitor_table`) of ids collected from Postgres."""
+    pa = _pyarrow()
+    columns: dict[str, list] = {name: [] for name in VISITOR_TABLE_COLUMNS}
+    for (dimension, value), ids in visitor_ids.items():
+        label = labels.get(value) if dimension == "country" else None
+        columns["dimension"].extend([dimension] * len(ids))
+        columns["value"].extend([value] * len(ids))
+        columns["label"].extend([label] * len(ids))
+        columns["visitor_id"].extend(ids)
+    return pa.Table.from_pydict(columns, schema=_visitor_schema())
+
+
+def count_distinct_visitors(
+    tables: list,
+) -> tuple[dict[str, dict[str, int]], dict[str, Optional[str]]]:
+    """
+    Exact distinct visitors per dimension value across the visitor tables of
+    several segments, counted by Arrow's hash aggregation.
+
+    Returns:
+        Counts keyed by dimension and value, and country labels
+    """
+    counts: dict[str, dict[str, int]] = defaultdict(dict)
+    labels: dict[str, Optional[str]] = {}
+    if not tables:
+        return counts, labels
+
+    pa = _pyarrow()
+    pc = pa.compute
+    schema = _visitor_schema()
+    table = pa.concat_tables([part.select(VISITOR_TABLE_COLUMNS).cast(schema) for part in tables])
+
+    grouped = table.group_by(["dimension", "value"]).aggregate([("visitor_id", "count_distinct")])
+    for row in grouped.to_pylist():
+        counts[row["dimension"]][row["value"]] = row["visitor_id_count_distinct"]
+
+    named = table.filter(
+        pc.and_(pc.equal(table["dimension"], "country"), pc.is_valid(table["label"]))
+    )
+    for row in named.group_by(["value", "label"]).aggregate([]).to_pylist():
+        labels.setdefault(row["value"], row["label"])
+    return counts, labels
+
+
+def _cold_events(
+    directory: str | Path,
+    start: datetime,
+    end: datetime,
+    end_inclusive: bool,
+    columns: list[str],
+    filters: Optional[dict[str, Any]] = None,
+):
+    """Human events in range matching `filters` ({column: value or values}), or None."""
+    dataset = _cold_dataset(directory, start, end)
+    if dataset is None:
+        return None
+
+    condition = _human_filter(start, end, end_inclusive)
+    for column_filter in _column_filters(filters):
+        condition &= column_filter
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+def _column_filters(filters: Optional[dict[str, Any]]) -> list:
+    """Dataset expressions for `filters` ({column: value or values})."""
+    ds = _pyarrow().dataset
+    expressions = []
+    for column, value in (filters or {}).items():
+        field = ds.field(column)
+        if isinstance(value, (list, tuple)):
+            expressions.append(field.isin(list(value)))
+        else:
+            expressions.append(field == value)
+    return expressions
+
+
+def read_cold_session_ids(
+    directory: str | Path,
+    start: datetime,
+    end: datetime,
+    filters: Optional[dict[str, Any]] = None,
+) -> list[str]:
+    """
+    Distinct ids of sessions with an event in [start, end) matching `filters`
+    in Parquet files. Bot events count, as every session row does.
+    """
+    dataset = _cold_dataset(directory, start, end)
+    if dataset is None:
+        return []
+
+    pc = _pyarrow().compute
+    timestamp = _pyarrow().dataset.field("timestamp")
+    condition = (timestamp >= start) & (timestamp < end)
+    for column_filter in _column_filters(filters):
+        condition &= column_filter
+    table = dataset.to_table(columns=["session_id"], filter=condition)
+    return pc.unique(table["session_id"]).to_pylist()
+
+
+def read_cold_funnel_events(
+    directory: str | Path,
+    start: datetime,
+    end: datetime,
+    path_pattern: str,
+    filters: Optional[dict[str, Any]] = None,
+    end_inclusive: bool = False,
+):
+    """
+    Human pageviews whose path matches `path_pattern` (a full-match regex)
+    from Parquet files, for funnel walks.
+
+    Returns:
+        Arrow table of (session_id, path, timestamp) sorted by session id
+        (byte order) and time, or None without day files
+    """
+    columns = ["session_id", "path", "timestamp"]
+    table = _cold_events(
+        directory, start, end, end_inclusive, columns, {**(filters or {}), "event_type": "pageview"}
+    )
+    if table is None:
+        return None
+    pc = _pyarrow().compute
+    table = table.filter(pc.fill_null(pc.match_substring_regex(table["path"], path_pattern), False))
+    return table.sort_by([("session_id", "ascending"), ("timestamp", "ascending")])
+
+
+def read_cold_heatmap_events(
+    directory: str | Path,
+    start: datetime,
+    end: datetime,
+    page_path: str,
+    width_low: Optional[int] = None,
+    width_high: Optional[int] = None,
+):
+    """
+    Human click and scroll events of `page_path` in [start, end) from Parquet
+    files, with a viewport width in [width_low, width_high) (None is unbounded).
+
+    Returns:
+        Arrow table of timestamp, event_type, properties (JSON text),
+        viewport_width, viewport_height and session_id, or None without day files
+    """
+    columns = [
+        "timestamp", "event_type", "properties", "viewport_width", "viewport_height", "session_id",
+    ]
+    filters = {"path": page_path, "event_type": ["click", "scroll"]}
+    table = _cold_events(directory, start, end, False, columns, filters)
+    if table is None:
+        return None
+    pc = _pyarrow().compute
+    width = table["viewport_width"]
+    keep = pc.greater(width, 0)
+    if width_low is not None:
+        keep = pc.and_(keep, pc.greater_equal(width, width_low))
+    if width_high is not None:
+        keep = pc.and_(keep, pc.less(width, width_high))
+    return table.filter(pc.fill_null(keep, False))
+
+
+def read_cold_series(
+    directory: str | Path,
+    start: datetime,
+    end: datetime,
+    group_by: str,
+    filters: Optional[dict[str, Any]] = None,
+    end_inclusive: bool = False,
+) -> dict[datetime, tuple[int, int, int, int]]:
+    """
+    Traffic per `group_by` bucket (hour, day, week, month) from Parquet files.
+
+    Buckets are floored like Postgres `date_trunc` (ISO weeks).
+
+    Returns:
+        (pageviews, events, distinct sessions, distinct visitors) per bucket start
+    """
+    columns = ["timestamp", "event_type", "session_id", "visitor_id"]
+    table = _cold_events(directory, start, end, end_inclusive, columns, filters)
+    if table is None or table.num_rows == 0:
+        return {}
+
+    pc = _pyarrow().compute
+    table = table.append_column(
+        "bucket", pc.floor_temporal(table["timestamp"], unit=group_by, week_starts_monday=True)
+    ).append_column("is_pageview", pc.equal(table["event_type"], "pageview"))
+    grouped = table.group_by("bucket").aggregate([
+        ("is_pageview", "sum"),
+        ("timestamp", "count"),
+        ("session_id", "count_distinct"),
+        ("visitor_id", "count_distinct"),
+    ])
+    return {
+        row["bucket"]: (
+            row["is_pageview_sum"],
+            row["timestamp_count"],
+            row["session_id_count_distinct"],
+            row["visitor_id_count_distinct"],
+        )
+        for row in grouped.to_pylist()
+    }
+
+
+def read_cold_bucket_visitors(
+    directory: str | Path,
+    start: datetime,
+    end: datetime,
+    group_by: str,
+    end_inclusive: bool = False,
+) -> list[tuple[datetime, str]]:
+    """Distinct (bucket start, visitor id) pairs from Parquet files, for short ranges."""
+    table = _cold_events(directory, start, end, end_inclusive, ["timestamp", "visitor_id"])
+    if table is None:
+        return []
+
+    pc = _pyarrow().compute
+    pairs = table.append_column(
+        "bucket", pc.floor_temporal(table["timestamp"], unit=group_by, week_starts_monday=True)
+    ).group_by(["bucket", "visitor_id"]).aggregate([])
+    return list(zip(pairs["bucket"].to_pylist(), pairs["visitor_id"].to_pylist(), strict=True))
+
+
+def count_cold_distinct(
+    directory: str | Path,
+    start: datetime,
+    end: datetime,
+    filters: Optional[dict[str, Any]],
+    session_ids: list[str],
+    visitor_ids: list[str],
+) -> tuple[int, int]:
+    """
+    Distinct sessions and visitors of [start, end) in Parquet files together
+    with ids read elsewhere (the Postgres part of a bucket straddling the
+    cold boundary), counted in Arrow.
+    """
+    pa = _pyarrow()
+    pc = pa.compute
+    table = _cold_events(directory, start, end, False, ["session_id", "visitor_id"], filters)
+    sessions = [pa.array(session_ids, pa.string())]
+    visitors = [pa.array(visitor_ids, pa.string())]
+    if table is not None:
+        sessions += table["session_id"].chunks
+        visitors += table["visitor_id"].chunks
+    return (
+        pc.count_distinct(pa.chunked_array(sessions, pa.string())).as_py(),
+        pc.count_distinct(pa.chunked_array(visitors, pa.string())).as_py(),
+    )
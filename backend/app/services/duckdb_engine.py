@@ -0,0 +1,297 @@
+"""
+DuckDB Engine - Embedded columnar SQL over the Parquet event archive.
+
+Provides:
+- A lazily opened in-process DuckDB database with bounded threads/memory
+- The summary's event counters and visitor metrics for archived ranges,
+  computed with DuckDB's parallel, vectorized scans over the day files
+- Exact COUNT(DISTINCT visitor_id) inside DuckDB, so long historical
+  ranges never ship visitor ids back to Python; ranges that also span
+  Postgres get their archived visitor sets as Arrow tables instead
+- Session-ordered funnel pageviews, sorted by DuckDB (spilling to disk
+  past its memory limit) rather than in Arrow
+
+Selected with `COLD_QUERY_ENGINE=duckdb`; duckdb is an optional dependency
+(`pip install .[duckdb]`) imported only when the engine is first used.
+"""
+import threading
+from collections import Counter
+from collections.abc import Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.cold_storage import ColdStorageUnavailableError, _pyarrow, cold_files
+
+logger = get_logger(__name__)
+
+TOP_N = 10
+
+_PAGES_SQL = """
+    SELECT path, count(*) FROM read_parquet($files)
+    WHERE {human} AND event_type = 'pageview'
+    GROUP BY path
+"""
+
+_REFERRERS_SQL = """
+    SELECT referrer_domain, count(*) FROM read_parquet($files)
+    WHERE {human} AND referrer_domain IS NOT NULL
+    GROUP BY referrer_domain
+"""
+
+# One pass: distinct visitors overall ('total' is the rollups' TOTAL_DIMENSION),
+# per top path, per country and per device
+_VISITORS_SQL = """
+    WITH human AS (
+        SELECT visitor_id, event_type, path, country_code, country_name,
+               coalesce(device_type, 'unknown') AS device_type
+        FROM read_parquet($files)
+        WHERE {human}
+    )
+    SELECT 'total' AS dimension, '' AS value, NULL AS label,
+           count(DISTINCT visitor_id) AS visitors
+    FROM human
+    UNION ALL
+    SELECT 'path', path, NULL, count(DISTINCT visitor_id)
+    FROM human
+    WHERE event_type = 'pageview' AND list_contains($top_paths, path)
+    GROUP BY path
+    UNION ALL
+    SELECT 'country', country_code, any_value(country_name), count(DISTINCT visitor_id)
+    FROM human
+    WHERE country_code IS NOT NULL
+    GROUP BY country_code
+    UNION ALL
+    SELECT 'device', device_type, NULL, count(DISTINCT visitor_id)
+    FROM human
+    GROUP BY device_type
+"""
+
+_VISITOR_IDS_SQL = """
+    WITH human AS (
+        SELECT visitor_id, event_type, path, country_code, country_name,
+               coalesce(device_type, 'unknown') AS device_type
+        FROM read_parquet($files)
+        WHERE {human}
+    )
+    SELECT DISTINCT 'total' AS dimension, '' AS value, NULL AS label, visitor_id FROM human
+    UNION ALL
+    SELECT DISTINCT 'path', path, NULL, visitor_id FROM human
+    WHERE event_type = 'pageview' AND list_contains($top_paths, path)
+    UNION ALL
+    SELECT DISTINCT 'country', country_code, country_name, visitor_id FROM human
+    WHERE country_code IS NOT NULL
+    UNION ALL
+    SELECT DISTINCT 'device', device_type, NULL, visitor_id FROM human
+"""
+
+
+_FUNNEL_EVENTS_SQL = """
+    SELECT session_id, path, timestamp FROM read_parquet($files)
+    WHERE {human} AND event_type = 'pageview' AND regexp_matches(path, $pattern) {filters}
+    ORDER BY session_id, timestamp
+"""
+
+
+def _human_predicate(end_inclusive: bool) -> str:
+    upper = "<=" if end_inclusive else "<"
+    return f"timestamp >= $start AND timestamp {upper} $end AND is_bot = false"
+
+
+class DuckDBEngine:
+    """
+    Process-wide DuckDB database for archive queries.
+
+    Each query runs on its own cursor, so calls from worker threads (via
+    `asyncio.to_thread`) execute concurrently on DuckDB's shared pool.
+    """
+
+    def __init__(self, threads: int, memory_limit: str) -> None:
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self._connection: Any = None
+        self._lock = threading.Lock()
+        self.queries = 0
+
+    def _cursor(self):
+        """Cursor on the shared connection, opening it on first use."""
+        with self._lock:
+            if self._connection is None:
+                try:
+                    import duckdb
+                except ImportError as e:
+                    raise ColdStorageUnavailableError(
+                        "The DuckDB query engine requires duckdb (pip install .[duckdb])"
+                    ) from e
+                self._connection = duckdb.connect(
+                    config={"threads": self.threads, "memory_limit": self.memory_limit}
+                )
+                logger.info(
+                    "DuckDB engine opened", threads=self.threads, memory_limit=self.memory_limit
+                )
+            self.queries += 1
+            return self._connection.cursor()
+
+    def close(self) -> None:
+        """Close the shared connection (reopened on next use)."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _execute(
+        self,
+        sql: str,
+        files: list[str],
+        start: datetime,
+        end: datetime,
+        end_inclusive: bool,
+        arrow: bool = False,
+        **params: Any,
+    ) -> Any:
+        """Rows as tuples, or as an Arrow table with `arrow`."""
+        cursor = self._cursor()
+        try:
+            query = sql.format(human=_human_predicate(end_inclusive))
+            result = cursor.execute(
+                query, {"files": files, "start": start, "end": end, **params}
+            )
+            return _pyarrow().table(result.arrow()) if arrow else result.fetchall()
+        finally:
+            cursor.close()
+
+    def counters(
+        self,
+        directory: str | Path,
+        start: datetime,
+        end: datetime,
+        end_inclusive: bool = False,
+    ) -> tuple[Counter, Counter]:
+        """Pageviews per path and visits per referrer (same contract as pyarrow)."""
+        files = cold_files(directory, start, end)
+        if not files:
+            return Counter(), Counter()
+        pages = self._execute(_PAGES_SQL, files, start, end, end_inclusive)
+        referrers = self._execute(_REFERRERS_SQL, files, start, end, end_inclusive)
+        return Counter(dict(pages)), Counter(dict(referrers))
+
+    def visitor_ids(
+        self,
+        directory: str | Path,
+        start: datetime,
+        end: datetime,
+        top_paths: list[str],
+        visitor_ids: dict[tuple[str, str], list[str]],
+        labels: dict[str, Optional[str]],
+        end_inclusive: bool = False,
+    ) -> None:
+        """Collect distinct visitor ids per dimension value (same contract as pyarrow)."""
+        files = cold_files(directory, start, end)
+        if not files:
+            return
+        rows = self._execute(
+            _VISITOR_IDS_SQL, files, start, end, end_inclusive, top_paths=list(top_paths)
+        )
+        for dimension, value, label, visitor_id in rows:
+            visitor_ids[(dimension, value)].append(visitor_id)
+            if dimension == "country":
+                labels.setdefault(value, label)
+
+    def visitor_table(
+        self,
+        directory: str | Path,
+        start: datetime,
+        end: datetime,
+        top_paths: list[str],
+        end_inclusive: bool = False,
+    ):
+        """Distinct visitors per dimension value as Arrow (same contract as pyarrow)."""
+        files = cold_files(directory, start, end)
+        if not files:
+            return None
+        return self._execute(
+            _VISITOR_IDS_SQL, files, start, end, end_inclusive,
+            arrow=True, top_paths=list(top_paths),
+        )
+
+    def visitor_breakdowns(
+        self,
+        directory: str | Path,
+        start: datetime,
+        end: datetime,
+        top_paths: Sequence[str],
+        end_inclusive: bool = True,
+    ) -> tuple[int, dict[str, int], list[dict], dict[str, int]]:
+        """
+        Exact distinct-visitor metrics for a range held entirely in the archive.
+
+        Returns:
+            Total visitors, visitors per top path, top countries and visitors
+            per device, in the shape `build_analytics_summary` expects
+        """
+        files = cold_files(directory, start, end)
+        if not files:
+            return 0, {}, [], {}
+        rows = self._execute(
+            _VISITORS_SQL, files, start, end, end_inclusive, top_paths=list(top_paths)
+        )
+
+        total_visitors = 0
+        page_visitors: dict[str, int] = {}
+        countries = []
+        device_breakdown: dict[str, int] = {}
+        for dimension, value, label, visitors in rows:
+            if dimension == "total":
+                total_visitors = visitors
+            elif dimension == "path":
+                page_visitors[value] = visitors
+            elif dimension == "country":
+                countries.append(
+                    {"country_code": value, "country_name": label, "visitors": visitors}
+                )
+            else:
+                device_breakdown[value] = visitors
+
+        countries.sort(key=lambda country: country["visitors"], reverse=True)
+        return total_visitors, page_visitors, countries[:TOP_N], device_breakdown
+
+    def funnel_events(
+        self,
+        directory: str | Path,
+        start: datetime,
+        end: datetime,
+        path_pattern: str,
+        filters: Optional[dict[str, Any]] = None,
+        end_inclusive: bool = False,
+    ):
+        """Funnel pageviews as Arrow (same contract as `read_cold_funnel_events`)."""
+        files = cold_files(directory, start, end)
+        if not files:
+            return None
+        # Column names come from the validated filter columns, values are bound
+        predicates = ""
+        params = {}
+        for index, (column, value) in enumerate((filters or {}).items()):
+            if isinstance(value, (list, tuple)):
+                predicates += f" AND list_contains($filter_{index}, {column})"
+                value = list(value)
+            else:
+                predicates += f" AND {column} = $filter_{index}"
+            params[f"filter_{index}"] = value
+        return self._execute(
+            _FUNNEL_EVENTS_SQL.replace("{filters}", predicates),
+            files, start, end, end_inclusive,
+            arrow=True, pattern=path_pattern, **params,
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """Counters for metrics endpoints."""
+        return {"open": self._connection is not None, "queries": self.queries}
+
+
+duckdb_engine = DuckDBEngine(
+    threads=settings.duckdb_threads,
+    memory_limit=settings.duckdb_memory_limit,
+)
@@ -0,0 +1,184 @@
+"""
+Event Partitions - Daily range partitions for `analytics_events`.
+
+Provides:
+- Naming and planning helpers for one partition per UTC day
+- Creation of upcoming partitions ahead of time, moving any rows that
+  already landed in the DEFAULT partition for that day
+- Retention by detaching or dropping whole expired partitions instead of
+  deleting rows, so expiring a day costs a catalog change, not a table scan
+- The maintenance routine run at startup and by the periodic worker job
+
+Queries that bound `timestamp` (every analytics read path does) are pruned
+by the planner to the partitions covering their range.
+"""
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+PARENT_TABLE = "analytics_events"
+DEFAULT_PARTITION = "analytics_events_default"
+
+_PARTITION_NAME = re.compile(r"^analytics_events_p(\d{8})$")
+
+_LIST_PARTITIONS_SQL = text(
+    """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = :parent
+    """
+)
+
+
+def partition_name(day: date) -> str:
+    """Name of the partition holding events from `day` (UTC)."""
+    return f"{PARENT_TABLE}_p{day:%Y%m%d}"
+
+
+def partition_day(name: str) -> Optional[date]:
+    """Day covered by a partition name, or None for DEFAULT and foreign tables."""
+    match = _PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    return datetime.strptime(match.group(1), "%Y%m%d").date()
+
+
+def plan_partition_days(start: date, end: date) -> list[date]:
+    """Days from `start` to `end` inclusive."""
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def expired_partition_days(days: list[date], cutoff: date) -> list[date]:
+    """Partitions whose whole day lies before `cutoff`, oldest first."""
+    return sorted(day for day in days if day < cutoff)
+
+
+async def list_event_partitions(db: AsyncSession) -> list[date]:
+    """Days that currently have a dedicated partition, oldest first."""
+    result = await db.execute(_LIST_PARTITIONS_SQL, {"parent": PARENT_TABLE})
+    days = (partition_day(name) for name in result.scalars())
+    return sorted(day for day in days if day is not None)
+
+
+async def create_event_partition(db: AsyncSession, day: date) -> None:
+    """
+    Create the partition for `day`.
+
+    Rows for that day already sitting in the DEFAULT partition (late or
+    far-future events written before the partition existed) would make a
+    plain `PARTITION OF` fail, so they are moved into a standalone table
+    which is then attached.
+    """
+    name = partition_name(day)
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=1)
+    bounds = {"start": start, "end": end}
+    bound_sql = f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+
+    stray_rows = await db.scalar(
+        text(
+            f"SELECT count(*) FROM {DEFAULT_PARTITION} "
+            "WHERE timestamp >= :start AND timestamp < :end"
+        ),
+        bounds,
+    )
+    if not stray_rows:
+        await db.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} {bound_sql}"))
+        return
+
+    await db.execute(
+        text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    )
+    await db.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE timestamp >= :start AND timestamp < :end
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """
+        ),
+        bounds,
+    )
+    await db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} {bound_sql}"))
+    logger.info("Moved default-partition rows into new partition", partition=name, rows=stray_rows)
+
+
+async def expire_event_partition(db: AsyncSession, day: date, action: str) -> None:
+    """Detach (keeping the table for archival) or drop the partition for `day`."""
+    name = partition_name(day)
+    await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+    if action == "drop":
+        await db.execute(text(f"DROP TABLE {name}"))
+
+
+async def maintain_event_partitions(
+    db: AsyncSession,
+    now: Optional[datetime] = None,
+    apply_retention: bool = True,
+) -> dict[str, int]:
+    """
+    Create partitions for today and the next `analytics_partition_premake_days`
+    days, and expire partitions older than `analytics_event_retention_days`.
+
+    Args:
+        db: Database session (committed by this function)
+        now: Reference time (UTC); defaults to the current time
+        apply_retention: Set False to only create partitions
+
+    Returns:
+        Number of partitions created and expired
+    """
+    today = (now or datetime.utcnow()).date()
+
+    # Catch-all for events outside every daily range (clock skew, backfills)
+    await db.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT")
+    )
+    existing = set(await list_event_partitions(db))
+
+    wanted = plan_partition_days(
+        today, today + timedelta(days=settings.analytics_partition_premake_days)
+    )
+    created = 0
+    for day in wanted:
+        if day not in existing:
+            await create_event_partition(db, day)
+            created += 1
+
+    expired = 0
+    retention_days = settings.analytics_event_retention_days
+    if apply_retention and retention_days > 0:
+        cutoff = today - timedelta(days=retention_days)
+        for day in expired_partition_days(list(existing), cutoff):
+            await expire_event_partition(db, day, settings.analytics_partition_retention_action)
+            expired += 1
+
+        # The DEFAULT partition only holds stray rows, so a DELETE stays small
+        await db.execute(
+            text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"),
+            {"cutoff": datetime.combine(cutoff, datetime.min.time())},
+        )
+
+    await db.commit()
+
+    if created or expired:
+        logger.info(
+            "Event partitions maintained",
+            created=created,
+            expired=expired,
+            action=settings.analytics_partition_retention_action,
+        )
+    return {"created": created, "expired": expired}
@@ -0,0 +1,391 @@
+"""
+Event Stream - Pluggable publisher for committed analytics events.
+
+Provides:
+- `EventStreamBackend` interface for durable event logs (Kafka/Redpanda or local)
+- Local segmented append-only log: length-prefixed, CRC-checked records,
+  one fsync per written group, size-based segment rotation
+- Offset-based reader so downstream consumers (rollups, sessionizer, replay)
+  can tail the log or replay it from any position
+- Publisher with a bounded buffer, batching and retry, decoupling ingest
+  from whatever consumes the stream
+"""
+import asyncio
+import fcntl
+import json
+import os
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any, Optional, TypeVar
+
+from app.core.batching import BatchingFlusher, retry_with_backoff
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Record frame: payload length and CRC32 of the payload, big-endian
+_RECORD_HEADER = struct.Struct(">II")
+_SEGMENT_SUFFIX = ".log"
+_LOCK_FILE = ".lock"
+
+T = TypeVar("T")
+
+
+def serialize_event(event: dict[str, Any]) -> bytes:
+    """Encode an event row as compact JSON (datetimes and UUIDs as strings)."""
+    return json.dumps(event, default=str, separators=(",", ":")).encode()
+
+
+def _segment_path(directory: Path, base_offset: int) -> Path:
+    return directory / f"{base_offset:020d}{_SEGMENT_SUFFIX}"
+
+
+def _list_segments(directory: Path) -> list[tuple[int, Path]]:
+    """Segments in the log directory as (base offset, path), oldest first."""
+    if not directory.is_dir():
+        return []
+    return sorted(
+        (int(path.stem), path)
+        for path in directory.glob(f"*{_SEGMENT_SUFFIX}")
+        if path.stem.isdigit()
+    )
+
+
+def _iter_segment(path: Path, start: int = 0) -> Iterator[tuple[int, bytes]]:
+    """
+    Yield (byte position after the record, payload) for each intact record
+    from byte position `start` on.
+
+    Stops at the first incomplete or corrupt record, which is how a torn
+    write or a record still being appended looks to a reader.
+    """
+    with open(path, "rb") as f:
+        position = f.seek(start)
+        while True:
+            header = f.read(_RECORD_HEADER.size)
+            if len(header) < _RECORD_HEADER.size:
+                return
+            length, checksum = _RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+            position += _RECORD_HEADER.size + length
+            yield position, payload
+
+
+def read_event_log(
+    directory: str | Path,
+    offset: int = 0,
+    max_records: Optional[int] = None,
+) -> Iterator[tuple[int, bytes]]:
+    """
+    Read records from a local event log starting at `offset`.
+
+    Consumers keep the offset after the last record they processed and call
+    this again to tail the log; starting from 0 replays everything retained.
+
+    Args:
+        directory: Log directory
+        offset: First record offset to return
+        max_records: Stop after this many records (None for all available)
+
+    Yields:
+        (offset, payload) pairs in log order
+    """
+    segments = _list_segments(Path(directory))
+    start = 0
+    for index, (base_offset, _) in enumerate(segments):
+        if base_offset <= offset:
+            start = index
+
+    returned = 0
+    for base_offset, path in segments[start:]:
+        for record_offset, (_, payload) in enumerate(_iter_segment(path), start=base_offset):
+            if record_offset < offset:
+                continue
+            yield record_offset, payload
+            returned += 1
+            if max_records is not None and returned >= max_records:
+                return
+
+
+class EventStreamBackend(ABC):
+    """Destination for serialized events."""
+
+    @abstractmethod
+    async def open(self) -> None:
+        """Prepare the backend before the first append."""
+
+    @abstractmethod
+    async def append(self, payloads: list[bytes]) -> int:
+        """
+        Durably append payloads in order.
+
+        Returns:
+            Offset of the last appended payload
+        """
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Release resources after the last append."""
+
+
+class SegmentedLogBackend(EventStreamBackend):
+    """
+    Append-only log split into segment files named by their first offset.
+
+    Each `append` writes its payloads and issues a single fsync, so the cost
+    of durability is paid once per group rather than once per event. A new
+    segment starts once the current one reaches `segment_max_bytes`, which
+    keeps retention (deleting whole old segments) and seeking cheap.
+
+    Every worker process may append to the same directory: appends and
+    rotations hold an exclusive `flock` on the directory's lock file, and
+    each append first reads whatever other processes wrote since its last
+    one, so offsets stay dense and records never interleave.
+    """
+
+    def __init__(self, directory: str | Path, segment_max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.segment_max_bytes = segment_max_bytes
+        self.next_offset = 0
+        # Newest segment as of this process's last append (None: not read yet)
+        self._segment_base: Optional[int] = None
+        self._segment_size = 0
+
+    async def open(self) -> None:
+        await asyncio.to_thread(self._locked, self._catch_up)
+
+    async def append(self, payloads: list[bytes]) -> int:
+        return await asyncio.to_thread(self._locked, self._append_sync, payloads)
+
+    async def close(self) -> None:
+        """Forget the cached tail; no file stays open between appends."""
+        self._segment_base = None
+
+    def _locked(self, func: Callable[..., T], *args: Any) -> T:
+        """Run `func` holding the log directory's exclusive lock."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / _LOCK_FILE, "ab") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                return func(*args)
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _catch_up(self) -> None:
+        """
+        Move to the log's current tail, counting records other processes
+        appended and truncating a torn tail left by a crashed writer.
+        """
+        segments = _list_segments(self.directory)
+        if not segments:
+            self._segment_base, self._segment_size, self.next_offset = 0, 0, 0
+            return
+
+        base_offset, path = segments[-1]
+        size = path.stat().st_size
+        if base_offset == self._segment_base and size == self._segment_size:
+            return
+
+        if base_offset == self._segment_base and size > self._segment_size:
+            start, records = self._segment_size, self.next_offset
+        else:
+            start, records = 0, base_offset
+        valid_bytes = start
+        for end, _ in _iter_segment(path, start):
+            valid_bytes = end
+            records += 1
+
+        if valid_bytes < size:
+            logger.warning(
+                "Event log tail truncated",
+                segment=path.name,
+                valid_bytes=valid_bytes,
+                size=size,
+            )
+            os.truncate(path, valid_bytes)
+
+        self._segment_base, self._segment_size, self.next_offset = (
+            base_offset, valid_bytes, records
+        )
+
+    def _append_sync(self, payloads: list[bytes]) -> int:
+        """
+        Write payloads after the current tail, rotating full segments.
+
+        The cached tail only moves once every frame is written and synced.
+        A failed append truncates each segment it touched back to its size
+        before the call (removing segments it created), so retrying the
+        same payloads never duplicates records.
+        """
+        self._catch_up()
+        size, next_offset = self._segment_size, self.next_offset
+
+        # (base offset, size before this append, frames) per segment file
+        segments: list[tuple[int, int, list[bytes]]] = [(self._segment_base, size, [])]
+        for payload in payloads:
+            if size >= self.segment_max_bytes:
+                segments.append((next_offset, 0, []))
+                size = 0
+            frame = _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+            segments[-1][2].append(frame)
+            size += len(frame)
+            next_offset += 1
+
+        touched: list[tuple[Path, int, bool]] = []
+        try:
+            for index, (base_offset, start_size, frames) in enumerate(segments):
+                if not frames:
+                    continue
+                path = _segment_path(self.directory, base_offset)
+                touched.append((path, start_size, index > 0))
+                with open(path, "ab") as f:
+                    f.write(b"".join(frames))
+                    f.flush()
+                    os.fsync(f.fileno())
+        except BaseException:
+            self._rollback(touched)
+            raise
+
+        self._segment_base, self._segment_size, self.next_offset = (
+            segments[-1][0], size, next_offset
+        )
+        return next_offset - 1
+
+    def _rollback(self, touched: list[tuple[Path, int, bool]]) -> None:
+        """Undo a partial append: truncate touched segments, remove created ones."""
+        for path, start_size, created in reversed(touched):
+            try:
+                if created:
+                    path.unlink(missing_ok=True)
+                elif path.exists():
+                    os.truncate(path, start_size)
+            except OSError as e:
+                # The next _catch_up drops whatever torn tail is left
+                logger.error("Event log rollback failed", segment=path.name, error=str(e))
+
+
+class EventStreamPublisher:
+    """
+    Bounded, batching publisher in front of an `EventStreamBackend`.
+
+    `publish` never waits: rows are queued and written by a flusher in
+    batches of up to `batch_size` (or after `flush_interval_ms`). When the
+    buffer is full, new rows are dropped and counted rather than slowing
+    down ingestion; the database remains the source of truth.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[EventStreamBackend],
+        max_buffer: int,
+        batch_size: int,
+        flush_interval_ms: int,
+        max_retries: int = 3,
+    ) -> None:
+        self.backend = backend
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self._batches: BatchingFlusher[dict[str, Any]] = BatchingFlusher(
+            "event-stream", max_buffer, batch_size, flush_interval_ms, self._flush
+        )
+        self.published = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_offset: Optional[int] = None
+
+    @property
+    def is_running(self) -> bool:
+        """True while the publisher accepts rows."""
+        return self._batches.is_running
+
+    def publish(self, events: list[dict[str, Any]]) -> None:
+        """Queue committed event rows for the stream (no-op when stopped)."""
+        if not self.is_running:
+            return
+
+        for event in events:
+            try:
+                self._batches.put_nowait(event)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def start(self) -> None:
+        """Open the backend and start the flusher coroutine."""
+        if self.is_running or self.backend is None:
+            return
+
+        await self.backend.open()
+        self._batches.start()
+        logger.info(
+            "Event stream publisher started",
+            backend=type(self.backend).__name__,
+            max_buffer=self.max_buffer,
+            batch_size=self.batch_size,
+        )
+
+    async def stop(self) -> None:
+        """Stop accepting rows, write everything queued and close the backend."""
+        if not self.is_running:
+            return
+
+        await self._batches.stop()
+        await self.backend.close()
+
+        logger.info(
+            "Event stream publisher stopped",
+            published=self.published,
+            dropped=self.dropped,
+            failed=self.failed,
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """Counters for metrics endpoints."""
+        return {
+            "running": self.is_running,
+            "depth": self._batches.depth,
+            "published": self.published,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_offset": self.last_offset,
+        }
+
+    async def _flush(self, batch: list[dict[str, Any]]) -> None:
+        """Append one batch, retrying transient failures with backoff."""
+        payloads = [serialize_event(event) for event in batch]
+
+        try:
+            self.last_offset = await retry_with_backoff(
+                lambda: self.backend.append(payloads),
+                "Event stream append failed",
+                max_attempts=self.max_retries,
+                rows=len(payloads),
+            )
+        except Exception:
+            self.failed += len(payloads)
+            return
+        self.published += len(payloads)
+
+
+def create_event_stream_backend() -> Optional[EventStreamBackend]:
+    """Backend selected by `event_stream_backend` (None when disabled)."""
+    if settings.event_stream_backend == "local_log":
+        return SegmentedLogBackend(
+            directory=settings.event_log_dir,
+            segment_max_bytes=settings.event_log_segment_bytes,
+        )
+    return None
+
+
+event_stream_publisher = EventStreamPublisher(
+    backend=create_event_stream_backend(),
+    max_buffer=settings.event_stream_buffer_size,
+    batch_size=settings.event_stream_batch_size,
+    flush_interval_ms=settings.event_stream_flush_interval_ms,
+)
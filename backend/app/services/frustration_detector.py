@@ -0,0 +1,277 @@
+"""
+Frustration Detector - Streaming rage-click, dead-click and error detection.
+
+Provides:
+- Small per-session state (the last few clicks, one pending click) updated
+  in O(1) per event as batches come out of ingestion
+- Rage clicks: `rage_click_count` clicks on the same element and spot
+  within `rage_click_window_ms`
+- Dead clicks: a click on a non-link element that nothing but clicks,
+  scrolls or errors follow for `dead_click_window_ms`
+- Error sessions: any `error` event
+- Bulk writes of the resulting flags to `analytics_sessions` and
+  `session_replays`, so replay triage reads idx_replays_quality instead
+  of scanning sessions
+
+State is per process and bounded by an LRU of sessions; flags are only
+ever set (OR-ed in SQL), so batches of one session handled by different
+workers cannot clear each other's findings.
+"""
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import timezone
+from typing import Any, Optional
+
+from sqlalchemy import Boolean, Integer, String, and_, case, column, func, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.analytics import AnalyticsSession, SessionReplay
+
+logger = get_logger(__name__)
+
+# Replay triage score weights; rage plus error lands above the
+# idx_replays_quality threshold (70)
+RAGE_CLICK_SCORE = 50
+ERROR_SCORE = 35
+DEAD_CLICK_SCORE = 5
+DEAD_CLICK_SCORE_LIMIT = 3  # dead clicks counted towards the score
+
+# Events that show the page reacted to a click
+_CLICK_FOLLOW_UPS = frozenset({"click", "scroll", "error"})
+
+
+def event_time_ms(event: dict[str, Any]) -> int:
+    """Client event time in epoch ms, falling back to the server timestamp."""
+    client_timestamp = event.get("client_timestamp")
+    if isinstance(client_timestamp, int):
+        return client_timestamp
+    return int(event["timestamp"].replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+@dataclass(slots=True)
+class Click:
+    """A click reduced to what the detector compares."""
+
+    time_ms: int
+    target: tuple[str, str]  # (element, text)
+    x: float
+    y: float
+
+
+def click_from_event(event: dict[str, Any]) -> Click:
+    properties = event.get("properties") or {}
+    x, y = properties.get("x"), properties.get("y")
+    return Click(
+        time_ms=event_time_ms(event),
+        target=(str(properties.get("element") or ""), str(properties.get("text") or "")),
+        x=float(x) if isinstance(x, (int, float)) else -1.0,
+        y=float(y) if isinstance(y, (int, float)) else -1.0,
+    )
+
+
+@dataclass(slots=True)
+class SessionSignals:
+    """Detector state of one session."""
+
+    recent_clicks: deque[Click]
+    pending_click: Optional[Click] = None
+    last_time_ms: int = 0
+    has_rage_click: bool = False
+    has_error: bool = False
+    dead_clicks: int = 0
+
+
+@dataclass
+class SignalDelta:
+    """Findings of one batch for one session, as written to the database."""
+
+    has_rage_click: bool = False
+    has_error: bool = False
+    dead_clicks: int = 0
+
+    def __bool__(self) -> bool:
+        return self.has_rage_click or self.has_error or self.dead_clicks > 0
+
+
+class FrustrationDetector:
+    """Feeds ingested events through per-session detector state."""
+
+    def __init__(
+        self,
+        rage_click_count: int = 3,
+        rage_click_window_ms: int = 1000,
+        rage_click_radius_px: float = 30.0,
+        dead_click_window_ms: int = 2000,
+        max_sessions: int = 100_000,
+    ) -> None:
+        self.rage_click_count = rage_click_count
+        self.rage_click_window_ms = rage_click_window_ms
+        self.rage_click_radius_px = rage_click_radius_px
+        self.dead_click_window_ms = dead_click_window_ms
+        self._sessions: LRUCache[str, SessionSignals] = LRUCache(max_sessions)
+
+    def _state(self, session_id: str) -> SessionSignals:
+        return self._sessions.get_or_compute(
+            session_id, lambda _: SessionSignals(deque(maxlen=self.rage_click_count))
+        )
+
+    def _is_rage(self, clicks: deque[Click]) -> bool:
+        """The last `rage_click_count` clicks hit one element and spot in time."""
+        if len(clicks) < self.rage_click_count:
+            return False
+        newest = clicks[-1]
+        if newest.time_ms - clicks[0].time_ms > self.rage_click_window_ms:
+            return False
+        radius = self.rage_click_radius_px
+        return all(
+            click.target == newest.target
+            and abs(click.x - newest.x) <= radius
+            and abs(click.y - newest.y) <= radius
+            for click in clicks
+        )
+
+    def observe(self, event: dict[str, Any], delta: SignalDelta) -> None:
+        """Advance the session's state by one event, recording new findings in `delta`."""
+        state = self._state(event["session_id"])
+        event_type = event["event_type"]
+        time_ms = event_time_ms(event)
+
+        if event_type == "error" and not state.has_error:
+            state.has_error = delta.has_error = True
+
+        # Late events cannot be placed in the click timeline any more
+        if time_ms < state.last_time_ms:
+            return
+        state.last_time_ms = time_ms
+
+        pending = state.pending_click
+        if pending is not None:
+            if time_ms - pending.time_ms > self.dead_click_window_ms:
+                state.dead_clicks += 1
+                delta.dead_clicks += 1
+                state.pending_click = None
+            elif event_type not in _CLICK_FOLLOW_UPS:
+                state.pending_click = None
+
+        if event_type != "click":
+            return
+        click = click_from_event(event)
+        state.recent_clicks.append(click)
+        if not state.has_rage_click and self._is_rage(state.recent_clicks):
+            state.has_rage_click = delta.has_rage_click = True
+        # Only the latest click is watched; links are answered by their pageview
+        has_href = bool((event.get("properties") or {}).get("href"))
+        state.pending_click = None if has_href else click
+
+    def process(self, events: Iterable[dict[str, Any]]) -> dict[str, SignalDelta]:
+        """
+        Run a batch through the detector.
+
+        Returns:
+            Sessions with new findings, keyed by session id
+        """
+        ordered = sorted(
+            (e for e in events if not e.get("is_bot")),
+            key=lambda e: (e["session_id"], event_time_ms(e)),
+        )
+        deltas: dict[str, SignalDelta] = {}
+        for event in ordered:
+            delta = deltas.get(event["session_id"])
+            if delta is None:
+                delta = deltas[event["session_id"]] = SignalDelta()
+            self.observe(event, delta)
+        return {session_id: delta for session_id, delta in deltas.items() if delta}
+
+
+def replay_quality_score(has_rage_click: Any, has_error: Any, dead_clicks: Any) -> Any:
+    """SQL expression scoring how worth watching a session replay is (0-100)."""
+    return (
+        case((has_rage_click.is_(True), RAGE_CLICK_SCORE), else_=0)
+        + case((has_error.is_(True), ERROR_SCORE), else_=0)
+        + func.least(func.coalesce(dead_clicks, 0), DEAD_CLICK_SCORE_LIMIT) * DEAD_CLICK_SCORE
+    )
+
+
+async def record_frustration_signals(db: AsyncSession, deltas: dict[str, SignalDelta]) -> None:
+    """
+    OR the findings into `analytics_sessions`, then copy the merged flags
+    and score onto the sessions' replays, in one statement each.
+    """
+    signals = values(
+        column("session_id", String),
+        column("has_rage_click", Boolean),
+        column("has_error", Boolean),
+        column("dead_clicks", Integer),
+        name="signals",
+    ).data([
+        (session_id, delta.has_rage_click, delta.has_error, delta.dead_clicks)
+        for session_id, delta in sorted(deltas.items())
+    ])
+    session = AnalyticsSession
+    await db.execute(
+        update(session)
+        .where(session.session_id == signals.c.session_id)
+        .values(
+            has_rage_click=func.coalesce(session.has_rage_click, False) | signals.c.has_rage_click,
+            has_error=func.coalesce(session.has_error, False) | signals.c.has_error,
+            dead_click_count=func.coalesce(session.dead_click_count, 0) + signals.c.dead_clicks,
+        )
+    )
+
+    replay = SessionReplay
+    await db.execute(
+        update(replay)
+        .where(
+            and_(
+                replay.session_id == session.session_id,
+                session.session_id.in_(sorted(deltas)),
+            )
+        )
+        .values(
+            has_rage_clicks=session.has_rage_click,
+            has_errors=session.has_error,
+            quality_score=func.greatest(
+                func.coalesce(replay.quality_score, 0),
+                replay_quality_score(
+                    session.has_rage_click, session.has_error, session.dead_click_count
+                ),
+            ),
+        )
+    )
+
+
+async def update_frustration_signals(events: list[dict[str, Any]], db: AsyncSession) -> None:
+    """
+    Detect rage clicks, dead clicks and errors in newly stored events.
+
+    Runs after `update_session_metrics`, so the sessions' rows exist.
+
+    Args:
+        events: Event rows just stored (as built by `build_event_record`)
+        db: Database session
+    """
+    deltas = frustration_detector.process(events)
+    if not deltas:
+        return
+
+    try:
+        await record_frustration_signals(db, deltas)
+        await db.commit()
+        logger.debug("Frustration signals recorded", sessions=len(deltas))
+
+    except Exception as e:
+        logger.error("Frustration signal update failed", error=str(e))
+        await db.rollback()
+
+
+frustration_detector = FrustrationDetector(
+    rage_click_count=settings.rage_click_count,
+    rage_click_window_ms=settings.rage_click_window_ms,
+    rage_click_radius_px=settings.rage_click_radius_px,
+    dead_click_window_ms=settings.dead_click_window_ms,
+    max_sessions=settings.frustration_max_sessions,
+)
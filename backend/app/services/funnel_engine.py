@@ -0,0 +1,363 @@
+"""
+Funnel Engine - Single-pass conversion funnel analysis over raw events.
+
+Provides:
+- Compilation of every step's `url_pattern` into one combined matcher,
+  applied in Postgres as a single regex so only events that can advance a
+  funnel leave the database
+- A streaming accumulator that walks session-ordered events once, keeping
+  state for the current session only, so memory does not grow with the
+  number of sessions
+- Entries, drop-off and time-to-complete per step
+- Ranges reaching before the cold-storage boundary read those days from the
+  Parquet archive (pyarrow or DuckDB) and merge them with Postgres by session
+
+Patterns are matched against the event path; `*` matches any run of
+characters (including `/`) and everything else is literal.
+"""
+import asyncio
+import re
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.analytics import AnalyticsEvent
+from app.services.analytics_timeseries import filter_columns, filter_conditions
+from app.services.cold_storage import cold_boundary, read_cold_funnel_events
+from app.services.duckdb_engine import duckdb_engine
+
+logger = get_logger(__name__)
+
+DEFAULT_TIME_WINDOW_HOURS = 24
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Regex body for a `*` glob; valid in both Python and Postgres (ARE) syntax."""
+    return ".*".join(re.escape(part) for part in pattern.split("*"))
+
+
+class FunnelMatcher:
+    """
+    Combined matcher for the url patterns of a funnel's steps.
+
+    `sql_pattern` rejects non-matching events inside Postgres; `steps_for`
+    maps a path to the steps it matches, memoized because paths repeat.
+    """
+
+    def __init__(self, steps: Sequence[dict[str, Any]], cache_size: int = 4096) -> None:
+        if len(steps) < 2:
+            raise ValueError("A funnel needs at least two steps")
+
+        self.names: list[str] = []
+        self.patterns: list[str] = []
+        for index, step in enumerate(steps):
+            pattern = step.get("url_pattern")
+            if not pattern:
+                raise ValueError(f"Funnel step {index + 1} has no url_pattern")
+            self.patterns.append(pattern)
+            self.names.append(step.get("name") or f"Step {index + 1}")
+
+        bodies = [glob_to_regex(pattern) for pattern in self.patterns]
+        self.sql_pattern = f"^(?:{'|'.join(bodies)})$"
+        self._combined = re.compile(self.sql_pattern)
+        self._step_patterns = [re.compile(f"^(?:{body})$") for body in bodies]
+        self._cache: LRUCache[str, frozenset[int]] = LRUCache(cache_size)
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def _match(self, path: str) -> frozenset[int]:
+        if not self._combined.match(path):
+            return frozenset()
+        return frozenset(
+            index for index, pattern in enumerate(self._step_patterns) if pattern.match(path)
+        )
+
+    def steps_for(self, path: Optional[str]) -> frozenset[int]:
+        """Indexes of the steps whose pattern matches `path`."""
+        if not path:
+            return frozenset()
+        return self._cache.get_or_compute(path, self._match)
+
+
+@dataclass
+class FunnelState:
+    """Progress of one session through a funnel."""
+
+    entered_at: Optional[datetime] = None  # Start of the current attempt
+    next_step: int = 0
+    furthest_step: int = -1
+    completed_at: Optional[datetime] = None
+
+
+def advance_funnel(
+    state: FunnelState,
+    steps: frozenset[int],
+    timestamp: datetime,
+    step_count: int,
+    time_window: timedelta,
+) -> bool:
+    """
+    Apply one event matching `steps` to a session's state.
+
+    A session enters on its first event matching step 1 and advances when
+    an event matches the next step within `time_window` of entering. If the
+    window lapses before completion, a later step-1 event starts a fresh
+    attempt; `furthest_step` keeps the best attempt.
+
+    Returns:
+        True if the state changed
+    """
+    if state.completed_at is not None or not steps:
+        return False
+
+    entered = state.entered_at is not None
+    expired = entered and timestamp - state.entered_at > time_window
+    if entered and not expired and state.next_step in steps:
+        state.furthest_step = max(state.furthest_step, state.next_step)
+        state.next_step += 1
+        if state.next_step == step_count:
+            state.completed_at = timestamp
+        return True
+    if 0 in steps and (not entered or expired):
+        state.entered_at = timestamp
+        state.next_step = 1
+        state.furthest_step = max(state.furthest_step, 0)
+        return True
+    return False
+
+
+def funnel_report(
+    matcher: FunnelMatcher,
+    reached: Sequence[int],
+    completions: int,
+    completion_seconds: float,
+) -> dict[str, Any]:
+    """
+    Report from the number of sessions that reached each step.
+
+    Returns:
+        total_entries, per-step entries/drop-off/conversion (rates in
+        percent), overall_conversion_rate and avg_time_to_complete
+        (seconds, None without completions)
+    """
+    total_entries = reached[0]
+    steps = []
+    for index, entries in enumerate(reached):
+        following = reached[index + 1] if index + 1 < len(reached) else entries
+        drop_off = entries - following
+        steps.append({
+            "name": matcher.names[index],
+            "url_pattern": matcher.patterns[index],
+            "entries": entries,
+            "drop_off_count": drop_off,
+            "drop_off_rate": round(drop_off / entries * 100, 2) if entries else 0.0,
+            "conversion_rate": round(entries / total_entries * 100, 2) if total_entries else 0.0,
+        })
+
+    return {
+        "total_entries": total_entries,
+        "steps": steps,
+        "overall_conversion_rate": (
+            round(reached[-1] / total_entries * 100, 2) if total_entries else 0.0
+        ),
+        "avg_time_to_complete": (
+            round(completion_seconds / completions, 2) if completions else None
+        ),
+    }
+
+
+@dataclass
+class FunnelAccumulator:
+    """
+    Advance sessions through a funnel from events ordered by (session, time).
+
+    Only the current session's state is held; each finished session is
+    folded into per-step counters (see `advance_funnel` for the rules).
+    """
+
+    matcher: FunnelMatcher
+    time_window: timedelta = timedelta(hours=DEFAULT_TIME_WINDOW_HOURS)
+    reached: list[int] = field(init=False)
+    completion_seconds: float = 0.0
+    completions: int = 0
+    events: int = 0
+
+    def __post_init__(self) -> None:
+        self.reached = [0] * len(self.matcher)
+        self._session_id: Optional[str] = None
+        self._state = FunnelState()
+
+    def _close_session(self) -> None:
+        state = self._state
+        for step in range(state.furthest_step + 1):
+            self.reached[step] += 1
+        if state.completed_at is not None:
+            self.completions += 1
+            self.completion_seconds += (state.completed_at - state.entered_at).total_seconds()
+
+    def add(self, session_id: str, path: Optional[str], timestamp: datetime) -> None:
+        """Feed one event; events must arrive grouped by session, in time order."""
+        self.events += 1
+        if session_id != self._session_id:
+            self._close_session()
+            self._session_id = session_id
+            self._state = FunnelState()
+        advance_funnel(
+            self._state,
+            self.matcher.steps_for(path),
+            timestamp,
+            len(self.matcher),
+            self.time_window,
+        )
+
+    def add_many(self, rows: Iterable[tuple[str, Optional[str], datetime]]) -> None:
+        """Feed (session_id, path, timestamp) rows."""
+        for session_id, path, timestamp in rows:
+            self.add(session_id, path, timestamp)
+
+    def finish(self) -> dict[str, Any]:
+        """Close the last session and report the funnel (see `funnel_report`)."""
+        self._close_session()
+        self._session_id = None
+        self._state = FunnelState()
+        return funnel_report(
+            self.matcher, self.reached, self.completions, self.completion_seconds
+        )
+
+
+def funnel_events_query(
+    matcher: FunnelMatcher,
+    date_from: datetime,
+    date_to: datetime,
+    filters: Optional[dict[str, Any]] = None,
+):
+    """Human pageviews that match a funnel step, ordered by (session_id, timestamp)."""
+    return (
+        select(AnalyticsEvent.session_id, AnalyticsEvent.path, AnalyticsEvent.timestamp)
+        .where(
+            and_(
+                AnalyticsEvent.timestamp >= date_from,
+                AnalyticsEvent.timestamp <= date_to,
+                AnalyticsEvent.event_type == "pageview",
+                AnalyticsEvent.is_bot == False,
+                AnalyticsEvent.path.regexp_match(matcher.sql_pattern),
+                *filter_conditions(filters),
+            )
+        )
+        .order_by(AnalyticsEvent.session_id, AnalyticsEvent.timestamp)
+    )
+
+
+def _cold_funnel_rows(
+    matcher: FunnelMatcher,
+    date_from: datetime,
+    date_to: datetime,
+    boundary: datetime,
+    filters: Optional[dict[str, Any]],
+) -> Iterator[tuple[str, Optional[str], datetime]]:
+    """Archived funnel pageviews before `boundary`, in (session_id, timestamp) order."""
+    reader = (
+        duckdb_engine.funnel_events
+        if settings.cold_query_engine == "duckdb"
+        else read_cold_funnel_events
+    )
+    table = reader(
+        settings.cold_storage_dir,
+        date_from,
+        min(date_to, boundary),
+        matcher.sql_pattern,
+        filter_columns(filters),
+        end_inclusive=date_to < boundary,
+    )
+    if table is None:
+        return iter(())
+    return (
+        row
+        for batch in table.to_batches(max_chunksize=settings.funnel_stream_batch_rows)
+        for row in zip(
+            batch.column("session_id").to_pylist(),
+            batch.column("path").to_pylist(),
+            batch.column("timestamp").to_pylist(),
+            strict=True,
+        )
+    )
+
+
+async def analyze_funnel(
+    db: AsyncSession,
+    steps: Sequence[dict[str, Any]],
+    date_from: datetime,
+    date_to: datetime,
+    time_window_hours: int = DEFAULT_TIME_WINDOW_HOURS,
+    filters: Optional[dict[str, Any]] = None,
+) -> dict[str, Any]:
+    """
+    Funnel report for human pageviews in [date_from, date_to].
+
+    Matching pageviews are streamed in (session_id, timestamp) order, which
+    the (session_id, timestamp) index provides without a sort, and folded
+    into a `FunnelAccumulator` one batch at a time. Days before the
+    cold-storage boundary are read from the archive, sorted the same way,
+    and merged in; Postgres then sorts session ids bytewise (COLLATE "C")
+    to agree with the archive's order, so sessions spanning the boundary
+    stay contiguous.
+
+    Args:
+        db: Database session
+        steps: Ordered steps, each with `url_pattern` and optional `name`
+        date_from: Range start (inclusive)
+        date_to: Range end (inclusive)
+        time_window_hours: Max time from entering to completing the funnel
+        filters: Optional dimension filters (country, device, utm_*)
+
+    Returns:
+        The report produced by `FunnelAccumulator.finish`
+
+    Raises:
+        ValueError: For invalid steps or unsupported filters
+    """
+    matcher = FunnelMatcher(steps)
+    accumulator = FunnelAccumulator(matcher, timedelta(hours=time_window_hours))
+
+    boundary = cold_boundary(settings.cold_storage_dir) if settings.cold_storage_enabled else None
+    if boundary is None or date_from >= boundary:
+        result = await db.stream(funnel_events_query(matcher, date_from, date_to, filters))
+        async for rows in result.partitions(settings.funnel_stream_batch_rows):
+            accumulator.add_many(rows)
+    else:
+        cold = await asyncio.to_thread(
+            _cold_funnel_rows, matcher, date_from, date_to, boundary, filters
+        )
+        pending = next(cold, None)
+        if date_to >= boundary:
+            query = funnel_events_query(matcher, boundary, date_to, filters).order_by(None)
+            result = await db.stream(
+                query.order_by(AnalyticsEvent.session_id.collate("C"), AnalyticsEvent.timestamp)
+            )
+            async for rows in result.partitions(settings.funnel_stream_batch_rows):
+                for session_id, path, timestamp in rows:
+                    # A session's archived events all precede its Postgres ones
+                    while pending is not None and pending[0] <= session_id:
+                        accumulator.add(*pending)
+                        pending = next(cold, None)
+                    accumulator.add(session_id, path, timestamp)
+        if pending is not None:
+            accumulator.add(*pending)
+            accumulator.add_many(cold)
+
+    report = accumulator.finish()
+    logger.debug(
+        "Funnel analyzed",
+        steps=len(matcher),
+        events=accumulator.events,
+        entries=report["total_entries"],
+    )
+    return report
@@ -0,0 +1,320 @@
+"""
+Funnel Progress - Materialized per-session progress for saved funnels.
+
+Provides:
+- Incremental updates of `funnel_progress` from each ingested batch, so a
+  saved funnel's report is a GROUP BY over one small row per session
+- Rebuilds from raw events when a funnel is created or its steps or time
+  window change (tracked by `ConversionFunnel.progress_version`)
+- Reports in the same shape as the raw-event funnel engine
+
+Rows carry the funnel version they were built for; rows of an older
+version are ignored by reports, reset by ingestion and deleted by the
+next rebuild.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import and_, delete, extract, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.analytics import ConversionFunnel, FunnelProgress
+from app.services.funnel_engine import (
+    FunnelMatcher,
+    FunnelState,
+    advance_funnel,
+    funnel_events_query,
+    funnel_report,
+)
+
+logger = get_logger(__name__)
+
+# Compiled matchers per (funnel id, progress_version)
+_matchers: LRUCache[tuple[Any, int], FunnelMatcher] = LRUCache(256)
+
+
+def funnel_matcher(funnel: ConversionFunnel) -> FunnelMatcher:
+    """Compiled matcher for the funnel's current steps."""
+    return _matchers.get_or_compute(
+        (funnel.id, funnel.progress_version), lambda _: FunnelMatcher(funnel.steps)
+    )
+
+
+def _time_window(funnel: ConversionFunnel) -> timedelta:
+    return timedelta(hours=funnel.time_window_hours or 24)
+
+
+def _state_from_row(row: FunnelProgress, version: int) -> FunnelState:
+    if row.version != version:
+        return FunnelState()
+    return FunnelState(
+        entered_at=row.entered_at,
+        next_step=row.next_step,
+        furthest_step=row.furthest_step,
+        completed_at=row.completed_at,
+    )
+
+
+def _progress_row(funnel: ConversionFunnel, session_id: str, state: FunnelState) -> dict:
+    return {
+        "funnel_id": funnel.id,
+        "session_id": session_id,
+        "version": funnel.progress_version,
+        "entered_at": state.entered_at,
+        "next_step": state.next_step,
+        "furthest_step": state.furthest_step,
+        "completed_at": state.completed_at,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def _upsert(rows: list[dict], only_if_further: bool = False):
+    """INSERT ... ON CONFLICT (funnel_id, session_id) DO UPDATE from `rows`."""
+    stmt = pg_insert(FunnelProgress).values(rows)
+    new = stmt.excluded
+    where = None
+    if only_if_further:
+        # A rebuild must not roll back progress ingestion recorded meanwhile
+        where = or_(
+            FunnelProgress.version != new.version,
+            FunnelProgress.furthest_step < new.furthest_step,
+        )
+    return stmt.on_conflict_do_update(
+        index_elements=[FunnelProgress.funnel_id, FunnelProgress.session_id],
+        set_={
+            column: new[column]
+            for column in (
+                "version", "entered_at", "next_step", "furthest_step", "completed_at", "updated_at"
+            )
+        },
+        where=where,
+    )
+
+
+async def _apply_funnel_events(
+    db: AsyncSession,
+    funnel: ConversionFunnel,
+    pageviews: list[dict[str, Any]],
+) -> int:
+    """Advance one funnel's progress rows with a batch of pageviews."""
+    matcher = funnel_matcher(funnel)
+    hits: dict[str, list[tuple[frozenset[int], datetime]]] = defaultdict(list)
+    for event in pageviews:
+        steps = matcher.steps_for(event["path"])
+        if steps:
+            hits[event["session_id"]].append((steps, event["timestamp"]))
+    if not hits:
+        return 0
+
+    # Rows for sessions that may enter, so they can be locked like existing ones
+    entering = sorted(
+        session_id
+        for session_id, session_hits in hits.items()
+        if any(0 in steps for steps, _ in session_hits)
+    )
+    if entering:
+        await db.execute(
+            pg_insert(FunnelProgress)
+            .values([
+                _progress_row(funnel, session_id, FunnelState()) for session_id in entering
+            ])
+            .on_conflict_do_nothing()
+        )
+
+    # Stable lock order keeps concurrent batches from deadlocking
+    rows = await db.execute(
+        select(FunnelProgress)
+        .where(
+            FunnelProgress.funnel_id == funnel.id,
+            FunnelProgress.session_id.in_(sorted(hits)),
+        )
+        .order_by(FunnelProgress.session_id)
+        .with_for_update()
+    )
+
+    changed = []
+    window = _time_window(funnel)
+    for row in rows.scalars():
+        state = _state_from_row(row, funnel.progress_version)
+        advanced = row.version != funnel.progress_version
+        for steps, timestamp in hits[row.session_id]:
+            advanced |= advance_funnel(state, steps, timestamp, len(matcher), window)
+        if advanced:
+            changed.append(_progress_row(funnel, row.session_id, state))
+
+    if changed:
+        await db.execute(_upsert(changed))
+    return len(changed)
+
+
+async def update_funnel_progress(events: list[dict[str, Any]], db: AsyncSession) -> None:
+    """
+    Fold newly stored events into the progress of every active saved funnel.
+
+    Only human pageviews advance funnels. Events are applied per session in
+    timestamp order; events arriving after later ones of the same session
+    were applied are folded as they come (a rebuild re-walks them exactly).
+
+    Args:
+        events: Event rows just stored (as built by `build_event_record`)
+        db: Database session
+    """
+    pageviews = sorted(
+        (e for e in events if e["event_type"] == "pageview" and not e.get("is_bot")),
+        key=lambda e: (e["session_id"], e["timestamp"]),
+    )
+    if not pageviews:
+        return
+
+    try:
+        funnels = (
+            await db.execute(
+                select(ConversionFunnel).where(ConversionFunnel.is_active == True)
+            )
+        ).scalars().all()
+
+        updated = 0
+        for funnel in funnels:
+            updated += await _apply_funnel_events(db, funnel, pageviews)
+        await db.commit()
+        if updated:
+            logger.debug("Funnel progress updated", funnels=len(funnels), sessions=updated)
+
+    except Exception as e:
+        logger.error("Funnel progress update failed", error=str(e))
+        await db.rollback()
+
+
+async def rebuild_funnel_progress(
+    db: AsyncSession,
+    funnel_id: Any,
+    now: Optional[datetime] = None,
+) -> dict[str, Any]:
+    """
+    Recompute a funnel's progress from raw events of the backfill window.
+
+    Sessions are walked in one streamed pass (as in `analyze_funnel`) and
+    written in batches. The funnel is marked rebuilt only if its version
+    did not change meanwhile.
+
+    Returns:
+        Sessions written and whether the rebuild was recorded
+    """
+    funnel = await db.get(ConversionFunnel, funnel_id)
+    if funnel is None:
+        return {"sessions": 0, "rebuilt": False}
+
+    version = funnel.progress_version
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=settings.funnel_progress_backfill_days)
+    matcher = funnel_matcher(funnel)
+    window = _time_window(funnel)
+
+    await db.execute(
+        delete(FunnelProgress).where(
+            FunnelProgress.funnel_id == funnel.id, FunnelProgress.version != version
+        )
+    )
+
+    written = 0
+    batch: list[dict] = []
+    session_id: Optional[str] = None
+    state = FunnelState()
+
+    async def flush() -> None:
+        nonlocal written, batch
+        if batch:
+            await db.execute(_upsert(batch, only_if_further=True))
+            written += len(batch)
+            batch = []
+
+    result = await db.stream(funnel_events_query(matcher, since, now))
+    async for rows in result.partitions(settings.funnel_stream_batch_rows):
+        for row_session_id, path, timestamp in rows:
+            if row_session_id != session_id:
+                if state.furthest_step >= 0:
+                    batch.append(_progress_row(funnel, session_id, state))
+                session_id, state = row_session_id, FunnelState()
+            advance_funnel(state, matcher.steps_for(path), timestamp, len(matcher), window)
+        await flush()
+    if state.furthest_step >= 0:
+        batch.append(_progress_row(funnel, session_id, state))
+    await flush()
+
+    marked = await db.execute(
+        update(ConversionFunnel)
+        .where(ConversionFunnel.id == funnel.id, ConversionFunnel.progress_version == version)
+        .values(progress_since=since, progress_rebuilt_at=datetime.utcnow())
+    )
+    await db.commit()
+
+    logger.info(
+        "Funnel progress rebuilt",
+        funnel_id=str(funnel.id),
+        version=version,
+        sessions=written,
+    )
+    return {"sessions": written, "rebuilt": marked.rowcount == 1}
+
+
+def can_report_from_progress(funnel: ConversionFunnel, date_from: datetime) -> bool:
+    """
+    True when materialized progress covers funnels entered since `date_from`.
+
+    Ingestion skips inactive funnels, so their progress stops at deactivation.
+    """
+    return (
+        bool(funnel.is_active)
+        and funnel.progress_rebuilt_at is not None
+        and funnel.progress_since is not None
+        and funnel.progress_since <= date_from
+    )
+
+
+async def funnel_progress_report(
+    db: AsyncSession,
+    funnel: ConversionFunnel,
+    date_from: datetime,
+    date_to: datetime,
+) -> dict[str, Any]:
+    """
+    Report for sessions that entered the funnel in [date_from, date_to].
+
+    Returns:
+        The same shape as `funnel_engine.funnel_report`
+    """
+    matcher = funnel_matcher(funnel)
+    duration = extract("epoch", FunnelProgress.completed_at - FunnelProgress.entered_at)
+    rows = await db.execute(
+        select(
+            FunnelProgress.furthest_step,
+            func.count(),
+            func.count(FunnelProgress.completed_at),
+            func.coalesce(func.sum(duration), 0),
+        )
+        .where(
+            and_(
+                FunnelProgress.funnel_id == funnel.id,
+                FunnelProgress.version == funnel.progress_version,
+                FunnelProgress.furthest_step >= 0,
+                FunnelProgress.entered_at >= date_from,
+                FunnelProgress.entered_at <= date_to,
+            )
+        )
+        .group_by(FunnelProgress.furthest_step)
+    )
+
+    reached = [0] * len(matcher)
+    completions = 0
+    completion_seconds = 0.0
+    for furthest_step, sessions, completed, seconds in rows:
+        for step in range(min(furthest_step, len(matcher) - 1) + 1):
+            reached[step] += sessions
+        completions += completed
+        completion_seconds += float(seconds)
+    return funnel_report(matcher, reached, completions, completion_seconds)
@@ -0,0 +1,296 @@
+"""
+GeoIP - Self-hosted IP-to-location lookup for analytics ingestion.
+
+Provides:
+- Compiler from MaxMind GeoLite2 CSV or IP-range CSV files into a compact
+  binary range table (sorted uint32 range starts/ends plus a location table)
+- Memory-mapped database so every worker process shares one page-cached copy
+- Binary-search lookups with a per-/24 LRU cache
+
+Only IPv4 is resolved; other addresses return no location.
+"""
+import array
+import bisect
+import csv
+import ipaddress
+import json
+import mmap
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Header: magic, range count, byte offset and length of the JSON location table.
+# Arrays are stored in native byte order, so build the file on the same
+# architecture that serves it.
+_MAGIC = b"GIP1"
+_HEADER = struct.Struct("=4sIII")
+_UINT32 = "I"
+
+_BLOCK_BITS = 8  # cache granularity: one entry per /24
+
+# Cache sentinel distinguishing "not cached" from a cached None
+_UNCACHED = object()
+
+
+@dataclass(frozen=True)
+class GeoLocation:
+    """Location columns written onto `analytics_events`."""
+
+    country_code: Optional[str] = None
+    country_name: Optional[str] = None
+    region: Optional[str] = None
+    city: Optional[str] = None
+    timezone: Optional[str] = None
+
+    def to_columns(self) -> dict[str, Optional[str]]:
+        return {
+            "country_code": self.country_code,
+            "country_name": self.country_name,
+            "region": self.region,
+            "city": self.city,
+            "timezone": self.timezone,
+        }
+
+
+def _ipv4_to_int(ip: str) -> Optional[int]:
+    """Integer form of a public IPv4 address, or None."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    if address.version != 4 or not address.is_global:
+        return None
+    return int(address)
+
+
+def _parse_ip_bound(value: str) -> int:
+    """Range bound given as an integer or dotted IPv4 address."""
+    return int(value) if value.isdigit() else int(ipaddress.IPv4Address(value))
+
+
+def _load_maxmind_locations(path: Path) -> dict[str, tuple]:
+    """geoname_id -> location tuple from a GeoLite2 *-Locations-*.csv file."""
+    locations = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            locations[row["geoname_id"]] = (
+                row.get("country_iso_code") or None,
+                row.get("country_name") or None,
+                row.get("subdivision_1_name") or None,
+                row.get("city_name") or None,
+                row.get("time_zone") or None,
+            )
+    return locations
+
+
+def _read_ranges(
+    blocks_path: Path,
+    locations_path: Optional[Path],
+) -> list[tuple[int, int, tuple]]:
+    """Read (start, end, location) triples from a supported CSV layout."""
+    locations = _load_maxmind_locations(locations_path) if locations_path else {}
+    ranges = []
+
+    with open(blocks_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if "network" in row:
+                # GeoLite2 blocks: CIDR network + geoname_id
+                network = ipaddress.ip_network(row["network"])
+                if network.version != 4:
+                    continue
+                geoname_id = row.get("geoname_id") or row.get("registered_country_geoname_id")
+                location = locations.get(geoname_id)
+                if location is None:
+                    continue
+                ranges.append(
+                    (int(network.network_address), int(network.broadcast_address), location)
+                )
+            else:
+                # Range CSV: ip_from, ip_to and location columns
+                location = (
+                    (row.get("country_code") or "").upper() or None,
+                    row.get("country_name") or None,
+                    row.get("region") or None,
+                    row.get("city") or None,
+                    row.get("timezone") or None,
+                )
+                if location[0] in (None, "-"):
+                    continue
+                ranges.append(
+                    (_parse_ip_bound(row["ip_from"]), _parse_ip_bound(row["ip_to"]), location)
+                )
+
+    return ranges
+
+
+def compile_geoip_csv(
+    blocks_path: str | Path,
+    output_path: str | Path,
+    locations_path: Optional[str | Path] = None,
+) -> int:
+    """
+    Compile a CSV IP database into the binary range table served by `GeoIPDatabase`.
+
+    Args:
+        blocks_path: GeoLite2 blocks CSV (`network`, `geoname_id`) or a range
+            CSV (`ip_from`, `ip_to`, `country_code`, `country_name`, `region`,
+            `city`, `timezone`)
+        output_path: Destination file
+        locations_path: GeoLite2 locations CSV (required for GeoLite2 blocks)
+
+    Returns:
+        Number of ranges written (adjacent ranges with the same location merged)
+    """
+    ranges = sorted(
+        _read_ranges(Path(blocks_path), Path(locations_path) if locations_path else None)
+    )
+
+    starts = array.array(_UINT32)
+    ends = array.array(_UINT32)
+    location_ids = array.array(_UINT32)
+    location_table: list[tuple] = []
+    location_index: dict[tuple, int] = {}
+
+    for start, end, location in ranges:
+        location_id = location_index.setdefault(location, len(location_table))
+        if location_id == len(location_table):
+            location_table.append(location)
+
+        if ends and location_ids[-1] == location_id and ends[-1] + 1 == start:
+            ends[-1] = end
+            continue
+        if ends and start <= ends[-1]:
+            raise ValueError(f"Overlapping IP ranges at {ipaddress.IPv4Address(start)}")
+        starts.append(start)
+        ends.append(end)
+        location_ids.append(location_id)
+
+    locations_blob = json.dumps(location_table, separators=(",", ":")).encode()
+    locations_offset = _HEADER.size + 3 * starts.itemsize * len(starts)
+
+    with open(output_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(starts), locations_offset, len(locations_blob)))
+        f.write(starts.tobytes())
+        f.write(ends.tobytes())
+        f.write(location_ids.tobytes())
+        f.write(locations_blob)
+
+    return len(starts)
+
+
+class GeoIPDatabase:
+    """
+    Memory-mapped range table with binary-search lookups.
+
+    The arrays are read straight from the mapping (no per-process copy), so
+    all workers on a host share the same page-cached file. Results are
+    cached per /24 whenever the whole /24 resolves to the same answer.
+    """
+
+    def __init__(self, cache_size: int) -> None:
+        self._cache: LRUCache[int, Optional[GeoLocation]] = LRUCache(cache_size)
+        self._mmap: Optional[mmap.mmap] = None
+        self._starts: Any = ()
+        self._ends: Any = ()
+        self._location_ids: Any = ()
+        self._locations: list[GeoLocation] = []
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._mmap is not None
+
+    def open(self, path: str | Path) -> None:
+        """Map a compiled database file, replacing any previously opened one."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, locations_offset, locations_length = _HEADER.unpack_from(mapped, 0)
+        if magic != _MAGIC:
+            mapped.close()
+            raise ValueError(f"{path} is not a compiled GeoIP database")
+
+        view = memoryview(mapped)
+        array_bytes = count * 4
+        offset = _HEADER.size
+        starts = view[offset:offset + array_bytes].cast(_UINT32)
+        ends = view[offset + array_bytes:offset + 2 * array_bytes].cast(_UINT32)
+        location_ids = view[offset + 2 * array_bytes:offset + 3 * array_bytes].cast(_UINT32)
+        locations = [
+            GeoLocation(*location)
+            for location in json.loads(
+                bytes(view[locations_offset:locations_offset + locations_length])
+            )
+        ]
+
+        self.close()
+        self._mmap = mapped
+        self._starts, self._ends, self._location_ids = starts, ends, location_ids
+        self._locations = locations
+        logger.info("GeoIP database loaded", path=str(path), ranges=count)
+
+    def close(self) -> None:
+        """Unmap the database and clear the cache."""
+        if self._mmap is None:
+            return
+        for view in (self._starts, self._ends, self._location_ids):
+            view.release()
+        self._starts = self._ends = self._location_ids = ()
+        self._locations = []
+        self._mmap.close()
+        self._mmap = None
+        self._cache.clear()
+
+    def lookup(self, ip: Optional[str]) -> Optional[GeoLocation]:
+        """Location of a client IP, or None if unknown, private or not IPv4."""
+        if not ip or self._mmap is None:
+            return None
+
+        address = _ipv4_to_int(ip)
+        if address is None:
+            return None
+
+        block = address >> _BLOCK_BITS
+        cached = self._cache.get(block, _UNCACHED)
+        if cached is not _UNCACHED:
+            return cached
+
+        location, uniform = self._search(address)
+        if uniform:
+            self._cache.set(block, location)
+        return location
+
+    def _search(self, address: int) -> tuple[Optional[GeoLocation], bool]:
+        """
+        Binary search for the range holding `address`.
+
+        Returns:
+            The location (or None) and whether every address in the same /24
+            resolves identically, i.e. whether the answer may be cached.
+        """
+        block_start = address >> _BLOCK_BITS << _BLOCK_BITS
+        block_end = block_start + (1 << _BLOCK_BITS) - 1
+
+        index = bisect.bisect_right(self._starts, address) - 1
+        if index >= 0 and address <= self._ends[index]:
+            uniform = self._starts[index] <= block_start and self._ends[index] >= block_end
+            return self._locations[self._location_ids[index]], uniform
+
+        # In a gap: uniform if no range touches this /24
+        previous_end = self._ends[index] if index >= 0 else -1
+        next_start = self._starts[index + 1] if index + 1 < len(self._starts) else 1 << 32
+        return None, previous_end < block_start and next_start > block_end
+
+    def cache_stats(self) -> dict[str, Any]:
+        """Per-/24 cache counters for metrics endpoints."""
+        return self._cache.stats()
+
+
+geoip_database = GeoIPDatabase(cache_size=settings.geoip_cache_size)
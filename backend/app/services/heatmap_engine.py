@@ -0,0 +1,743 @@
+"""
+Heatmap Engine - Per-day click and scroll heatmaps per page and viewport.
+
+Provides:
+- Viewport bucketing (375, 768, 1024, 1920 px wide layouts)
+- Click grids binned with NumPy `histogram2d` and scroll reach kept as
+  HyperLogLog sketches of sessions, both mergeable and stored as
+  zlib-compressed binary arrays
+- Per-day accumulators in `heatmap_data`, updated from each ingested batch
+- Range reads that sum the day grids and downsample to the requested
+  resolution, binning from raw events only the days not accumulated yet
+  and the partial days at the range edges
+
+A day row records the earliest event it counted when ingestion created
+it (`accumulated_from`). Rows created after a day had already started
+(e.g. the day this was deployed) are detected on read by looking for
+earlier events, and that day is rebuilt from raw events.
+
+Days before the cold-storage boundary no longer have raw events in
+Postgres; they are binned (and rebuilt) from the Parquet archive instead.
+
+Click coordinates are viewport-relative (`clientX`/`clientY`) and are
+normalized by the event's viewport size, so clicks from every width in a
+bucket land on the same grid.
+"""
+import asyncio
+import json
+import struct
+import zlib
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+import numpy as np
+from sqlalchemy import and_, case, extract, func, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.hyperloglog import HyperLogLog, register_positions
+from app.core.logging import get_logger
+from app.models.analytics import AnalyticsEvent, HeatmapData
+from app.services.cold_storage import cold_boundary, read_cold_heatmap_events
+
+logger = get_logger(__name__)
+
+VIEWPORT_BUCKETS = (375, 768, 1024, 1920)
+
+# Heatmap types the tracking SDKs collect data for
+HEATMAP_TYPES = ("click", "scroll")
+
+SCROLL_REPORT_STEP = 5
+SCROLL_REACH_DEPTHS = tuple(range(0, 101, SCROLL_REPORT_STEP))  # percent
+
+_FORMAT_VERSION = 1
+_SCROLL_FORMAT_VERSION = 2  # 1 held per-depth event counts
+_GRID_HEADER = struct.Struct("<BHH")  # version, rows, columns
+_COUNT_DTYPE = np.dtype("<i4")
+
+_DAY = timedelta(days=1)
+_EPSILON = timedelta(microseconds=1)
+_EPOCH = datetime(1970, 1, 1)
+
+
+def viewport_bucket(width: int) -> int:
+    """Largest bucket not wider than `width` (narrower viewports use the smallest)."""
+    bucket = VIEWPORT_BUCKETS[0]
+    for candidate in VIEWPORT_BUCKETS:
+        if width >= candidate:
+            bucket = candidate
+    return bucket
+
+
+def viewport_width_range(bucket: int) -> tuple[Optional[int], Optional[int]]:
+    """Viewport widths [low, high) assigned to `bucket`; None is unbounded."""
+    index = VIEWPORT_BUCKETS.index(bucket)
+    low = VIEWPORT_BUCKETS[index] if index else None
+    high = VIEWPORT_BUCKETS[index + 1] if index + 1 < len(VIEWPORT_BUCKETS) else None
+    return low, high
+
+
+class HeatmapGrid:
+    """
+    Click counts on a fixed rows x columns grid over the viewport.
+
+    Grids of the same shape are additive, so adjacent ranges merge by
+    summing their counts.
+    """
+
+    def __init__(self, rows: int, columns: int, counts: Optional[np.ndarray] = None) -> None:
+        if counts is None:
+            counts = np.zeros((rows, columns), dtype=np.int64)
+        elif counts.shape != (rows, columns):
+            raise ValueError("Heatmap grid counts do not match its shape")
+        self.rows = rows
+        self.columns = columns
+        self.counts = counts
+
+    @classmethod
+    def default(cls) -> "HeatmapGrid":
+        """Empty grid at the configured storage resolution."""
+        return cls(settings.heatmap_grid_rows, settings.heatmap_grid_columns)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def add_clicks(self, points: np.ndarray) -> None:
+        """
+        Bin clicks given as rows of (x, y, viewport_width, viewport_height).
+
+        Rows with missing values or coordinates outside the viewport are
+        dropped.
+        """
+        if not len(points):
+            return
+        with np.errstate(invalid="ignore", divide="ignore"):
+            x = points[:, 0] / points[:, 2]
+            y = points[:, 1] / points[:, 3]
+            valid = (x >= 0) & (x < 1) & (y >= 0) & (y < 1)
+        counts, _, _ = np.histogram2d(
+            y[valid], x[valid], bins=(self.rows, self.columns), range=((0, 1), (0, 1))
+        )
+        self.counts += counts.astype(np.int64)
+
+    def merge(self, other: "HeatmapGrid") -> None:
+        if other.counts.shape != self.counts.shape:
+            raise ValueError("Cannot merge heatmap grids of different shapes")
+        self.counts += other.counts
+
+    def downsample(self, rows: int, columns: int) -> "HeatmapGrid":
+        """
+        Grid of at most the stored resolution, each cell summing a block of
+        stored cells (blocks differ by at most one cell when sizes do not divide).
+        """
+        rows, columns = min(rows, self.rows), min(columns, self.columns)
+        row_starts = np.linspace(0, self.rows, rows, endpoint=False).astype(np.int64)
+        column_starts = np.linspace(0, self.columns, columns, endpoint=False).astype(np.int64)
+        counts = np.add.reduceat(self.counts, row_starts, axis=0)
+        counts = np.add.reduceat(counts, column_starts, axis=1)
+        return HeatmapGrid(rows, columns, counts)
+
+    def to_bytes(self) -> bytes:
+        """Serialize as a version/shape header and zlib-compressed int32 counts."""
+        return _GRID_HEADER.pack(_FORMAT_VERSION, self.rows, self.columns) + zlib.compress(
+            self.counts.astype(_COUNT_DTYPE).tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HeatmapGrid":
+        """Deserialize a grid produced by `to_bytes`."""
+        if len(data) < _GRID_HEADER.size or data[0] != _FORMAT_VERSION:
+            raise ValueError("Unsupported heatmap grid format")
+        _, rows, columns = _GRID_HEADER.unpack_from(data)
+        counts = np.frombuffer(zlib.decompress(data[_GRID_HEADER.size:]), dtype=_COUNT_DTYPE)
+        return cls(rows, columns, counts.astype(np.int64).reshape(rows, columns))
+
+    def cells(self) -> list[dict[str, int]]:
+        """Non-empty cells as {x: column, y: row, count}."""
+        rows, columns = np.nonzero(self.counts)
+        return [
+            {"x": int(column), "y": int(row), "count": int(count)}
+            for row, column, count in zip(rows, columns, self.counts[rows, columns], strict=True)
+        ]
+
+
+class ScrollReach:
+    """
+    Sessions scrolling at least each reported depth, as one HyperLogLog
+    sketch per depth.
+
+    The SDKs send a scroll event whenever a session scrolls further
+    (analytics-sdk.js repeats the same milestone), so reach counts
+    sessions, not events. A session is added to the sketch of every depth
+    it reached; repeats, and sessions spread over ingest batches or days,
+    collapse in the union, so adjacent ranges merge like click grids.
+    """
+
+    def __init__(self, precision: Optional[int] = None, registers: Optional[np.ndarray] = None):
+        precision = precision or settings.heatmap_scroll_hll_precision
+        shape = (len(SCROLL_REACH_DEPTHS), 1 << precision)
+        if registers is None:
+            registers = np.zeros(shape, dtype=np.uint8)
+        elif registers.shape != shape:
+            raise ValueError("Scroll reach registers do not match their precision")
+        self.precision = precision
+        self.registers = registers
+
+    def _counts(self) -> np.ndarray:
+        counts = [HyperLogLog(self.precision, registers).count() for registers in self.registers]
+        # Deeper sketches are subsets; keep their estimates from crossing over
+        return np.minimum.accumulate(counts)
+
+    @property
+    def total(self) -> int:
+        """Estimated sessions with a scroll event."""
+        return int(self._counts()[0])
+
+    def add_scrolls(self, sessions: np.ndarray, depths: np.ndarray) -> None:
+        """Add each session at the deepest of its scroll events."""
+        known = ~np.isnan(depths)
+        deepest: dict[str, float] = {}
+        for session, depth in zip(sessions[known].tolist(), depths[known].tolist(), strict=True):
+            if depth > deepest.get(session, -np.inf):
+                deepest[session] = depth
+        depths = np.fromiter(deepest.values(), dtype=np.float64)
+        depths = np.clip(np.rint(depths), 0, SCROLL_REACH_DEPTHS[-1])
+        indexes, ranks = register_positions(deepest, self.precision)
+        for registers, depth in zip(self.registers, SCROLL_REACH_DEPTHS, strict=True):
+            reached = depths >= depth
+            np.maximum.at(registers, indexes[reached], ranks[reached])
+
+    def merge(self, other: "ScrollReach") -> None:
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge scroll reach of different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def to_bytes(self) -> bytes:
+        """Serialize as version and precision bytes and zlib-compressed registers."""
+        return bytes((_SCROLL_FORMAT_VERSION, self.precision)) + zlib.compress(
+            self.registers.tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ScrollReach":
+        """Deserialize sketches produced by `to_bytes`."""
+        if len(data) < 2 or data[0] != _SCROLL_FORMAT_VERSION:
+            raise ValueError("Unsupported scroll reach format")
+        registers = np.frombuffer(zlib.decompress(data[2:]), dtype=np.uint8)
+        return cls(data[1], registers.reshape(len(SCROLL_REACH_DEPTHS), -1).copy())
+
+    def reach(self) -> list[dict[str, int]]:
+        """Estimated sessions reaching at least each reported depth."""
+        return [
+            {"depth_percent": depth, "reach_count": int(count)}
+            for depth, count in zip(SCROLL_REACH_DEPTHS, self._counts(), strict=True)
+        ]
+
+
+class DayHeatmap:
+    """Click grid and scroll reach of one page, viewport bucket and day."""
+
+    def __init__(
+        self,
+        clicks: Optional[HeatmapGrid] = None,
+        scroll: Optional[ScrollReach] = None,
+    ) -> None:
+        self.clicks = clicks or HeatmapGrid.default()
+        self.scroll = scroll or ScrollReach()
+
+    def add_rows(self, rows: np.ndarray, sessions: np.ndarray) -> None:
+        """Bin rows laid out as `HEATMAP_ROW_COLUMNS` minus the leading epoch."""
+        is_click = rows[:, 0] == 1
+        self.clicks.add_clicks(rows[is_click, 1:5])
+        self.scroll.add_scrolls(sessions[~is_click], rows[~is_click, 5])
+
+    def merge(self, other: "DayHeatmap") -> None:
+        self.clicks.merge(other.clicks)
+        self.scroll.merge(other.scroll)
+
+    @classmethod
+    def from_row(cls, row: HeatmapData) -> Optional["DayHeatmap"]:
+        """Stored day, or None if it is at another grid resolution or scroll format."""
+        clicks = HeatmapGrid.from_bytes(row.click_grid) if row.click_grid else None
+        if clicks is not None and clicks.counts.shape != HeatmapGrid.default().counts.shape:
+            return None
+        scroll = None
+        if row.scroll_grid:
+            if row.scroll_grid[0] != _SCROLL_FORMAT_VERSION:
+                return None
+            scroll = ScrollReach.from_bytes(row.scroll_grid)
+            if scroll.precision != settings.heatmap_scroll_hll_precision:
+                return None
+        return cls(clicks, scroll)
+
+    def column_values(self) -> dict[str, Any]:
+        """`heatmap_data` column values for this day."""
+        return {
+            "click_grid": self.clicks.to_bytes(),
+            "scroll_grid": self.scroll.to_bytes(),
+            "sample_size": self.clicks.total + self.scroll.total,
+        }
+
+
+# Binned row layout: epoch seconds, is_click, x, y, viewport_width, viewport_height, depth.
+# Each row's session id travels in a parallel object array.
+HEATMAP_ROW_COLUMNS = 7
+
+
+def _number_property(name: str):
+    # NULL (NaN once binned) unless the client sent a JSON number
+    value = AnalyticsEvent.properties[name]
+    return case((func.jsonb_typeof(value) == "number", value.as_float()))
+
+
+def _bucket_conditions(page_path: str, bucket: int) -> list:
+    low, high = viewport_width_range(bucket)
+    conditions = [
+        AnalyticsEvent.path == page_path,
+        AnalyticsEvent.event_type.in_(HEATMAP_TYPES),
+        AnalyticsEvent.is_bot == False,
+        AnalyticsEvent.viewport_width > 0,
+    ]
+    if low is not None:
+        conditions.append(AnalyticsEvent.viewport_width >= low)
+    if high is not None:
+        conditions.append(AnalyticsEvent.viewport_width < high)
+    return conditions
+
+
+def heatmap_events_query(page_path: str, bucket: int, start: datetime, end: datetime):
+    """Click and scroll events of [start, end) as `HEATMAP_ROW_COLUMNS` rows plus session id."""
+    # apex-analytics.js sends scroll_depth, analytics-sdk.js sends depth
+    depth = func.coalesce(_number_property("scroll_depth"), _number_property("depth"))
+    return select(
+        extract("epoch", AnalyticsEvent.timestamp),
+        case((AnalyticsEvent.event_type == "click", 1), else_=0),
+        _number_property("x"),
+        _number_property("y"),
+        AnalyticsEvent.viewport_width,
+        AnalyticsEvent.viewport_height,
+        depth,
+        AnalyticsEvent.session_id,
+    ).where(
+        and_(
+            AnalyticsEvent.timestamp >= start,
+            AnalyticsEvent.timestamp < end,
+            *_bucket_conditions(page_path, bucket),
+        )
+    )
+
+
+def split_by_day(
+    accumulators: dict[datetime, DayHeatmap],
+    rows: np.ndarray,
+    sessions: np.ndarray,
+) -> None:
+    """Fold binned rows and their session ids into per-UTC-day accumulators."""
+    if not len(rows):
+        return
+    days = np.floor(rows[:, 0] / _DAY.total_seconds()).astype(np.int64)
+    for day in np.unique(days):
+        start = _EPOCH + timedelta(days=int(day))
+        accumulator = accumulators.get(start)
+        if accumulator is None:
+            accumulator = accumulators[start] = DayHeatmap()
+        in_day = days == day
+        accumulator.add_rows(rows[in_day, 1:], sessions[in_day])
+
+
+def _number(value: Any) -> float:
+    # Coordinates and depths arrive from clients; anything non-numeric is dropped
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+
+def event_rows(events: Iterable[dict[str, Any]]) -> tuple[np.ndarray, np.ndarray]:
+    """Binned rows and session ids for event records (as built by `build_event_record`)."""
+    rows = []
+    sessions = []
+    for event in events:
+        properties = event.get("properties") or {}
+        depth = properties.get("scroll_depth", properties.get("depth"))
+        rows.append((
+            (event["timestamp"] - _EPOCH).total_seconds(),
+            1.0 if event["event_type"] == "click" else 0.0,
+            _number(properties.get("x")),
+            _number(properties.get("y")),
+            event.get("viewport_width") or np.nan,
+            event.get("viewport_height") or np.nan,
+            _number(depth),
+        ))
+        sessions.append(event["session_id"])
+    return (
+        np.array(rows, dtype=np.float64).reshape(-1, HEATMAP_ROW_COLUMNS),
+        np.array(sessions, dtype=object),
+    )
+
+
+def heatmap_events(events: Iterable[dict[str, Any]]) -> dict[tuple[str, int], list[dict]]:
+    """Human click and scroll events with a viewport, per (path, viewport bucket)."""
+    grouped: dict[tuple[str, int], list[dict]] = defaultdict(list)
+    for event in events:
+        width = event.get("viewport_width")
+        if event["event_type"] in HEATMAP_TYPES and not event.get("is_bot") and width:
+            grouped[(event["path"], viewport_bucket(width))].append(event)
+    return grouped
+
+
+async def update_heatmap_grids(events: list[dict[str, Any]], db: AsyncSession) -> None:
+    """
+    Add newly stored click and scroll events to their per-day grids.
+
+    Grids are binned in memory per (page, viewport bucket, day), then the
+    day rows are created if missing, locked in key order and updated in
+    one transaction.
+
+    Args:
+        events: Event rows just stored (as built by `build_event_record`)
+        db: Database session
+    """
+    grouped = heatmap_events(events)
+    if not grouped:
+        return
+
+    days: dict[tuple[str, int, datetime], DayHeatmap] = {}
+    first_seen: dict[tuple[str, int, datetime], datetime] = {}
+    for (path, bucket), page_events in grouped.items():
+        accumulators: dict[datetime, DayHeatmap] = {}
+        split_by_day(accumulators, *event_rows(page_events))
+        for day, accumulator in accumulators.items():
+            days[(path, bucket, day)] = accumulator
+        for event in page_events:
+            timestamp = event["timestamp"]
+            key = (path, bucket, timestamp.replace(hour=0, minute=0, second=0, microsecond=0))
+            first_seen[key] = min(first_seen.get(key, timestamp), timestamp)
+
+    keys = sorted(days)
+    try:
+        await db.execute(
+            pg_insert(HeatmapData)
+            .values([
+                {
+                    "page_path": path,
+                    "viewport_width": bucket,
+                    "date_from": day,
+                    "date_to": day + _DAY,
+                    "accumulated_from": first_seen[(path, bucket, day)],
+                    "verified": False,
+                }
+                for path, bucket, day in keys
+            ])
+            .on_conflict_do_nothing(constraint="uq_heatmap_page_viewport_day")
+        )
+
+        # Stable lock order keeps concurrent batches from deadlocking
+        rows = await db.execute(
+            select(HeatmapData)
+            .where(
+                tuple_(HeatmapData.page_path, HeatmapData.viewport_width, HeatmapData.date_from)
+                .in_(keys)
+            )
+            .order_by(HeatmapData.page_path, HeatmapData.viewport_width, HeatmapData.date_from)
+            .with_for_update()
+        )
+        for row in rows.scalars():
+            key = (row.page_path, row.viewport_width, row.date_from)
+            stored = DayHeatmap.from_row(row)
+            if stored is None:
+                # Grid resolution changed: restart the day; reads rebuild it from raw events
+                stored = DayHeatmap()
+                row.verified = False
+                row.accumulated_from = first_seen[key]
+            stored.merge(days[key])
+            for column, value in stored.column_values().items():
+                setattr(row, column, value)
+            if row.accumulated_from is None or first_seen[key] < row.accumulated_from:
+                row.accumulated_from = first_seen[key]
+        await db.commit()
+
+    except Exception as e:
+        logger.error("Heatmap grid update failed", error=str(e))
+        await db.rollback()
+
+
+async def _bin_events(
+    db: AsyncSession,
+    page_path: str,
+    bucket: int,
+    start: datetime,
+    end: datetime,
+    accumulators: dict[datetime, DayHeatmap],
+) -> int:
+    """Stream raw events of [start, end) into per-day accumulators; returns rows read."""
+    result = await db.stream(heatmap_events_query(page_path, bucket, start, end))
+    read = 0
+    async for rows in result.partitions(settings.heatmap_stream_batch_rows):
+        *values, sessions = zip(*rows, strict=True)
+        # None (missing or non-numeric values) becomes NaN and is dropped while binning
+        split_by_day(
+            accumulators,
+            np.array(values, dtype=np.float64).T,
+            np.array(sessions, dtype=object),
+        )
+        read += len(rows)
+    return read
+
+
+def _cold_event_rows(
+    page_path: str,
+    bucket: int,
+    start: datetime,
+    end: datetime,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Binned rows and session ids of archived events in [start, end)."""
+    table = read_cold_heatmap_events(
+        settings.cold_storage_dir, start, end, page_path, *viewport_width_range(bucket)
+    )
+    if table is None:
+        return event_rows([])
+    events = table.to_pylist()
+    for event in events:
+        event["properties"] = json.loads(event["properties"]) if event["properties"] else None
+    return event_rows(events)
+
+
+async def _bin_cold_events(
+    page_path: str,
+    bucket: int,
+    start: datetime,
+    end: datetime,
+    accumulators: dict[datetime, DayHeatmap],
+) -> int:
+    """`_bin_events` for a range whose events were moved to the Parquet archive."""
+    rows, sessions = await asyncio.to_thread(_cold_event_rows, page_path, bucket, start, end)
+    split_by_day(accumulators, rows, sessions)
+    return len(rows)
+
+
+def covered_days(date_from: datetime, date_to: datetime, now: datetime) -> list[datetime]:
+    """
+    UTC days a range covers whole: inside [date_from, date_to], or cut off
+    by `date_to` only after `now` (today, when the range runs to the present).
+    """
+    day = date_from.replace(hour=0, minute=0, second=0, microsecond=0)
+    if day < date_from:
+        day += _DAY
+    days = []
+    while day <= now and (day + _DAY - _EPSILON <= date_to or now <= date_to):
+        days.append(day)
+        day += _DAY
+    return days
+
+
+def uncovered_ranges(
+    date_from: datetime,
+    end: datetime,
+    covered: Iterable[datetime],
+) -> list[tuple[datetime, datetime]]:
+    """Parts of [date_from, end) outside the covered days, as [start, end) runs."""
+    ranges = []
+    cursor = date_from
+    for day in sorted(covered):
+        if day > cursor:
+            ranges.append((cursor, day))
+        cursor = max(cursor, day + _DAY)
+    if cursor < end:
+        ranges.append((cursor, end))
+    return ranges
+
+
+async def _days_with_gaps(
+    db: AsyncSession,
+    page_path: str,
+    bucket: int,
+    rows: list[HeatmapData],
+) -> set[datetime]:
+    """Days having events before the row started accumulating."""
+    gaps = [
+        and_(
+            AnalyticsEvent.timestamp >= row.date_from,
+            AnalyticsEvent.timestamp < (row.accumulated_from or row.date_to),
+        )
+        for row in rows
+        if row.accumulated_from is None or row.accumulated_from > row.date_from
+    ]
+    if not gaps:
+        return set()
+    day = func.date_trunc("day", AnalyticsEvent.timestamp)
+    result = await db.execute(
+        select(day)
+        .where(and_(or_(*gaps), *_bucket_conditions(page_path, bucket)))
+        .distinct()
+    )
+    return set(result.scalars())
+
+
+async def build_heatmap(
+    db: AsyncSession,
+    page_path: str,
+    viewport_width: int,
+    heatmap_type: str,
+    date_from: datetime,
+    date_to: datetime,
+    grid_rows: Optional[int] = None,
+    grid_columns: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> dict[str, Any]:
+    """
+    Heatmap of a page for one viewport bucket over [date_from, date_to].
+
+    Whole days are summed from their stored grids. Days without a complete
+    grid and the partial days at the range edges are binned from raw
+    events in one streamed pass per gap (from the Parquet archive before
+    the cold-storage boundary); the closed days among them are stored for
+    the next request.
+
+    Args:
+        db: Database session
+        page_path: Page path as tracked
+        viewport_width: Viewport width (mapped to its bucket)
+        heatmap_type: click or scroll
+        date_from: Range start (inclusive)
+        date_to: Range end (inclusive)
+        grid_rows: Click grid rows to return (default and maximum: stored rows)
+        grid_columns: Click grid columns to return (default and maximum: stored columns)
+
+    Returns:
+        viewport bucket, sample size, and the grid cells (click, with the
+        grid shape) or scroll reach per depth (scroll)
+
+    Raises:
+        ValueError: For heatmap types without tracked data
+    """
+    if heatmap_type not in HEATMAP_TYPES:
+        raise ValueError(f"Heatmap type must be one of {', '.join(HEATMAP_TYPES)}")
+
+    bucket = viewport_bucket(viewport_width)
+    now = now or datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    days = covered_days(date_from, date_to, now)
+
+    total = DayHeatmap()
+    stored_rows = []
+    if days:
+        stored_rows = (
+            await db.execute(
+                select(HeatmapData).where(
+                    HeatmapData.page_path == page_path,
+                    HeatmapData.viewport_width == bucket,
+                    HeatmapData.date_from.in_(days),
+                )
+            )
+        ).scalars().all()
+
+    boundary = cold_boundary(settings.cold_storage_dir) if settings.cold_storage_enabled else None
+    unverified = [row for row in stored_rows if not row.verified]
+    # An archived day cannot be checked against Postgres; rebuild it from the archive
+    cold_unverified = {
+        row.date_from for row in unverified if boundary is not None and row.date_from < boundary
+    }
+    unverified = [row for row in unverified if row.date_from not in cold_unverified]
+    gaps = await _days_with_gaps(db, page_path, bucket, unverified) if unverified else set()
+    gaps |= cold_unverified
+    newly_verified = []
+    used: set[datetime] = set()
+    for row in stored_rows:
+        stored = DayHeatmap.from_row(row)
+        if stored is None or row.date_from in gaps:
+            continue
+        total.merge(stored)
+        used.add(row.date_from)
+        if not row.verified:
+            newly_verified.append(row.id)
+
+    accumulators: dict[datetime, DayHeatmap] = {}
+    events_read = 0
+    for start, end in uncovered_ranges(date_from, date_to + _EPSILON, used):
+        if boundary is not None and start < boundary:
+            cold_end = min(end, boundary)
+            events_read += await _bin_cold_events(page_path, bucket, start, cold_end, accumulators)
+            start = cold_end
+        if start < end:
+            events_read += await _bin_events(db, page_path, bucket, start, end, accumulators)
+    for accumulator in accumulators.values():
+        total.merge(accumulator)
+
+    # Today's grid belongs to ingestion; only closed days are written here
+    rebuilt = [day for day in days if day not in used and day < today]
+    if newly_verified or rebuilt:
+        await _store_days(db, page_path, bucket, rebuilt, accumulators, newly_verified)
+
+    logger.debug(
+        "Heatmap built",
+        page_path=page_path,
+        viewport=bucket,
+        stored_days=len(used),
+        rebuilt_days=len(rebuilt),
+        events=events_read,
+    )
+
+    if heatmap_type == "scroll":
+        return {
+            "viewport_width": bucket,
+            "sample_size": total.scroll.total,
+            "data": total.scroll.reach(),
+        }
+    grid = total.clicks.downsample(
+        grid_rows or total.clicks.rows, grid_columns or total.clicks.columns
+    )
+    return {
+        "viewport_width": bucket,
+        "sample_size": grid.total,
+        "rows": grid.rows,
+        "columns": grid.columns,
+        "data": grid.cells(),
+    }
+
+
+async def _store_days(
+    db: AsyncSession,
+    page_path: str,
+    bucket: int,
+    days: list[datetime],
+    accumulators: dict[datetime, DayHeatmap],
+    verified_ids: list[Any],
+) -> None:
+    """Write days rebuilt from raw events (empty ones included) and verified rows."""
+    if verified_ids:
+        await db.execute(
+            update(HeatmapData).where(HeatmapData.id.in_(verified_ids)).values(verified=True)
+        )
+    if days:
+        rows = [
+            {
+                "page_path": page_path,
+                "viewport_width": bucket,
+                "date_from": day,
+                "date_to": day + _DAY,
+                "accumulated_from": day,
+                "verified": True,
+                **accumulators.get(day, DayHeatmap()).column_values(),
+            }
+            for day in days
+        ]
+        stmt = pg_insert(HeatmapData).values(rows)
+        new = stmt.excluded
+        await db.execute(
+            stmt.on_conflict_do_update(
+                constraint="uq_heatmap_page_viewport_day",
+                set_={
+                    "click_grid": new.click_grid,
+                    "scroll_grid": new.scroll_grid,
+                    "sample_size": new.sample_size,
+                    "accumulated_from": new.accumulated_from,
+                    "verified": True,
+                    "updated_at": datetime.utcnow(),
+                },
+            )
+        )
+    await db.commit()
@@ -0,0 +1,203 @@
+"""
+Ingest Buffer - In-process group commit for analytics events.
+
+Provides:
+- Bounded in-memory queue of validated `analytics_events` rows
+- Flusher coroutine that commits rows by size or time window
+- Backpressure when the queue is full
+- Drain on shutdown so queued events are not lost on worker restart
+- Isolation of rows Postgres rejects, so one bad row never costs its batch
+"""
+from typing import Any
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.core.batching import BatchingFlusher, retry_with_backoff
+from app.core.config import settings
+from app.core.database import get_db_context
+from app.core.logging import get_logger
+from app.models.analytics import AnalyticsEvent
+from app.services.analytics_service import publish_to_event_stream
+from app.services.post_ingest import post_ingest_executor
+from app.services.realtime_window import realtime_window
+
+logger = get_logger(__name__)
+
+# Longest wait between two attempts at a batch that failed transiently
+_MAX_RETRY_DELAY = 5.0
+
+
+def is_row_error(error: Exception) -> bool:
+    """
+    True if Postgres rejected the rows themselves (SQLSTATE classes 22 data
+    exception and 23 integrity violation), so retrying them cannot succeed.
+    """
+    if isinstance(error, (DataError, IntegrityError)):
+        return True
+    orig = getattr(error, "orig", None)
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(
+        getattr(orig, "__cause__", None), "sqlstate", None
+    )
+    return isinstance(sqlstate, str) and sqlstate[:2] in ("22", "23")
+
+
+class IngestBufferFullError(Exception):
+    """Raised when the ingest buffer cannot accept more rows."""
+
+
+class IngestBuffer:
+    """
+    Bounded queue of event rows drained into one transaction per batch.
+
+    Rows are flushed when `batch_size` rows are waiting or when the oldest
+    waiting row has been queued for `flush_interval_ms`, whichever is first.
+
+    Rows were already acknowledged when they were queued, so a batch is
+    retried with backoff for up to `retry_seconds` while the database is
+    unavailable, and a batch Postgres rejects is split until only the
+    offending rows are dropped.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval_ms: int,
+        retry_seconds: float = 120,
+    ) -> None:
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self._batches: BatchingFlusher[dict[str, Any]] = BatchingFlusher(
+            "ingest-buffer", max_size, batch_size, flush_interval_ms, self._flush
+        )
+        self.flushed_rows = 0
+        self.failed_rows = 0
+
+    @property
+    def is_running(self) -> bool:
+        """True while the buffer accepts rows."""
+        return self._batches.is_running
+
+    @property
+    def depth(self) -> int:
+        """Number of rows waiting to be committed."""
+        return self._batches.depth
+
+    def submit(self, records: list[dict[str, Any]]) -> None:
+        """
+        Queue event rows for the next group commit.
+
+        All rows are accepted or none are, so a batch is never half-queued.
+
+        Raises:
+            IngestBufferFullError: If the buffer is stopped or lacks capacity
+        """
+        if not self.is_running or self._batches.free < len(records):
+            raise IngestBufferFullError(f"Ingest buffer full ({self.depth} rows queued)")
+
+        for record in records:
+            self._batches.put_nowait(record)
+
+    async def start(self) -> None:
+        """Start the flusher coroutine."""
+        if self.is_running:
+            return
+
+        self._batches.start()
+        logger.info(
+            "Ingest buffer started",
+            max_size=self.max_size,
+            batch_size=self.batch_size,
+            flush_interval_ms=int(self._batches.flush_interval * 1000),
+        )
+
+    async def stop(self) -> None:
+        """Stop accepting rows and wait until everything queued is committed."""
+        if not self.is_running:
+            return
+
+        await self._batches.stop()
+        logger.info(
+            "Ingest buffer drained",
+            flushed_rows=self.flushed_rows,
+            failed_rows=self.failed_rows,
+        )
+
+    async def _flush(self, batch: list[dict[str, Any]]) -> None:
+        """Commit one batch and hand the committed rows to post-ingest work."""
+        committed = await self._write(batch)
+        if not committed:
+            return
+
+        self.flushed_rows += len(committed)
+        realtime_window.observe(committed)
+        await self._after_flush(committed)
+
+    async def _write(self, batch: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Insert rows, bisecting a rejected batch so only bad rows are dropped.
+
+        Returns:
+            The rows that were committed
+        """
+        try:
+            await self._insert(batch)
+            return batch
+        except Exception as e:
+            if not is_row_error(e):
+                logger.error(
+                    "Ingest buffer flush abandoned",
+                    rows=len(batch),
+                    retry_seconds=self.retry_seconds,
+                    error=str(e),
+                )
+                self.failed_rows += len(batch)
+                return []
+            if len(batch) == 1:
+                logger.error(
+                    "Ingest buffer dropped rejected row",
+                    session_id=batch[0].get("session_id"),
+                    error=str(e),
+                )
+                self.failed_rows += 1
+                return []
+
+        middle = len(batch) // 2
+        return await self._write(batch[:middle]) + await self._write(batch[middle:])
+
+    async def _insert(self, batch: list[dict[str, Any]]) -> None:
+        """
+        Insert rows in one transaction, retrying transient failures with
+        capped backoff until `retry_seconds` have passed.
+
+        Raises:
+            Exception: The row error, or the last transient error once retries run out
+        """
+
+        async def insert_batch() -> None:
+            async with get_db_context() as session:
+                await session.execute(insert(AnalyticsEvent), batch)
+
+        await retry_with_backoff(
+            insert_batch,
+            "Ingest buffer flush failed",
+            retry_seconds=self.retry_seconds,
+            max_delay=_MAX_RETRY_DELAY,
+            retryable=lambda error: not is_row_error(error),
+            rows=len(batch),
+        )
+
+    async def _after_flush(self, batch: list[dict[str, Any]]) -> None:
+        """Hand a committed batch to post-ingest processing and the event stream."""
+        post_ingest_executor.submit(batch)
+        await publish_to_event_stream(batch)
+
+
+ingest_buffer = IngestBuffer(
+    max_size=settings.ingest_buffer_max_size,
+    batch_size=settings.ingest_flush_batch_size,
+    flush_interval_ms=settings.ingest_flush_interval_ms,
+    retry_seconds=settings.ingest_flush_retry_seconds,
+)
@@ -25,7 +25,13 @@ from app.models.code_analysis import (
     TrafficMetric,
 )
 from app.services.ai_analyzer import ai_analyzer
+from app.services.analytics_rollups import refresh_analytics_rollups
+from app.services.cold_storage import compact_cold_events
+from app.services.event_partitions import maintain_event_partitions
+from app.services.funnel_progress import rebuild_funnel_progress
 from app.services.notification_service import notification_service
+from app.services.session_replay import delete_expired_replays
+from app.services.session_scoring import rescore_recent_sessions
 
 logger = get_logger(__name__)
 
@@ -365,6 +371,68 @@ async def check_adaptive_trigger(ctx: dict) -> dict[str, Any]:
         return {"triggered": False}
 
 
+async def rollup_analytics_job(ctx: dict) -> dict[str, Any]:
+    """
+    Periodic job to advance hourly/daily analytics rollups.
+    Runs every 5 minutes; each run only processes newly closed buckets
+    plus a short recompute window.
+    """
+    if not settings.analytics_rollups_enabled:
+        return {"skipped": True}
+
+    async with get_db_context() as session:
+        return await refresh_analytics_rollups(session)
+
+
+async def maintain_event_partitions_job(ctx: dict) -> dict[str, Any]:
+    """
+    Periodic job to keep analytics_events partitions ahead of time and
+    expire the ones past the retention window.
+    Runs hourly; creating partitions that already exist is skipped.
+    """
+    async with get_db_context() as session:
+        return await maintain_event_partitions(session)
+
+
+async def compact_cold_events_job(ctx: dict) -> dict[str, Any]:
+    """
+    Nightly job to move raw events older than the hot window into the
+    Parquet archive and drop them from Postgres.
+    """
+    if not settings.cold_storage_enabled:
+        return {"skipped": True}
+
+    async with get_db_context() as session:
+        return await compact_cold_events(session)
+
+
+async def rebuild_funnel_progress_job(ctx: dict, funnel_id: str) -> dict[str, Any]:
+    """
+    Job to recompute a saved funnel's materialized progress.
+    Enqueued when a funnel is created or its steps or time window change.
+    """
+    async with get_db_context() as session:
+        return await rebuild_funnel_progress(session, UUID(funnel_id))
+
+
+async def expire_session_replays_job(ctx: dict) -> dict[str, Any]:
+    """
+    Nightly job to delete session replays past their expiry, removing the
+    replay objects from the store along with their metadata rows.
+    """
+    async with get_db_context() as session:
+        return await delete_expired_replays(session)
+
+
+async def rescore_sessions_job(ctx: dict) -> dict[str, Any]:
+    """
+    Periodic job to refresh quality scores of recent sessions in bulk
+    (NumPy scoring, one UPDATE per batch of sessions).
+    """
+    async with get_db_context() as session:
+        return await rescore_recent_sessions(session)
+
+
 # ============================================
 # WORKER SETTINGS
 # ============================================
@@ -377,6 +445,12 @@ class WorkerSettings:
         send_notification_job,
         batch_analysis_job,
         check_adaptive_trigger,
+        rollup_analytics_job,
+        maintain_event_partitions_job,
+        compact_cold_events_job,
+        rebuild_funnel_progress_job,
+        expire_session_replays_job,
+        rescore_sessions_job,
     ]
 
     # Cron jobs - must use cron() function, not dict format
@@ -385,6 +459,16 @@ class WorkerSettings:
         cron(batch_analysis_job, hour={0, 6, 12, 18}, minute=0),
         # Adaptive trigger check every 15 minutes
         cron(check_adaptive_trigger, minute={0, 15, 30, 45}),
+        # Analytics rollups every 5 minutes
+        cron(rollup_analytics_job, minute=set(range(0, 60, 5))),
+        # Event partition creation and retention every hour
+        cron(maintain_event_partitions_job, minute=10),
+        # Cold storage export nightly, before retention would drop the days
+        cron(compact_cold_events_job, hour=3, minute=30),
+        # Session replay expiry nightly
+        cron(expire_session_replays_job, hour=4, minute=0),
+        # Session quality scores every 15 minutes
+        cron(rescore_sessions_job, minute={5, 20, 35, 50}),
     ]
 
     redis_settings = get_redis_settings()
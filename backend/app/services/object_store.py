@@ -0,0 +1,142 @@
+"""
+Object Store - Pluggable blob storage for payloads kept out of Postgres.
+
+Provides:
+- `ObjectStore` interface: append, size, streaming range reads, delete
+- Local filesystem backend (the default), with appends serialized by an
+  exclusive file lock so concurrent writers from any process get
+  non-overlapping offsets
+- A registry of backends selected by name (`replay_storage_backend`), so
+  S3-compatible stores can be plugged in without touching callers
+
+Keys are relative, `/`-separated paths such as `replays/ab/abcdef.jsonl.gz`.
+"""
+import asyncio
+import fcntl
+import os
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Callable
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ObjectStore(ABC):
+    """Append-friendly blob store addressed by key."""
+
+    @abstractmethod
+    async def append(self, key: str, data: bytes) -> int:
+        """
+        Append `data` to the object, creating it if needed.
+
+        Returns:
+            Offset at which `data` starts
+        """
+
+    @abstractmethod
+    async def size(self, key: str) -> Optional[int]:
+        """Size of the object in bytes, or None if it does not exist."""
+
+    @abstractmethod
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        Stream bytes [start, end) of the object in blocks (to the end when
+        `end` is None).
+
+        Raises:
+            FileNotFoundError: If the object does not exist
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Delete the object; missing objects are ignored."""
+
+
+class LocalObjectStore(ObjectStore):
+    """Objects as files under a root directory."""
+
+    def __init__(self, root: str | Path, block_size: int = 64 * 1024) -> None:
+        self.root = Path(root)
+        self.block_size = block_size
+
+    def _path(self, key: str) -> Path:
+        parts = key.split("/")
+        if not key or key.startswith("/") or any(part in ("", ".", "..") for part in parts):
+            raise ValueError(f"Invalid object key '{key}'")
+        return self.root.joinpath(*parts)
+
+    def _append_sync(self, key: str, data: bytes) -> int:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "ab") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(data)
+                f.flush()
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return offset
+
+    async def append(self, key: str, data: bytes) -> int:
+        return await asyncio.to_thread(self._append_sync, key, data)
+
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            return (await asyncio.to_thread(self._path(key).stat)).st_size
+        except FileNotFoundError:
+            return None
+
+    async def read(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(open, self._path(key), "rb")
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = None if end is None else max(end - start, 0)
+            while remaining is None or remaining > 0:
+                size = self.block_size if remaining is None else min(self.block_size, remaining)
+                block = await asyncio.to_thread(f.read, size)
+                if not block:
+                    return
+                if remaining is not None:
+                    remaining -= len(block)
+                yield block
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._path(key).unlink, missing_ok=True)
+
+
+# Backend name -> factory; extended with `register_object_store`
+OBJECT_STORE_BACKENDS: dict[str, Callable[[], ObjectStore]] = {
+    "local": lambda: LocalObjectStore(
+        settings.replay_storage_dir, block_size=settings.replay_read_block_bytes
+    ),
+}
+
+
+def register_object_store(name: str, factory: Callable[[], ObjectStore]) -> None:
+    """Make a backend selectable by name."""
+    OBJECT_STORE_BACKENDS[name] = factory
+
+
+def create_object_store(name: Optional[str] = None) -> ObjectStore:
+    """
+    Backend selected by `name` (default: `replay_storage_backend`).
+
+    Raises:
+        ValueError: For unknown backends
+    """
+    name = name or settings.replay_storage_backend
+    factory = OBJECT_STORE_BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(
+            f"Unknown object store '{name}'; use one of {', '.join(OBJECT_STORE_BACKENDS)}"
+        )
+    return factory()
@@ -0,0 +1,186 @@
+"""
+Post-Ingest Executor - Bounded background processing of stored events.
+
+Provides:
+- Its own pooled database sessions (never the request-scoped session)
+- A semaphore capping concurrent post-ingest transactions
+- Micro-batching: rows submitted within a short window are processed
+  together, so a burst of requests becomes a few multi-session upserts
+- A cap on rows waiting for a batch: ingest checks it before storing
+  events (429 when full), and rows submitted past it anyway (group
+  commits already in flight) are dropped and counted
+- Drain on shutdown so accepted rows are not lost on worker restart
+"""
+import asyncio
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.database import get_db_context
+from app.core.logging import get_logger
+from app.services.analytics_service import process_ingested_events
+
+logger = get_logger(__name__)
+
+
+class PostIngestBacklogFullError(Exception):
+    """Raised when the post-ingest backlog cannot take more rows."""
+
+
+class PostIngestExecutor:
+    """
+    Runs `process_ingested_events` for committed rows in the background.
+
+    A dispatcher waits `batch_window_ms` after the first pending row, then
+    takes up to `max_batch_rows` rows once a concurrency slot is free. While
+    every slot is busy rows keep accumulating, so load turns into larger
+    batches rather than more connections.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        batch_window_ms: int,
+        max_batch_rows: int,
+        max_pending_rows: int,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self.max_pending_rows = max_pending_rows
+        self._pending: list[dict[str, Any]] = []
+        self._has_work: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._in_flight: set[asyncio.Task] = set()
+        self._closing = False
+        self.processed_rows = 0
+        self.failed_rows = 0
+        self.dropped_rows = 0
+        self.batches = 0
+
+    @property
+    def is_running(self) -> bool:
+        """True while the dispatcher is active."""
+        return self._dispatcher is not None and not self._dispatcher.done()
+
+    @property
+    def pending(self) -> int:
+        """Rows waiting for a batch."""
+        return len(self._pending)
+
+    def check_capacity(self, rows: int) -> None:
+        """
+        Ensure `rows` more rows fit in the backlog; call before storing them.
+
+        Raises:
+            PostIngestBacklogFullError: If the backlog lacks capacity
+        """
+        if self.max_pending_rows - len(self._pending) < rows:
+            raise PostIngestBacklogFullError(
+                f"Post-ingest backlog full ({len(self._pending)} rows pending)"
+            )
+
+    def submit(self, records: list[dict[str, Any]]) -> None:
+        """
+        Queue committed event rows for post-ingest processing.
+
+        Rows beyond `max_pending_rows` are dropped and counted; the events
+        themselves are already stored.
+        """
+        room = self.max_pending_rows - len(self._pending)
+        if len(records) > room:
+            dropped = len(records) - max(room, 0)
+            self.dropped_rows += dropped
+            logger.warning("Post-ingest backlog full, rows dropped", rows=dropped)
+            records = records[:max(room, 0)]
+        if not records:
+            return
+
+        if not self.is_running:
+            self._start()
+        self._pending.extend(records)
+        self._has_work.set()
+
+    def _start(self) -> None:
+        """Start the dispatcher on the running event loop."""
+        self._closing = False
+        self._has_work = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._dispatcher = asyncio.create_task(self._run(), name="post-ingest-dispatcher")
+
+    async def stop(self) -> None:
+        """Process everything pending and wait for in-flight batches."""
+        if self._dispatcher is None:
+            return
+
+        self._closing = True
+        self._has_work.set()
+        await self._dispatcher
+        self._dispatcher = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+        logger.info(
+            "Post-ingest executor drained",
+            processed_rows=self.processed_rows,
+            failed_rows=self.failed_rows,
+            dropped_rows=self.dropped_rows,
+            batches=self.batches,
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """Counters for metrics endpoints."""
+        return {
+            "running": self.is_running,
+            "pending": self.pending,
+            "in_flight": len(self._in_flight),
+            "processed_rows": self.processed_rows,
+            "failed_rows": self.failed_rows,
+            "dropped_rows": self.dropped_rows,
+            "batches": self.batches,
+        }
+
+    async def _run(self) -> None:
+        """Turn pending rows into batches, one per free concurrency slot."""
+        while True:
+            await self._has_work.wait()
+            if not self._closing:
+                # Let concurrent requests join this batch
+                await asyncio.sleep(self.batch_window)
+
+            await self._semaphore.acquire()
+            batch = self._pending[:self.max_batch_rows]
+            del self._pending[:self.max_batch_rows]
+            if not self._pending:
+                self._has_work.clear()
+
+            if batch:
+                task = asyncio.create_task(self._process(batch))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+            else:
+                self._semaphore.release()
+
+            if self._closing and not self._pending:
+                return
+
+    async def _process(self, batch: list[dict[str, Any]]) -> None:
+        """Run post-ingest work for one batch in its own session."""
+        try:
+            async with get_db_context() as session:
+                await process_ingested_events(batch, session)
+            self.processed_rows += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed_rows += len(batch)
+            logger.error("Post-ingest batch failed", rows=len(batch), error=str(e))
+        finally:
+            self._semaphore.release()
+
+
+post_ingest_executor = PostIngestExecutor(
+    max_concurrency=settings.post_ingest_max_concurrency,
+    batch_window_ms=settings.post_ingest_batch_window_ms,
+    max_batch_rows=settings.post_ingest_max_batch_rows,
+    max_pending_rows=settings.post_ingest_max_pending_rows,
+)
@@ -0,0 +1,205 @@
+"""
+Realtime Stream - In-process pub/sub pushing live analytics to dashboards.
+
+Provides:
+- Per-batch realtime deltas built from committed event rows
+- Broker fanning deltas out to connected stream subscribers
+- Bounded per-subscriber queues that coalesce deltas instead of blocking
+  ingest when a client reads slowly
+- Server-Sent Events framing with periodic full snapshots
+"""
+import asyncio
+import json
+from collections import Counter, deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.realtime_window import (
+    RECENT_CONVERSIONS_LIMIT,
+    conversion_from_record,
+    realtime_window,
+)
+
+logger = get_logger(__name__)
+
+
+class StreamSubscribersExhaustedError(Exception):
+    """Raised when the process already serves the maximum number of streams."""
+
+
+def build_realtime_delta(records: list[dict[str, Any]]) -> Optional[dict[str, Any]]:
+    """
+    Summarize committed event rows as a realtime delta.
+
+    Returns:
+        Event, pageview, per-path and per-country counts plus new
+        conversions (newest first), or None if every row was a bot
+    """
+    events = 0
+    pageviews = 0
+    pages: Counter = Counter()
+    countries: Counter = Counter()
+    conversions = []
+
+    for record in records:
+        if record.get("is_bot"):
+            continue
+        events += 1
+        if record["event_type"] == "pageview":
+            pageviews += 1
+            pages[record["path"]] += 1
+        if record.get("country_code"):
+            countries[record["country_code"]] += 1
+        conversion = conversion_from_record(record)
+        if conversion:
+            conversions.append(conversion)
+
+    if not events:
+        return None
+
+    conversions.sort(key=lambda conversion: conversion["timestamp"], reverse=True)
+    return {
+        "events": events,
+        "pageviews": pageviews,
+        "pages": dict(pages),
+        "countries": dict(countries),
+        "conversions": conversions[:RECENT_CONVERSIONS_LIMIT],
+    }
+
+
+def merge_deltas(older: dict[str, Any], newer: dict[str, Any]) -> dict[str, Any]:
+    """Coalesce two deltas into one covering both (inputs are left untouched)."""
+    return {
+        "events": older["events"] + newer["events"],
+        "pageviews": older["pageviews"] + newer["pageviews"],
+        "pages": dict(Counter(older["pages"]) + Counter(newer["pages"])),
+        "countries": dict(Counter(older["countries"]) + Counter(newer["countries"])),
+        "conversions": (newer["conversions"] + older["conversions"])[:RECENT_CONVERSIONS_LIMIT],
+    }
+
+
+def format_sse(event: str, data: dict[str, Any]) -> str:
+    """Frame one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class StreamSubscriber:
+    """
+    Bounded delta queue for one connected dashboard.
+
+    When `max_queue` deltas are already waiting, a new delta is merged into
+    the newest queued one, so publishing never blocks or grows memory and a
+    slow client just receives fewer, larger deltas.
+    """
+
+    def __init__(self, max_queue: int) -> None:
+        self.max_queue = max_queue
+        self.coalesced = 0
+        self._queue: deque[dict[str, Any]] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, delta: dict[str, Any]) -> None:
+        """Queue a delta without waiting."""
+        if len(self._queue) >= self.max_queue:
+            self._queue[-1] = merge_deltas(self._queue[-1], delta)
+            self.coalesced += 1
+        else:
+            self._queue.append(delta)
+        self._ready.set()
+
+    async def get(self, timeout: float) -> Optional[dict[str, Any]]:
+        """Next delta, or None if none arrives within `timeout` seconds."""
+        if not self._queue:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), max(timeout, 0))
+            except TimeoutError:
+                return None
+        return self._queue.popleft()
+
+
+class RealtimeBroker:
+    """Fans realtime deltas out to every subscriber in this process."""
+
+    def __init__(self, queue_size: int, max_subscribers: int) -> None:
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: set[StreamSubscriber] = set()
+        self.published = 0
+
+    def subscribe(self) -> StreamSubscriber:
+        """
+        Register a new subscriber.
+
+        Raises:
+            StreamSubscribersExhaustedError: If the subscriber limit is reached
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            raise StreamSubscribersExhaustedError(
+                f"Realtime stream limit reached ({self.max_subscribers} subscribers)"
+            )
+        subscriber = StreamSubscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        """Remove a subscriber (idempotent)."""
+        self._subscribers.discard(subscriber)
+
+    def publish_events(self, records: list[dict[str, Any]]) -> None:
+        """Build a delta from committed rows and push it to all subscribers."""
+        if not self._subscribers:
+            return
+
+        delta = build_realtime_delta(records)
+        if delta is None:
+            return
+
+        for subscriber in list(self._subscribers):
+            subscriber.push(delta)
+        self.published += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Subscriber and coalescing counters for metrics endpoints."""
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "coalesced": sum(subscriber.coalesced for subscriber in self._subscribers),
+        }
+
+    async def sse_events(
+        self,
+        subscriber: StreamSubscriber,
+        is_disconnected: Callable[[], Awaitable[bool]],
+        snapshot_interval: float,
+    ) -> AsyncIterator[str]:
+        """
+        Server-Sent Events for one subscriber.
+
+        Sends a full `snapshot` on connect and every `snapshot_interval`
+        seconds (which also keeps the connection alive and corrects for
+        traffic ingested by other workers), and a `delta` for each batch of
+        events in between. The subscriber is removed when the client leaves.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            yield format_sse("snapshot", await realtime_window.merged_stats())
+            next_snapshot = loop.time() + snapshot_interval
+
+            while not await is_disconnected():
+                delta = await subscriber.get(timeout=next_snapshot - loop.time())
+                if delta is not None:
+                    yield format_sse("delta", delta)
+                if loop.time() >= next_snapshot:
+                    yield format_sse("snapshot", await realtime_window.merged_stats())
+                    next_snapshot = loop.time() + snapshot_interval
+        finally:
+            self.unsubscribe(subscriber)
+
+
+realtime_broker = RealtimeBroker(
+    queue_size=settings.realtime_stream_queue_size,
+    max_subscribers=settings.realtime_stream_max_subscribers,
+)
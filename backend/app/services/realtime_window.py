@@ -0,0 +1,316 @@
+"""
+Realtime Window - In-memory sliding window of recent analytics traffic.
+
+Provides:
+- Ring buffer of per-second buckets covering the last few minutes
+- Visitor sets, pageview counts, per-path and per-country visitors and
+  recent conversions, fed directly from the ingest path
+- Realtime stats answered from memory instead of querying `analytics_events`
+- Optional Redis sync so every API process reports traffic from all workers
+"""
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+REDIS_KEY_PREFIX = "analytics:realtime"
+
+TOP_PAGES_LIMIT = 5
+TOP_COUNTRIES_LIMIT = 5
+RECENT_CONVERSIONS_LIMIT = 10
+
+
+def _epoch_second(timestamp: datetime) -> int:
+    """Whole epoch second of a naive UTC timestamp."""
+    return int(timestamp.replace(tzinfo=timezone.utc).timestamp())
+
+
+def conversion_from_record(record: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """Recent-conversion entry for an ecommerce event carrying order data, else None."""
+    ecommerce_data = record.get("ecommerce_data")
+    if record["event_type"] != "ecommerce" or not ecommerce_data:
+        return None
+    return {
+        "type": ecommerce_data.get("funnel_step") or "purchase",
+        "value": ecommerce_data.get("order_value"),
+        "timestamp": record["timestamp"].isoformat(),
+    }
+
+
+@dataclass
+class SecondBucket:
+    """Traffic observed during one wall-clock second."""
+
+    second: int = -1
+    visitors: set[str] = field(default_factory=set)
+    pageviews: int = 0
+    page_visitors: dict[str, set[str]] = field(default_factory=lambda: defaultdict(set))
+    country_visitors: dict[str, set[str]] = field(default_factory=lambda: defaultdict(set))
+    conversions: list[dict[str, Any]] = field(default_factory=list)
+
+    def reset(self, second: int) -> None:
+        """Reuse the slot for a new second."""
+        self.second = second
+        self.visitors = set()
+        self.pageviews = 0
+        self.page_visitors = defaultdict(set)
+        self.country_visitors = defaultdict(set)
+        self.conversions = []
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-serializable form used for Redis sync."""
+        return {
+            "second": self.second,
+            "visitors": list(self.visitors),
+            "pageviews": self.pageviews,
+            "pages": {path: list(v) for path, v in self.page_visitors.items()},
+            "countries": {code: list(v) for code, v in self.country_visitors.items()},
+            "conversions": self.conversions,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "SecondBucket":
+        """Rebuild a bucket published by another worker."""
+        bucket = cls(second=data["second"])
+        bucket.visitors = set(data["visitors"])
+        bucket.pageviews = data["pageviews"]
+        for path, visitors in data["pages"].items():
+            bucket.page_visitors[path] = set(visitors)
+        for code, visitors in data["countries"].items():
+            bucket.country_visitors[code] = set(visitors)
+        bucket.conversions = data["conversions"]
+        return bucket
+
+
+class RealtimeWindow:
+    """
+    Ring buffer of `window_seconds` per-second buckets.
+
+    Slot `second % window_seconds` holds that second's traffic and is reset
+    when the second it holds falls out of the window, so memory stays bounded
+    by the traffic of the window itself.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int,
+        active_seconds: int,
+        sync_interval_ms: int,
+    ) -> None:
+        self.window_seconds = window_seconds
+        self.active_seconds = active_seconds
+        self.sync_interval = sync_interval_ms / 1000
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._buckets = [SecondBucket() for _ in range(window_seconds)]
+        self._dirty: set[int] = set()
+        self._redis: Optional[aioredis.Redis] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._merged_cache: Optional[tuple[int, dict[str, Any]]] = None
+
+    def observe(self, records: Iterable[dict[str, Any]], now: Optional[float] = None) -> None:
+        """
+        Count committed event rows into their per-second buckets.
+
+        Bots and rows older than the window are ignored.
+        """
+        now_second = int(now if now is not None else time.time())
+        oldest = now_second - self.window_seconds + 1
+
+        for record in records:
+            if record.get("is_bot"):
+                continue
+
+            second = min(_epoch_second(record["timestamp"]), now_second)
+            if second < oldest:
+                continue
+
+            bucket = self._buckets[second % self.window_seconds]
+            if bucket.second != second:
+                bucket.reset(second)
+
+            visitor_id = record["visitor_id"]
+            bucket.visitors.add(visitor_id)
+            if record["event_type"] == "pageview":
+                bucket.pageviews += 1
+                bucket.page_visitors[record["path"]].add(visitor_id)
+            if record.get("country_code"):
+                bucket.country_visitors[record["country_code"]].add(visitor_id)
+
+            conversion = conversion_from_record(record)
+            if conversion:
+                bucket.conversions.append(conversion)
+
+            self._dirty.add(second)
+
+    def stats(
+        self,
+        now: Optional[float] = None,
+        extra_buckets: Iterable[SecondBucket] = (),
+    ) -> dict[str, Any]:
+        """
+        Realtime stats over the window, shaped like `RealTimeStatsResponse`.
+
+        Args:
+            now: Epoch time to evaluate the window at (defaults to now)
+            extra_buckets: Buckets from other workers to merge in
+
+        Returns:
+            Current visitors, 5-minute visitors and pageviews, top pages and
+            countries by visitors, and the most recent conversions
+        """
+        now_second = int(now if now is not None else time.time())
+        oldest = now_second - self.window_seconds + 1
+        active_since = now_second - self.active_seconds + 1
+
+        visitors: set[str] = set()
+        active_visitors: set[str] = set()
+        pageviews = 0
+        page_visitors: dict[str, set[str]] = defaultdict(set)
+        country_visitors: dict[str, set[str]] = defaultdict(set)
+        conversions: list[dict[str, Any]] = []
+
+        for bucket in (*self._buckets, *extra_buckets):
+            if not oldest <= bucket.second <= now_second:
+                continue
+            visitors |= bucket.visitors
+            if bucket.second >= active_since:
+                active_visitors |= bucket.visitors
+            pageviews += bucket.pageviews
+            for path, path_visitors in bucket.page_visitors.items():
+                page_visitors[path] |= path_visitors
+            for code, code_visitors in bucket.country_visitors.items():
+                country_visitors[code] |= code_visitors
+            conversions.extend(bucket.conversions)
+
+        top_pages = sorted(page_visitors.items(), key=lambda item: len(item[1]), reverse=True)
+        top_countries = sorted(
+            country_visitors.items(), key=lambda item: len(item[1]), reverse=True
+        )
+        conversions.sort(key=lambda conversion: conversion["timestamp"], reverse=True)
+
+        return {
+            "current_visitors": len(active_visitors),
+            "visitors_last_5min": len(visitors),
+            "pageviews_last_5min": pageviews,
+            "top_pages_now": [
+                {"path": path, "visitors": len(v)} for path, v in top_pages[:TOP_PAGES_LIMIT]
+            ],
+            "top_countries_now": [
+                {"country_code": code, "visitors": len(v)}
+                for code, v in top_countries[:TOP_COUNTRIES_LIMIT]
+            ],
+            "recent_conversions": conversions[:RECENT_CONVERSIONS_LIMIT],
+        }
+
+    async def merged_stats(self) -> dict[str, Any]:
+        """
+        Realtime stats across all workers.
+
+        Without Redis this is the local window. With Redis, buckets published
+        by other workers are merged in; the result is reused for one sync
+        interval so frequent polls do not each hit Redis.
+        """
+        if self._redis is None:
+            return self.stats()
+
+        now_second = int(time.time())
+        if self._merged_cache and self._merged_cache[0] == now_second:
+            return self._merged_cache[1]
+
+        try:
+            remote_buckets = await self._fetch_remote_buckets(now_second)
+        except Exception as e:
+            logger.warning("Realtime window Redis read failed", error=str(e))
+            return self.stats()
+
+        merged = self.stats(now=now_second, extra_buckets=remote_buckets)
+        self._merged_cache = (now_second, merged)
+        return merged
+
+    async def start(self) -> None:
+        """Start syncing buckets through Redis when it is configured."""
+        if self._sync_task is not None or not settings.redis_url:
+            return
+
+        self._redis = aioredis.from_url(str(settings.redis_url))
+        self._sync_task = asyncio.create_task(self._run_sync(), name="realtime-window-sync")
+        logger.info(
+            "Realtime window sync started",
+            worker_id=self.worker_id,
+            window_seconds=self.window_seconds,
+        )
+
+    async def stop(self) -> None:
+        """Stop the Redis sync task and close the connection."""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._sync_task
+            self._sync_task = None
+
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def _run_sync(self) -> None:
+        """Publish touched buckets every sync interval."""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self._publish_dirty()
+            except Exception as e:
+                logger.warning("Realtime window Redis sync failed", error=str(e))
+
+    async def _publish_dirty(self) -> None:
+        """Write buckets changed since the last sync to Redis under this worker's id."""
+        if not self._dirty or self._redis is None:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        ttl = self.window_seconds + int(self.sync_interval) + 5
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for second in dirty:
+                bucket = self._buckets[second % self.window_seconds]
+                if bucket.second != second:
+                    continue
+                key = f"{REDIS_KEY_PREFIX}:{second}"
+                pipe.hset(key, self.worker_id, json.dumps(bucket.to_dict()))
+                pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def _fetch_remote_buckets(self, now_second: int) -> list[SecondBucket]:
+        """Read other workers' buckets for every second in the window."""
+        seconds = range(now_second - self.window_seconds + 1, now_second + 1)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for second in seconds:
+                pipe.hgetall(f"{REDIS_KEY_PREFIX}:{second}")
+            results = await pipe.execute()
+
+        own_id = self.worker_id.encode()
+        return [
+            SecondBucket.from_dict(json.loads(payload))
+            for published in results
+            for worker_id, payload in published.items()
+            if worker_id != own_id
+        ]
+
+
+realtime_window = RealtimeWindow(
+    window_seconds=settings.realtime_window_seconds,
+    active_seconds=settings.realtime_active_seconds,
+    sync_interval_ms=settings.realtime_sync_interval_ms,
+)
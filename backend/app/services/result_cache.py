@@ -0,0 +1,215 @@
+"""
+Result Cache - Read-through cache for analytics and dashboard read endpoints.
+
+Provides:
+- In-process LRU of JSON-ready endpoint results with per-entry TTLs
+- Optional Redis tier (via `redis_url`) shared by every API worker
+- Single-flight loading: concurrent misses for the same key share one
+  computation instead of stampeding the database
+- Namespace invalidation (per shop for dashboards, one namespace for
+  analytics summaries) fired by order sync and event ingestion
+
+Invalidation bumps a namespace generation that is part of every key, so
+stale entries are never read again and simply age out of the LRU. With
+Redis the generation lives in Redis, so an invalidation on one worker is
+seen by all of them.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, Optional
+
+import redis.asyncio as aioredis
+from pydantic_core import to_jsonable_python
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+REDIS_KEY_PREFIX = "cache:result"
+
+ANALYTICS_NAMESPACE = "analytics"
+
+
+def dashboard_namespace(shop_id: Any) -> str:
+    """Namespace holding one shop's dashboard results."""
+    return f"dashboard:{shop_id}"
+
+
+def cache_key(namespace: str, generation: int, params: dict[str, Any]) -> str:
+    """Key for normalized request parameters (order-insensitive, JSON-encoded)."""
+    encoded = json.dumps(to_jsonable_python(params), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(encoded.encode()).hexdigest()[:32]
+    return f"{namespace}:{generation}:{digest}"
+
+
+class ResultCache:
+    """
+    Two-tier result cache with single-flight loading.
+
+    Values are stored in their JSON-ready form (pydantic models dumped with
+    `mode="json"`), which is what FastAPI serializes anyway and what Redis
+    can hold.
+    """
+
+    def __init__(self, max_entries: int, default_ttl: int, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.default_ttl = default_ttl
+        self._local: LRUCache[str, tuple[float, Any]] = LRUCache(max_entries)
+        self._generations: dict[str, int] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._last_invalidated: dict[str, float] = {}
+        self._redis: Optional[aioredis.Redis] = None
+        self.computed = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    async def start(self) -> None:
+        """Connect the Redis tier when `redis_url` is configured."""
+        if self.enabled and settings.redis_url and self._redis is None:
+            self._redis = aioredis.from_url(str(settings.redis_url))
+            logger.info("Result cache Redis tier enabled")
+
+    async def stop(self) -> None:
+        """Close the Redis connection."""
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def _generation(self, namespace: str) -> int:
+        if self._redis is not None:
+            try:
+                value = await self._redis.get(f"{REDIS_KEY_PREFIX}:gen:{namespace}")
+                return int(value or 0)
+            except Exception as e:
+                logger.warning("Result cache Redis read failed", error=str(e))
+        return self._generations.get(namespace, 0)
+
+    async def _read(self, key: str) -> tuple[bool, Any]:
+        entry = self._local.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return True, entry[1]
+
+        if self._redis is not None:
+            try:
+                data = await self._redis.get(f"{REDIS_KEY_PREFIX}:{key}")
+            except Exception as e:
+                logger.warning("Result cache Redis read failed", error=str(e))
+                data = None
+            if data is not None:
+                ttl = await self._remaining_ttl(key)
+                value = json.loads(data)
+                self._local.set(key, (time.monotonic() + ttl, value))
+                return True, value
+        return False, None
+
+    async def _remaining_ttl(self, key: str) -> float:
+        try:
+            ttl = await self._redis.ttl(f"{REDIS_KEY_PREFIX}:{key}")
+        except Exception:
+            return 0.0
+        return max(float(ttl), 0.0)
+
+    async def _write(self, key: str, value: Any, ttl: int) -> None:
+        self._local.set(key, (time.monotonic() + ttl, value))
+        if self._redis is not None:
+            try:
+                await self._redis.set(f"{REDIS_KEY_PREFIX}:{key}", json.dumps(value), ex=ttl)
+            except Exception as e:
+                logger.warning("Result cache Redis write failed", error=str(e))
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        params: dict[str, Any],
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+    ) -> Any:
+        """
+        Cached result for `params`, computing it once on a miss.
+
+        Args:
+            namespace: Invalidation namespace (see `dashboard_namespace`)
+            params: Normalized request parameters identifying the result
+            compute: Coroutine factory producing the result on a miss
+            ttl: Seconds the result stays fresh (default: `pattern_analysis_cache_ttl`)
+
+        Returns:
+            The result in JSON-ready form
+        """
+        if not self.enabled:
+            return to_jsonable_python(await compute())
+
+        key = cache_key(namespace, await self._generation(namespace), params)
+        hit, value = await self._read(key)
+        if hit:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = to_jsonable_python(await compute())
+            self.computed += 1
+            await self._write(key, value, ttl or self.default_ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Waiters re-raise it; nothing left to log
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def invalidate(self, namespace: str, min_interval: float = 0.0) -> bool:
+        """
+        Make every cached result in `namespace` unreachable.
+
+        Args:
+            namespace: Namespace to invalidate
+            min_interval: Skip if the namespace was invalidated this recently
+                (seconds); used on hot paths such as ingestion
+
+        Returns:
+            True if the namespace was invalidated
+        """
+        now = time.monotonic()
+        last = self._last_invalidated.get(namespace)
+        if min_interval and last is not None and now - last < min_interval:
+            return False
+        self._last_invalidated[namespace] = now
+
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        self.invalidations += 1
+        if self._redis is not None:
+            try:
+                await self._redis.incr(f"{REDIS_KEY_PREFIX}:gen:{namespace}")
+            except Exception as e:
+                logger.warning("Result cache Redis invalidation failed", error=str(e))
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        """Counters for metrics endpoints."""
+        return {
+            "enabled": self.enabled,
+            "redis": self._redis is not None,
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            **self._local.stats(),
+        }
+
+
+result_cache = ResultCache(
+    max_entries=settings.result_cache_max_entries,
+    default_ttl=settings.pattern_analysis_cache_ttl,
+    enabled=settings.result_cache_enabled,
+)
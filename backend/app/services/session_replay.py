@@ -0,0 +1,420 @@
+"""
+Session Replay - rrweb chunk ingest, storage and playback reads.
+
+Provides:
+- Compression of each incoming chunk of rrweb events into one gzip member
+  or zstd frame (JSON Lines inside), appended to the session's replay
+  object; concatenated members/frames are themselves a valid gzip/zstd
+  stream, so the whole object decompresses in one pass
+- A fixed-width chunk index stored next to each replay object, giving
+  byte ranges per chunk for seeking during playback
+- Metadata upserts into `session_replays` (counts, duration, sizes) and
+  the listing queries behind GET /replays
+
+Payloads only ever live in the object store (see `object_store`); rows
+in `session_replays` hold metadata and the object key.
+
+zstd needs the optional zstandard package (`pip install .[replay-zstd]`);
+gzip is always available.
+"""
+import gzip
+import hashlib
+import json
+import struct
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    and_,
+    cast,
+    delete,
+    extract,
+    func,
+    literal,
+    literal_column,
+    select,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.analytics import AnalyticsSession, SessionReplay
+from app.services.frustration_detector import replay_quality_score
+from app.services.object_store import ObjectStore, create_object_store
+
+logger = get_logger(__name__)
+
+# idx_replays_quality only covers rows with quality_score above this
+QUALITY_INDEX_THRESHOLD = 70.0
+
+# session_replays.duration_ms is a 32-bit integer
+MAX_DURATION_MS = 2**31 - 1
+
+_KEY_PREFIX = "replays"
+_INDEX_SUFFIX = ".idx"
+
+# Chunk index entry: offset, compressed length, event count, first event time (ms)
+_INDEX_ENTRY = struct.Struct("<QIIQ")
+
+
+class ReplayStorageUnavailableError(Exception):
+    """Raised when zstd compression is used without zstandard installed."""
+
+
+def _zstandard():
+    """Import zstandard lazily so it stays an optional dependency."""
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ReplayStorageUnavailableError(
+            "zstd replay compression requires zstandard (pip install .[replay-zstd])"
+        ) from e
+    return zstandard
+
+
+@dataclass(frozen=True)
+class ReplayCodec:
+    """Compression of replay objects; one member/frame per chunk."""
+
+    name: str
+    extension: str
+    media_type: str
+
+    def compress(self, data: bytes) -> bytes:
+        if self.name == "zstd":
+            return _zstandard().ZstdCompressor(level=settings.replay_compression_level).compress(
+                data
+            )
+        return gzip.compress(data, compresslevel=min(settings.replay_compression_level, 9))
+
+    def decompress(self, data: bytes) -> bytes:
+        """Decompress one or more concatenated chunks."""
+        if self.name == "zstd":
+            reader = _zstandard().ZstdDecompressor().stream_reader(data, read_across_frames=True)
+            return reader.read()
+        return gzip.decompress(data)
+
+
+CODECS = {
+    "gzip": ReplayCodec("gzip", ".jsonl.gz", "application/gzip"),
+    "zstd": ReplayCodec("zstd", ".jsonl.zst", "application/zstd"),
+}
+
+
+@dataclass
+class ReplayChunk:
+    """Position of one appended chunk inside its replay object."""
+
+    offset: int
+    length: int
+    event_count: int
+    first_timestamp_ms: int
+
+
+@dataclass
+class StoredChunk:
+    """Result of appending a chunk."""
+
+    key: str
+    codec: ReplayCodec
+    chunk: ReplayChunk
+    object_size: int
+
+
+def replay_key(session_id: str, codec: ReplayCodec) -> str:
+    """Object key for a session; hashed so client ids never shape paths."""
+    digest = hashlib.sha256(session_id.encode()).hexdigest()
+    return f"{_KEY_PREFIX}/{digest[:2]}/{digest}{codec.extension}"
+
+
+def event_timestamp_ms(event: dict[str, Any]) -> Optional[int]:
+    """rrweb event time in epoch milliseconds, if present and numeric."""
+    value = event.get("timestamp")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    return None
+
+
+def encode_chunk(events: list[dict[str, Any]], codec: ReplayCodec) -> bytes:
+    """Compress events as one JSON Lines member/frame."""
+    lines = b"".join(
+        json.dumps(event, separators=(",", ":")).encode() + b"\n" for event in events
+    )
+    return codec.compress(lines)
+
+
+def parse_chunk_index(data: bytes) -> list[ReplayChunk]:
+    """Chunks of an index object in offset order (a torn last entry is ignored)."""
+    usable = len(data) - len(data) % _INDEX_ENTRY.size
+    chunks = [ReplayChunk(*entry) for entry in _INDEX_ENTRY.iter_unpack(data[:usable])]
+    # Concurrent appenders may write index entries out of data order
+    return sorted(chunks, key=lambda chunk: chunk.offset)
+
+
+class ReplayStore:
+    """Replay objects and their chunk indexes in an `ObjectStore`."""
+
+    def __init__(self, store: ObjectStore) -> None:
+        self.store = store
+
+    async def locate(self, session_id: str) -> Optional[tuple[str, ReplayCodec]]:
+        """Key and codec of the session's replay object, if one exists."""
+        for codec in CODECS.values():
+            key = replay_key(session_id, codec)
+            if await self.store.size(key) is not None:
+                return key, codec
+        return None
+
+    async def append_chunk(self, session_id: str, events: list[dict[str, Any]]) -> StoredChunk:
+        """
+        Compress and append a chunk of rrweb events.
+
+        A session keeps the codec its object was created with, so changing
+        `replay_compression` never mixes formats within one object.
+        """
+        located = await self.locate(session_id)
+        if located is None:
+            codec = CODECS[settings.replay_compression]
+            key = replay_key(session_id, codec)
+        else:
+            key, codec = located
+
+        data = encode_chunk(events, codec)
+        offset = await self.store.append(key, data)
+        timestamps = [ts for ts in map(event_timestamp_ms, events) if ts is not None]
+        chunk = ReplayChunk(offset, len(data), len(events), min(timestamps, default=0))
+        entry = _INDEX_ENTRY.pack(
+            chunk.offset, chunk.length, chunk.event_count, chunk.first_timestamp_ms
+        )
+        await self.store.append(key + _INDEX_SUFFIX, entry)
+        return StoredChunk(key, codec, chunk, offset + len(data))
+
+    async def chunks(self, key: str) -> list[ReplayChunk]:
+        """Chunk index of a replay object."""
+        try:
+            data = b"".join([block async for block in self.store.read(key + _INDEX_SUFFIX)])
+        except FileNotFoundError:
+            return []
+        return parse_chunk_index(data)
+
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream compressed bytes [start, end) of a replay object."""
+        return self.store.read(key, start, end)
+
+    async def delete(self, key: str) -> None:
+        await self.store.delete(key)
+        await self.store.delete(key + _INDEX_SUFFIX)
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Single `bytes=` range as [start, end) within an object of `size` bytes.
+
+    Returns:
+        None when no range was requested
+
+    Raises:
+        ValueError: For malformed, multi-part or unsatisfiable ranges
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise ValueError("Only single byte ranges are supported")
+    first, _, last = spec.strip().partition("-")
+    if not first and not last:
+        raise ValueError("Invalid byte range")
+    if not first:
+        start, end = max(size - int(last), 0), size  # Suffix range: last N bytes
+    else:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+async def record_replay_chunk(
+    db: AsyncSession,
+    session_id: str,
+    visitor_id: str,
+    events: list[dict[str, Any]],
+    stored: StoredChunk,
+    has_console_logs: bool = False,
+    has_network_data: bool = False,
+    privacy_mode: str = "strict",
+) -> None:
+    """
+    Fold an appended chunk into the session's `session_replays` row.
+
+    Counters add up, the size is the object's size after this append, and
+    the duration runs from the first recorded event to the latest one seen.
+    Retention runs from the server time of the first chunk, so a client
+    clock cannot push a replay past expiry.
+    """
+    timestamps = [ts for ts in map(event_timestamp_ms, events) if ts is not None]
+    now = datetime.utcnow()
+    first_ms = min(timestamps, default=None)
+    last_ms = max(timestamps, default=None)
+    recorded_at = datetime.utcfromtimestamp(first_ms / 1000) if first_ms is not None else now
+
+    # Frustration signals detected before the first chunk arrived
+    session = AnalyticsSession
+
+    def session_signal(expression: Any) -> Any:
+        return select(expression).where(session.session_id == session_id).scalar_subquery()
+
+    stmt = pg_insert(SessionReplay).values(
+        session_id=session_id,
+        visitor_id=visitor_id,
+        duration_ms=min(last_ms - first_ms, MAX_DURATION_MS) if timestamps else 0,
+        event_count=len(events),
+        storage_path=stored.key,
+        compressed_size_bytes=stored.object_size,
+        has_console_logs=has_console_logs,
+        has_network_data=has_network_data,
+        privacy_mode=privacy_mode,
+        has_errors=func.coalesce(session_signal(session.has_error), False),
+        has_rage_clicks=func.coalesce(session_signal(session.has_rage_click), False),
+        quality_score=session_signal(
+            replay_quality_score(
+                session.has_rage_click, session.has_error, session.dead_click_count
+            )
+        ),
+        processing_status="pending",
+        recorded_at=recorded_at,
+        expires_at=now + timedelta(days=settings.replay_retention_days),
+        created_at=now,
+    )
+    current = SessionReplay
+    new = stmt.excluded
+    duration = current.duration_ms
+    if last_ms is not None:
+        started_ms = extract("epoch", current.recorded_at) * 1000
+        since_start = cast(
+            func.least(literal(last_ms, BigInteger) - started_ms, MAX_DURATION_MS), Integer
+        )
+        duration = func.greatest(func.coalesce(current.duration_ms, 0), since_start)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[SessionReplay.session_id],
+            set_={
+                "event_count": func.coalesce(current.event_count, 0) + new.event_count,
+                "duration_ms": duration,
+                "storage_path": new.storage_path,
+                "compressed_size_bytes": func.greatest(
+                    func.coalesce(current.compressed_size_bytes, 0), new.compressed_size_bytes
+                ),
+                "has_console_logs": current.has_console_logs | new.has_console_logs,
+                "has_network_data": current.has_network_data | new.has_network_data,
+            },
+        )
+    )
+    await db.commit()
+
+
+def replay_list_query(
+    date_from: datetime,
+    date_to: datetime,
+    min_quality_score: Optional[float] = None,
+    has_errors: Optional[bool] = None,
+    has_rage_clicks: Optional[bool] = None,
+):
+    """
+    Replays recorded in [date_from, date_to], best first.
+
+    A minimum score above `QUALITY_INDEX_THRESHOLD` repeats the partial
+    index predicate, so Postgres walks idx_replays_quality in score order
+    and stops at the page limit; other listings are newest first through
+    idx_replays_recorded_at.
+    """
+    conditions = [
+        SessionReplay.recorded_at >= date_from,
+        SessionReplay.recorded_at <= date_to,
+    ]
+    if has_errors is not None:
+        conditions.append(SessionReplay.has_errors == has_errors)
+    if has_rage_clicks is not None:
+        conditions.append(SessionReplay.has_rage_clicks == has_rage_clicks)
+
+    if min_quality_score is not None and min_quality_score > QUALITY_INDEX_THRESHOLD:
+        conditions += [
+            # Inlined, not bound: a generic plan could not prove the index predicate
+            SessionReplay.quality_score > literal_column(str(QUALITY_INDEX_THRESHOLD)),
+            SessionReplay.quality_score >= min_quality_score,
+        ]
+        order = (SessionReplay.quality_score.desc(), SessionReplay.recorded_at.desc())
+    else:
+        if min_quality_score is not None:
+            conditions.append(SessionReplay.quality_score >= min_quality_score)
+        order = (SessionReplay.recorded_at.desc(),)
+    return select(SessionReplay).where(and_(*conditions)).order_by(*order)
+
+
+async def list_replays(
+    db: AsyncSession,
+    date_from: datetime,
+    date_to: datetime,
+    min_quality_score: Optional[float] = None,
+    has_errors: Optional[bool] = None,
+    has_rage_clicks: Optional[bool] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> tuple[int, list[SessionReplay]]:
+    """
+    One page of replay metadata and the total number of matches.
+
+    Returns:
+        (total, replays)
+    """
+    query = replay_list_query(date_from, date_to, min_quality_score, has_errors, has_rage_clicks)
+    total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+    replays = (await db.execute(query.limit(limit).offset(offset))).scalars().all()
+    return total or 0, list(replays)
+
+
+async def delete_expired_replays(
+    db: AsyncSession,
+    store: Optional[ReplayStore] = None,
+    now: Optional[datetime] = None,
+    batch_size: int = 500,
+) -> dict[str, int]:
+    """
+    Delete replays past `expires_at`: objects first, then their rows.
+
+    Returns:
+        Number of replays deleted
+    """
+    store = store or replay_store
+    now = now or datetime.utcnow()
+    deleted = 0
+    while True:
+        rows = (
+            await db.execute(
+                select(SessionReplay.id, SessionReplay.storage_path)
+                .where(SessionReplay.expires_at < now)
+                .limit(batch_size)
+            )
+        ).all()
+        if not rows:
+            break
+        for _, key in rows:
+            if key:
+                await store.delete(key)
+        await db.execute(
+            delete(SessionReplay).where(SessionReplay.id.in_([row.id for row in rows]))
+        )
+        await db.commit()
+        deleted += len(rows)
+
+    if deleted:
+        logger.info("Expired session replays deleted", replays=deleted)
+    return {"deleted": deleted}
+
+
+replay_store = ReplayStore(create_object_store())
@@ -0,0 +1,172 @@
+"""
+Session Scoring - Vectorized quality scores for analytics sessions.
+
+Provides:
+- `score_sessions`: the session quality rules (duration, pageviews,
+  clicks, conversion, bounce) applied to whole NumPy columns at once
+- `rescore_sessions`: pages through the sessions of a time range in
+  columns, scores them and writes changed scores back with one
+  `UPDATE ... FROM (VALUES ...)` and commit per batch
+
+Scores range from 0 to 100; higher means more likely to convert.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+import numpy as np
+from sqlalchemy import Float, String, column, func, select, tuple_, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.analytics import AnalyticsSession
+
+logger = get_logger(__name__)
+
+BASE_SCORE = 50.0
+BOUNCE_PENALTY = 30.0
+
+# (thresholds, bonuses): a bonus applies from its threshold upwards.
+# Durations must exceed their threshold; counts must reach it.
+DURATION_BONUS = ((30, 120, 300), (0.0, 5.0, 10.0, 20.0))
+PAGEVIEW_BONUS = ((2, 3, 5), (0.0, 5.0, 10.0, 15.0))
+CLICK_BONUS = ((2, 5, 10), (0.0, 5.0, 10.0, 15.0))
+
+# Column order of rows paged into `rescore_sessions`; start_time last
+# is only the keyset position
+_SCORE_COLUMNS = (
+    AnalyticsSession.session_id,
+    func.coalesce(AnalyticsSession.duration_seconds, 0),
+    func.coalesce(AnalyticsSession.pageview_count, 0),
+    func.coalesce(AnalyticsSession.click_count, 0),
+    func.coalesce(AnalyticsSession.has_conversion, False),
+    func.coalesce(AnalyticsSession.is_bounce, False),
+    AnalyticsSession.quality_score,
+    AnalyticsSession.start_time,
+)
+
+
+def _bonus(values_: np.ndarray, rule: tuple[tuple[int, ...], tuple[float, ...]], side: str):
+    thresholds, bonuses = rule
+    return np.asarray(bonuses)[np.searchsorted(thresholds, values_, side=side)]
+
+
+def score_sessions(
+    duration_seconds: np.ndarray,
+    pageview_count: np.ndarray,
+    click_count: np.ndarray,
+    has_conversion: np.ndarray,
+    is_bounce: np.ndarray,
+) -> np.ndarray:
+    """
+    Quality scores for equally long columns of session metrics.
+
+    A conversion scores 100 outright; a bounce then costs 30 points.
+
+    Returns:
+        float64 array of scores in [0, 100]
+    """
+    scores = (
+        BASE_SCORE
+        + _bonus(np.asarray(duration_seconds), DURATION_BONUS, "left")
+        + _bonus(np.asarray(pageview_count), PAGEVIEW_BONUS, "right")
+        + _bonus(np.asarray(click_count), CLICK_BONUS, "right")
+    )
+    scores = np.where(np.asarray(has_conversion, dtype=bool), 100.0, scores)
+    scores = np.where(
+        np.asarray(is_bounce, dtype=bool), np.maximum(scores - BOUNCE_PENALTY, 0.0), scores
+    )
+    return np.minimum(scores, 100.0)
+
+
+def _changed_scores(rows: list[Any]) -> list[tuple[str, float]]:
+    """Score a batch of paged rows; only sessions whose score moved are returned."""
+    session_ids, duration, pageviews, clicks, conversion, bounce, current, *_ = zip(
+        *rows, strict=True
+    )
+    scores = score_sessions(
+        np.fromiter(duration, dtype=np.int64, count=len(rows)),
+        np.fromiter(pageviews, dtype=np.int64, count=len(rows)),
+        np.fromiter(clicks, dtype=np.int64, count=len(rows)),
+        np.fromiter(conversion, dtype=bool, count=len(rows)),
+        np.fromiter(bounce, dtype=bool, count=len(rows)),
+    )
+    previous = np.array([np.nan if s is None else s for s in current], dtype=np.float64)
+    changed = np.flatnonzero(~np.isclose(scores, previous))  # NaN never matches
+    return [(session_ids[i], float(scores[i])) for i in changed]
+
+
+async def _write_scores(db: AsyncSession, scores: list[tuple[str, float]]) -> None:
+    """Write scores with a single UPDATE ... FROM (VALUES ...)."""
+    rows = values(
+        column("session_id", String), column("score", Float), name="scores"
+    ).data(sorted(scores))  # Stable row order keeps concurrent writers from deadlocking
+    await db.execute(
+        update(AnalyticsSession)
+        .where(AnalyticsSession.session_id == rows.c.session_id)
+        # Scoring is not session activity; keep updated_at as it was
+        .values(quality_score=rows.c.score, updated_at=AnalyticsSession.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def rescore_sessions(
+    db: AsyncSession,
+    date_from: datetime,
+    date_to: datetime,
+    batch_rows: Optional[int] = None,
+) -> dict[str, int]:
+    """
+    Recompute quality scores of sessions that started in [date_from, date_to].
+
+    Sessions are read in keyset pages of `batch_rows` ordered by
+    (start_time, session_id). Each page becomes one set of NumPy columns and
+    at most one UPDATE (keeping bind parameters under the driver's limit),
+    and is committed on its own: the range covers the live sessions that
+    post-ingest upserts write, so row locks are held for one batch only.
+
+    Returns:
+        Sessions scored and scores changed
+    """
+    batch_rows = batch_rows or settings.session_score_batch_rows
+    query = (
+        select(*_SCORE_COLUMNS)
+        .where(
+            AnalyticsSession.start_time >= date_from,
+            AnalyticsSession.start_time <= date_to,
+        )
+        .order_by(AnalyticsSession.start_time, AnalyticsSession.session_id)
+        .limit(batch_rows)
+    )
+    position = tuple_(AnalyticsSession.start_time, AnalyticsSession.session_id)
+
+    scored = updated = 0
+    after: Optional[tuple[datetime, str]] = None
+    while True:
+        page = query if after is None else query.where(position > tuple_(*after))
+        rows = (await db.execute(page)).all()
+        if not rows:
+            break
+
+        changed = _changed_scores(rows)
+        if changed:
+            await _write_scores(db, changed)
+        await db.commit()
+        scored += len(rows)
+        updated += len(changed)
+
+        if len(rows) < batch_rows:
+            break
+        after = (rows[-1].start_time, rows[-1].session_id)
+
+    logger.info("Session quality scores refreshed", sessions=scored, updated=updated)
+    return {"sessions": scored, "updated": updated}
+
+
+async def rescore_recent_sessions(
+    db: AsyncSession, now: Optional[datetime] = None
+) -> dict[str, int]:
+    """Rescore sessions started within `session_score_lookback_hours`."""
+    now = now or datetime.utcnow()
+    since = now - timedelta(hours=settings.session_score_lookback_hours)
+    return await rescore_sessions(db, since, now)
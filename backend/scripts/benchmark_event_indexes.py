@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Benchmark analytics_events insert throughput under the old and new index sets.
+
+Creates one scratch table per index set (same columns as analytics_events,
+not partitioned, so only index maintenance differs), inserts the same
+synthetic events in ingest-sized batches, and reports rows/second, index
+size and the latency of the raw top-pages query. Scratch tables are dropped
+afterwards.
+
+`--explain` instead prints EXPLAIN ANALYZE plans of the read paths that lost
+their path and event_type indexes (summary scans, funnel and heatmap event
+queries), run against analytics_events of the configured database over its
+most recent day of events.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/benchmark_event_indexes.py \
+        --rows 200000 --batch-size 500
+    DATABASE_URL=postgresql://... python scripts/benchmark_event_indexes.py --explain
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func, select, text  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+
+from app.core.database import engine  # noqa: E402
+from app.models.analytics import AnalyticsEvent, HeatmapData  # noqa: E402
+from app.services.analytics_summary import (  # noqa: E402
+    RangeSegment,
+    _raw_event_totals,
+    _visitor_breakdowns,
+)
+from app.services.funnel_engine import FunnelMatcher, funnel_events_query  # noqa: E402
+from app.services.heatmap_engine import (  # noqa: E402
+    _days_with_gaps,
+    heatmap_events_query,
+    viewport_bucket,
+)
+
+# Index set created by 002 (plus the ecommerce partial index from the model)
+BEFORE_INDEXES = [
+    *(
+        f"CREATE INDEX ON {{table}} ({column})"
+        for column in (
+            "event_type", "session_id", "visitor_id", "user_id", "timestamp", "path",
+            "referrer_domain", "utm_source", "utm_medium", "utm_campaign",
+            "country_code", "is_bot",
+        )
+    ),
+    "CREATE INDEX ON {table} (timestamp, path)",
+    "CREATE INDEX ON {table} (session_id, timestamp)",
+    "CREATE INDEX ON {table} (visitor_id, timestamp)",
+    "CREATE INDEX ON {table} (event_type, timestamp)",
+    "CREATE INDEX ON {table} (timestamp) WHERE ecommerce_data IS NOT NULL",
+]
+
+# Index set after 006 and 011
+AFTER_INDEXES = [
+    "CREATE INDEX ON {table} USING brin (timestamp) WITH (pages_per_range = 32)",
+    "CREATE INDEX ON {table} USING brin (created_at)",
+    "CREATE INDEX ON {table} (session_id, timestamp)",
+    "CREATE INDEX ON {table} (timestamp) INCLUDE (path, visitor_id) "
+    "WHERE event_type = 'pageview' AND is_bot = false",
+    "CREATE INDEX ON {table} (path, timestamp) "
+    "WHERE event_type IN ('click', 'scroll') AND is_bot = false",
+]
+
+TOP_PAGES_SQL = """
+    SELECT path, count(*) FROM {table}
+    WHERE event_type = 'pageview' AND is_bot = false
+      AND timestamp >= :start AND timestamp < :end
+    GROUP BY path ORDER BY count(*) DESC LIMIT 10
+"""
+
+COLUMNS = (
+    "id", "event_type", "session_id", "visitor_id", "timestamp", "url", "path",
+    "referrer_domain", "utm_source", "utm_medium", "utm_campaign", "device_type",
+    "country_code", "is_bot", "created_at",
+)
+
+
+def synthetic_events(rows: int, start: datetime) -> list[dict[str, Any]]:
+    """Events in arrival order with a realistic mix of types and dimensions."""
+    rng = random.Random(42)
+    paths = [f"/products/{i}" for i in range(200)] + ["/", "/cart", "/checkout"]
+    events = []
+    for index in range(rows):
+        timestamp = start + timedelta(milliseconds=index * 50)
+        session = rng.randrange(rows // 8 + 1)
+        path = rng.choice(paths)
+        events.append({
+            "id": uuid.uuid4(),
+            "event_type": rng.choices(["pageview", "click", "scroll"], [6, 3, 1])[0],
+            "session_id": f"s{session}",
+            "visitor_id": f"v{session // 2}",
+            "timestamp": timestamp,
+            "url": f"https://shop.example{path}",
+            "path": path,
+            "referrer_domain": rng.choice([None, "google.com", "facebook.com"]),
+            "utm_source": rng.choice([None, "newsletter", "ads"]),
+            "utm_medium": rng.choice([None, "email", "cpc"]),
+            "utm_campaign": rng.choice([None, "spring", "launch"]),
+            "device_type": rng.choice(["desktop", "mobile", "tablet"]),
+            "country_code": rng.choice(["US", "GB", "DE", "FR", None]),
+            "is_bot": rng.random() < 0.05,
+            "created_at": timestamp,
+        })
+    return events
+
+
+async def run_variant(
+    name: str,
+    indexes: list[str],
+    events: list[dict[str, Any]],
+    batch_size: int,
+) -> dict[str, Any]:
+    """Insert `events` into a scratch table with `indexes` and measure it."""
+    table = f"bench_events_{name}"
+    insert_sql = text(
+        f"INSERT INTO {table} ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join(':' + column for column in COLUMNS)})"
+    )
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        await conn.execute(
+            text(f"CREATE TABLE {table} (LIKE analytics_events INCLUDING DEFAULTS)")
+        )
+        for ddl in indexes:
+            await conn.execute(text(ddl.format(table=table)))
+
+    try:
+        started = time.perf_counter()
+        for offset in range(0, len(events), batch_size):
+            async with engine.begin() as conn:
+                await conn.execute(insert_sql, events[offset:offset + batch_size])
+        elapsed = time.perf_counter() - started
+
+        # VACUUM sets the visibility map so covering indexes can answer index-only
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+        async with engine.begin() as conn:
+            index_bytes = await conn.scalar(text(f"SELECT pg_indexes_size('{table}')"))
+            window = {
+                "start": events[len(events) // 4]["timestamp"],
+                "end": events[len(events) // 2]["timestamp"],
+            }
+            query_started = time.perf_counter()
+            await conn.execute(text(TOP_PAGES_SQL.format(table=table)), window)
+            query_ms = (time.perf_counter() - query_started) * 1000
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+    return {
+        "variant": name,
+        "indexes": len(indexes),
+        "rows_per_second": len(events) / elapsed,
+        "index_mb": index_bytes / 1024 / 1024,
+        "top_pages_ms": query_ms,
+    }
+
+
+class StatementCapture:
+    """Stands in for a session and keeps the statements a read path executes."""
+
+    def __init__(self) -> None:
+        self.statements: list[Any] = []
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return EmptyResult()
+
+
+class EmptyResult(list):
+    """No rows, in the shapes the read paths consume them."""
+
+    def scalars(self) -> list:
+        return []
+
+
+async def read_path_statements(start: datetime, end: datetime) -> dict[str, Any]:
+    """Statements of the read paths that relied on the dropped indexes."""
+    capture = StatementCapture()
+    await _raw_event_totals(capture, RangeSegment("raw", start, end))
+    await _visitor_breakdowns(capture, start, end, ["/", "/cart"])
+    gap_row = HeatmapData(date_from=start, date_to=end, accumulated_from=start + (end - start) / 2)
+    await _days_with_gaps(capture, "/cart", viewport_bucket(1440), [gap_row])
+    summary_totals, summary_visitors, heatmap_gaps = capture.statements
+
+    funnel = FunnelMatcher([{"url_pattern": "/products/*"}, {"url_pattern": "/cart"}])
+    return {
+        "summary raw totals": summary_totals,
+        "summary visitor breakdowns": summary_visitors,
+        "funnel events": funnel_events_query(funnel, start, end),
+        "heatmap events (partial day)": heatmap_events_query(
+            "/cart", viewport_bucket(1440), start + (end - start) / 2, end
+        ),
+        "heatmap gap probe": heatmap_gaps,
+    }
+
+
+async def explain_read_paths() -> None:
+    """Print EXPLAIN ANALYZE of each read path over the latest day of events."""
+    async with engine.connect() as conn:
+        end = await conn.scalar(select(func.max(AnalyticsEvent.timestamp)))
+    if end is None:
+        print("analytics_events is empty")
+        return
+    start = end - timedelta(days=1)
+
+    for name, statement in (await read_path_statements(start, end)).items():
+        sql = statement.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+        async with engine.connect() as conn:
+            plan = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {sql}"))
+            print(f"-- {name}")
+            print("\n".join(row[0] for row in plan))
+            print()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=200_000, help="Events to insert per variant")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per insert transaction")
+    parser.add_argument(
+        "--explain", action="store_true", help="Plan the read paths instead of inserting"
+    )
+    args = parser.parse_args()
+
+    if args.explain:
+        await explain_read_paths()
+        await engine.dispose()
+        return
+
+    events = synthetic_events(args.rows, datetime(2026, 1, 1))
+    results = [
+        await run_variant("before", BEFORE_INDEXES, events, args.batch_size),
+        await run_variant("after", AFTER_INDEXES, events, args.batch_size),
+    ]
+    await engine.dispose()
+
+    print(f"{'variant':<8} {'indexes':>7} {'rows/s':>10} {'index MB':>9} {'top pages ms':>13}")
+    for result in results:
+        print(
+            f"{result['variant']:<8} {result['indexes']:>7} "
+            f"{result['rows_per_second']:>10.0f} {result['index_mb']:>9.1f} "
+            f"{result['top_pages_ms']:>13.1f}"
+        )
+    before, after = results
+    print(f"insert speedup: {after['rows_per_second'] / before['rows_per_second']:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Benchmark 90-day historical summaries over the Parquet archive.
+
+Generates synthetic archived days (one Parquet file per day, same layout as
+the cold-storage export), then times the event side of a summary over the
+whole range with each archive engine:
+
+- pyarrow: vectorized counters plus a visitor table whose distinct counts
+  Arrow's hash aggregation takes (what the summary does with
+  COLD_QUERY_ENGINE=pyarrow)
+- duckdb: counters plus exact COUNT(DISTINCT) inside DuckDB
+- postgres: the same events copied into analytics_events, one partition
+  per day, and the whole summary built from those rows with rollups and
+  cold storage off, i.e. the hot path the archive replaces
+
+`--engines` picks the variants. The pyarrow visitor table holds every
+event's visitor id in memory, so run it on its own at large volumes.
+
+Usage:
+    python scripts/benchmark_historical_summary.py --events 50000000 --days 90 \
+        --directory /tmp/cold_bench
+    DATABASE_URL=postgresql://... python scripts/benchmark_historical_summary.py \
+        --events 50000000 --days 90 --directory /tmp/cold_bench --engines duckdb,postgres
+"""
+import argparse
+import asyncio
+import io
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import async_session_factory, engine  # noqa: E402
+from app.services.analytics_summary import build_analytics_summary  # noqa: E402
+from app.services.cold_storage import (  # noqa: E402
+    _event_schema,
+    _pyarrow,
+    cold_file_path,
+    cold_visitor_table,
+    count_distinct_visitors,
+    read_cold_counters,
+)
+from app.services.duckdb_engine import DuckDBEngine  # noqa: E402
+from app.services.event_partitions import (  # noqa: E402
+    create_event_partition,
+    list_event_partitions,
+    partition_name,
+)
+
+START = datetime(2026, 1, 1)
+
+# Archive columns the generator fills, copied into Postgres next to a fresh id
+COPY_COLUMNS = [
+    "event_type", "session_id", "visitor_id", "timestamp", "url", "path",
+    "referrer_domain", "country_code", "device_type", "is_bot", "created_at",
+]
+
+
+def generate_archive(directory: Path, events: int, days: int) -> None:
+    """Write `days` day files holding `events` synthetic events in total."""
+    pa = _pyarrow()
+    schema = _event_schema()
+    rng = np.random.default_rng(42)
+    per_day = events // days
+    paths = np.array([f"/products/{i}" for i in range(500)] + ["/", "/cart", "/checkout"])
+    event_types = np.array(["pageview", "click", "scroll"])
+    referrers = np.array(["google.com", "facebook.com", "instagram.com"])
+    countries = np.array(["US", "GB", "DE", "FR", "CA"])
+    devices = np.array(["desktop", "mobile", "tablet"])
+    visitors_per_day = max(per_day // 6, 1)
+
+    for offset in range(days):
+        day = START + timedelta(days=offset)
+        path = cold_file_path(directory, day.date())
+        if path.exists():
+            continue
+
+        # Visitors overlap across days so distinct counts are not additive
+        visitor_numbers = rng.integers(0, visitors_per_day * 3, per_day) + offset * visitors_per_day
+        visitors = np.char.add("v", visitor_numbers.astype(str))
+        timestamps = np.datetime64(day) + np.sort(
+            rng.integers(0, 86_400_000_000, per_day)
+        ).astype("timedelta64[us]")
+        referrer_values = referrers[rng.integers(0, len(referrers), per_day)].astype(object)
+        referrer_values[rng.random(per_day) < 0.7] = None
+
+        columns = {
+            "event_type": event_types[rng.choice(3, per_day, p=[0.6, 0.3, 0.1])],
+            "session_id": np.char.add(visitors, "-s"),
+            "visitor_id": visitors,
+            "timestamp": timestamps,
+            "url": paths[rng.integers(0, len(paths), per_day)],
+            "path": paths[rng.integers(0, len(paths), per_day)],
+            "referrer_domain": referrer_values,
+            "country_code": countries[rng.integers(0, len(countries), per_day)],
+            "device_type": devices[rng.integers(0, len(devices), per_day)],
+            "is_bot": rng.random(per_day) < 0.03,
+            "created_at": timestamps,
+        }
+        arrays = [
+            pa.array(columns[field.name], type=field.type)
+            if field.name in columns
+            else pa.nulls(per_day, type=field.type)
+            for field in schema
+        ]
+        _pyarrow().parquet.write_table(
+            pa.Table.from_arrays(arrays, schema=schema), path, compression="zstd"
+        )
+        print(f"wrote {path.name} ({per_day} events)", flush=True)
+
+
+async def load_postgres(directory: Path, days: int) -> None:
+    """Copy the archive's day files into analytics_events, one partition per day."""
+    pa = _pyarrow()
+    import pyarrow.csv
+
+    rng = np.random.default_rng(7)
+    async with async_session_factory() as db:
+        loaded = set(await list_event_partitions(db))
+        for offset in range(days):
+            day = (START + timedelta(days=offset)).date()
+            if day in loaded:
+                continue
+            table = pa.parquet.read_table(cold_file_path(directory, day), columns=COPY_COLUMNS)
+            ids = rng.bytes(16 * table.num_rows)
+            table = table.add_column(
+                0, "id", pa.array([ids[i:i + 16].hex() for i in range(0, len(ids), 16)])
+            )
+            buffer = io.BytesIO()
+            pyarrow.csv.write_csv(table, buffer)
+            buffer.seek(0)
+
+            # Partition and rows commit together, so a rerun resumes at this day
+            await create_event_partition(db, day)
+            connection = await (await db.connection()).get_raw_connection()
+            await connection.driver_connection.copy_to_table(
+                partition_name(day),
+                source=buffer,
+                columns=table.column_names,
+                format="csv",
+                header=True,
+            )
+            await db.commit()
+            print(f"copied {day} ({table.num_rows} events)", flush=True)
+        await db.execute(text("ANALYZE analytics_events"))
+        await db.commit()
+
+
+def run_pyarrow(directory: Path, start: datetime, end: datetime) -> dict:
+    pages, referrers = read_cold_counters(directory, start, end, True)
+    top_paths = [path for path, _ in pages.most_common(10)]
+    table = cold_visitor_table(directory, start, end, top_paths, True)
+    counts, _ = count_distinct_visitors([table])
+    return {"pageviews": sum(pages.values()), "visitors": counts["total"][""]}
+
+
+def run_duckdb(engine: DuckDBEngine, directory: Path, start: datetime, end: datetime) -> dict:
+    pages, referrers = engine.counters(directory, start, end, True)
+    top_paths = [path for path, _ in Counter(pages).most_common(10)]
+    visitors, *_ = engine.visitor_breakdowns(directory, start, end, top_paths)
+    return {"pageviews": sum(pages.values()), "visitors": visitors}
+
+
+async def run_postgres(directory: Path, days: int, start: datetime, end: datetime) -> tuple:
+    """Load the archive into Postgres, then time an exact summary from its rows."""
+    await load_postgres(directory, days)
+    settings.analytics_rollups_enabled = False
+    settings.cold_storage_enabled = False
+    try:
+        async with async_session_factory() as db:
+            started = time.perf_counter()
+            summary = await build_analytics_summary(db, start, end, exact=True)
+            elapsed = time.perf_counter() - started
+    finally:
+        await engine.dispose()
+    result = {"pageviews": summary.total_pageviews, "visitors": summary.total_visitors}
+    return "postgres", elapsed, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--events", type=int, default=50_000_000, help="Total synthetic events")
+    parser.add_argument("--days", type=int, default=90, help="Days in the archive and the range")
+    parser.add_argument("--directory", default="data/cold_bench", help="Archive directory")
+    parser.add_argument("--threads", type=int, default=4, help="DuckDB threads")
+    parser.add_argument(
+        "--engines",
+        default="pyarrow,duckdb",
+        help="Comma-separated variants to time: pyarrow, duckdb, postgres",
+    )
+    args = parser.parse_args()
+    engines = args.engines.split(",")
+
+    directory = Path(args.directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    generate_archive(directory, args.events, args.days)
+
+    start = START
+    end = START + timedelta(days=args.days) - timedelta(microseconds=1)
+
+    results = []
+    if "pyarrow" in engines:
+        started = time.perf_counter()
+        result = run_pyarrow(directory, start, end)
+        results.append(("pyarrow", time.perf_counter() - started, result))
+    if "duckdb" in engines:
+        duckdb_engine = DuckDBEngine(threads=args.threads, memory_limit="4GB")
+        started = time.perf_counter()
+        result = run_duckdb(duckdb_engine, directory, start, end)
+        results.append(("duckdb", time.perf_counter() - started, result))
+        duckdb_engine.close()
+    if "postgres" in engines:
+        results.append(asyncio.run(run_postgres(directory, args.days, start, end)))
+
+    print(f"\n{'engine':<8} {'seconds':>8} {'pageviews':>12} {'visitors':>10}")
+    for name, elapsed, result in results:
+        print(f"{name:<8} {elapsed:>8.2f} {result['pageviews']:>12} {result['visitors']:>10}")
+
+
+if __name__ == "__main__":
+    main()
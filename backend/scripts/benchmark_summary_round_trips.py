@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark the database round trips of one analytics summary.
+
+Builds the summary for a range of the configured database twice, once with
+all queries on the request session (ANALYTICS_SUMMARY_MAX_CONNECTIONS=1)
+and once with concurrent pooled connections, and reports the statements
+sent to Postgres and the wall-clock time of each run. `--raw` disables the
+rollups so every metric is aggregated from analytics_events, the path the
+GROUPING SETS queries replace. `--date-to` ends the range at midnight of
+a given day instead of now, e.g. on the archive loaded by
+benchmark_historical_summary.py --engines postgres.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/benchmark_summary_round_trips.py \
+        --days 7 --raw --repeat 5 [--date-to 2026-03-01]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import async_session_factory, engine  # noqa: E402
+from app.services.analytics_summary import build_analytics_summary  # noqa: E402
+
+
+class StatementCounter:
+    """Counts statements executed on the engine."""
+
+    def __init__(self) -> None:
+        self.statements = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements += 1
+
+
+async def run_variant(
+    max_connections: int,
+    date_from: datetime,
+    date_to: datetime,
+    repeat: int,
+    counter: StatementCounter,
+) -> dict:
+    """Time `repeat` summaries with the given connection limit."""
+    settings.analytics_summary_max_connections = max_connections
+    timings = []
+    statements = 0
+    for _ in range(repeat):
+        counter.statements = 0
+        async with async_session_factory() as db:
+            started = time.perf_counter()
+            await build_analytics_summary(db, date_from, date_to)
+            timings.append((time.perf_counter() - started) * 1000)
+        statements = counter.statements
+    return {
+        "connections": max_connections,
+        "statements": statements,
+        "median_ms": statistics.median(timings),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--days", type=int, default=7, help="Days in the summary range")
+    parser.add_argument("--repeat", type=int, default=5, help="Summaries per variant")
+    parser.add_argument("--raw", action="store_true", help="Disable rollups")
+    parser.add_argument("--connections", type=int, default=4, help="Concurrent connections")
+    parser.add_argument(
+        "--date-to", type=datetime.fromisoformat, default=None, help="Range end (default: now)"
+    )
+    args = parser.parse_args()
+
+    if args.raw:
+        settings.analytics_rollups_enabled = False
+    date_to = args.date_to or datetime.utcnow()
+    date_from = date_to - timedelta(days=args.days)
+
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    results = [
+        await run_variant(1, date_from, date_to, args.repeat, counter),
+        await run_variant(args.connections, date_from, date_to, args.repeat, counter),
+    ]
+    await engine.dispose()
+
+    print(f"{'connections':>11} {'statements':>10} {'median ms':>10}")
+    for result in results:
+        print(
+            f"{result['connections']:>11} {result['statements']:>10} "
+            f"{result['median_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Compile a GeoIP CSV into the binary range table used at ingest.
+
+Usage:
+    # MaxMind GeoLite2 City/Country CSV
+    python scripts/build_geoip_db.py GeoLite2-City-Blocks-IPv4.csv geoip.bin \
+        --locations GeoLite2-City-Locations-en.csv
+
+    # Range CSV: ip_from,ip_to,country_code,country_name,region,city,timezone
+    python scripts/build_geoip_db.py ip-ranges.csv geoip.bin
+
+Then set GEOIP_DATABASE_PATH=geoip.bin.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.geoip import compile_geoip_csv  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("blocks", help="GeoLite2 blocks CSV or IP range CSV")
+    parser.add_argument("output", help="Compiled database file to write")
+    parser.add_argument("--locations", help="GeoLite2 locations CSV (for GeoLite2 blocks)")
+    args = parser.parse_args()
+
+    ranges = compile_geoip_csv(args.blocks, args.output, locations_path=args.locations)
+    print(f"Wrote {ranges} ranges to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+"""
+Tests for analytics event ingestion.
+"""
+import asyncio
+import re
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DataError
+
+from app.core import batching as batching_module
+from app.schemas.analytics import EventType, TrackEventRequest
+from app.services import ingest_buffer as ingest_buffer_module
+from app.services.analytics_service import (
+    build_event_record,
+    detect_bot,
+    fold_session_events,
+    get_user_agent_cache_stats,
+    parse_user_agent,
+    update_session_metrics,
+)
+from app.services.geoip import GeoIPDatabase, GeoLocation, compile_geoip_csv
+from app.services.ingest_buffer import IngestBuffer, IngestBufferFullError
+from app.services.post_ingest import PostIngestBacklogFullError, PostIngestExecutor
+
+CHROME_UA = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+@pytest.fixture
+def track_request() -> TrackEventRequest:
+    """Sample pageview tracking request."""
+    return TrackEventRequest(
+        event_type="pageview",
+        session_id="sess_1",
+        visitor_id="visitor_1",
+        url="https://shop.example.com/products/widget?ref=nav",
+        path="/products/widget",
+        referrer="https://www.google.com/search?q=widget",
+        user_agent=CHROME_UA,
+        viewport_width=1280,
+    )
+
+
+class TestBuildEventRecord:
+    """Tests for in-memory event enrichment."""
+
+    def test_record_is_enriched(self, track_request: TrackEventRequest):
+        """Test the row carries parsed UA, referrer domain and hashed IP."""
+        record = build_event_record(track_request, "abc123")
+
+        assert isinstance(record["id"], uuid.UUID)
+        assert record["event_type"] == "pageview"
+        assert record["referrer_domain"] == "google.com"
+        assert record["browser"] == "Chrome"
+        assert record["device_type"] == "desktop"
+        assert record["ip_address_hash"] == "abc123"
+        assert record["is_bot"] is False
+        assert record["timestamp"] == record["created_at"]
+
+    def test_records_share_column_set(self, track_request: TrackEventRequest):
+        """Test every row has the same keys so a batch can be one multi-row INSERT."""
+        other = track_request.model_copy(update={"referrer": None, "event_type": EventType.CLICK})
+
+        first = build_event_record(track_request, None)
+        second = build_event_record(other, None)
+
+        assert first.keys() == second.keys()
+        assert first["id"] != second["id"]
+        assert second["referrer_domain"] is None
+
+    def test_invalid_user_id_is_rejected(self, track_request: TrackEventRequest):
+        """Test a user_id the UUID column would refuse fails this event only."""
+        bad = track_request.model_copy(update={"user_id": "not-a-uuid"})
+        good = track_request.model_copy(update={"user_id": str(uuid.uuid4()).upper()})
+
+        with pytest.raises(ValueError, match="user_id"):
+            build_event_record(bad, None)
+        assert build_event_record(good, None)["user_id"] == good.user_id.lower()
+
+    def test_overlong_column_is_rejected(self, track_request: TrackEventRequest):
+        """Test values longer than their String column are caught before INSERT."""
+        long_name = track_request.model_copy(update={"event_name": "x" * 300})
+        long_browser = track_request.model_copy(update={"browser": "b" * 101})
+
+        with pytest.raises(ValueError, match="event_name exceeds 255"):
+            build_event_record(long_name, None)
+        with pytest.raises(ValueError, match="browser exceeds 100"):
+            build_event_record(long_browser, None)
+
+
+class TestUserAgentCaching:
+    """Tests for memoized User-Agent parsing and bot detection."""
+
+    def test_parse_is_memoized(self):
+        """Test repeated UAs hit the cache and callers get independent copies."""
+        before = get_user_agent_cache_stats()["parse"]["hits"]
+
+        first = parse_user_agent(CHROME_UA)
+        first["browser"] = "mutated"
+        second = parse_user_agent(CHROME_UA)
+
+        assert second["browser"] == "Chrome"
+        assert get_user_agent_cache_stats()["parse"]["hits"] > before
+
+    @pytest.mark.parametrize(
+        "user_agent",
+        ["Googlebot/2.1 (+http://www.google.com/bot.html)", "python-requests/2.31.0", "Wget/1.21"],
+    )
+    def test_bot_signatures(self, user_agent: str):
+        """Test the merged signature pattern matches known bots case-insensitively."""
+        assert detect_bot(user_agent, {"is_bot": False}) is True
+
+    def test_browser_is_not_bot(self):
+        """Test a regular browser UA passes bot detection."""
+        assert detect_bot(CHROME_UA, parse_user_agent(CHROME_UA)) is False
+
+
+class TestFoldSessionEvents:
+    """Tests for folding new events into a session row delta."""
+
+    def test_out_of_order_events(self, track_request: TrackEventRequest):
+        """Test entry/exit pages and the window follow timestamps, not arrival order."""
+        start = datetime(2026, 1, 1, 12, 0, 0)
+        late = build_event_record(
+            track_request.model_copy(update={"event_type": EventType.CLICK, "path": "/cart"}),
+            None,
+        )
+        late["timestamp"] = start + timedelta(seconds=30)
+        early = build_event_record(track_request, None)
+        early["timestamp"] = start
+
+        row = fold_session_events([late, early])
+
+        assert row["start_time"] == start
+        assert row["entry_page"] == "/products/widget"
+        assert row["exit_page"] == "/cart"
+        assert row["duration_seconds"] == 30
+        assert row["pageview_count"] == 1
+        assert row["click_count"] == 1
+        assert row["event_count"] == 2
+        assert row["is_bounce"] is False
+        assert row["has_conversion"] is False
+        assert row["conversion_value"] is None
+
+
+class TestUpdateSessionMetrics:
+    """Tests for the session upsert's ON CONFLICT merge."""
+
+    @staticmethod
+    async def upsert(events: list[dict]) -> tuple[str, dict]:
+        """Run `update_session_metrics` and compile its statement for Postgres."""
+
+        class FakeSession:
+            async def execute(self, statement):
+                self.statement = statement
+
+            async def commit(self):
+                pass
+
+        db = FakeSession()
+        await update_session_metrics(events, db)
+        compiled = db.statement.compile(dialect=postgresql.dialect())
+        set_clause = str(compiled).split("DO UPDATE SET ", 1)[1]
+        assignments = dict(
+            part.split(" = ", 1) for part in re.split(r", (?=\w+ = )", set_clause)
+        )
+        return assignments, compiled.params
+
+    @pytest.mark.parametrize("out_of_order", [False, True])
+    async def test_batches_merge_in_any_order(
+        self, track_request: TrackEventRequest, out_of_order: bool
+    ):
+        """Test the window widens, first touch stays earliest and bounce uses merged values."""
+        start = datetime(2026, 1, 1, 12, 0, 0)
+        landing = build_event_record(track_request, None)
+        landing["timestamp"] = start
+        cart = build_event_record(
+            track_request.model_copy(
+                update={"path": "/cart", "referrer": "https://ads.example.com/"}
+            ),
+            None,
+        )
+        cart["timestamp"] = start + timedelta(seconds=30)
+        first, second = ([cart], [landing]) if out_of_order else ([landing], [cart])
+
+        await self.upsert(first)
+        assignments, params = await self.upsert(second)
+
+        # The incoming row is the second batch alone; the merge happens in SQL
+        batch = second[0]
+        assert params["start_time_m0"] == params["end_time_m0"] == batch["timestamp"]
+        assert params["entry_page_m0"] == params["exit_page_m0"] == batch["path"]
+        assert params["initial_referrer_m0"] == batch["referrer"]
+        assert params["pageview_count_m0"] == 1
+
+        window_start = "least(analytics_sessions.start_time, excluded.start_time)"
+        window_end = "greatest(analytics_sessions.end_time, excluded.end_time)"
+        assert assignments["start_time"] == window_start
+        assert assignments["end_time"] == window_end
+        assert assignments["duration_seconds"] == (
+            f"CAST(EXTRACT(epoch FROM {window_end} - {window_start}) AS INTEGER)"
+        )
+        for column in (
+            "entry_page",
+            "initial_referrer",
+            "initial_utm_source",
+            "initial_utm_medium",
+            "initial_utm_campaign",
+        ):
+            # An out-of-order batch replaces first touch; an in-order one keeps it
+            assert assignments[column] == (
+                "CASE WHEN (excluded.start_time < analytics_sessions.start_time) "
+                f"THEN excluded.{column} ELSE analytics_sessions.{column} END"
+            )
+        assert assignments["exit_page"] == (
+            "CASE WHEN (excluded.end_time >= analytics_sessions.end_time) "
+            "THEN excluded.exit_page ELSE analytics_sessions.exit_page END"
+        )
+
+        # Bounce is recomputed from the merged pageviews and window, not either batch
+        pageviews = "coalesce(analytics_sessions.pageview_count, %(coalesce_1)s::INTEGER)"
+        assert assignments["pageview_count"] == f"({pageviews} + excluded.pageview_count)"
+        assert assignments["is_bounce"] == (
+            f"({pageviews} + excluded.pageview_count = %(param_1)s::INTEGER "
+            f"AND {window_end} - {window_start} < %(param_2)s)"
+        )
+        assert (params["coalesce_1"], params["param_1"]) == (0, 1)
+        assert params["param_2"] == timedelta(seconds=10)
+
+
+class TestIngestBuffer:
+    """Tests for the group-commit ingest buffer."""
+
+    @pytest.fixture
+    def buffer(self):
+        """Buffer whose flushes are captured instead of written to the database."""
+        buffer = IngestBuffer(max_size=5, batch_size=3, flush_interval_ms=10)
+        buffer.batches = []
+
+        async def capture(batch):
+            buffer.batches.append(batch)
+
+        buffer._batches.flush = capture
+        return buffer
+
+    def test_rejects_when_stopped(self, buffer: IngestBuffer):
+        """Test rows are refused before the flusher runs."""
+        with pytest.raises(IngestBufferFullError):
+            buffer.submit([{"id": 1}])
+
+    async def test_backpressure_is_all_or_nothing(self, buffer: IngestBuffer):
+        """Test a batch that does not fit is rejected without queueing any rows."""
+        buffer._batches._closed = False
+        buffer.submit([{"id": i} for i in range(4)])
+
+        with pytest.raises(IngestBufferFullError):
+            buffer.submit([{"id": 4}, {"id": 5}])
+
+        assert buffer.depth == 4
+
+    async def test_drains_in_size_bounded_batches_on_stop(self, buffer: IngestBuffer):
+        """Test everything queued is flushed, at most batch_size rows at a time."""
+        await buffer.start()
+        buffer.submit([{"id": i} for i in range(5)])
+        await buffer.stop()
+
+        flushed = [row["id"] for batch in buffer.batches for row in batch]
+        assert flushed == [0, 1, 2, 3, 4]
+        assert all(len(batch) <= 3 for batch in buffer.batches)
+        assert not buffer.is_running
+
+    async def test_rejected_rows_are_isolated(self):
+        """Test a batch Postgres rejects is split so only the bad rows are dropped."""
+        buffer = IngestBuffer(max_size=10, batch_size=8, flush_interval_ms=10)
+        inserted = []
+
+        async def insert(batch):
+            if any(row["bad"] for row in batch):
+                raise DataError("INSERT", {}, Exception("value too long"))
+            inserted.extend(row["id"] for row in batch)
+
+        buffer._insert = insert
+        committed = await buffer._write([{"id": i, "bad": i in (2, 5)} for i in range(8)])
+
+        assert [row["id"] for row in committed] == [0, 1, 3, 4, 6, 7]
+        assert sorted(inserted) == [0, 1, 3, 4, 6, 7]
+        assert buffer.failed_rows == 2
+
+    async def test_transient_failures_are_retried(self, monkeypatch):
+        """Test an unavailable database is retried instead of dropping the batch."""
+        buffer = IngestBuffer(max_size=10, batch_size=8, flush_interval_ms=10, retry_seconds=60)
+        attempts = []
+
+        class FlakySession:
+            async def __aenter__(self):
+                attempts.append(1)
+                if len(attempts) < 4:
+                    raise OSError("connection refused")
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, *args):
+                pass
+
+        async def no_sleep(delay):
+            pass
+
+        monkeypatch.setattr(ingest_buffer_module, "get_db_context", FlakySession)
+        monkeypatch.setattr(batching_module.asyncio, "sleep", no_sleep)
+
+        committed = await buffer._write([{"id": 0}, {"id": 1}])
+
+        assert len(committed) == 2
+        assert len(attempts) == 4
+        assert buffer.failed_rows == 0
+
+
+class TestPostIngestExecutor:
+    """Tests for the bounded post-ingest executor."""
+
+    @pytest.fixture
+    def executor(self):
+        """Executor whose batches are captured instead of written to the database."""
+        executor = PostIngestExecutor(
+            max_concurrency=2, batch_window_ms=10, max_batch_rows=3, max_pending_rows=8
+        )
+        executor.captured = []
+
+        async def capture(batch):
+            executor.captured.append(batch)
+            executor._semaphore.release()
+
+        executor._process = capture
+        return executor
+
+    async def test_rows_within_window_share_a_batch(self, executor: PostIngestExecutor):
+        """Test submissions arriving inside the window are processed together."""
+        executor.submit([{"id": 0}])
+        executor.submit([{"id": 1}, {"id": 2}])
+        await executor.stop()
+
+        assert executor.captured == [[{"id": 0}, {"id": 1}, {"id": 2}]]
+
+    async def test_drains_in_size_bounded_batches_on_stop(self, executor: PostIngestExecutor):
+        """Test everything pending is processed, at most max_batch_rows at a time."""
+        executor.submit([{"id": i} for i in range(7)])
+        await executor.stop()
+
+        processed = [row["id"] for batch in executor.captured for row in batch]
+        assert processed == list(range(7))
+        assert all(len(batch) <= 3 for batch in executor.captured)
+        assert not executor.is_running
+        assert executor.pending == 0
+
+    async def test_concurrency_is_bounded(self):
+        """Test no more than max_concurrency batches run at once."""
+        executor = PostIngestExecutor(
+            max_concurrency=2, batch_window_ms=0, max_batch_rows=1, max_pending_rows=8
+        )
+        running = 0
+        peak = 0
+
+        async def slow(batch):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            executor._semaphore.release()
+
+        executor._process = slow
+        executor.submit([{"id": i} for i in range(6)])
+        await executor.stop()
+
+        assert peak == 2
+
+    async def test_backlog_is_capped(self, executor: PostIngestExecutor):
+        """Test ingest is refused at the cap and rows submitted past it are dropped."""
+        executor.submit([{"id": i} for i in range(6)])
+
+        executor.check_capacity(2)
+        with pytest.raises(PostIngestBacklogFullError):
+            executor.check_capacity(3)
+        executor.submit([{"id": i} for i in range(6, 10)])
+        await executor.stop()
+
+        processed = [row["id"] for batch in executor.captured for row in batch]
+        assert processed == list(range(8))
+        assert executor.dropped_rows == 2
+
+
+class TestGeoIP:
+    """Tests for the memory-mapped GeoIP range table."""
+
+    @pytest.fixture
+    def database(self, tmp_path) -> GeoIPDatabase:
+        """Database compiled from a small range CSV."""
+        csv_path = tmp_path / "ranges.csv"
+        csv_path.write_text(
+            "ip_from,ip_to,country_code,country_name,region,city,timezone\n"
+            "8.8.8.0,8.8.8.255,US,United States,California,Mountain View,America/Los_Angeles\n"
+            "8.8.9.0,8.8.9.127,US,United States,California,Mountain View,America/Los_Angeles\n"
+            "81.2.69.0,81.2.69.100,GB,United Kingdom,England,London,Europe/London\n"
+        )
+        compiled = tmp_path / "geoip.bin"
+        assert compile_geoip_csv(csv_path, compiled) == 2  # adjacent US ranges merged
+
+        database = GeoIPDatabase(cache_size=16)
+        database.open(compiled)
+        yield database
+        database.close()
+
+    def test_lookup_by_range(self, database: GeoIPDatabase):
+        """Test addresses resolve to the range containing them."""
+        assert database.lookup("8.8.9.5").country_code == "US"
+        assert database.lookup("81.2.69.50").city == "London"
+        assert database.lookup("81.2.69.200") is None
+        assert database.lookup("8.8.9.200") is None
+
+    def test_private_and_invalid_addresses(self, database: GeoIPDatabase):
+        """Test non-public, IPv6 and malformed addresses are not resolved."""
+        assert database.lookup("10.0.0.1") is None
+        assert database.lookup("2001:4860:4860::8888") is None
+        assert database.lookup("not-an-ip") is None
+        assert database.lookup(None) is None
+
+    def test_caches_only_uniform_blocks(self, database: GeoIPDatabase):
+        """Test a /24 is cached only when every address in it resolves the same."""
+        database.lookup("8.8.8.8")
+        database.lookup("8.8.8.9")
+        database.lookup("81.2.69.50")
+        database.lookup("81.2.69.51")
+
+        stats = database.cache_stats()
+        assert stats["size"] == 1
+        assert stats["hits"] == 1
+
+    def test_event_record_carries_location(self, track_request: TrackEventRequest):
+        """Test ingest writes the location resolved before hashing."""
+        geo = GeoLocation(country_code="DE", country_name="Germany", city="Berlin")
+
+        record = build_event_record(track_request, "hash", geo)
+
+        assert record["country_code"] == "DE"
+        assert record["city"] == "Berlin"
+        assert build_event_record(track_request, "hash")["country_code"] is None
@@ -0,0 +1,430 @@
+"""
+Tests for analytics summaries and time series.
+"""
+import asyncio
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import pairwise
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import settings
+from app.core.hyperloglog import HyperLogLog
+from app.models.analytics import AnalyticsEvent, AnalyticsSession
+from app.services import analytics_summary
+from app.services.analytics_summary import (
+    RangeSegment,
+    SummaryTotals,
+    _gather_queries,
+    _raw_visitor_ids,
+    _segment_queries,
+    _sketch_visitor_breakdowns,
+    _visitor_breakdowns,
+    plan_summary_segments,
+)
+from app.services.analytics_timeseries import (
+    MAX_TIME_SERIES_BUCKETS,
+    TimeSeriesPoint,
+    _rollup_segment_series,
+    build_time_series,
+    filter_conditions,
+    plan_time_buckets,
+)
+from app.services.result_cache import ResultCache, cache_key
+
+
+class TestPlanSummarySegments:
+    """Tests for splitting summary ranges between rollups and raw events."""
+
+    def test_no_rollups_scans_raw(self):
+        """Test the whole range is raw before the first rollup run."""
+        date_from = datetime(2026, 1, 1, 10, 30)
+        date_to = datetime(2026, 1, 3, 12, 0)
+
+        segments = plan_summary_segments(date_from, date_to, None, None)
+
+        assert [(s.source, s.start, s.end) for s in segments] == [("raw", date_from, date_to)]
+        assert segments[0].end_inclusive
+
+    def test_days_hours_and_raw_edges(self):
+        """Test whole days use daily rollups, partial days hourly, edges raw."""
+        date_from = datetime(2026, 1, 1, 10, 30)
+        date_to = datetime(2026, 1, 4, 8, 15)
+        hour_watermark = datetime(2026, 1, 4, 6, 0)
+        day_watermark = datetime(2026, 1, 4, 0, 0)
+
+        segments = plan_summary_segments(date_from, date_to, hour_watermark, day_watermark)
+
+        assert [(s.source, s.start, s.end) for s in segments] == [
+            ("raw", date_from, datetime(2026, 1, 1, 11, 0)),
+            ("hour", datetime(2026, 1, 1, 11, 0), datetime(2026, 1, 2, 0, 0)),
+            ("day", datetime(2026, 1, 2, 0, 0), datetime(2026, 1, 4, 0, 0)),
+            ("hour", datetime(2026, 1, 4, 0, 0), hour_watermark),
+            ("raw", hour_watermark, date_to),
+        ]
+        assert segments[-1].end_inclusive
+
+    def test_segments_are_contiguous(self):
+        """Test segments cover the range without gaps or overlaps."""
+        date_from = datetime(2026, 1, 1, 0, 0)
+        date_to = datetime(2026, 1, 1, 5, 45)
+
+        segments = plan_summary_segments(
+            date_from, date_to, datetime(2026, 1, 2, 0, 0), datetime(2026, 1, 1, 0, 0)
+        )
+
+        assert segments[0].start == date_from
+        assert segments[-1].end == date_to
+        for previous, current in pairwise(segments):
+            assert previous.end == current.start
+        assert "day" not in {s.source for s in segments}
+
+
+class TestSummaryTotals:
+    """Tests for merging per-segment summary counters."""
+
+    def test_merge_adds_counters(self):
+        """Test counters and per-page counts are summed."""
+        totals = SummaryTotals(pageviews=3, sessions=2, bounces=1)
+        totals.pages.update({"/": 2, "/cart": 1})
+
+        other = SummaryTotals(pageviews=2, sessions=1, revenue=9.5)
+        other.pages.update({"/": 2})
+        totals.merge(other)
+
+        assert totals.pageviews == 5
+        assert totals.sessions == 3
+        assert totals.bounces == 1
+        assert totals.revenue == 9.5
+        assert totals.pages == {"/": 4, "/cart": 1}
+
+
+class TestSummaryQueries:
+    """Tests for splitting and running the summary's independent queries."""
+
+    def test_segment_queries(self):
+        """Test raw and cold segments pair event counters with session totals."""
+        start, end = datetime(2026, 1, 1), datetime(2026, 1, 2)
+
+        def names(source):
+            return [q.func.__name__ for q in _segment_queries(RangeSegment(source, start, end))]
+
+        assert names("raw") == ["_raw_event_totals", "_session_totals"]
+        assert names("cold") == ["_cold_event_totals", "_session_totals"]
+        assert names("day") == ["_rollup_totals"]
+
+    async def test_single_connection_runs_on_request_session(self, monkeypatch):
+        """Test a limit of 1 runs every query in order on the given session."""
+        monkeypatch.setattr(analytics_summary.settings, "analytics_summary_max_connections", 1)
+        db = object()
+        used = []
+
+        async def query(session):
+            used.append(session)
+            return len(used)
+
+        assert await _gather_queries(db, [query, query]) == [1, 2]
+        assert used == [db, db]
+
+    async def test_concurrent_queries_use_bounded_pooled_sessions(self, monkeypatch):
+        """Test queries run on separate sessions, at most the limit at once across summaries."""
+        monkeypatch.setattr(analytics_summary.settings, "analytics_summary_max_connections", 2)
+        monkeypatch.setattr(analytics_summary, "_connection_slots", None)
+        opened = []
+
+        class FakeSession:
+            async def __aenter__(self):
+                opened.append(self)
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+        monkeypatch.setattr(analytics_summary, "async_session_factory", FakeSession)
+        running = 0
+        peak = 0
+
+        async def query(session):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return session
+
+        sessions, other = await asyncio.gather(
+            _gather_queries(object(), [query] * 4), _gather_queries(object(), [query] * 2)
+        )
+
+        assert sorted(map(id, sessions + other)) == sorted(map(id, opened))
+        assert len(set(map(id, opened))) == 6
+        assert peak == 2
+
+    async def test_visitor_breakdowns_of_an_empty_range(self):
+        """Test a range without pageviews groups nothing by path, which GROUPING() rejects."""
+        start, end = datetime(2026, 1, 1), datetime(2026, 1, 2)
+        statements = []
+
+        class FakeSession:
+            def __init__(self, rows):
+                self.rows = rows
+
+            async def execute(self, statement):
+                statements.append(statement)
+                return self.rows
+
+        # Rows as Postgres returns them: GROUPING(country, device) plus the path bit
+        rows = [
+            (0b111, None, None, None, None, 5),
+            (0b101, None, "US", "United States", None, 3),
+            (0b110, None, None, None, "mobile", 2),
+        ]
+        breakdowns = await _visitor_breakdowns(FakeSession(rows), start, end, [])
+        await _raw_visitor_ids(
+            FakeSession([]), RangeSegment("raw", start, end), [], defaultdict(list), {}
+        )
+
+        assert breakdowns == (
+            5,
+            {},
+            [{"country_code": "US", "country_name": "United States", "visitors": 3}],
+            {"mobile": 2},
+        )
+        for statement in statements:
+            sql = str(statement.compile(dialect=postgresql.dialect()))
+            assert "top_path" not in re.search(r"grouping\((.*?)\)", sql).group(1)
+            assert "top_path" not in sql.split("GROUP BY")[1]
+
+    async def test_sketch_breakdowns_skip_buckets_without_visitors(self):
+        """Test a zero-traffic bucket's missing sketch counts as empty, not as unsketched."""
+        sketch = HyperLogLog(12)
+        sketch.update(["v1", "v2"])
+        segment = RangeSegment("hour", datetime(2026, 1, 1, 0), datetime(2026, 1, 1, 3))
+
+        class FakeSession:
+            def __init__(self, totals):
+                self.results = [totals, [("device", "mobile", None, sketch.to_bytes())]]
+
+            async def execute(self, statement):
+                return self.results.pop(0)
+
+        # Hour 01:00 had no traffic, so the rollup left its sketch NULL
+        totals = [(sketch.to_bytes(), 2), (None, 0), (sketch.to_bytes(), 2)]
+        breakdowns = await _sketch_visitor_breakdowns(FakeSession(totals), [segment], [])
+
+        assert breakdowns == (2, {}, [], {"mobile": 2})
+
+        # A bucket with visitors but no sketch was rolled before sketches existed
+        totals[1] = (None, 3)
+        assert await _sketch_visitor_breakdowns(FakeSession(totals), [segment], []) is None
+
+
+class TestResultCache:
+    """Tests for the read-through result cache."""
+
+    @pytest.fixture
+    def cache(self) -> ResultCache:
+        return ResultCache(max_entries=16, default_ttl=60)
+
+    def test_key_ignores_parameter_order(self):
+        """Test normalized parameters map to the same key."""
+        assert cache_key("ns", 0, {"a": 1, "b": datetime(2026, 1, 1)}) == cache_key(
+            "ns", 0, {"b": datetime(2026, 1, 1), "a": 1}
+        )
+        assert cache_key("ns", 0, {"a": 1}) != cache_key("ns", 1, {"a": 1})
+
+    async def test_concurrent_misses_compute_once(self, cache: ResultCache):
+        """Test single-flight: simultaneous misses share one computation."""
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"day": datetime(2026, 1, 1), "value": calls}
+
+        results = await asyncio.gather(
+            *(cache.get_or_compute("ns", {"q": 1}, compute) for _ in range(5))
+        )
+
+        assert calls == 1
+        assert results == [{"day": "2026-01-01T00:00:00", "value": 1}] * 5
+        assert cache.coalesced == 4
+        assert await cache.get_or_compute("ns", {"q": 1}, compute) == results[0]
+        assert calls == 1
+
+    async def test_errors_reach_waiters_and_are_not_cached(self, cache: ResultCache):
+        """Test a failed computation fails its waiters and is retried next time."""
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            cache.get_or_compute("ns", {}, fail),
+            cache.get_or_compute("ns", {}, fail),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        async def succeed():
+            return 1
+
+        assert await cache.get_or_compute("ns", {}, succeed) == 1
+
+    async def test_ttl_and_invalidation(self, cache: ResultCache):
+        """Test entries expire and namespace invalidation forces a recompute."""
+        values = iter(range(10))
+
+        async def compute():
+            return next(values)
+
+        assert await cache.get_or_compute("ns", {}, compute, ttl=60) == 0
+        assert await cache.get_or_compute("ns", {}, compute, ttl=60) == 0
+        assert await cache.get_or_compute("other", {}, compute, ttl=60) == 1
+
+        assert await cache.invalidate("ns")
+        assert await cache.get_or_compute("ns", {}, compute, ttl=60) == 2
+        assert await cache.get_or_compute("other", {}, compute, ttl=60) == 1
+
+        assert await cache.invalidate("ns", min_interval=60) is False
+        assert await cache.get_or_compute("ns", {}, compute) == 2
+
+        cache._local.set(cache_key("ns", 1, {}), (0.0, 2))  # Expired entry
+        assert await cache.get_or_compute("ns", {}, compute) == 3
+
+
+class TestPlanTimeBuckets:
+    """Tests for time series bucket planning and filters."""
+
+    def test_week_buckets_start_on_monday(self):
+        """Test partial first and last weeks are aligned like date_trunc."""
+        buckets = plan_time_buckets(
+            datetime(2026, 3, 4, 15), datetime(2026, 3, 17, 2), "week"
+        )
+
+        assert buckets == [datetime(2026, 3, 2), datetime(2026, 3, 9), datetime(2026, 3, 16)]
+
+    def test_month_buckets_cross_year(self):
+        """Test month buckets roll over into January."""
+        buckets = plan_time_buckets(datetime(2025, 11, 20), datetime(2026, 1, 3), "month")
+
+        assert buckets == [datetime(2025, 11, 1), datetime(2025, 12, 1), datetime(2026, 1, 1)]
+
+    def test_hour_buckets_include_both_edges(self):
+        """Test the buckets holding date_from and date_to are both returned."""
+        buckets = plan_time_buckets(
+            datetime(2026, 3, 4, 10, 30), datetime(2026, 3, 4, 12, 0), "hour"
+        )
+
+        assert buckets == [datetime(2026, 3, 4, h) for h in (10, 11, 12)]
+
+    def test_rejects_unknown_unit_and_long_series(self):
+        """Test bad units and oversized series raise ValueError."""
+        with pytest.raises(ValueError):
+            plan_time_buckets(datetime(2026, 1, 1), datetime(2026, 1, 2), "minute")
+
+        with pytest.raises(ValueError):
+            plan_time_buckets(
+                datetime(2026, 1, 1),
+                datetime(2026, 1, 1) + timedelta(hours=MAX_TIME_SERIES_BUCKETS),
+                "hour",
+            )
+
+    def test_filter_conditions(self):
+        """Test scalar filters compare, lists use IN, and unknown names raise."""
+        conditions = filter_conditions({"country": "US", "device": ["mobile", "tablet"]})
+
+        assert [str(c) for c in conditions] == [
+            "analytics_events.country_code = :country_code_1",
+            "analytics_events.device_type IN (__[POSTCOMPILE_device_type_1])",
+        ]
+        with pytest.raises(ValueError):
+            filter_conditions({"browser": "Chrome"})
+
+
+class TestRollupTimeSeries:
+    """Tests for folding rollup buckets into time series points."""
+
+    async def test_buckets_without_visitors_keep_the_sketch_path(self):
+        """Test a zero-traffic hour without a sketch is folded in instead of aborting."""
+        sketch = HyperLogLog(12)
+        sketch.update(["v1", "v2"])
+        day = datetime(2026, 1, 1)
+        rows = [
+            (day, 3, 4, 1, 2, sketch.to_bytes()),
+            (day + timedelta(hours=1), 0, 0, 0, 0, None),
+        ]
+
+        class FakeSession:
+            async def execute(self, statement):
+                return rows
+
+        series = defaultdict(TimeSeriesPoint)
+        sketches = defaultdict(lambda: HyperLogLog(12))
+        segment = RangeSegment("hour", day, day + timedelta(hours=2))
+
+        assert await _rollup_segment_series(FakeSession(), segment, "day", series, sketches)
+        assert (series[day].pageviews, series[day].events, series[day].sessions) == (3, 4, 1)
+        assert sketches[day].count() == 2
+
+        # An unsketched bucket that had visitors still forces the exact recount
+        rows[1] = (day + timedelta(hours=1), 1, 1, 1, 1, None)
+        assert not await _rollup_segment_series(FakeSession(), segment, "day", series, sketches)
+
+
+class TestExactTimeSeries:
+    """Tests for time series aggregated from raw events."""
+
+    @pytest.fixture
+    async def db(self):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def add_date_trunc(connection, _):
+            # Day buckets only; SQLite stores timestamps as ISO strings
+            connection.create_function(
+                "date_trunc", 2, lambda unit, ts: ts[:10] + " 00:00:00.000000"
+            )
+
+        async with engine.begin() as connection:
+            await connection.run_sync(AnalyticsEvent.__table__.create)
+            await connection.run_sync(AnalyticsSession.__table__.create)
+        async with AsyncSession(engine) as session:
+            yield session
+        await engine.dispose()
+
+    async def test_filtered_sessions_match_unfiltered(self, db, monkeypatch):
+        """Test sessions count in their start bucket whether or not a filter is applied."""
+        monkeypatch.setattr(settings, "analytics_rollups_enabled", False)
+        monkeypatch.setattr(settings, "cold_storage_enabled", False)
+        day = datetime(2026, 1, 1)
+        # s1 keeps sending events on the next two days
+        for session_id, offsets in (("s1", (0, 1, 2)), ("s2", (0,)), ("s3", (1,))):
+            start = day + timedelta(days=offsets[0], hours=12)
+            db.add(AnalyticsSession(
+                session_id=session_id, visitor_id=session_id, start_time=start, end_time=start
+            ))
+            for offset in offsets:
+                db.add(AnalyticsEvent(
+                    event_type="pageview", session_id=session_id, visitor_id=session_id,
+                    timestamp=day + timedelta(days=offset, hours=12), url="/", path="/",
+                    device_type="desktop", is_bot=False,
+                ))
+        await db.commit()
+
+        date_to = day + timedelta(days=3) - timedelta(microseconds=1)
+        unfiltered = await build_time_series(db, day, date_to, "day")
+        filtered = await build_time_series(db, day, date_to, "day", {"device": "desktop"})
+
+        assert filtered == unfiltered
+        assert [point["sessions"] for point in unfiltered] == [2, 1, 0]
+        assert [point["visitors"] for point in unfiltered] == [2, 2, 1]
+        assert [
+            point["sessions"]
+            for point in await build_time_series(db, day, date_to, "day", {"device": "mobile"})
+        ] == [0, 0, 0]
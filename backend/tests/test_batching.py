@@ -0,0 +1,93 @@
+"""
+Tests for the batching flusher and retry helper.
+"""
+import pytest
+
+from app.core import batching as batching_module
+from app.core.batching import BatchingFlusher, retry_with_backoff
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """Skip backoff waits."""
+
+    async def sleep(delay):
+        pass
+
+    monkeypatch.setattr(batching_module.asyncio, "sleep", sleep)
+
+
+class TestBatchingFlusher:
+    """Tests for the size- and time-bounded batching queue."""
+
+    async def test_stop_flushes_everything_in_bounded_batches(self):
+        """Test queued items are flushed in order, at most batch_size at a time."""
+        batches = []
+
+        async def flush(batch):
+            batches.append(batch)
+
+        flusher = BatchingFlusher("test", max_size=10, batch_size=3, flush_interval_ms=10, flush=flush)
+        flusher.start()
+        for i in range(7):
+            flusher.put_nowait(i)
+        await flusher.stop()
+
+        assert [item for batch in batches for item in batch] == list(range(7))
+        assert all(len(batch) <= 3 for batch in batches)
+        assert not flusher.is_running
+
+    def test_capacity_is_reported(self):
+        """Test free slots shrink as items are queued."""
+
+        async def flush(batch):
+            pass
+
+        flusher = BatchingFlusher("test", max_size=3, batch_size=2, flush_interval_ms=10, flush=flush)
+        flusher.put_nowait("a")
+
+        assert flusher.depth == 1
+        assert flusher.free == 2
+
+
+class TestRetryWithBackoff:
+    """Tests for retrying failed operations."""
+
+    async def test_retries_until_success(self, no_sleep):
+        """Test a transient failure is retried and the result returned."""
+        attempts = []
+
+        async def operation():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OSError("busy")
+            return "ok"
+
+        assert await retry_with_backoff(operation, "failed", max_attempts=5) == "ok"
+        assert len(attempts) == 3
+
+    async def test_gives_up_after_max_attempts(self, no_sleep):
+        """Test the last error is raised once attempts run out."""
+        attempts = []
+
+        async def operation():
+            attempts.append(1)
+            raise OSError("down")
+
+        with pytest.raises(OSError):
+            await retry_with_backoff(operation, "failed", max_attempts=3)
+        assert len(attempts) == 3
+
+    async def test_non_retryable_errors_raise_at_once(self, no_sleep):
+        """Test errors the predicate rejects are not retried."""
+        attempts = []
+
+        async def operation():
+            attempts.append(1)
+            raise ValueError("bad row")
+
+        with pytest.raises(ValueError):
+            await retry_with_backoff(
+                operation, "failed", retryable=lambda error: not isinstance(error, ValueError)
+            )
+        assert len(attempts) == 1
@@ -0,0 +1,42 @@
+"""
+Tests for the in-process LRU cache.
+"""
+from app.core.cache import LRUCache
+
+
+class TestLRUCache:
+    """Tests for the bounded LRU cache."""
+
+    def test_lru_evicts_least_recently_used(self):
+        """Test the cache stays bounded and keeps recently read keys."""
+        cache: LRUCache[str, int] = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+
+    def test_get_or_compute_computes_once(self):
+        """Test a miss computes and stores the value; later reads hit."""
+        cache: LRUCache[str, int] = LRUCache(max_size=4)
+        calls = []
+
+        def compute(key: str) -> int:
+            calls.append(key)
+            return len(key)
+
+        assert cache.get_or_compute("abc", compute) == 3
+        assert cache.get_or_compute("abc", compute) == 3
+        assert calls == ["abc"]
+
+    def test_zero_size_disables_caching(self):
+        """Test a cache sized 0 never stores entries."""
+        cache: LRUCache[str, int] = LRUCache(max_size=0)
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
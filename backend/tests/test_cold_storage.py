@@ -0,0 +1,282 @@
+"""
+Tests for the Parquet cold-storage archive and its query engines.
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.services.analytics_summary import (
+    RangeSegment,
+    split_cold_segments,
+)
+from app.services.cold_storage import (
+    _copy_archived_rows,
+    _event_schema,
+    _rows_to_table,
+    cold_boundary,
+    cold_file_path,
+    cold_visitor_table,
+    count_cold_distinct,
+    count_distinct_visitors,
+    read_cold_counters,
+    read_cold_funnel_events,
+    read_cold_series,
+    read_cold_visitor_ids,
+    visitor_table_from_ids,
+)
+from app.services.duckdb_engine import DuckDBEngine
+from app.services.funnel_engine import FunnelMatcher, analyze_funnel
+
+FUNNEL_STEPS = [{"url_pattern": "/"}, {"url_pattern": "/cart"}]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """One exported day with human pageviews, a click and a bot pageview."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    day = datetime(2026, 1, 5)
+
+    def event(minute, event_type, path, visitor, is_bot=False, **extra):
+        return {
+            "id": uuid.uuid4(),
+            "event_type": event_type,
+            "session_id": f"s-{visitor}",
+            "visitor_id": visitor,
+            "timestamp": day + timedelta(minutes=minute),
+            "url": f"https://shop.example{path}",
+            "path": path,
+            "is_bot": is_bot,
+            "properties": {"x": 1},
+            "created_at": day,
+            **extra,
+        }
+
+    rows = [
+        event(0, "pageview", "/", "v1", referrer_domain="google.com", country_code="US",
+              country_name="United States", device_type="mobile"),
+        event(5, "pageview", "/", "v2", country_code="DE", country_name="Germany"),
+        event(6, "pageview", "/cart", "v1", country_code="US",
+              country_name="United States", device_type="mobile"),
+        event(7, "click", "/cart", "v1"),
+        event(8, "pageview", "/", "bot", is_bot=True, referrer_domain="google.com"),
+        event(600, "pageview", "/late", "v3"),
+    ]
+    pq.write_table(_rows_to_table(rows, _event_schema()), cold_file_path(tmp_path, day.date()))
+    return tmp_path
+
+
+class TestColdStorage:
+    """Tests for the Parquet cold-storage archive."""
+
+    def test_split_routes_only_raw_segments_before_boundary(self):
+        """Test raw edges straddling the boundary are split; rollups stay put."""
+        boundary = datetime(2026, 1, 10)
+        segments = [
+            RangeSegment("raw", datetime(2026, 1, 1, 9, 30), datetime(2026, 1, 1, 10)),
+            RangeSegment("day", datetime(2026, 1, 2), datetime(2026, 1, 9)),
+            RangeSegment("raw", datetime(2026, 1, 9, 12), datetime(2026, 1, 10, 6), True),
+        ]
+
+        routed = split_cold_segments(segments, boundary)
+
+        assert [(s.source, s.start, s.end, s.end_inclusive) for s in routed] == [
+            ("cold", datetime(2026, 1, 1, 9, 30), datetime(2026, 1, 1, 10), False),
+            ("day", datetime(2026, 1, 2), datetime(2026, 1, 9), False),
+            ("cold", datetime(2026, 1, 9, 12), boundary, False),
+            ("raw", boundary, datetime(2026, 1, 10, 6), True),
+        ]
+
+    def test_no_boundary_keeps_plan(self):
+        """Test nothing changes before any day was exported."""
+        segments = [RangeSegment("raw", datetime(2026, 1, 1), datetime(2026, 1, 2), True)]
+
+        assert split_cold_segments(segments, None) == segments
+
+    def test_boundary_follows_newest_exported_day(self, archive):
+        """Test the boundary is midnight after the last archived day."""
+        assert cold_boundary(archive) == datetime(2026, 1, 6)
+
+    def test_counters_match_raw_queries(self, archive):
+        """Test human pageviews per path and referrer visits inside the range."""
+        pages, referrers = read_cold_counters(
+            archive, datetime(2026, 1, 5), datetime(2026, 1, 5, 1)
+        )
+
+        assert pages == {"/": 2, "/cart": 1}
+        assert referrers == {"google.com": 1}
+
+    def test_visitor_ids_per_dimension(self, archive):
+        """Test distinct visitor ids are collected per total, path, country and device."""
+        visitor_ids = defaultdict(list)
+        labels = {}
+
+        read_cold_visitor_ids(
+            archive, datetime(2026, 1, 5), datetime(2026, 1, 5, 1), ["/"], visitor_ids, labels
+        )
+
+        assert sorted(visitor_ids[("total", "")]) == ["v1", "v2"]
+        assert sorted(visitor_ids[("path", "/")]) == ["v1", "v2"]
+        assert ("path", "/cart") not in visitor_ids
+        assert visitor_ids[("country", "US")] == ["v1"]
+        assert labels["DE"] == "Germany"
+        assert sorted(visitor_ids[("device", "unknown")]) == ["v1", "v2"]
+        assert visitor_ids[("device", "mobile")] == ["v1"]
+
+    def test_exact_counts_span_archive_and_postgres(self, archive):
+        """Test distinct visitors are counted over the union of both sources in Arrow."""
+        cold = cold_visitor_table(archive, datetime(2026, 1, 5), datetime(2026, 1, 5, 1), ["/"])
+        hot = visitor_table_from_ids(
+            {("total", ""): ["v1", "v9"], ("country", "US"): ["v9"], ("path", "/"): ["v1"]},
+            {"US": "United States"},
+        )
+
+        counts, labels = count_distinct_visitors([cold, hot])
+
+        assert counts["total"] == {"": 3}
+        assert counts["path"] == {"/": 2}
+        assert counts["country"] == {"US": 2, "DE": 1}
+        assert labels == {"US": "United States", "DE": "Germany"}
+        assert count_distinct_visitors([]) == ({}, {})
+
+    def test_series_buckets_and_filters(self, archive):
+        """Test archived traffic per bucket, with and without a dimension filter."""
+        start, end = datetime(2026, 1, 5), datetime(2026, 1, 6)
+
+        assert read_cold_series(archive, start, end, "hour") == {
+            datetime(2026, 1, 5, 0): (3, 4, 2, 2),
+            datetime(2026, 1, 5, 10): (1, 1, 1, 1),
+        }
+        assert read_cold_series(archive, start, end, "week", {"country_code": ["US"]}) == {
+            datetime(2026, 1, 5): (2, 2, 1, 1),
+        }
+
+    def test_distinct_counts_include_ids_from_postgres(self, archive):
+        """Test a bucket straddling the boundary counts each session and visitor once."""
+        assert count_cold_distinct(
+            archive, datetime(2026, 1, 5), datetime(2026, 1, 6), None,
+            ["s-v1", "s-new"], ["v1", "v9"],
+        ) == (4, 4)
+
+    def test_funnel_events_in_session_order(self, archive):
+        """Test archived funnel pageviews skip clicks, bots and unmatched paths."""
+        pattern = FunnelMatcher(FUNNEL_STEPS).sql_pattern
+        start, end = datetime(2026, 1, 5), datetime(2026, 1, 6)
+
+        table = read_cold_funnel_events(archive, start, end, pattern)
+        assert table["session_id"].to_pylist() == ["s-v1", "s-v1", "s-v2"]
+        assert table["path"].to_pylist() == ["/", "/cart", "/"]
+
+        table = read_cold_funnel_events(archive, start, end, pattern, {"country_code": "DE"})
+        assert table["session_id"].to_pylist() == ["s-v2"]
+
+    async def test_funnel_walk_merges_archive_and_postgres(self, archive, monkeypatch):
+        """Test sessions spanning the cold boundary are walked as one."""
+        monkeypatch.setattr(settings, "cold_storage_enabled", True)
+        monkeypatch.setattr(settings, "cold_storage_dir", str(archive))
+        boundary = datetime(2026, 1, 6)
+        statements = []
+
+        class FakeResult:
+            async def partitions(self, size):
+                # s-v2 entered in the archive and finishes after the boundary
+                yield [("s-a", "/", boundary), ("s-v2", "/cart", boundary)]
+
+        class FakeSession:
+            async def stream(self, statement):
+                statements.append(statement)
+                return FakeResult()
+
+        report = await analyze_funnel(
+            FakeSession(), FUNNEL_STEPS, datetime(2026, 1, 5), datetime(2026, 1, 7)
+        )
+
+        assert [step["entries"] for step in report["steps"]] == [3, 2]
+        sql = str(statements[0].compile(dialect=postgresql.dialect()))
+        assert 'COLLATE "C"' in sql
+
+        # Ranges held entirely in the archive never query Postgres
+        report = await analyze_funnel(
+            FakeSession(), FUNNEL_STEPS, datetime(2026, 1, 5), datetime(2026, 1, 5, 12)
+        )
+        assert [step["entries"] for step in report["steps"]] == [2, 1]
+        assert len(statements) == 1
+
+    def test_reexported_day_keeps_archived_rows_once(self, archive, tmp_path):
+        """Test a day file is merged into its re-export, minus rows exported again."""
+        pq = pytest.importorskip("pyarrow.parquet")
+        path = cold_file_path(archive, datetime(2026, 1, 5).date())
+        archived_ids = pq.read_table(path, columns=["id"])["id"]
+        target = tmp_path / "merged.parquet"
+
+        with pq.ParquetWriter(target, _event_schema()) as writer:
+            copied = _copy_archived_rows(path, writer, archived_ids.slice(0, 2).chunks)
+
+        assert copied == len(archived_ids) - 2
+        assert pq.read_table(target)["id"].to_pylist() == archived_ids.to_pylist()[2:]
+
+
+class TestDuckDBEngine:
+    """Tests for the embedded DuckDB archive engine."""
+
+    @pytest.fixture
+    def engine(self):
+        pytest.importorskip("duckdb")
+        engine = DuckDBEngine(threads=2, memory_limit="256MB")
+        yield engine
+        engine.close()
+
+    def test_counters_match_pyarrow(self, archive, engine: DuckDBEngine):
+        """Test both engines return the same page and referrer counters."""
+        args = (archive, datetime(2026, 1, 5), datetime(2026, 1, 5, 1))
+
+        assert engine.counters(*args) == read_cold_counters(*args)
+
+    def test_visitor_ids_match_pyarrow(self, archive, engine: DuckDBEngine):
+        """Test both engines collect the same visitor sets and labels."""
+        args = (archive, datetime(2026, 1, 5), datetime(2026, 1, 5, 1), ["/"])
+        duck_ids, arrow_ids = defaultdict(list), defaultdict(list)
+        duck_labels, arrow_labels = {}, {}
+
+        engine.visitor_ids(*args, duck_ids, duck_labels)
+        read_cold_visitor_ids(*args, arrow_ids, arrow_labels)
+
+        assert {k: sorted(v) for k, v in duck_ids.items()} == {
+            k: sorted(v) for k, v in arrow_ids.items()
+        }
+        assert duck_labels == arrow_labels
+
+    def test_visitor_table_matches_pyarrow(self, archive, engine: DuckDBEngine):
+        """Test both engines yield the same distinct visitor tables."""
+        args = (archive, datetime(2026, 1, 5), datetime(2026, 1, 5, 1), ["/"])
+
+        assert count_distinct_visitors([engine.visitor_table(*args)]) == (
+            count_distinct_visitors([cold_visitor_table(*args)])
+        )
+
+    def test_funnel_events_match_pyarrow(self, archive, engine: DuckDBEngine):
+        """Test both engines return the same session-ordered funnel pageviews."""
+        args = (
+            archive, datetime(2026, 1, 5), datetime(2026, 1, 6),
+            FunnelMatcher(FUNNEL_STEPS).sql_pattern, {"country_code": ["US", "DE"]},
+        )
+
+        assert engine.funnel_events(*args).to_pylist() == (
+            read_cold_funnel_events(*args).to_pylist()
+        )
+
+    def test_exact_breakdowns(self, archive, engine: DuckDBEngine):
+        """Test distinct visitors are counted inside DuckDB, bots and late rows excluded."""
+        total, pages, countries, devices = engine.visitor_breakdowns(
+            archive, datetime(2026, 1, 5), datetime(2026, 1, 5, 1), []
+        )
+
+        assert total == 2
+        assert pages == {}
+        assert countries[0] == {
+            "country_code": "US", "country_name": "United States", "visitors": 1,
+        }
+        assert devices == {"unknown": 2, "mobile": 1}
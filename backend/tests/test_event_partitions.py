@@ -0,0 +1,43 @@
+"""
+Tests for daily analytics_events partitions.
+"""
+from datetime import datetime
+
+from app.services.event_partitions import (
+    expired_partition_days,
+    partition_day,
+    partition_name,
+    plan_partition_days,
+)
+
+
+class TestEventPartitions:
+    """Tests for daily analytics_events partition planning."""
+
+    def test_name_round_trips_to_day(self):
+        """Test partition names encode the day they cover."""
+        day = datetime(2026, 3, 9).date()
+
+        assert partition_name(day) == "analytics_events_p20260309"
+        assert partition_day(partition_name(day)) == day
+
+    def test_default_and_foreign_tables_have_no_day(self):
+        """Test the DEFAULT partition is never treated as a daily one."""
+        assert partition_day("analytics_events_default") is None
+        assert partition_day("analytics_events_p2026") is None
+
+    def test_plans_inclusive_range_across_month_end(self):
+        """Test every day between the bounds gets a partition."""
+        days = plan_partition_days(datetime(2026, 1, 30).date(), datetime(2026, 2, 2).date())
+
+        assert [day.isoformat() for day in days] == [
+            "2026-01-30", "2026-01-31", "2026-02-01", "2026-02-02",
+        ]
+
+    def test_expires_only_days_before_cutoff(self):
+        """Test the cutoff day itself is retained."""
+        days = [datetime(2026, 1, d).date() for d in (5, 3, 4, 6)]
+
+        expired = expired_partition_days(days, cutoff=datetime(2026, 1, 5).date())
+
+        assert expired == [datetime(2026, 1, 3).date(), datetime(2026, 1, 4).date()]
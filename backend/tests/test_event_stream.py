@@ -0,0 +1,148 @@
+"""
+Tests for the event stream publisher and segmented event log.
+"""
+import json
+import uuid
+
+import pytest
+
+from app.services import event_stream as event_stream_module
+from app.services.event_stream import (
+    EventStreamBackend,
+    EventStreamPublisher,
+    SegmentedLogBackend,
+    read_event_log,
+)
+
+
+class TestSegmentedEventLog:
+    """Tests for the local segmented event log."""
+
+    async def test_rotates_and_replays_by_offset(self, tmp_path):
+        """Test records survive rotation and can be read from any offset."""
+        log = SegmentedLogBackend(tmp_path, segment_max_bytes=64)
+        await log.open()
+        last = await log.append([f"event-{i}".encode() for i in range(10)])
+        await log.close()
+
+        assert last == 9
+        assert len(list(tmp_path.glob("*.log"))) > 1
+        assert [offset for offset, _ in read_event_log(tmp_path)] == list(range(10))
+        assert list(read_event_log(tmp_path, offset=7, max_records=2)) == [
+            (7, b"event-7"),
+            (8, b"event-8"),
+        ]
+
+    async def test_reopen_truncates_torn_tail(self, tmp_path):
+        """Test a partial record is dropped and offsets continue after the last intact one."""
+        log = SegmentedLogBackend(tmp_path, segment_max_bytes=1024)
+        await log.open()
+        await log.append([b"a", b"b"])
+        await log.close()
+
+        segment = next(tmp_path.glob("*.log"))
+        with open(segment, "ab") as f:
+            f.write(b"\x00\x00\x00\x10partial")
+
+        reopened = SegmentedLogBackend(tmp_path, segment_max_bytes=1024)
+        await reopened.open()
+        assert await reopened.append([b"c"]) == 2
+        await reopened.close()
+
+        assert [payload for _, payload in read_event_log(tmp_path)] == [b"a", b"b", b"c"]
+
+    async def test_failed_append_is_rolled_back(self, tmp_path, monkeypatch):
+        """Test an append failing mid-rotation leaves no frames, so its retry adds no duplicates."""
+        log = SegmentedLogBackend(tmp_path, segment_max_bytes=32)
+        await log.open()
+        await log.append([b"a1", b"a2"])
+
+        real_fsync = event_stream_module.os.fsync
+        calls = []
+
+        def failing_fsync(fd):
+            calls.append(fd)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            real_fsync(fd)
+
+        monkeypatch.setattr(event_stream_module.os, "fsync", failing_fsync)
+        with pytest.raises(OSError):
+            await log.append([f"b{i}".encode() for i in range(6)])
+        monkeypatch.setattr(event_stream_module.os, "fsync", real_fsync)
+
+        assert [payload for _, payload in read_event_log(tmp_path)] == [b"a1", b"a2"]
+        assert await log.append([f"b{i}".encode() for i in range(6)]) == 7
+        assert await log.append([b"c"]) == 8
+        await log.close()
+
+        assert [payload for _, payload in read_event_log(tmp_path)] == [
+            b"a1", b"a2", b"b0", b"b1", b"b2", b"b3", b"b4", b"b5", b"c"
+        ]
+
+    async def test_workers_share_one_log(self, tmp_path):
+        """Test backends of separate workers keep offsets dense in one directory."""
+        first = SegmentedLogBackend(tmp_path, segment_max_bytes=32)
+        second = SegmentedLogBackend(tmp_path, segment_max_bytes=32)
+        await first.open()
+        await second.open()
+
+        assert await first.append([b"a1", b"a2"]) == 1
+        assert await second.append([b"b1"]) == 2
+        assert await first.append([b"a3", b"a4", b"a5"]) == 5
+        assert await second.append([b"b2"]) == 6
+        await first.close()
+        await second.close()
+
+        assert list(read_event_log(tmp_path)) == list(
+            enumerate([b"a1", b"a2", b"b1", b"a3", b"a4", b"a5", b"b2"])
+        )
+        assert len(list(tmp_path.glob("*.log"))) > 1
+
+
+class TestEventStreamPublisher:
+    """Tests for the buffered event stream publisher."""
+
+    class FlakyBackend(EventStreamBackend):
+        """Backend that fails its first append."""
+
+        def __init__(self):
+            self.payloads = []
+            self.calls = 0
+
+        async def open(self):
+            pass
+
+        async def close(self):
+            pass
+
+        async def append(self, payloads):
+            self.calls += 1
+            if self.calls == 1:
+                raise OSError("disk busy")
+            self.payloads.extend(payloads)
+            return len(self.payloads) - 1
+
+    async def test_retries_and_drains_on_stop(self):
+        """Test a failed append is retried and queued rows are written on stop."""
+        backend = self.FlakyBackend()
+        publisher = EventStreamPublisher(backend, max_buffer=10, batch_size=5, flush_interval_ms=10)
+
+        await publisher.start()
+        publisher.publish([{"id": uuid.uuid4(), "n": i} for i in range(3)])
+        await publisher.stop()
+
+        assert [json.loads(p)["n"] for p in backend.payloads] == [0, 1, 2]
+        assert publisher.published == 3
+        assert publisher.last_offset == 2
+
+    def test_drops_when_buffer_full(self):
+        """Test publishing never blocks; overflow is counted."""
+        publisher = EventStreamPublisher(
+            self.FlakyBackend(), max_buffer=2, batch_size=5, flush_interval_ms=10
+        )
+        publisher._batches._closed = False
+
+        publisher.publish([{"n": i} for i in range(5)])
+
+        assert publisher.dropped == 3
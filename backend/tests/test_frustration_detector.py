@@ -0,0 +1,71 @@
+"""
+Tests for rage-click, dead-click and error detection.
+"""
+from datetime import datetime
+
+from app.services.frustration_detector import FrustrationDetector
+
+
+class TestFrustrationDetector:
+    """Tests for the streaming rage-click, dead-click and error detector."""
+
+    @staticmethod
+    def event(event_type: str, time_ms: int, session_id: str = "s1", **properties) -> dict:
+        return {
+            "event_type": event_type,
+            "session_id": session_id,
+            "timestamp": datetime(2026, 1, 1),
+            "client_timestamp": time_ms,
+            "properties": properties,
+        }
+
+    def test_rage_click_needs_same_spot_within_window(self):
+        """Test repeated clicks on one button are rage, spread or slow ones are not."""
+        detector = FrustrationDetector(rage_click_count=3, rage_click_window_ms=1000)
+        button = {"element": "button", "text": "Pay"}
+        rage = [self.event("click", t, x=100 + t // 100, y=50, **button) for t in (0, 300, 600)]
+        slow = [self.event("click", t, "s2", x=100, y=50, **button) for t in (0, 800, 1600)]
+        spread = [
+            self.event("click", t, "s3", x=x, y=50, **button)
+            for t, x in ((0, 0), (200, 300), (400, 600))
+        ]
+
+        deltas = detector.process(rage + slow + spread)
+
+        assert deltas["s1"].has_rage_click
+        assert not any(deltas[s].has_rage_click for s in ("s2", "s3") if s in deltas)
+        # Findings are reported once per session
+        assert "s1" not in detector.process([self.event("click", 700, x=100, y=50, **button)])
+
+    def test_dead_clicks_and_errors(self):
+        """Test unanswered non-link clicks count as dead across batches; errors flag the session."""
+        detector = FrustrationDetector(dead_click_window_ms=2000)
+
+        first = detector.process([
+            self.event("click", 0, element="button", x=1, y=1),
+            self.event("scroll", 1500, scroll_depth=40),
+            self.event("click", 1600, element="a", href="/cart", x=1, y=1),
+            self.event("error", 1700, message="TypeError"),
+        ])
+        later = detector.process([
+            self.event("click", 5000, element="button", x=1, y=1),
+            self.event("pageview", 5500),
+        ])
+
+        assert first["s1"].has_error and first["s1"].dead_clicks == 0
+        assert later == {}
+        assert detector.process([self.event("custom", 9000)]) == {}
+        assert detector.process([
+            self.event("click", 10000, element="div", x=1, y=1),
+            self.event("scroll", 12500, scroll_depth=50),
+        ])["s1"].dead_clicks == 1
+
+    def test_bots_and_late_events(self):
+        """Test bot traffic is ignored and late events do not disturb the click timeline."""
+        detector = FrustrationDetector()
+        bot = dict(self.event("error", 0), is_bot=True)
+
+        assert detector.process([bot]) == {}
+        detector.process([self.event("click", 10000, element="div", x=1, y=1)])
+        assert detector.process([self.event("error", 100)])["s1"].has_error
+        assert detector.process([self.event("pageview", 11000)]) == {}
@@ -0,0 +1,155 @@
+"""
+Tests for conversion funnels.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.analytics import ConversionFunnel, FunnelProgress
+from app.services.analytics_service import calculate_funnel_conversion
+from app.services.funnel_engine import FunnelAccumulator, FunnelMatcher
+from app.services.funnel_progress import (
+    _state_from_row,
+    can_report_from_progress,
+    funnel_progress_report,
+)
+
+FUNNEL_STEPS = [
+    {"name": "Product", "url_pattern": "/products/*"},
+    {"name": "Cart", "url_pattern": "/cart"},
+    {"name": "Checkout", "url_pattern": "/checkout*"},
+]
+
+
+class TestFunnelEngine:
+    """Tests for the combined funnel matcher and single-pass accumulator."""
+
+    def test_matcher_maps_paths_to_steps(self):
+        """Test globs, literal characters and overlapping patterns."""
+        matcher = FunnelMatcher(
+            [{"url_pattern": "/*"}, {"url_pattern": "/cart"}, {"url_pattern": "/a.b"}]
+        )
+
+        assert matcher.steps_for("/cart") == {0, 1}
+        assert matcher.steps_for("/a.b") == {0, 2}
+        assert matcher.steps_for("/axb") == {0}
+        assert matcher.steps_for("cart") == frozenset()
+        assert matcher.names == ["Step 1", "Step 2", "Step 3"]
+        assert matcher.sql_pattern == r"^(?:/.*|/cart|/a\.b)$"
+
+    def test_matcher_rejects_invalid_steps(self):
+        """Test funnels need two steps, each with a pattern."""
+        with pytest.raises(ValueError):
+            FunnelMatcher([{"url_pattern": "/"}])
+        with pytest.raises(ValueError):
+            FunnelMatcher([{"url_pattern": "/"}, {"name": "No pattern"}])
+
+    def test_sessions_advance_in_order(self):
+        """Test entries, drop-off and time to complete across sessions."""
+        start = datetime(2026, 1, 1)
+        accumulator = FunnelAccumulator(FunnelMatcher(FUNNEL_STEPS))
+        accumulator.add_many([
+            # Completes in 10 minutes
+            ("a", "/products/1", start),
+            ("a", "/cart", start + timedelta(minutes=5)),
+            ("a", "/checkout/pay", start + timedelta(minutes=10)),
+            # Reaches the cart; checkout before cart does not count
+            ("b", "/checkout", start),
+            ("b", "/products/2", start + timedelta(minutes=1)),
+            ("b", "/cart", start + timedelta(minutes=2)),
+            # Never enters
+            ("c", "/cart", start),
+            ("d", "/products/3", start),
+        ])
+        report = accumulator.finish()
+
+        assert report["total_entries"] == 3
+        assert [step["entries"] for step in report["steps"]] == [3, 2, 1]
+        assert [step["drop_off_count"] for step in report["steps"]] == [1, 1, 0]
+        assert report["steps"][1]["conversion_rate"] == 66.67
+        assert report["overall_conversion_rate"] == 33.33
+        assert report["avg_time_to_complete"] == 600.0
+
+    def test_expired_attempt_restarts_on_new_entry(self):
+        """Test a lapsed window restarts the funnel at the next step-1 event."""
+        start = datetime(2026, 1, 1)
+        accumulator = FunnelAccumulator(FunnelMatcher(FUNNEL_STEPS), timedelta(hours=1))
+        accumulator.add_many([
+            ("a", "/products/1", start),
+            ("a", "/cart", start + timedelta(hours=2)),  # Too late
+            ("a", "/products/1", start + timedelta(hours=3)),
+            ("a", "/cart", start + timedelta(hours=3, minutes=1)),
+            ("a", "/checkout", start + timedelta(hours=3, minutes=2)),
+        ])
+        report = accumulator.finish()
+
+        assert [step["entries"] for step in report["steps"]] == [1, 1, 1]
+        assert report["avg_time_to_complete"] == 120.0
+
+    def test_calculate_funnel_conversion_sorts_events(self):
+        """Test the in-memory helper orders events by session and time."""
+        start = datetime(2026, 1, 1)
+        events = [
+            {"session_id": "a", "path": "/checkout", "timestamp": start + timedelta(minutes=2)},
+            {"session_id": "a", "path": "/products/1", "timestamp": start},
+            {"session_id": "a", "path": "/cart", "timestamp": start + timedelta(minutes=1)},
+        ]
+
+        report = calculate_funnel_conversion(FUNNEL_STEPS, events)
+
+        assert report["overall_conversion_rate"] == 100.0
+
+
+class TestFunnelProgress:
+    """Tests for materialized saved-funnel progress."""
+
+    @staticmethod
+    def funnel(**overrides):
+        values = {
+            "id": uuid.uuid4(),
+            "steps": FUNNEL_STEPS,
+            "time_window_hours": 24,
+            "is_active": True,
+            "progress_version": 2,
+            "progress_since": datetime(2026, 1, 1),
+            "progress_rebuilt_at": datetime(2026, 2, 1),
+        }
+        values.update(overrides)
+        return ConversionFunnel(**values)
+
+    def test_rows_of_older_versions_restart(self):
+        """Test progress recorded for previous steps is not carried over."""
+        row = FunnelProgress(
+            version=1, entered_at=datetime(2026, 1, 1), next_step=2, furthest_step=1
+        )
+
+        assert _state_from_row(row, 1).furthest_step == 1
+        assert _state_from_row(row, 2).furthest_step == -1
+
+    def test_progress_used_only_when_rebuilt_and_covering(self):
+        """Test pending rebuilds, inactive funnels and ranges before the backfill use raw events."""
+        funnel = self.funnel()
+
+        assert can_report_from_progress(funnel, datetime(2026, 1, 15))
+        assert not can_report_from_progress(funnel, datetime(2025, 12, 31))
+        assert not can_report_from_progress(self.funnel(is_active=False), datetime(2026, 1, 15))
+        funnel.progress_rebuilt_at = None
+        assert not can_report_from_progress(funnel, datetime(2026, 1, 15))
+
+    async def test_report_from_furthest_step_groups(self):
+        """Test per-step entries are cumulative over furthest-step counts."""
+
+        class FakeSession:
+            async def execute(self, stmt):
+                # furthest_step, sessions, completed, completion seconds
+                return [(0, 5, 0, 0), (1, 3, 0, 0), (2, 2, 2, 1200.0)]
+
+        report = await funnel_progress_report(
+            FakeSession(), self.funnel(), datetime(2026, 1, 1), datetime(2026, 1, 31)
+        )
+
+        assert report["total_entries"] == 10
+        assert [step["entries"] for step in report["steps"]] == [10, 5, 2]
+        assert report["overall_conversion_rate"] == 20.0
+        assert report["avg_time_to_complete"] == 600.0
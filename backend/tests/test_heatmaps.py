@@ -0,0 +1,231 @@
+"""
+Tests for heatmap aggregation.
+"""
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.analytics_service import aggregate_heatmap_data
+from app.services.cold_storage import _event_schema, _rows_to_table, cold_file_path
+from app.services.heatmap_engine import (
+    DayHeatmap,
+    HeatmapGrid,
+    ScrollReach,
+    build_heatmap,
+    covered_days,
+    event_rows,
+    split_by_day,
+    uncovered_ranges,
+    viewport_bucket,
+)
+
+
+class TestHeatmapEngine:
+    """Tests for NumPy heatmap binning and per-day range planning."""
+
+    def test_viewport_buckets(self):
+        """Test widths map to the largest bucket they fit."""
+        assert [viewport_bucket(w) for w in (320, 375, 800, 1440, 2560)] == [
+            375, 375, 768, 1024, 1920
+        ]
+
+    def test_clicks_are_normalized_by_viewport(self):
+        """Test clicks at the same relative spot share a cell at any width."""
+        grid = HeatmapGrid(rows=4, columns=4)
+        grid.add_clicks(np.array([
+            [10, 10, 1024, 768],
+            [20, 15, 1280, 800],  # Same top-left cell
+            [1000, 700, 1024, 768],  # Bottom-right cell
+            [1100, 10, 1024, 768],  # Outside the viewport
+            [np.nan, 10, 1024, 768],  # Missing coordinate
+        ]))
+
+        assert grid.total == 3
+        assert grid.counts[0, 0] == 2
+        assert grid.counts[3, 3] == 1
+
+    def test_grids_merge_through_compressed_bytes(self):
+        """Test stored grids round-trip and adjacent ranges add up."""
+        first = HeatmapGrid(rows=2, columns=3)
+        first.add_clicks(np.array([[0, 0, 300, 200], [250, 150, 300, 200]]))
+        second = HeatmapGrid.from_bytes(first.to_bytes())
+        second.merge(first)
+
+        assert second.cells() == [{"x": 0, "y": 0, "count": 2}, {"x": 2, "y": 1, "count": 2}]
+        with pytest.raises(ValueError):
+            second.merge(HeatmapGrid(rows=3, columns=3))
+        with pytest.raises(ValueError):
+            HeatmapGrid.from_bytes(b"\x09" + first.to_bytes()[1:])
+
+    def test_downsample_sums_blocks(self):
+        """Test coarser grids keep every click, including uneven blocks."""
+        grid = HeatmapGrid(rows=4, columns=5, counts=np.arange(20).reshape(4, 5))
+
+        halved = grid.downsample(2, 2)
+        assert halved.counts.tolist() == [[12, 33], [52, 93]]
+        assert halved.total == grid.total
+        assert grid.downsample(8, 8).counts.shape == (4, 5)
+
+    def test_scroll_reach_counts_sessions(self):
+        """Test each depth counts the sessions reaching at least that far, once each."""
+        scroll = ScrollReach(precision=10)
+        scroll.add_scrolls(
+            np.array(["a", "b", "c", "d", "e"], dtype=object),
+            np.array([25.0, 50.0, 50.0, 100.0, np.nan]),
+        )
+        # Repeated milestones of the same sessions, as analytics-sdk.js sends them
+        scroll.add_scrolls(np.array(["b", "b", "c"], dtype=object), np.array([50.0, 50.0, 60.0]))
+        scroll = ScrollReach.from_bytes(scroll.to_bytes())
+
+        reach = {point["depth_percent"]: point["reach_count"] for point in scroll.reach()}
+        assert (reach[0], reach[25], reach[30], reach[55], reach[60], reach[100]) == (
+            4, 4, 3, 2, 2, 1
+        )
+        assert scroll.total == 4
+
+    def test_scroll_reach_merges_sessions_across_days(self):
+        """Test a session scrolling on two days or in two batches counts once."""
+        first, second = ScrollReach(precision=10), ScrollReach(precision=10)
+        first.add_scrolls(np.array(["a", "b"], dtype=object), np.array([25.0, 75.0]))
+        second.add_scrolls(np.array(["a", "c"], dtype=object), np.array([50.0, 25.0]))
+        first.merge(second)
+
+        assert [point["reach_count"] for point in first.reach()][::5] == [3, 3, 2, 1, 0]
+        with pytest.raises(ValueError):
+            first.merge(ScrollReach(precision=12))
+        with pytest.raises(ValueError):
+            ScrollReach.from_bytes(b"\x01" + first.to_bytes()[1:])
+
+    def test_days_stored_in_another_scroll_format_are_rebuilt(self):
+        """Test event-count histograms and other sketch precisions are not merged."""
+        stored = DayHeatmap().column_values()
+        row = SimpleNamespace(click_grid=stored["click_grid"], scroll_grid=stored["scroll_grid"])
+        assert DayHeatmap.from_row(row) is not None
+
+        row.scroll_grid = b"\x01" + stored["scroll_grid"][1:]
+        assert DayHeatmap.from_row(row) is None
+        row.scroll_grid = ScrollReach(precision=12).to_bytes()
+        assert DayHeatmap.from_row(row) is None
+
+    def test_event_rows_split_into_utc_days(self):
+        """Test ingested click and scroll events are binned per day."""
+        day = datetime(2026, 1, 2)
+        click = {"event_type": "click", "viewport_width": 400, "viewport_height": 800,
+                 "session_id": "s1", "properties": {"x": 10, "y": 10}}
+        scroll = {"event_type": "scroll", "viewport_width": 400, "viewport_height": 800,
+                  "session_id": "s1", "properties": {"depth": 50}}
+        accumulators = {}
+        split_by_day(accumulators, *event_rows([
+            {**click, "timestamp": day - timedelta(seconds=1)},
+            {**click, "timestamp": day},
+            {**scroll, "timestamp": day + timedelta(hours=23)},
+            {**scroll, "timestamp": day + timedelta(hours=23)},
+            {**click, "timestamp": day, "properties": {"x": "10", "y": 10}},
+        ]))
+
+        assert sorted(accumulators) == [day - timedelta(days=1), day]
+        assert accumulators[day].clicks.total == 1
+        assert accumulators[day].scroll.total == 1
+
+    def test_covered_days_and_gaps(self):
+        """Test whole days come from grids, today included when the range runs to now."""
+        date_from = datetime(2026, 1, 1, 12)
+        now = datetime(2026, 1, 5, 9)
+
+        assert covered_days(date_from, datetime(2026, 1, 4, 12), now) == [
+            datetime(2026, 1, 2), datetime(2026, 1, 3)
+        ]
+        assert covered_days(date_from, now, now)[-1] == datetime(2026, 1, 5)
+
+        end = datetime(2026, 1, 5)
+        assert uncovered_ranges(date_from, end, [datetime(2026, 1, 3)]) == [
+            (date_from, datetime(2026, 1, 3)),
+            (datetime(2026, 1, 4), end),
+        ]
+
+    def test_aggregate_heatmap_data_from_events(self):
+        """Test in-memory aggregation keeps only the requested bucket."""
+        now = datetime(2026, 1, 1)
+        events = [
+            {"event_type": "click", "path": "/", "session_id": "s1", "timestamp": now,
+             "viewport_width": 390, "viewport_height": 844, "properties": {"x": 10, "y": 10}},
+            {"event_type": "scroll", "path": "/", "session_id": "s1", "timestamp": now,
+             "viewport_width": 400, "viewport_height": 844, "properties": {"scroll_depth": 50}},
+            {"event_type": "click", "path": "/", "session_id": "s1", "timestamp": now,
+             "viewport_width": 1920, "viewport_height": 1080, "properties": {"x": 10, "y": 10}},
+            {"event_type": "click", "path": "/", "session_id": "s1", "timestamp": now,
+             "viewport_width": 390, "viewport_height": 844, "properties": {"x": 10, "y": 10},
+             "is_bot": True},
+        ]
+
+        data = aggregate_heatmap_data(events, 375)
+
+        assert data["viewport_width"] == 375
+        assert HeatmapGrid.from_bytes(data["click_grid"]).total == 1
+        assert ScrollReach.from_bytes(data["scroll_grid"]).total == 1
+        assert data["sample_size"] == 2
+
+
+class TestArchivedHeatmapDays:
+    """Tests for heatmap days whose raw events were moved to cold storage."""
+
+    async def test_compacted_day_is_rebuilt_from_the_archive(self, tmp_path, monkeypatch):
+        """Test a day without a usable grid is binned from Parquet, not from empty Postgres."""
+        pq = pytest.importorskip("pyarrow.parquet")
+        monkeypatch.setattr(settings, "cold_storage_enabled", True)
+        monkeypatch.setattr(settings, "cold_storage_dir", str(tmp_path))
+        day = datetime(2026, 1, 5)
+
+        def event(event_type, properties, width=400, path="/p", is_bot=False):
+            return {
+                "id": uuid.uuid4(), "event_type": event_type, "session_id": "s1",
+                "visitor_id": "v1", "timestamp": day + timedelta(hours=1),
+                "url": f"https://shop.example{path}", "path": path,
+                "viewport_width": width, "viewport_height": 800,
+                "properties": properties, "is_bot": is_bot, "created_at": day,
+            }
+
+        rows = [
+            event("click", {"x": 10, "y": 10}),
+            event("scroll", {"depth": 50}),
+            event("click", {"x": 10, "y": 10}, width=1920),  # Other bucket
+            event("click", {"x": 10, "y": 10}, path="/q"),
+            event("click", {"x": 10, "y": 10}, is_bot=True),
+        ]
+        pq.write_table(_rows_to_table(rows, _event_schema()), cold_file_path(tmp_path, day.date()))
+
+        class FakeResult:
+            def scalars(self):
+                return self
+
+            def all(self):
+                return []  # No stored grid for the day yet
+
+        class FakeSession:
+            def __init__(self):
+                self.statements = []
+
+            async def execute(self, statement):
+                self.statements.append(statement)
+                return FakeResult()
+
+            async def stream(self, statement):
+                raise AssertionError("Archived days must not be read from Postgres")
+
+            async def commit(self):
+                pass
+
+        db = FakeSession()
+        heatmap = await build_heatmap(
+            db, "/p", 400, "click", day, day + timedelta(days=1) - timedelta(microseconds=1),
+            now=datetime(2026, 2, 1),
+        )
+
+        assert heatmap["sample_size"] == 1
+        stored = db.statements[-1].compile().params
+        assert HeatmapGrid.from_bytes(stored["click_grid_m0"]).total == 1
+        assert ScrollReach.from_bytes(stored["scroll_grid_m0"]).total == 1
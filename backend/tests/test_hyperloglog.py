@@ -0,0 +1,56 @@
+"""
+Tests for the HyperLogLog distinct-count sketch.
+"""
+from app.core.hyperloglog import HyperLogLog
+
+
+class TestHyperLogLog:
+    """Tests for HyperLogLog visitor sketches."""
+
+    def test_estimate_within_error_bound(self):
+        """Test the estimate stays within a few standard errors."""
+        sketch = HyperLogLog(precision=12)
+        sketch.update(f"visitor_{i}" for i in range(20000))
+
+        assert abs(sketch.count() - 20000) / 20000 < 4 * sketch.standard_error
+
+    def test_small_counts_are_exact_enough(self):
+        """Test duplicates are ignored and tiny sets count precisely."""
+        sketch = HyperLogLog(precision=14)
+        assert sketch.count() == 0
+
+        sketch.update(["a", "b", "c", "a", "b"])
+        assert sketch.count() == 3
+
+    def test_merge_is_union(self):
+        """Test merging overlapping sketches estimates the union."""
+        first = HyperLogLog(precision=12)
+        first.update(f"visitor_{i}" for i in range(5000))
+        second = HyperLogLog(precision=12)
+        second.update(f"visitor_{i}" for i in range(2500, 7500))
+
+        merged = HyperLogLog.union([first, second])
+
+        assert abs(merged.count() - 7500) / 7500 < 4 * merged.standard_error
+        assert first.count() < merged.count()
+
+    def test_fold_matches_lower_precision_sketch(self):
+        """Test folding reproduces the registers of a lower-precision sketch."""
+        values = [f"visitor_{i}" for i in range(3000)]
+        high = HyperLogLog(precision=14)
+        high.update(values)
+        low = HyperLogLog(precision=10)
+        low.update(values)
+
+        assert (high.fold(10).registers == low.registers).all()
+        assert high.copy().merge(low).precision == 10
+
+    def test_serialization_round_trip(self):
+        """Test sketches survive storage as bytes."""
+        sketch = HyperLogLog(precision=11)
+        sketch.update(f"visitor_{i}" for i in range(1000))
+
+        restored = HyperLogLog.from_bytes(sketch.to_bytes())
+
+        assert restored.precision == 11
+        assert restored.count() == sketch.count()
@@ -0,0 +1,151 @@
+"""
+Tests for realtime analytics.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.realtime_stream import (
+    RealtimeBroker,
+    StreamSubscribersExhaustedError,
+    build_realtime_delta,
+)
+from app.services.realtime_window import RealtimeWindow, SecondBucket
+
+
+class TestRealtimeWindow:
+    """Tests for the in-memory realtime sliding window."""
+
+    NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+    @pytest.fixture
+    def window(self) -> RealtimeWindow:
+        """Five-minute window with a 30 second active lookback."""
+        return RealtimeWindow(window_seconds=300, active_seconds=30, sync_interval_ms=1000)
+
+    def _event(self, visitor_id: str, seconds_ago: int, **overrides) -> dict:
+        record = {
+            "visitor_id": visitor_id,
+            "event_type": "pageview",
+            "path": "/",
+            "country_code": "US",
+            "is_bot": False,
+            "ecommerce_data": None,
+            "timestamp": self.NOW - timedelta(seconds=seconds_ago),
+        }
+        record.update(overrides)
+        return record
+
+    def _now(self, seconds_later: int = 0) -> float:
+        return (self.NOW + timedelta(seconds=seconds_later)).replace(
+            tzinfo=timezone.utc
+        ).timestamp()
+
+    def test_counts_visitors_pages_and_countries(self, window: RealtimeWindow):
+        """Test the window mirrors the realtime endpoint's metrics."""
+        window.observe(
+            [
+                self._event("v1", 5),
+                self._event("v1", 4, path="/cart"),
+                self._event("v2", 120, country_code="DE"),
+                self._event("bot", 1, is_bot=True),
+                self._event(
+                    "v3", 2, event_type="ecommerce",
+                    ecommerce_data={"funnel_step": "purchase", "order_value": 42.0},
+                ),
+            ],
+            now=self._now(),
+        )
+
+        stats = window.stats(now=self._now())
+
+        assert stats["current_visitors"] == 2
+        assert stats["visitors_last_5min"] == 3
+        assert stats["pageviews_last_5min"] == 3
+        assert stats["top_pages_now"][0] == {"path": "/", "visitors": 2}
+        assert stats["top_countries_now"][0] == {"country_code": "US", "visitors": 2}
+        assert stats["recent_conversions"] == [
+            {"type": "purchase", "value": 42.0,
+             "timestamp": (self.NOW - timedelta(seconds=2)).isoformat()}
+        ]
+
+    def test_old_seconds_fall_out_of_window(self, window: RealtimeWindow):
+        """Test buckets older than the window stop counting and slots are reused."""
+        window.observe([self._event("v1", 0)], now=self._now())
+        window.observe([self._event("v2", -300)], now=self._now(300))
+
+        stats = window.stats(now=self._now(300))
+
+        assert stats["visitors_last_5min"] == 1
+        assert stats["pageviews_last_5min"] == 1
+
+    def test_merges_buckets_from_other_workers(self, window: RealtimeWindow):
+        """Test remote buckets round-trip through their sync form and union visitors."""
+        other = RealtimeWindow(window_seconds=300, active_seconds=30, sync_interval_ms=1000)
+        other.observe([self._event("v1", 1), self._event("v9", 1)], now=self._now())
+        window.observe([self._event("v1", 1)], now=self._now())
+
+        remote = [
+            SecondBucket.from_dict(json.loads(json.dumps(bucket.to_dict())))
+            for bucket in other._buckets
+            if bucket.second >= 0
+        ]
+        stats = window.stats(now=self._now(), extra_buckets=remote)
+
+        assert stats["current_visitors"] == 2
+        assert stats["pageviews_last_5min"] == 3
+
+
+class TestRealtimeStream:
+    """Tests for the realtime pub/sub feeding /stream."""
+
+    def _records(self) -> list[dict]:
+        now = datetime(2026, 1, 1, 12, 0, 0)
+        base = {"visitor_id": "v1", "is_bot": False, "country_code": "US",
+                "ecommerce_data": None, "timestamp": now}
+        return [
+            {**base, "event_type": "pageview", "path": "/"},
+            {**base, "event_type": "click", "path": "/"},
+            {**base, "event_type": "pageview", "path": "/", "is_bot": True},
+            {**base, "event_type": "ecommerce", "path": "/checkout",
+             "ecommerce_data": {"funnel_step": "purchase", "order_value": 10.0}},
+        ]
+
+    def test_delta_skips_bots(self):
+        """Test deltas count human events only."""
+        delta = build_realtime_delta(self._records())
+
+        assert delta["events"] == 3
+        assert delta["pageviews"] == 1
+        assert delta["pages"] == {"/": 1}
+        assert delta["countries"] == {"US": 3}
+        assert [c["value"] for c in delta["conversions"]] == [10.0]
+        assert build_realtime_delta([self._records()[2]]) is None
+
+    async def test_slow_subscriber_gets_coalesced_deltas(self):
+        """Test a full queue merges deltas instead of growing or blocking."""
+        broker = RealtimeBroker(queue_size=2, max_subscribers=10)
+        subscriber = broker.subscribe()
+
+        for _ in range(5):
+            broker.publish_events(self._records())
+
+        first = await subscriber.get(timeout=0)
+        second = await subscriber.get(timeout=0)
+        assert first["events"] == 3
+        assert second["events"] == 12
+        assert second["pages"] == {"/": 4}
+        assert subscriber.coalesced == 3
+        assert await subscriber.get(timeout=0.01) is None
+
+    async def test_subscriber_limit(self):
+        """Test subscribing beyond the limit is refused and unsubscribing frees a slot."""
+        broker = RealtimeBroker(queue_size=2, max_subscribers=1)
+        subscriber = broker.subscribe()
+
+        with pytest.raises(StreamSubscribersExhaustedError):
+            broker.subscribe()
+
+        broker.unsubscribe(subscriber)
+        broker.subscribe()
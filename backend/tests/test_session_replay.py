@@ -0,0 +1,77 @@
+"""
+Tests for session replay storage.
+"""
+import json
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.analytics import ReplayChunkRequest
+from app.services.object_store import LocalObjectStore
+from app.services.session_replay import (
+    CODECS,
+    ReplayStore,
+    parse_byte_range,
+    replay_key,
+)
+
+
+class TestSessionReplayStore:
+    """Tests for replay chunk storage in the local object store."""
+
+    async def test_chunks_decode_alone_and_together(self, tmp_path):
+        """Test every chunk range decompresses by itself and the whole object in one pass."""
+        store = ReplayStore(LocalObjectStore(tmp_path, block_size=16))
+        first = [{"type": 4, "timestamp": 1000, "data": {"href": "/"}}]
+        second = [{"type": 3, "timestamp": 2500}, {"type": 3, "timestamp": 2000}]
+
+        await store.append_chunk("s1", first)
+        stored = await store.append_chunk("s1", second)
+        chunks = await store.chunks(stored.key)
+
+        assert [(c.event_count, c.first_timestamp_ms) for c in chunks] == [(1, 1000), (2, 2000)]
+        assert stored.object_size == chunks[1].offset + chunks[1].length
+        chunk_data = b"".join([
+            block async for block in store.read(stored.key, chunks[1].offset, stored.object_size)
+        ])
+        decoded = stored.codec.decompress(chunk_data).splitlines()
+        assert [json.loads(line) for line in decoded] == second
+        whole = b"".join([block async for block in store.read(stored.key)])
+        assert len(stored.codec.decompress(whole).splitlines()) == 3
+        assert (await store.locate("s1"))[0] == stored.key
+        assert await store.locate("s2") is None
+
+    def test_object_keys_stay_under_root(self, tmp_path):
+        """Test keys are hashed from session ids and traversal is rejected."""
+        key = replay_key("../../etc/passwd", CODECS["gzip"])
+
+        assert key.startswith("replays/") and key.endswith(".jsonl.gz") and ".." not in key
+        with pytest.raises(ValueError):
+            LocalObjectStore(tmp_path)._path("replays/../../escape")
+
+    def test_chunk_drops_timestamps_far_from_server_time(self):
+        """Test events with missing, negative or far-off timestamps never reach the store."""
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        request = ReplayChunkRequest(visitor_id="v1", events=[
+            {"type": 3, "timestamp": now_ms},
+            {"type": 3, "timestamp": -1},
+            {"type": 3, "timestamp": 10**18},
+            {"type": 3, "timestamp": True},
+            {"type": 3},
+        ])
+
+        assert request.events == [{"type": 3, "timestamp": now_ms}]
+        with pytest.raises(ValidationError):
+            ReplayChunkRequest(visitor_id="v1", events=[{"type": 3, "timestamp": -1}])
+
+    def test_parse_byte_range(self):
+        """Test single ranges, suffix ranges and unsatisfiable requests."""
+        assert parse_byte_range(None, 100) is None
+        assert parse_byte_range("bytes=10-19", 100) == (10, 20)
+        assert parse_byte_range("bytes=90-", 100) == (90, 100)
+        assert parse_byte_range("bytes=-30", 100) == (70, 100)
+        assert parse_byte_range("bytes=50-500", 100) == (50, 100)
+        for header in ("bytes=100-", "bytes=0-1,5-6", "items=0-1", "bytes=-"):
+            with pytest.raises(ValueError):
+                parse_byte_range(header, 100)
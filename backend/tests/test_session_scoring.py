@@ -0,0 +1,64 @@
+"""
+Tests for vectorized session quality scoring.
+"""
+import numpy as np
+
+from app.models.analytics import AnalyticsSession
+from app.services.analytics_service import calculate_session_quality_score
+from app.services.session_scoring import _changed_scores, score_sessions
+
+
+class TestSessionScoring:
+    """Tests for vectorized session quality scoring."""
+
+    @staticmethod
+    def branchy_score(duration: int, pageviews: int, clicks: int, conversion: bool, bounce: bool):
+        """The per-session rules the vectorized scorer replaced."""
+        score = 50.0
+        score += 20 if duration > 300 else 10 if duration > 120 else 5 if duration > 30 else 0
+        score += 15 if pageviews >= 5 else 10 if pageviews >= 3 else 5 if pageviews >= 2 else 0
+        score += 15 if clicks >= 10 else 10 if clicks >= 5 else 5 if clicks >= 2 else 0
+        if conversion:
+            score = 100.0
+        if bounce:
+            score = max(0, score - 30)
+        return min(100.0, score)
+
+    def test_matches_per_session_rules(self):
+        """Test every threshold edge scores as the branchy rules did."""
+        rng = np.random.default_rng(7)
+        n = 5000
+        duration = rng.choice([0, 30, 31, 120, 121, 300, 301, 5000], n)
+        pageviews = rng.integers(0, 7, n)
+        clicks = rng.choice([0, 1, 2, 4, 5, 9, 10, 50], n)
+        conversion = rng.random(n) < 0.1
+        bounce = rng.random(n) < 0.3
+
+        scores = score_sessions(duration, pageviews, clicks, conversion, bounce)
+
+        expected = [
+            self.branchy_score(*row) for row in zip(
+                duration.tolist(), pageviews.tolist(), clicks.tolist(),
+                conversion.tolist(), bounce.tolist(), strict=True,
+            )
+        ]
+        assert scores.tolist() == expected
+
+    def test_only_changed_scores_are_written(self):
+        """Test unchanged and already-scored sessions are skipped, unscored ones written."""
+        rows = [
+            ("a", 400, 5, 10, False, False, 100.0),
+            ("b", 0, 1, 0, False, True, None),
+            ("c", 0, 1, 0, False, False, 80.0),
+        ]
+
+        assert _changed_scores(rows) == [("b", 20.0), ("c", 50.0)]
+
+    def test_single_session_helper(self):
+        """Test the per-session helper delegates to the vectorized rules."""
+        session = AnalyticsSession(
+            duration_seconds=None, pageview_count=3, click_count=5,
+            has_conversion=True, is_bounce=False,
+        )
+
+        assert calculate_session_quality_score(session) == 100.0
@@ -15,7 +15,7 @@ import {
   ProgressBar,
   Box,
 } from '@shopify/polaris';
-import { useQuery } from '@tanstack/react-query';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
 
 // Types
 interface RealTimeStats {
@@ -27,6 +27,14 @@ interface RealTimeStats {
   recent_conversions: Array<{ type: string; value: number; timestamp: string }>;
 }
 
+interface RealTimeDelta {
+  events: number;
+  pageviews: number;
+  pages: Record<string, number>;
+  countries: Record<string, number>;
+  conversions: Array<{ type: string; value: number; timestamp: string }>;
+}
+
 interface AnalyticsSummary {
   date_from: string;
   date_to: string;
@@ -62,17 +70,60 @@ async function fetchAnalyticsSummary(dateFrom: string, dateTo: string): Promise<
   return response.json();
 }
 
+// Apply a streamed delta on top of the last snapshot
+function applyRealTimeDelta(stats: RealTimeStats, delta: RealTimeDelta): RealTimeStats {
+  return {
+    ...stats,
+    pageviews_last_5min: stats.pageviews_last_5min + delta.pageviews,
+    recent_conversions: [...delta.conversions, ...stats.recent_conversions].slice(0, 10),
+  };
+}
+
+// Subscribe to pushed real-time updates; returns true while the stream is live
+function useRealTimeStream(): boolean {
+  const queryClient = useQueryClient();
+  const [connected, setConnected] = useState(false);
+
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') {
+      return;
+    }
+
+    const source = new EventSource('/api/v1/analytics/stream');
+
+    source.addEventListener('snapshot', (event) => {
+      queryClient.setQueryData(['analytics', 'realtime'], JSON.parse((event as MessageEvent).data));
+      setConnected(true);
+    });
+
+    source.addEventListener('delta', (event) => {
+      const delta: RealTimeDelta = JSON.parse((event as MessageEvent).data);
+      queryClient.setQueryData<RealTimeStats>(['analytics', 'realtime'], (stats) =>
+        stats ? applyRealTimeDelta(stats, delta) : stats
+      );
+    });
+
+    // EventSource reconnects by itself; poll until the next snapshot arrives
+    source.onerror = () => setConnected(false);
+
+    return () => source.close();
+  }, [queryClient]);
+
+  return connected;
+}
+
 export default function AnalyticsDashboard() {
   const [dateRange, setDateRange] = useState({
     from: new Date(Date.now() - 7 * 24 * 60 * 60 * 1000).toISOString(), // Last 7 days
     to: new Date().toISOString(),
   });
 
-  // Real-time stats (refetch every 10 seconds)
+  // Real-time stats (pushed over the stream; poll every 10 seconds while it is down)
+  const streaming = useRealTimeStream();
   const { data: realTimeStats, isLoading: realTimeLoading } = useQuery({
     queryKey: ['analytics', 'realtime'],
     queryFn: fetchRealTimeStats,
-    refetchInterval: 10000, // Refetch every 10 seconds
+    refetchInterval: streaming ? false : 10000,
   });
 
   // Summary stats